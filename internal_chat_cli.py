@@ -5,8 +5,7 @@ from dotenv import load_dotenv
 # Ensure parent directory is in path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from phase3_retrieval.retrieval_pipeline import RetrievalSystem
-from phase4_generation.generation_pipeline import AnswerGenerator
+from utils.chat_pipeline import build_pipeline
 
 def main():
     load_dotenv()
@@ -20,16 +19,13 @@ def main():
         print(f"Error: Embeddings directory not found at {embeddings_dir}")
         return
 
-    print("Initializing Retrieval System...")
-    retriever = RetrievalSystem(embeddings_dir)
-    
-    print("Initializing Generator...")
     # Check for API key
-    if not os.getenv("GEMINI_API_KEY"):
-        print("WARNING: GEMINI_API_KEY not found in environment variables.")
+    if not os.getenv("GROQ_API_KEY"):
+        print("WARNING: GROQ_API_KEY not found in environment variables.")
         print("Please set it in your .env file to generate answers.")
         
-    generator = AnswerGenerator() 
+    print("Initializing chat pipeline...")
+    pipeline = build_pipeline(embeddings_dir, intent_method=os.getenv("MF_INTENT_CLASSIFIER"))
     
     # User Interface Elements
     print("\n" + "="*60)
@@ -53,18 +49,17 @@ def main():
             if not query:
                 continue
             
-            # Phase 3: Retrieve
-            print("Searching... ", end="", flush=True)
-            chunks = retriever.retrieve(query, k=5)
-            print(f"Found {len(chunks)} relevant contexts.")
-            
-            # Phase 4: Generate
             print("Thinking... ", end="", flush=True)
-            answer = generator.generate_answer(query, chunks)
+            result = pipeline.run(query, session_id="cli")
+            print(f"answered at '{result['stage']}' in {result['timings']['total']:.2f}s")
             
             # Output
             print("\n" + "-"*40)
-            print(answer)
+            print(result['answer'])
+            if result['sources']:
+                print(f"\nSource: {result['sources'][0]}")
+            for suggestion in result['suggestions']:
+                print(f"- {suggestion}")
             print("-" * 40)
             
         except KeyboardInterrupt:
@@ -0,0 +1,271 @@
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import logging
+import unicodedata
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Separates pages in raw text; the stages run over a whole document at once
+# and never match across it
+PAGE_BREAK = "\f"
+
+# Private-use glyphs PDFs use for bullets (e.g. U+F06C)
+PRIVATE_USE = re.compile('[\ue000-\uf8ff]')
+# "open-\nended" -> "open-ended": line breaks after a hyphen split compounds, not syllables
+LINE_END_HYPHEN = re.compile(r'-[ \t]*\n[ \t]*(?=[a-z])')
+SOFT_HYPHEN = re.compile('\u00ad[ \t]*\n?[ \t]*')
+# Page numbers as PDFs print them: "3", "Page 3", "1/2", "3 of 40"
+PAGE_NUMBER = re.compile(r'^(?:page\s*)?(\d{1,4})(?:\s*(?:/|of)\s*\d{1,4})?$', re.IGNORECASE)
+# A wide gap between two non-blank characters on one line separates table cells
+TABLE_GAP = re.compile(r'[ \t]{3,}|\t[ \t]*')
+DIGITS = re.compile(r'\d+')
+
+# Lines this close to the top or bottom of a page can be running headers/footers
+EDGE_LINES = 3
+# Running headers need this many pages to be told apart from content
+MIN_PAGES = 3
+
+# Whitespace other than PAGE_BREAK, so a pattern never matches across pages
+GAP = r'[^\S\f]+'
+DISCLAIMERS = [
+    GAP.join(['mutual', 'fund', 'investments', 'are', 'subject', 'to', 'market', 'risks,?', 'read', 'all', 'scheme',
+              'related', 'documents', r'carefully\.?']),
+]
+HDFC_DISCLAIMERS = DISCLAIMERS + [
+    GAP.join(['refer', 'disclaimer', 'on', 'page', r'\d+']),
+]
+
+# Stages run for each source_type in resource_registry.json, in order
+DEFAULT_STAGES = ['normalize_unicode', 'repair_hyphenation', 'remove_disclaimers', 'collapse_whitespace']
+SOURCE_RULES = {
+    'HDFC MF': {
+        'stages': ['normalize_unicode', 'repair_hyphenation', 'strip_headers_footers', 'flatten_tables',
+                   'remove_disclaimers', 'collapse_whitespace'],
+        'disclaimers': HDFC_DISCLAIMERS,
+    },
+    'AMFI': {
+        'stages': DEFAULT_STAGES,
+        'disclaimers': DISCLAIMERS,
+    },
+}
+
+# Bump when stage code or page handling changes; the rule data above is hashed by rules_version()
+CLEANING_VERSION = 1
+
+
+def rules_version() -> str:
+    """Identity of the cleaning rules; documents cleaned under other rules are cleaned again on the next scrape."""
+    rules = {
+        'version': CLEANING_VERSION,
+        'default_stages': DEFAULT_STAGES,
+        'default_disclaimers': DISCLAIMERS,
+        'sources': SOURCE_RULES,
+        'patterns': [pattern.pattern for pattern in (PRIVATE_USE, LINE_END_HYPHEN, SOFT_HYPHEN, PAGE_NUMBER,
+                                                     TABLE_GAP, DIGITS)],
+        'edge_lines': EDGE_LINES,
+        'min_pages': MIN_PAGES,
+    }
+    return hashlib.sha256(json.dumps(rules, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _split(text: str) -> List[str]:
+    return text.split(PAGE_BREAK)
+
+
+def normalize_unicode(text: str, pipeline: "CleaningPipeline") -> str:
+    """NFKC (ligatures like 'ﬁ' become 'fi', non-breaking spaces become spaces) and no bullet glyphs."""
+    return PRIVATE_USE.sub(' ', unicodedata.normalize('NFKC', text))
+
+
+def repair_hyphenation(text: str, pipeline: "CleaningPipeline") -> str:
+    """Rejoin words split across lines; soft hyphens are dropped, real hyphens kept."""
+    return LINE_END_HYPHEN.sub('-', SOFT_HYPHEN.sub('', text))
+
+
+def strip_headers_footers(text: str, pipeline: "CleaningPipeline") -> str:
+    """
+    Drop running headers/footers and page numbers: lines near a page edge
+    whose digit-insensitive form recurs at the edge of at least half the
+    pages, and edge lines that are just a page number.
+    """
+    pages = [page.split('\n') for page in _split(text)]
+    if len(pages) < MIN_PAGES:
+        return text
+
+    def edges(lines):
+        filled = [i for i, line in enumerate(lines) if line.strip()]
+        return set(filled[:EDGE_LINES] + filled[-EDGE_LINES:])
+
+    def key(line):
+        return DIGITS.sub('#', " ".join(line.split()).lower())
+
+    page_edges = [edges(lines) for lines in pages]
+    counts = Counter(k for lines, positions in zip(pages, page_edges) for k in {key(lines[i]) for i in positions})
+    repeated = {k for k, count in counts.items() if count >= max(MIN_PAGES, len(pages) / 2) and k != '#'}
+
+    def noise(line):
+        number = PAGE_NUMBER.match(line.strip())
+        return key(line) in repeated or (number is not None and int(number.group(1)) <= len(pages))
+
+    return PAGE_BREAK.join(
+        '\n'.join(line for i, line in enumerate(lines) if i not in positions or not noise(line))
+        for lines, positions in zip(pages, page_edges))
+
+
+def flatten_tables(text: str, pipeline: "CleaningPipeline") -> str:
+    """Column gaps in table rows become ' | ' so cells do not run together once whitespace collapses."""
+    def cell_break(match):
+        start, end = match.span()
+        between_cells = start > 0 and end < len(text) and not text[start - 1].isspace() and not text[end].isspace()
+        return ' | ' if between_cells else match.group()
+    return TABLE_GAP.sub(cell_break, text)
+
+
+def remove_disclaimers(text: str, pipeline: "CleaningPipeline") -> str:
+    """Boilerplate sentences repeated across a source's documents."""
+    return pipeline.disclaimers.sub(' ', text) if pipeline.disclaimers is not None else text
+
+
+def collapse_whitespace(text: str, pipeline: "CleaningPipeline") -> str:
+    """One space between words, no leading/trailing space on a page."""
+    return PAGE_BREAK.join(" ".join(page.split()) for page in _split(text))
+
+
+STAGES = {
+    'normalize_unicode': normalize_unicode,
+    'repair_hyphenation': repair_hyphenation,
+    'strip_headers_footers': strip_headers_footers,
+    'flatten_tables': flatten_tables,
+    'remove_disclaimers': remove_disclaimers,
+    'collapse_whitespace': collapse_whitespace,
+}
+
+
+def empty_report() -> Dict[str, Any]:
+    return {'documents': 0, 'chars_in': 0, 'chars_out': 0, 'stages': {}}
+
+
+def merge_reports(total: Dict[str, Any], report: Dict[str, Any]) -> Dict[str, Any]:
+    for key in ('documents', 'chars_in', 'chars_out'):
+        total[key] += report[key]
+    for name, stage in report['stages'].items():
+        entry = total['stages'].setdefault(name, {'seconds': 0.0, 'chars_removed': 0})
+        entry['seconds'] += stage['seconds']
+        entry['chars_removed'] += stage['chars_removed']
+    return total
+
+
+class CleaningPipeline:
+    """
+    Ordered cleaning stages for one source_type. A document's pages are
+    cleaned together (joined by PAGE_BREAK), so every stage is one pass of
+    compiled regexes over the document and cross-page rules see all pages.
+    """
+
+    def __init__(self, stages: List[str], disclaimers: Optional[List[str]] = None):
+        unknown = [name for name in stages if name not in STAGES]
+        if unknown:
+            raise ValueError(f"Unknown cleaning stages {unknown}, expected some of {list(STAGES)}")
+        self.stages = stages
+        self.disclaimers = re.compile('|'.join(f'(?:{pattern})' for pattern in disclaimers), re.IGNORECASE) \
+            if disclaimers else None
+
+    @classmethod
+    def for_source(cls, source_type: Optional[str]) -> "CleaningPipeline":
+        # Built (and its patterns compiled) once per source type and process
+        if source_type not in _PIPELINES:
+            rules = SOURCE_RULES.get(source_type, {})
+            _PIPELINES[source_type] = cls(rules.get('stages', DEFAULT_STAGES), rules.get('disclaimers', DISCLAIMERS))
+        return _PIPELINES[source_type]
+
+    def run(self, pages: List[str]) -> Tuple[List[str], Dict[str, Any]]:
+        """Cleaned pages (same count and order) and per-stage seconds and characters removed."""
+        text = PAGE_BREAK.join(page.replace(PAGE_BREAK, '\n') for page in pages)
+        report = empty_report()
+        report['documents'] = 1
+        report['chars_in'] = len(text) - len(pages) + 1
+        for name in self.stages:
+            start = time.perf_counter()
+            cleaned = STAGES[name](text, self)
+            if cleaned.count(PAGE_BREAK) != len(pages) - 1:
+                # Page numbers (citations, #page=N links, page hashes) depend on the count
+                raise RuntimeError(f"Cleaning stage {name} changed the page count of a document")
+            report['stages'][name] = {'seconds': time.perf_counter() - start,
+                                      'chars_removed': len(text) - len(cleaned)}
+            text = cleaned
+        cleaned_pages = _split(text)
+        report['chars_out'] = sum(len(page) for page in cleaned_pages)
+        return cleaned_pages, report
+
+
+_PIPELINES: Dict[Optional[str], CleaningPipeline] = {}
+
+
+def _clean_one(document: Tuple[Optional[str], List[str]]) -> Tuple[List[str], Dict[str, Any]]:
+    source_type, pages = document
+    return CleaningPipeline.for_source(source_type).run(pages)
+
+
+def clean_documents(documents: List[Tuple[Optional[str], List[str]]],
+                    workers: Optional[int] = None) -> Tuple[List[List[str]], Dict[str, Any]]:
+    """
+    Clean (source_type, pages) documents, in a process pool when there is
+    more than one worker and document. Returns cleaned pages in input order
+    and the summed report.
+    """
+    workers = workers if workers is not None else (os.cpu_count() or 1)
+    if workers > 1 and len(documents) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(documents))) as pool:
+            results = list(pool.map(_clean_one, documents, chunksize=max(1, len(documents) // (4 * workers))))
+    else:
+        results = [_clean_one(document) for document in documents]
+    report = empty_report()
+    for _, document_report in results:
+        merge_reports(report, document_report)
+    return [pages for pages, _ in results], report
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    removed = report['chars_in'] - report['chars_out']
+    lines = [f"Cleaned {report['documents']} documents: {report['chars_in']:,} -> {report['chars_out']:,} chars "
+             f"({removed / max(report['chars_in'], 1):.1%} removed)"]
+    for name, stage in report['stages'].items():
+        lines.append(f"  {name:<24} {stage['seconds'] * 1000:>9.1f} ms {stage['chars_removed']:>12,} chars")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+    from phase1_data_collection.object_store import ObjectStore
+
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Re-clean the raw text in the object store and report what each stage removes")
+    parser.add_argument("--store", default=os.path.join(BASE_DIR, "store"))
+    parser.add_argument("--registry", default=os.path.join(BASE_DIR, "resources", "resource_registry.json"))
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: CPU count)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    with open(args.registry, 'r', encoding='utf-8') as f:
+        source_types = {resource['url']: resource.get('source') for resource in json.load(f)}
+    store = ObjectStore(args.store)
+    documents = [(source_types.get(manifest['url']), _split(store.get_text(manifest['raw_text'])))
+                 for manifest in store.manifests().values()]
+    start = time.perf_counter()
+    _, report = clean_documents(documents, args.workers)
+    elapsed = time.perf_counter() - start
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    print(f"Wall time: {elapsed * 1000:.1f} ms")
@@ -0,0 +1,172 @@
+import re
+import logging
+from typing import List, Dict, Any, Optional, Union
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:  # lxml missing: every source falls back to the BeautifulSoup path
+    lxml = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Per-source `html_extractor` values in resource_registry.json
+EXTRACTORS = ('readability', 'page', 'legacy')
+DEFAULT_EXTRACTOR = 'readability'
+
+# Never text
+CODE_TAGS = ['script', 'style', 'noscript', 'template']
+# Never content
+DROP_TAGS = ['iframe', 'svg', 'canvas', 'form', 'button', 'select', 'input', 'nav', 'footer', 'header', 'aside']
+# A whole class/id token of menus, cookie banners, pop-ups and share widgets, e.g. "cookie-consent",
+# "site-footer", "main-menu" (but not "has-sidebar", "fund-header" or "shareholding")
+BOILERPLATE = re.compile(r'(?:(?:site|main|top|global|page|primary|mobile)[-_])?'
+                         r'(?:cookies?|consent|banner|gdpr|popup|modal|overlay|newsletter|subscribe|social|share|'
+                         r'breadcrumbs?|menu|navbar|nav|navigation|footer|header|sidebar|advert|ads|promo|skip-link|'
+                         r'toast)(?:[-_][\w-]*)?', re.IGNORECASE)
+# Boilerplate-looking elements holding more than this share of the page's text are kept (page wrappers)
+MAX_DROPPED_SHARE = 0.5
+# Below this share of the page's text, the result is not trusted and the legacy extractor is used
+MIN_KEPT_SHARE = {'readability': 0.05, 'page': 0.25}
+POSITIVE = re.compile(r'article|content|main|body|entry|text|story|post|faq|detail', re.IGNORECASE)
+NEGATIVE = re.compile(r'comment|related|widget|sponsor|tag|meta|link|footnote|disclaimer-popup', re.IGNORECASE)
+CANDIDATE_TAGS = {'div', 'section', 'article', 'main', 'td'}
+BLOCK_TAGS = {'p', 'div', 'section', 'article', 'main', 'li', 'tr', 'table', 'ul', 'ol', 'dl', 'dt', 'dd',
+              'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'br', 'blockquote', 'pre'}
+CELL_TAGS = {'td', 'th'}
+# Below this many characters the detected main content is not trusted
+MIN_MAIN_CHARS = 200
+
+
+def extract_legacy(html: Union[str, bytes]) -> str:
+    """The original path: html.parser, a few tags removed, text of the whole page."""
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # Remove script and style elements
+    for script in soup(["script", "style", "nav", "footer", "header"]):
+        script.decompose()
+
+    return soup.get_text()
+
+
+def _class_id(element) -> str:
+    return f"{element.get('class', '')} {element.get('id', '')}"
+
+
+def _text_length(element) -> int:
+    return len("".join(element.text_content().split()))
+
+
+def _is_boilerplate(element) -> bool:
+    tokens = f"{element.get('class', '')} {element.get('id', '')}".split()
+    return any(BOILERPLATE.fullmatch(token) for token in tokens)
+
+
+def _remove_boilerplate(root, drop_xpath: List[str], total: int):
+    etree.strip_elements(root, *DROP_TAGS, with_tail=False)
+    doomed = [element for element in root.iter(etree.Element)
+              if element.tag not in ('html', 'body') and _is_boilerplate(element)
+              and _text_length(element) <= MAX_DROPPED_SHARE * total]
+    for xpath in drop_xpath:
+        doomed.extend(root.xpath(xpath))
+    for element in doomed:
+        if element.getparent() is not None:
+            element.drop_tree()
+
+
+def _text(element) -> str:
+    """Text of an element with block elements on their own lines."""
+    parts = []
+    for node in element.iter():
+        if not isinstance(node.tag, str):
+            continue
+        if node.tag in BLOCK_TAGS:
+            parts.append("\n")
+        elif node.tag in CELL_TAGS:
+            parts.append(" ")
+        if node.text:
+            parts.append(node.text)
+        if node is not element and node.tail:
+            parts.append(node.tail)
+    text = re.sub(r'[ \t\r\f\v]+', ' ', "".join(parts))
+    return re.sub(r' *\n[\s]*', '\n', text).strip()
+
+
+def _score(element) -> float:
+    """Readability-style score: text in the element's own paragraphs, minus link-heavy text."""
+    text = element.text_content()
+    length = len(text.strip())
+    if length < 25:
+        return 0.0
+    link_chars = sum(len(link.text_content()) for link in element.iter('a'))
+    score = length * (1.0 - link_chars / length) + 25 * text.count(',')
+    attributes = _class_id(element)
+    if POSITIVE.search(attributes):
+        score *= 1.25
+    if NEGATIVE.search(attributes):
+        score *= 0.5
+    return score
+
+
+def _main_content(body):
+    """
+    The element holding the page's main text: the highest scoring block whose
+    score is not mostly inherited from one child (readability picks the
+    innermost block that still holds most of the article).
+    """
+    scores = {element: _score(element) for element in body.iter(*CANDIDATE_TAGS)}
+    best, best_score = None, 0.0
+    for element, score in scores.items():
+        if max((scores.get(child, 0.0) for child in element), default=0.0) > 0.8 * score:
+            continue
+        if score > best_score:
+            best, best_score = element, score
+    return best
+
+
+def extract_text(html: Union[str, bytes], config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Text of an HTML page (bytes let the parser honour the page's declared
+    encoding), per the source's registry entry:
+    - html_extractor: 'readability' (main content only, the default), 'page'
+      (whole page without boilerplate) or 'legacy' (original BeautifulSoup path);
+    - content_xpath: XPath of the main content, skipping detection;
+    - drop_xpath: extra XPaths to remove (site-specific banners).
+    """
+    config = config or {}
+    mode = config.get('html_extractor', DEFAULT_EXTRACTOR)
+    if mode not in EXTRACTORS:
+        raise ValueError(f"Unknown html_extractor '{mode}', expected one of {EXTRACTORS}")
+    if mode == 'legacy' or lxml is None or not html.strip():
+        return extract_legacy(html)
+
+    root = lxml.html.document_fromstring(html)
+    etree.strip_elements(root, etree.Comment, *CODE_TAGS, with_tail=False)
+    # Non-space characters of the whole page, to judge what extraction kept
+    total = _text_length(root)
+    _remove_boilerplate(root, config.get('drop_xpath', []), total)
+    body = root.find('body') if root.find('body') is not None else root
+
+    if config.get('content_xpath'):
+        matches = root.xpath(config['content_xpath'])
+        if matches:
+            return "\n".join(_text(match) for match in matches)
+        logging.warning(f"content_xpath {config['content_xpath']} matched nothing; detecting main content")
+
+    text = None
+    if mode == 'readability':
+        main = _main_content(body)
+        if main is not None:
+            text = _text(main)
+            if len(text) < MIN_MAIN_CHARS:
+                text = None
+    if text is None:
+        text = _text(body)
+    if len("".join(text.split())) < MIN_KEPT_SHARE[mode] * total:
+        # Boilerplate rules that removed the content itself: keep the whole page instead
+        logging.warning(f"{mode} extraction kept too little of the page; using the legacy extractor")
+        return extract_legacy(html)
+    return text
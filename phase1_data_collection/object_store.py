@@ -0,0 +1,235 @@
+import os
+import json
+import zlib
+import hashlib
+import logging
+from typing import Dict, Any, Optional
+
+try:
+    import zstandard
+except ImportError:  # zstandard missing: new objects are zlib-compressed instead
+    zstandard = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+OBJECTS_DIR = "objects"
+# Registry keys that change what is extracted from the same download
+EXTRACTOR_KEYS = ('html_extractor', 'content_xpath', 'drop_xpath', 'extract_tables')
+MANIFESTS_DIR = "manifests"
+# Suffix of an object file tells how it is compressed
+ZSTD_SUFFIX = ".zst"
+ZLIB_SUFFIX = ".zz"
+
+
+def text_hash(text: str) -> str:
+    """Identity of a document's cleaned text (same scheme as segments.content_hash)."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def extractor_config(resource: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: resource[key] for key in EXTRACTOR_KEYS if key in resource}
+
+
+class ObjectStore:
+    """
+    Content-addressed store for Phase 1 data: extracted text, cleaned documents
+    and (optionally) raw downloads are compressed blobs under objects/<2 hex>/<sha256>, so
+    content that did not change is never written again. A small manifest per
+    resource (manifests/<name>.json) names its current objects and the hashes
+    downstream stages compare instead of parsing documents.
+    """
+
+    def __init__(self, root: str, level: int = 19):
+        self.root = root
+        self.level = level
+        os.makedirs(os.path.join(root, OBJECTS_DIR), exist_ok=True)
+        os.makedirs(os.path.join(root, MANIFESTS_DIR), exist_ok=True)
+
+    def _path(self, digest: str, suffix: str) -> str:
+        return os.path.join(self.root, OBJECTS_DIR, digest[:2], digest[2:] + suffix)
+
+    def _existing_path(self, digest: str) -> Optional[str]:
+        for suffix in (ZSTD_SUFFIX, ZLIB_SUFFIX):
+            path = self._path(digest, suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def has(self, digest: str) -> bool:
+        return self._existing_path(digest) is not None
+
+    def put(self, data: bytes) -> str:
+        """Store bytes; returns their SHA-256. Existing objects are not rewritten."""
+        digest = hashlib.sha256(data).hexdigest()
+        if self.has(digest):
+            return digest
+        if zstandard is not None:
+            path, blob = self._path(digest, ZSTD_SUFFIX), zstandard.ZstdCompressor(level=self.level).compress(data)
+        else:
+            path, blob = self._path(digest, ZLIB_SUFFIX), zlib.compress(data, 9)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest: str) -> bytes:
+        path = self._existing_path(digest)
+        if path is None:
+            raise KeyError(f"Object {digest} not in {self.root}")
+        with open(path, 'rb') as f:
+            blob = f.read()
+        if path.endswith(ZLIB_SUFFIX):
+            return zlib.decompress(blob)
+        if zstandard is None:
+            raise RuntimeError(f"Object {digest} is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(blob)
+
+    def put_text(self, text: str) -> str:
+        return self.put(text.encode('utf-8'))
+
+    def get_text(self, digest: str) -> str:
+        return self.get(digest).decode('utf-8')
+
+    def put_json(self, data: Any) -> str:
+        # Canonical form, so equal documents get equal digests
+        return self.put(json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    def get_json(self, digest: str) -> Any:
+        return json.loads(self.get(digest))
+
+    def _manifest_path(self, name: str) -> str:
+        return os.path.join(self.root, MANIFESTS_DIR, name + ".json")
+
+    def load_manifest(self, name: str) -> Optional[Dict[str, Any]]:
+        path = self._manifest_path(name)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def save_manifest(self, name: str, manifest: Dict[str, Any]) -> bool:
+        """Write a resource manifest; returns False (and writes nothing) when it is unchanged."""
+        if self.load_manifest(name) == manifest:
+            return False
+        path = self._manifest_path(name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return True
+
+    def manifests(self) -> Dict[str, Dict[str, Any]]:
+        """Every resource manifest, by name."""
+        names = sorted(name[:-len(".json")] for name in os.listdir(os.path.join(self.root, MANIFESTS_DIR))
+                       if name.endswith(".json"))
+        return {name: self.load_manifest(name) for name in names}
+
+    def unchanged(self, name: str, resource: Dict[str, Any], raw_bytes: bytes, cleaning: str) -> bool:
+        """
+        True when the download, the extractor settings and the cleaning rules
+        (cleaning.rules_version()) match the manifest, so nothing needs parsing.
+        """
+        previous = self.load_manifest(name)
+        return (previous is not None and previous.get('raw') == hashlib.sha256(raw_bytes).hexdigest()
+                and previous.get('extractor') == extractor_config(resource)
+                and previous.get('cleaning') == cleaning)
+
+    def record(self, name: str, resource: Dict[str, Any], cleaned_entry: Dict[str, Any], raw_text: str,
+               raw_bytes: Optional[bytes] = None, keep_raw: bool = False, cleaning: Optional[str] = None) -> bool:
+        """
+        Store one resource's data and point its manifest at it. The download
+        is always identified by its SHA-256; its bytes are only kept with
+        keep_raw (PDFs would grow the repo). cleaning is the rules version the
+        document was cleaned under (None when unknown). Returns True when the
+        cleaned document changed (callers skip downstream work otherwise).
+        """
+        previous = self.load_manifest(name) or {}
+        raw = previous.get('raw'), previous.get('raw_size')
+        if raw_bytes is not None:
+            raw = self.put(raw_bytes) if keep_raw else hashlib.sha256(raw_bytes).hexdigest(), len(raw_bytes)
+        manifest = {
+            'resource_name': resource.get('resource_name'),
+            'url': cleaned_entry['source_url'],
+            'raw': raw[0],
+            'raw_size': raw[1],
+            'extractor': extractor_config(resource),
+            'cleaning': cleaning,
+            'raw_text': self.put_text(raw_text),
+            'cleaned': self.put_json(cleaned_entry),
+            'text_hash': text_hash(cleaned_entry['extracted_text']),
+            'pages': {str(page['page']): page['hash'] for page in cleaned_entry.get('pages', [])},
+        }
+        self.save_manifest(name, manifest)
+        return previous.get('cleaned') != manifest['cleaned']
+
+    def cleaned_document(self, name: str) -> Dict[str, Any]:
+        return self.get_json(self.load_manifest(name)['cleaned'])
+
+    def gc(self) -> int:
+        """Delete objects no manifest refers to. Returns the number deleted."""
+        live = set()
+        for manifest in self.manifests().values():
+            live.update(manifest[key] for key in ('raw', 'raw_text', 'cleaned') if manifest.get(key))
+        deleted = 0
+        objects_dir = os.path.join(self.root, OBJECTS_DIR)
+        for prefix in os.listdir(objects_dir):
+            for filename in os.listdir(os.path.join(objects_dir, prefix)):
+                if prefix + filename.split('.')[0] not in live:
+                    os.remove(os.path.join(objects_dir, prefix, filename))
+                    deleted += 1
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        objects, size = 0, 0
+        for dirpath, _, filenames in os.walk(os.path.join(self.root, OBJECTS_DIR)):
+            objects += len(filenames)
+            size += sum(os.path.getsize(os.path.join(dirpath, filename)) for filename in filenames)
+        return {'manifests': len(self.manifests()), 'objects': objects, 'bytes': size}
+
+
+def import_json_dirs(store: ObjectStore, raw_dir: str, cleaned_dir: str, registry_path: str) -> int:
+    """
+    Move existing raw/ and cleaned/ JSON copies into the store (raw bytes are
+    not known for these; the next scrape records them). Returns the number of
+    resources imported.
+    """
+    with open(registry_path, 'r', encoding='utf-8') as f:
+        resources = {resource['url']: resource for resource in json.load(f)}
+    imported = 0
+    for filename in sorted(os.listdir(cleaned_dir)):
+        if not filename.endswith("_cleaned.json"):
+            continue
+        name = filename[:-len("_cleaned.json")]
+        raw_path = os.path.join(raw_dir, name + "_raw.json")
+        if not os.path.exists(raw_path):
+            continue
+        with open(os.path.join(cleaned_dir, filename), 'r', encoding='utf-8') as f:
+            cleaned_entry = json.load(f)
+        with open(raw_path, 'r', encoding='utf-8') as f:
+            raw_entry = json.load(f)
+        store.record(name, resources.get(cleaned_entry['source_url'], {}), cleaned_entry, raw_entry['raw_text'])
+        imported += 1
+    logging.info(f"Imported {imported} resources into {store.root}")
+    return imported
+
+
+if __name__ == "__main__":
+    import argparse
+
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Content-addressed store of Phase 1 data")
+    parser.add_argument("command", choices=["import", "gc", "stats"],
+                        help="import: load raw/ and cleaned/ JSON; gc: drop unreferenced objects")
+    parser.add_argument("--store", default=os.path.join(BASE_DIR, "store"))
+    args = parser.parse_args()
+
+    store = ObjectStore(args.store)
+    if args.command == "import":
+        import_json_dirs(store, os.path.join(BASE_DIR, "raw"), os.path.join(BASE_DIR, "cleaned"),
+                         os.path.join(BASE_DIR, "resources", "resource_registry.json"))
+    elif args.command == "gc":
+        print(f"Deleted {store.gc()} objects")
+    print(json.dumps(store.stats(), indent=2))
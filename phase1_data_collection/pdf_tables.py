@@ -0,0 +1,75 @@
+import io
+import re
+import logging
+import unicodedata
+from typing import List, Dict, Any, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Words of one cell are one space apart in pypdf's layout text; cells are further
+CELL = re.compile(r'\S+(?: \S+)*')
+# A wrapped value line may start this many columns off its cell
+ALIGN_TOLERANCE = 2
+# Blank lines a wrapped value may skip (layout mode adds them for line spacing)
+MAX_BLANK_LINES = 1
+
+
+def _cells(line: str) -> List[Tuple[int, str]]:
+    return [(match.start(), match.group()) for match in CELL.finditer(line)]
+
+
+def layout_rows(text: str) -> List[List[str]]:
+    """
+    Table rows of one page's layout text (pypdf extraction_mode="layout",
+    which keeps each line's column positions). A row is a line with two or
+    more cells; an indented line that lines up with a value cell of the row
+    above is a wrapped value and is appended to that cell.
+    """
+    text = unicodedata.normalize('NFKC', text)
+    rows: List[List[str]] = []
+    previous = None  # (cell columns, row) of the last row
+    blank = 0
+    for line in text.split('\n'):
+        cells = _cells(line)
+        if not cells:
+            blank += 1
+            continue
+        if previous is not None and blank <= MAX_BLANK_LINES and cells[0][0] > previous[0][0] + ALIGN_TOLERANCE:
+            columns, row = previous
+            targets = [min(range(1, len(columns)), key=lambda i: abs(columns[i] - start)) for start, _ in cells]
+            if all(abs(columns[i] - start) <= ALIGN_TOLERANCE for i, (start, _) in zip(targets, cells)):
+                for i, (_, cell) in zip(targets, cells):
+                    row[i] = f"{row[i]} {cell}"
+                blank = 0
+                continue
+        blank = 0
+        if len(cells) >= 2:
+            row = [cell for _, cell in cells]
+            rows.append(row)
+            previous = ([start for start, _ in cells], row)
+        else:
+            previous = None
+    return rows
+
+
+def extract_tables(layout_pages: List[str]) -> List[Dict[str, Any]]:
+    """Table rows per page: [{"page": 1-based number, "rows": [[cell, ...], ...]}], pages without rows left out."""
+    tables = []
+    for number, text in enumerate(layout_pages, start=1):
+        rows = layout_rows(text)
+        if rows:
+            tables.append({"page": number, "rows": rows})
+    return tables
+
+
+def extract_tables_from_pdf(content: bytes) -> List[Dict[str, Any]]:
+    """Table rows of a PDF's pages ([] on failure; tables are an extra, never a reason to drop a document)."""
+    try:
+        from pypdf import PdfReader
+
+        reader = PdfReader(io.BytesIO(content))
+        return extract_tables([page.extract_text(extraction_mode="layout") or "" for page in reader.pages])
+    except Exception as e:
+        logging.error(f"Error extracting PDF tables: {e}")
+        return []
@@ -1,20 +1,37 @@
 import os
+import sys
 import json
 import requests
 import re
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse
 import logging
-from typing import Dict, Any, Optional
+from typing import List, Dict, Any, Optional
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from phase1_data_collection.html_extract import extract_text
+from phase1_data_collection.cleaning import CleaningPipeline, PAGE_BREAK, clean_documents, format_report, rules_version
+from phase1_data_collection.object_store import ObjectStore, text_hash
+from phase1_data_collection.pdf_tables import extract_tables_from_pdf
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class Phase1Scraper:
-    def __init__(self, resource_registry_path: str, raw_dir: str, cleaned_dir: str):
+    def __init__(self, resource_registry_path: str, raw_dir: str, cleaned_dir: str, store_dir: Optional[str] = None,
+                 keep_downloads: bool = False):
         self.resource_registry_path = resource_registry_path
         self.raw_dir = raw_dir
         self.cleaned_dir = cleaned_dir
+        # With a store, raw downloads and text go to the content-addressed
+        # object store instead of raw/ JSON, and cleaned/ files are only
+        # rewritten when their content changed
+        self.store = ObjectStore(store_dir) if store_dir else None
+        # Also keep downloaded PDF/HTML bytes in the store (re-extract offline)
+        self.keep_downloads = keep_downloads
         
         # Create directories if they don't exist
         os.makedirs(self.raw_dir, exist_ok=True)
@@ -24,113 +41,202 @@ class Phase1Scraper:
         with open(self.resource_registry_path, 'r') as f:
             self.registry = json.load(f)
 
-    def scrape_and_clean(self):
-        """Main method to iterate through resources and process them."""
+    def scrape_and_clean(self, workers: Optional[int] = None):
+        """
+        Main method: fetch and extract every resource, clean all documents in
+        one batch (a process pool, see cleaning.clean_documents), then save.
+        """
+        extracted = []
         for resource in self.registry:
             try:
-                self.process_resource(resource)
+                item = self.extract_resource(resource)
+                if item is not None:
+                    extracted.append(item)
             except Exception as e:
                 logging.error(f"Failed to process resource {resource.get('resource_name')}: {e}")
+        if not extracted:
+            return
+
+        cleaned, report = clean_documents([(item['source_type'], item['pages']) for item in extracted], workers)
+        logging.info(format_report(report))
+        for item, cleaned_pages in zip(extracted, cleaned):
+            try:
+                self.save_resource(item, cleaned_pages)
+            except Exception as e:
+                logging.error(f"Failed to process resource {item['resource'].get('resource_name')}: {e}")
 
     def process_resource(self, resource: Dict[str, Any]):
         """Process a single resource: fetch, extract, clean, and save."""
+        item = self.extract_resource(resource)
+        if item is not None:
+            cleaned_pages, _ = CleaningPipeline.for_source(item['source_type']).run(item['pages'])
+            self.save_resource(item, cleaned_pages)
+
+    def extract_resource(self, resource: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Fetch and extract one resource, saving its raw data. Returns the text
+        to clean (a list of pages; one for HTML), or None when there is
+        nothing new to clean.
+        """
         url = resource.get('url')
         resource_name = resource.get('resource_name')
-        source_type = resource.get('source')
-        doc_type = resource.get('document_type')
         scheme = resource.get('scheme', 'COMMON')
         
         logging.info(f"Processing: {resource_name}")
         
         raw_text = ""
+        pages = None
+        tables = None
+        content = None
+        name = self.get_filename(resource_name, "cleaned")[:-len("_cleaned.json")]
+        if self.store is not None:
+            content = self.download(url)
+            # Same bytes, extractor settings and cleaning rules: the cleaned document cannot have changed
+            if self.store.unchanged(name, resource, content, rules_version()) and \
+                    os.path.exists(os.path.join(self.cleaned_dir, self.get_filename(resource_name, "cleaned"))):
+                logging.info(f"Unchanged download: {resource_name}")
+                return None
         
         if url.lower().endswith('.pdf'):
-            raw_text = self.extract_text_from_pdf(url)
+            # One record per page, so chunks and citations can point to a page
+            if resource.get('extract_tables') and content is None:
+                content = self.download(url)
+            pages = self.extract_pages_from_pdf(url, content)
+            raw_text = "".join(page + "\n" for page in pages)
+            if resource.get('extract_tables'):
+                # extract_text runs table cells together; layout text keeps the rows
+                tables = extract_tables_from_pdf(content)
         else:
-            raw_text = self.extract_text_from_html(url)
+            raw_text = self.extract_text_from_html(url, resource, content)
             
-        if not raw_text:
+        if not raw_text.strip():
             logging.warning(f"No text extracted for {resource_name}")
-            return
+            return None
 
-        # Save Raw Data
-        raw_filename = self.get_filename(resource_name, "raw")
-        raw_entry = {
-            "scheme": scheme,
-            "category": doc_type,
-            "raw_text": raw_text,
-            "source_url": url,
-            "source_type": source_type
-        }
-        self.save_json(raw_entry, os.path.join(self.raw_dir, raw_filename))
+        # Save Raw Data (the store keeps it when there is one)
+        if self.store is None:
+            raw_filename = self.get_filename(resource_name, "raw")
+            raw_entry = {
+                "scheme": scheme,
+                "category": resource.get('document_type'),
+                "raw_text": raw_text,
+                "source_url": url,
+                "source_type": resource.get('source')
+            }
+            if pages is not None:
+                raw_entry["pages"] = [{"page": number, "text": text} for number, text in enumerate(pages, start=1)]
+            self.save_json(raw_entry, os.path.join(self.raw_dir, raw_filename))
+        elif pages is not None:
+            # Page breaks kept, so the store's text can be re-cleaned page by page
+            raw_text = PAGE_BREAK.join(pages)
+
+        return {"resource": resource, "name": name, "source_type": resource.get('source'),
+                "pages": pages if pages is not None else [raw_text], "is_pdf": pages is not None,
+                "tables": tables, "raw_text": raw_text, "content": content}
+
+    def save_resource(self, item: Dict[str, Any], cleaned_pages: List[str]):
+        """Save the cleaned document of an extract_resource() result."""
+        resource = item['resource']
+        resource_name = resource.get('resource_name')
         
         # Clean Data
-        cleaned_text = self.clean_text(raw_text, source_type)
+        page_records = None
+        if item['is_pdf']:
+            page_records = self.page_records(cleaned_pages)
+            cleaned_text = " ".join(page["text"] for page in page_records)
+        else:
+            cleaned_text = cleaned_pages[0]
         
         # Save Cleaned Data
         cleaned_filename = self.get_filename(resource_name, "cleaned")
         cleaned_entry = {
-            "scheme": scheme,
-            "category": doc_type,
+            "scheme": resource.get('scheme', 'COMMON'),
+            "category": resource.get('document_type'),
             "extracted_text": cleaned_text,
-            "source_url": url,
-            "source_type": source_type
+            "source_url": resource.get('url'),
+            "source_type": item['source_type']
         }
-        self.save_json(cleaned_entry, os.path.join(self.cleaned_dir, cleaned_filename))
+        if page_records is not None:
+            cleaned_entry["pages"] = page_records
+        if item.get('tables') is not None:
+            # Structured rows for the Phase 2 fact table
+            cleaned_entry["tables"] = item['tables']
+        cleaned_path = os.path.join(self.cleaned_dir, cleaned_filename)
+        if self.store is not None:
+            changed = self.store.record(item['name'], resource, cleaned_entry, item['raw_text'], item['content'],
+                                        self.keep_downloads, rules_version())
+            if not changed and os.path.exists(cleaned_path):
+                logging.info(f"Unchanged: {resource_name}")
+                return
+        self.save_json(cleaned_entry, cleaned_path)
         logging.info(f"Successfully processed {resource_name}")
 
+    def download(self, url: str) -> bytes:
+        response = requests.get(url)
+        response.raise_for_status()
+        return response.content
+
     def extract_text_from_pdf(self, url: str) -> str:
         """Download and extract text from PDF."""
+        return "".join(page + "\n" for page in self.extract_pages_from_pdf(url))
+
+    def extract_pages_from_pdf(self, url: str, content: Optional[bytes] = None) -> List[str]:
+        """Download a PDF (unless its bytes are given) and extract the text of each page ([] on failure)."""
         try:
             # For this phase, we assume we might need to download or use local.
             # If local_file_path is null, we download to a temp location or memory.
             # Using pypdf for extraction.
             # Check if we should use a local file if available in registry (not implemented in registry yet properly)
             
-            response = requests.get(url, stream=True)
-            response.raise_for_status()
+            if content is None:
+                response = requests.get(url, stream=True)
+                response.raise_for_status()
+                content = response.content
             
             # Save properly to a temp file or process in memory if possible, 
             # but pypdf usually likes files.
             import io
             from pypdf import PdfReader
             
-            remote_file = io.BytesIO(response.content)
+            remote_file = io.BytesIO(content)
             reader = PdfReader(remote_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
-            return text
+            return [page.extract_text() or "" for page in reader.pages]
         except Exception as e:
             logging.error(f"Error extracting PDF from {url}: {e}")
-            return ""
+            return []
 
-    def extract_text_from_html(self, url: str) -> str:
-        """Extract text from HTML."""
+    def extract_text_from_html(self, url: str, config: Optional[Dict[str, Any]] = None,
+                               content: Optional[bytes] = None) -> str:
+        """
+        Extract text from HTML (downloaded unless its bytes are given); `config`
+        is the registry entry (html_extractor, content_xpath, drop_xpath).
+        """
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Remove script and style elements
-            for script in soup(["script", "style", "nav", "footer", "header"]):
-                script.decompose()
-                
-            text = soup.get_text()
-            return text
+            if content is None:
+                response = requests.get(url)
+                response.raise_for_status()
+                return extract_text(response.text, config)
+            return extract_text(content, config)
         except Exception as e:
             logging.error(f"Error extracting HTML from {url}: {e}")
             return ""
 
     def clean_text(self, text: str, source_type: str) -> str:
-        """Clean and normalize extracted text."""
-        # collapse white spaces
-        text = re.sub(r'\s+', ' ', text).strip()
-        
-        # Specific cleaning rules can be added here
-        # For now, we perform basic normalization
-        
-        return text
+        """Clean and normalize extracted text with the source's rules (cleaning.SOURCE_RULES)."""
+        return CleaningPipeline.for_source(source_type).run([text])[0][0]
+
+    def clean_pages(self, pages: List[str], source_type: str) -> List[Dict[str, Any]]:
+        """
+        Clean a document's pages together (running headers are found across
+        pages). Pages keep their 1-based number and a hash of their cleaned
+        text, so re-indexing only touches pages whose hash changed. Blank
+        pages are dropped; the numbering still counts them.
+        """
+        return self.page_records(CleaningPipeline.for_source(source_type).run(pages)[0])
+
+    def page_records(self, cleaned_pages: List[str]) -> List[Dict[str, Any]]:
+        return [{"page": number, "text": text, "hash": text_hash(text)}
+                for number, text in enumerate(cleaned_pages, start=1) if text]
 
     def get_filename(self, resource_name: str, type_suffix: str) -> str:
         """Generate a filename from resource name."""
@@ -148,6 +254,7 @@ if __name__ == "__main__":
     REGISTRY_PATH = os.path.join(BASE_DIR, "resources", "resource_registry.json")
     RAW_DIR = os.path.join(BASE_DIR, "raw")
     CLEANED_DIR = os.path.join(BASE_DIR, "cleaned")
+    STORE_DIR = os.path.join(BASE_DIR, "store")
     
-    scraper = Phase1Scraper(REGISTRY_PATH, RAW_DIR, CLEANED_DIR)
+    scraper = Phase1Scraper(REGISTRY_PATH, RAW_DIR, CLEANED_DIR, STORE_DIR)
     scraper.scrape_and_clean()
@@ -0,0 +1,176 @@
+import os
+import json
+import logging
+from urllib.parse import unquote
+from typing import List, Dict, Any, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CITATIONS_FILE = "citations.json"
+# resource_name of every registry URL names documents the URL alone can't (AMFI pages)
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                             "phase1_data_collection", "resources", "resource_registry.json")
+GENERIC_NAME = "HDFC Fund - Document"
+
+
+def registry_names(registry_path: str = REGISTRY_PATH) -> Dict[str, str]:
+    """source URL -> resource_name from resource_registry.json ({} when it is missing)."""
+    if not os.path.exists(registry_path):
+        return {}
+    with open(registry_path, 'r', encoding='utf-8') as f:
+        return {resource['url']: resource['resource_name'] for resource in json.load(f) if resource.get('url')}
+
+
+def display_name(source_url: str) -> str:
+    """
+    Convert a source URL to a friendly display name.
+
+    Examples:
+    - KIM PDF → "HDFC Midcap Fund - KIM"
+    - SID PDF → "HDFC Large Cap Fund - SID"
+    - Factsheet → "HDFC Flexi Cap Fund - Factsheet"
+    - Fund Page → "HDFC Small Cap Fund - Fund Page"
+    """
+    if not source_url:
+        return "Source Document"
+
+    # Extract document type from URL (PDF links spell names with %20)
+    url_lower = unquote(source_url).lower()
+
+    # Determine document type
+    if 'kim' in url_lower:
+        doc_type = "KIM"
+    elif 'sid' in url_lower:
+        doc_type = "SID"
+    elif 'factsheet' in url_lower or 'fact' in url_lower:
+        doc_type = "Factsheet"
+    elif 'presentation' in url_lower:
+        doc_type = "Presentation"
+    elif 'hdfcfund.com/explore/mutual-funds' in url_lower:
+        doc_type = "Fund Page"
+    else:
+        doc_type = "Document"
+
+    # Extract fund name from URL
+    fund_name = "HDFC Fund"
+    if 'mid-cap' in url_lower or 'mid cap' in url_lower or 'midcap' in url_lower:
+        fund_name = "HDFC Mid Cap Fund"
+    elif 'large-cap' in url_lower or 'large cap' in url_lower or 'large_cap' in url_lower:
+        fund_name = "HDFC Large Cap Fund"
+    elif 'small-cap' in url_lower or 'small cap' in url_lower or 'small_cap' in url_lower:
+        fund_name = "HDFC Small Cap Fund"
+    elif 'flexi-cap' in url_lower or 'flexi cap' in url_lower or 'flexi_cap' in url_lower:
+        fund_name = "HDFC Flexi Cap Fund"
+    elif 'multi-cap' in url_lower or 'multi cap' in url_lower or 'multi_cap' in url_lower:
+        fund_name = "HDFC Multi Cap Fund"
+
+    return f"{fund_name} - {doc_type}"
+
+
+def citation_link(url: str, page: Optional[int]) -> str:
+    """URL to open a citation at: PDFs open at the cited page (#page=N)."""
+    if page and url.startswith('http') and unquote(url).lower().split('?')[0].endswith('.pdf'):
+        return f"{url}#page={page}"
+    return url
+
+
+def citation_record(metadata: Dict[str, Any], names: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """Everything needed to show a citation for a chunk, resolved once at index time."""
+    # Prioritize URL, then filename
+    url = metadata.get('source_url') or metadata.get('source_file') or ''
+    name = display_name(url) if url.startswith('http') else (url or display_name(url))
+    if name == GENERIC_NAME and names and url in names:
+        name = names[url]
+    return {
+        'display_name': name,
+        'url': url,
+        'document_type': metadata.get('category', ''),
+        'scheme': metadata.get('scheme', ''),
+        'page': metadata.get('page'),
+        'link': citation_link(url, metadata.get('page')),
+    }
+
+
+class CitationTable:
+    """
+    Deduplicated citation records; a record's id is its position in the list.
+    Ids are only ever appended, so ids stored in chunk metadata, segments and
+    cached answers stay valid as documents are added.
+    """
+
+    def __init__(self, records: Optional[List[Dict[str, Any]]] = None, names: Optional[Dict[str, str]] = None):
+        self.records = list(records or [])
+        for record in self.records:
+            # Records saved before page links existed
+            record.setdefault('link', citation_link(record['url'], record['page']))
+        self.names = names if names is not None else {}
+        self._ids = {(record['url'], record['page']): i for i, record in enumerate(self.records)}
+        self._url_ids: Dict[str, int] = {}
+        for i, record in enumerate(self.records):
+            self._url_ids.setdefault(record['url'], i)
+
+    def add(self, metadata: Dict[str, Any]) -> int:
+        """Id of the chunk's citation, appending a record the first time it is seen."""
+        record = citation_record(metadata, self.names)
+        key = (record['url'], record['page'])
+        if key not in self._ids:
+            self._ids[key] = len(self.records)
+            self._url_ids.setdefault(record['url'], len(self.records))
+            self.records.append(record)
+        return self._ids[key]
+
+    def get(self, citation_id: int) -> Dict[str, Any]:
+        return self.records[citation_id]
+
+    def id_for_url(self, url: str, page: Optional[int] = None) -> Optional[int]:
+        """A document's citation for `page`, else its first one, for answers that only know the URL (fact lookup)."""
+        if page is not None and (url, page) in self._ids:
+            return self._ids[(url, page)]
+        return self._url_ids.get(url)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    @classmethod
+    def load(cls, embeddings_dir: str, names: Optional[Dict[str, str]] = None) -> "CitationTable":
+        path = os.path.join(embeddings_dir, CITATIONS_FILE)
+        if not os.path.exists(path):
+            return cls(names=names)
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), names)
+
+    def save(self, embeddings_dir: str):
+        path = os.path.join(embeddings_dir, CITATIONS_FILE)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.records, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+
+def attach_citations(embeddings_dir: str) -> int:
+    """
+    Add citation ids to an existing vector_store.json (built before citations
+    existed) and write citations.json, without re-embedding anything.
+    Returns the number of chunks that got an id.
+    """
+    vector_store_path = os.path.join(embeddings_dir, "vector_store.json")
+    with open(vector_store_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    table = CitationTable.load(embeddings_dir, registry_names())
+    attached = 0
+    for metadata in data['metadatas']:
+        if 'citation_id' not in metadata:
+            metadata['citation_id'] = table.add(metadata)
+            attached += 1
+    table.save(embeddings_dir)
+    tmp_path = vector_store_path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, vector_store_path)
+    logging.info(f"Attached citations to {attached} chunks ({len(table)} citation records)")
+    return attached
+
+
+if __name__ == "__main__":
+    attach_citations(os.path.dirname(os.path.abspath(__file__)))
@@ -0,0 +1,119 @@
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from phase2_vector_db.quantization import CODECS, build_codec
+
+
+def recall_at_k(expected: np.ndarray, found: np.ndarray) -> float:
+    """Mean fraction of the baseline top-k that also appears in the compressed top-k."""
+    hits = [len(set(e) & set(f)) / len(e) for e, f in zip(expected, found)]
+    return float(np.mean(hits))
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, scores.shape[-1])
+    idx = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    return np.take_along_axis(idx, np.argsort(-np.take_along_axis(scores, idx, axis=-1), axis=-1), axis=-1)
+
+
+def build_report(embeddings: np.ndarray, queries: np.ndarray, k: int = 5, rescore_k: int = 50,
+                 codecs: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Compare every codec against exact float32 search.
+    Reports memory footprint, first-pass recall@k and recall@k after rescoring.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    baseline = top_k(queries @ embeddings.T, k)
+
+    report = {
+        'num_vectors': int(embeddings.shape[0]),
+        'dim': int(embeddings.shape[1]),
+        'num_queries': int(len(queries)),
+        'k': k,
+        'rescore_k': rescore_k,
+        'codecs': {
+            'float32': {'bytes': int(embeddings.nbytes), 'compression_ratio': 1.0,
+                        'recall_first_pass': 1.0, 'recall_rescored': 1.0}
+        }
+    }
+
+    for name in codecs or list(CODECS):
+        start = time.perf_counter()
+        codec = build_codec(name, embeddings)
+        build_seconds = time.perf_counter() - start
+
+        first_pass, rescored = [], []
+        start = time.perf_counter()
+        for query in queries:
+            approx = codec.score(query)
+            first_pass.append(top_k(approx, k))
+
+            shortlist = top_k(approx, max(k, rescore_k))
+            exact = embeddings[shortlist] @ query
+            rescored.append(shortlist[np.argsort(-exact)[:k]])
+        search_ms = (time.perf_counter() - start) * 1000 / max(len(queries), 1)
+
+        report['codecs'][name] = {
+            'bytes': codec.nbytes,
+            'compression_ratio': round(embeddings.nbytes / codec.nbytes, 2),
+            'recall_first_pass': round(recall_at_k(baseline, first_pass), 4),
+            'recall_rescored': round(recall_at_k(baseline, rescored), 4),
+            'build_seconds': round(build_seconds, 3),
+            'search_ms_per_query': round(search_ms, 3),
+        }
+
+    return report
+
+
+def load_queries(path: Optional[str], embeddings: np.ndarray, sample: int, seed: int = 0) -> np.ndarray:
+    """
+    Encode questions from a text file (one per line) when given, otherwise use a
+    random sample of corpus vectors as stand-in queries (no model download needed).
+    """
+    if path:
+        from sentence_transformers import SentenceTransformer
+
+        with open(path, 'r', encoding='utf-8') as f:
+            questions = [line.strip() for line in f if line.strip()]
+        model = SentenceTransformer('all-MiniLM-L6-v2')
+        return model.encode(questions, normalize_embeddings=True)
+
+    rng = np.random.default_rng(seed)
+    idx = rng.choice(len(embeddings), min(sample, len(embeddings)), replace=False)
+    return embeddings[idx]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Memory and recall report for compressed embeddings")
+    parser.add_argument("--embeddings-dir", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--queries", help="Text file with one question per line")
+    parser.add_argument("--sample", type=int, default=200, help="Corpus vectors used as queries if --queries is not given")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore-k", type=int, default=50)
+    parser.add_argument("--output", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    embeddings = np.load(os.path.join(args.embeddings_dir, "embeddings.npy"))
+    queries = load_queries(args.queries, embeddings, args.sample)
+    report = build_report(embeddings, queries, k=args.k, rescore_k=args.rescore_k)
+
+    print(f"{report['num_vectors']} vectors x {report['dim']} dims, {report['num_queries']} queries, k={report['k']}")
+    print(f"{'codec':<10}{'KiB':>10}{'ratio':>8}{'recall@k':>11}{'rescored':>11}")
+    for name, row in report['codecs'].items():
+        print(f"{name:<10}{row['bytes'] / 1024:>10.1f}{row['compression_ratio']:>8.2f}"
+              f"{row['recall_first_pass']:>11.3f}{row['recall_rescored']:>11.3f}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,338 @@
+import os
+import re
+import json
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Canonical scheme keys (same keys as supplementary_data/riskometer_ratings.json)
+SCHEMES = {
+    'hdfc_large_cap_fund': {
+        'name': 'HDFC Large Cap Fund',
+        'aliases': ['large cap', 'large-cap', 'largecap', 'top 100'],
+    },
+    'hdfc_mid_cap_fund': {
+        'name': 'HDFC Mid Cap Fund',
+        'aliases': ['mid cap', 'mid-cap', 'midcap'],
+    },
+    'hdfc_small_cap_fund': {
+        'name': 'HDFC Small Cap Fund',
+        'aliases': ['small cap', 'small-cap', 'smallcap'],
+    },
+    'hdfc_flexi_cap_fund': {
+        'name': 'HDFC Flexi Cap Fund',
+        'aliases': ['flexi cap', 'flexi-cap', 'flexicap'],
+    },
+    'hdfc_multi_cap_fund': {
+        'name': 'HDFC Multi Cap Fund',
+        'aliases': ['multi cap', 'multi-cap', 'multicap'],
+    },
+}
+
+FACT_FIELDS = ['expense_ratio', 'exit_load', 'min_sip', 'lock_in', 'benchmark', 'riskometer', 'aum',
+               'fund_manager', 'inception_date']
+
+# Row labels of factsheet/KIM tables (Phase 1 `tables`), per field
+TABLE_LABELS = {
+    'aum': re.compile(r'^(?:month[- ]end |monthly average )?(?:aum|assets under management)\b', re.IGNORECASE),
+    'expense_ratio': re.compile(r'^(?:total )?expense ratio\b|^ter\b', re.IGNORECASE),
+    'exit_load': re.compile(r'^exit load\b', re.IGNORECASE),
+    'benchmark': re.compile(r'^benchmark\b', re.IGNORECASE),
+    'fund_manager': re.compile(r'^fund manager', re.IGNORECASE),
+    'inception_date': re.compile(r'^(?:inception date|date of allotment)\b', re.IGNORECASE),
+}
+DATE = (r'(?:\d{1,2}(?:st|nd|rd|th)?[ -])?(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?'
+        r'(?:[ -]\d{1,2}(?:st|nd|rd|th)?)?,?[ -]\d{4}|\d{2}[/-]\d{2}[/-]\d{4}')
+LABEL_DATE = re.compile(DATE, re.IGNORECASE)
+PAGE_AS_OF = re.compile(r'\bas (?:on|of|at) (' + DATE + ')', re.IGNORECASE)
+PLAN_EXPENSE = {
+    'regular': re.compile(r'regular[^\d%]*?([\d.]+ ?%)', re.IGNORECASE),
+    'direct': re.compile(r'direct[^\d%]*?([\d.]+ ?%)', re.IGNORECASE),
+}
+
+
+def resolve_schemes(text: str) -> List[str]:
+    """Return the scheme keys mentioned in a piece of text (query, scheme label, file name)."""
+    text_lower = text.lower().replace('_', ' ')
+    return [key for key, scheme in SCHEMES.items()
+            if any(alias in text_lower for alias in scheme['aliases'])]
+
+
+def make_fact(scheme_key: str, field: str, value: Any, source_url: str, as_of: Optional[str],
+              page: Optional[int] = None) -> Dict[str, Any]:
+    return {
+        'scheme': scheme_key,
+        'scheme_name': SCHEMES[scheme_key]['name'],
+        'field': field,
+        'value': value,
+        'source_url': source_url,
+        'as_of': as_of,
+        'page': page,
+    }
+
+
+def table_field(label: str) -> Optional[str]:
+    label = label.strip(' :*$')
+    for field, pattern in TABLE_LABELS.items():
+        if pattern.search(label):
+            return field
+    return None
+
+
+def labelled_values(rows: List[List[str]]):
+    """
+    (field, label, value) of a page's table rows. Rows are either
+    "label | value..." or a row of labels above a row of their values.
+    """
+    skip = False
+    for i, row in enumerate(rows):
+        if skip:
+            skip = False
+            continue
+        fields = [table_field(cell) for cell in row]
+        following = rows[i + 1] if i + 1 < len(rows) else None
+        if sum(field is not None for field in fields) >= 2 and following and len(following) == len(row):
+            for field, label, value in zip(fields, row, following):
+                if field:
+                    yield field, label, value
+            skip = True
+        elif fields[0]:
+            yield fields[0], row[0], " ".join(row[1:])
+
+
+class FactExtractor:
+    """
+    Extracts per-scheme facts from Phase 1 output into a small structured table.
+    Sources are the supplementary riskometer data, the expense ratio sheet and
+    the scheme fund pages, which carry the other fields in a fixed layout.
+    """
+
+    def __init__(self, cleaned_dir: str, supplementary_dir: str):
+        self.cleaned_dir = cleaned_dir
+        self.supplementary_dir = supplementary_dir
+
+        # Fund page patterns (text is whitespace-collapsed by the Phase 1 cleaner)
+        self.fund_page_patterns = {
+            'exit_load': re.compile(
+                r'Exit Load\s*●?\s*(In respect of each .*?allotment\.\s*●?\s*No Exit Load is payable .*?allotment\.)'),
+            'min_sip': re.compile(r'Min SIP\s*₹\s*([\d,]+)'),
+            'lock_in': re.compile(r'Lock in.*?lock-in\.\s*(NA|[\w\s-]+?)(?=NAV)'),
+            'benchmark': re.compile(r'similar to the market\.\s*.*?\.\.\.(.*?)INVEST NOW'),
+        }
+        self.snapshot_pattern = re.compile(r'AUM \((\d{2}/\d{2}/\d{4})\)')
+        self.expense_pattern = re.compile(
+            r'(HDFC [\w ]+? Fund) Expense Ratio:\s*- Regular Plan: ([\d.]+%)\s*- Direct Plan: ([\d.]+%)')
+        self.expense_as_of_pattern = re.compile(r'\(As of ([^)]+)\)')
+
+    def extract_all(self) -> List[Dict[str, Any]]:
+        # Table rows first: the curated sources below replace them for the same (scheme, field)
+        facts = self.extract_tables()
+        facts.extend(self.extract_riskometer())
+        facts.extend(self.extract_expense_ratios())
+        facts.extend(self.extract_fund_pages())
+        logging.info(f"Extracted {len(facts)} facts")
+        return facts
+
+    def _load_cleaned(self, filename: str) -> Optional[Dict[str, Any]]:
+        filepath = os.path.join(self.cleaned_dir, filename)
+        if not os.path.exists(filepath):
+            return None
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # Some files store a single-element list
+        return data[0] if isinstance(data, list) else data
+
+    def _riskometer_source_urls(self) -> Dict[str, str]:
+        """Source URLs of the cleaned riskometer documents, keyed by scheme."""
+        urls = {}
+        if not os.path.exists(self.cleaned_dir):
+            return urls
+        for filename in os.listdir(self.cleaned_dir):
+            if filename.startswith('riskometer_') and filename.endswith('.json'):
+                data = self._load_cleaned(filename)
+                for key in resolve_schemes(data.get('scheme', '')):
+                    urls[key] = data.get('source_url', '')
+        return urls
+
+    def extract_riskometer(self) -> List[Dict[str, Any]]:
+        ratings_path = os.path.join(self.supplementary_dir, "riskometer_ratings.json")
+        if not os.path.exists(ratings_path):
+            logging.warning(f"Riskometer ratings not found at {ratings_path}")
+            return []
+
+        with open(ratings_path, 'r', encoding='utf-8') as f:
+            ratings = json.load(f)
+
+        urls = self._riskometer_source_urls()
+        facts = []
+        for key, rating in ratings.items():
+            if key not in SCHEMES:
+                continue
+            value = {
+                'level': rating.get('riskometer'),
+                'position': rating.get('riskometer_level'),
+                'benchmark_level': rating.get('benchmark_riskometer'),
+            }
+            facts.append(make_fact(key, 'riskometer', value, urls.get(key, ''), rating.get('last_updated')))
+        return facts
+
+    def extract_expense_ratios(self) -> List[Dict[str, Any]]:
+        data = self._load_cleaned("expense_ratios_cleaned.json")
+        if not data:
+            return []
+
+        text = data.get('extracted_text', '')
+        as_of = self.expense_as_of_pattern.search(text)
+        facts = []
+        for match in self.expense_pattern.finditer(text):
+            keys = resolve_schemes(match.group(1))
+            if len(keys) != 1:
+                continue
+            value = {'regular': match.group(2), 'direct': match.group(3)}
+            facts.append(make_fact(keys[0], 'expense_ratio', value, data.get('source_url', ''),
+                                   as_of.group(1) if as_of else None))
+        return facts
+
+    def extract_fund_pages(self) -> List[Dict[str, Any]]:
+        facts = []
+        if not os.path.exists(self.cleaned_dir):
+            return facts
+
+        for filename in sorted(os.listdir(self.cleaned_dir)):
+            if 'fund_page' not in filename:
+                continue
+            data = self._load_cleaned(filename)
+            keys = resolve_schemes(data.get('scheme', '') + ' ' + filename)
+            if len(keys) != 1:
+                continue
+
+            text = data.get('extracted_text', '')
+            snapshot = self.snapshot_pattern.search(text)
+            as_of = snapshot.group(1) if snapshot else None
+
+            for field, pattern in self.fund_page_patterns.items():
+                match = pattern.search(text)
+                if not match:
+                    continue
+                value = re.sub(r'\s*●\s*', ' ', match.group(1)).strip()
+                value = re.sub(r'\.(?=[A-Z])', '. ', value)
+                if field == 'min_sip':
+                    value = f"₹{value}"
+                facts.append(make_fact(keys[0], field, value, data.get('source_url', ''), as_of))
+        return facts
+
+
+    def extract_tables(self) -> List[Dict[str, Any]]:
+        """Facts from the table rows Phase 1 keeps for factsheet and KIM PDFs."""
+        facts = []
+        if not os.path.exists(self.cleaned_dir):
+            return facts
+
+        # PDFs cleaned before page and table extraction existed
+        stale = []
+        # Monthly factsheets last, so their values replace the KIM's
+        for filename in sorted(os.listdir(self.cleaned_dir), key=lambda name: ('factsheet' in name, name)):
+            if not filename.endswith('_cleaned.json'):
+                continue
+            data = self._load_cleaned(filename)
+            if not data.get('tables'):
+                if data.get('source_url', '').lower().endswith('.pdf') and 'pages' not in data:
+                    stale.append(filename)
+                continue
+            keys = resolve_schemes(data.get('scheme', '') + ' ' + filename)
+            if len(keys) != 1:
+                continue
+
+            page_texts = {page['page']: page['text'] for page in data.get('pages', [])}
+            seen = set()
+            for table in data['tables']:
+                page_as_of = PAGE_AS_OF.search(page_texts.get(table['page'], ''))
+                for field, label, value in labelled_values(table['rows']):
+                    value = self._table_value(field, value)
+                    # The first row of a field wins (later ones are usually footnotes or other plans)
+                    if value is None or field in seen:
+                        continue
+                    seen.add(field)
+                    as_of = LABEL_DATE.search(label) or page_as_of
+                    facts.append(make_fact(keys[0], field, value, data.get('source_url', ''),
+                                           as_of.group(as_of.lastindex or 0) if as_of else None, table['page']))
+        if stale:
+            logging.warning(f"{len(stale)} cleaned PDFs have no pages or table rows (e.g. {stale[0]}); "
+                            f"re-run the Phase 1 scrape (phase7_scheduled_refresh/refresh.py --sync-index)")
+        return facts
+
+    def _table_value(self, field: str, value: str) -> Any:
+        value = value.strip()
+        if field == 'expense_ratio':
+            plans = {plan: pattern.search(value) for plan, pattern in PLAN_EXPENSE.items()}
+            if not all(plans.values()):
+                return None
+            return {plan: match.group(1).replace(' ', '') for plan, match in plans.items()}
+        if field == 'aum' and not re.search(r'\d', value):
+            return None
+        return value or None
+
+
+class FactTable:
+    """
+    In-memory fact table indexed by (scheme, field).
+    Persisted as fact_table.json next to the vector store.
+    """
+
+    def __init__(self, facts: Optional[List[Dict[str, Any]]] = None):
+        self.facts = []
+        self.index: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        for fact in facts or []:
+            self.add(fact)
+
+    def add(self, fact: Dict[str, Any]):
+        self.facts.append(fact)
+        self.index[(fact['scheme'], fact['field'])] = fact
+
+    def get(self, scheme: str, field: str) -> Optional[Dict[str, Any]]:
+        return self.index.get((scheme, field))
+
+    def rows(self, scheme: Optional[str] = None, field: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Every fact (not only the indexed one) for a scheme and/or field, e.g. all sources of a value."""
+        return [fact for fact in self.facts
+                if (scheme is None or fact['scheme'] == scheme) and (field is None or fact['field'] == field)]
+
+    def __len__(self) -> int:
+        return len(self.facts)
+
+    def save(self, path: str):
+        # No build timestamp, so an unchanged refresh leaves the file byte-identical
+        data = {'facts': self.facts}
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        logging.info(f"Saved {len(self.facts)} facts to {path}")
+
+    @classmethod
+    def load(cls, path: str) -> "FactTable":
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data.get('facts', []))
+
+
+def fact_table_path(embeddings_dir: str) -> str:
+    return os.path.join(embeddings_dir, "fact_table.json")
+
+
+def build_fact_table(cleaned_dir: str, supplementary_dir: str, embeddings_dir: str) -> FactTable:
+    """Run fact extraction over Phase 1 output and save the table."""
+    table = FactTable(FactExtractor(cleaned_dir, supplementary_dir).extract_all())
+    table.save(fact_table_path(embeddings_dir))
+    return table
+
+
+if __name__ == "__main__":
+    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+    PHASE1_DIR = os.path.join(os.path.dirname(BASE_DIR), "phase1_data_collection")
+
+    build_fact_table(
+        os.path.join(PHASE1_DIR, "cleaned"),
+        os.path.join(PHASE1_DIR, "supplementary_data"),
+        BASE_DIR
+    )
@@ -0,0 +1,423 @@
+import os
+import sys
+import json
+import math
+import time
+import uuid
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from phase2_vector_db.segments import (PROCESS_LOCK_FILE, index_lock, load_manifest, save_manifest, new_segment_name,
+                                       write_segment, read_segment, delete_segment_files, ingest_log_path,
+                                       content_hash)
+from phase2_vector_db.vector_store import chunk_document, page_hashes
+from phase2_vector_db.citations import CitationTable, registry_names
+from phase1_data_collection.object_store import ObjectStore
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def select_merge(counts: List[int], deleted: List[int], merge_factor: int = 4,
+                 expunge_ratio: float = 0.3) -> List[int]:
+    """
+    Tiered merge policy over the manifest's segment list. Returns the indices
+    of one run of adjacent segments to merge, or [] when the layout is fine:
+    - a segment whose deleted fraction reaches expunge_ratio is rewritten alone;
+    - otherwise the first run of `merge_factor` adjacent segments in the same
+      size tier (floor(log_merge_factor(live rows))) is merged, so segments
+      grow geometrically and their number stays logarithmic in the rows.
+    """
+    for i, (count, gone) in enumerate(zip(counts, deleted)):
+        if count and gone / count >= expunge_ratio:
+            return [i]
+    tiers = [int(math.log(max(count - gone, 1), merge_factor)) for count, gone in zip(counts, deleted)]
+    run_start = 0
+    for i in range(1, len(tiers) + 1):
+        if i == len(tiers) or tiers[i] != tiers[run_start]:
+            if i - run_start >= merge_factor:
+                return list(range(run_start, run_start + merge_factor))
+            run_start = i
+    return []
+
+
+class IngestionService:
+    """
+    Adds documents to a live index without rebuilding it.
+
+    submit() chunks documents and appends them to the ingest log (cheap, no
+    model call). process_pending() embeds whatever the log holds, seals it
+    into an immutable segment and publishes a new manifest; running
+    RetrievalSystem instances pick the segment up on their next query.
+    Deletes (delete_sources(), sync() against resource_registry.json) only
+    add tombstones; a tiered merger folds small segments together and
+    rewrites segments with many deleted rows, so every change costs
+    O(changed data) and the number of segments stays logarithmic.
+
+    Writers in any process serialize on segments.index_lock, so the CLI and
+    a background ingester (`serve`, or one API worker) can run side by side.
+    """
+
+    def __init__(self, embeddings_dir: str, model=None, interval: float = 2.0, merge_factor: int = 4,
+                 expunge_ratio: float = 0.3, batch_size: int = 64):
+        self.embeddings_dir = embeddings_dir
+        self._model = model
+        self.interval = interval
+        self.merge_factor = merge_factor
+        self.expunge_ratio = expunge_ratio
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def model(self):
+        # Loaded on first use so submit() and status() never pay for it
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer('all-MiniLM-L6-v2')
+        return self._model
+
+    def submit(self, documents: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Queue cleaned documents ({'extracted_text', 'scheme', 'category',
+        'source_url', 'source_type', 'source_file'}, and 'pages' for PDFs)
+        for embedding.
+        """
+        lines = []
+        for document in documents:
+            if not document.get('extracted_text', '').strip():
+                continue
+            for chunk, metadata in chunk_document(document):
+                record = {'id': str(uuid.uuid4()), 'text': chunk, 'metadata': metadata}
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+
+        if lines:
+            with index_lock(self.embeddings_dir):
+                manifest = load_manifest(self.embeddings_dir)
+                with open(ingest_log_path(self.embeddings_dir, manifest), 'a', encoding='utf-8') as f:
+                    f.write("".join(lines))
+                    f.flush()
+                    os.fsync(f.fileno())
+            self._wake.set()
+        logging.info(f"Queued {len(lines)} chunks from {len(documents)} documents")
+        return {'documents': len(documents), 'chunks': len(lines)}
+
+    def _read_log(self, manifest: Dict[str, Any]):
+        path = ingest_log_path(self.embeddings_dir, manifest)
+        if not os.path.exists(path):
+            return [], manifest['log_offset']
+        with open(path, 'rb') as f:
+            f.seek(manifest['log_offset'])
+            data = f.read()
+        # Only whole lines: a submit interrupted mid-write leaves its tail for later
+        complete = data[:data.rfind(b"\n") + 1]
+        records = [json.loads(line) for line in complete.decode('utf-8').splitlines() if line.strip()]
+        return records, manifest['log_offset'] + len(complete)
+
+    def process_pending(self) -> int:
+        """Embed queued chunks into a new segment. Returns the number of chunks published."""
+        with index_lock(self.embeddings_dir, PROCESS_LOCK_FILE):
+            # Only processors move the log offset, so it cannot change under us;
+            # submit() keeps appending while the model runs
+            records, offset = self._read_log(load_manifest(self.embeddings_dir))
+            if not records:
+                return 0
+
+            texts = [record['text'] for record in records]
+            embeddings = np.asarray(self.model.encode(texts, batch_size=self.batch_size), dtype=np.float32)
+
+            with index_lock(self.embeddings_dir):
+                manifest = load_manifest(self.embeddings_dir)
+                metadatas = self._attach_citations([record['metadata'] for record in records])
+                segment = write_segment(self.embeddings_dir, new_segment_name(manifest),
+                                        [record['id'] for record in records], texts, metadatas, embeddings)
+                manifest['segments'].append(segment)
+
+                old_log = ingest_log_path(self.embeddings_dir, manifest)
+                rotate = offset == os.path.getsize(old_log)
+                if rotate:
+                    manifest['log_number'] += 1
+                    manifest['log_offset'] = 0
+                else:
+                    manifest['log_offset'] = offset
+                save_manifest(self.embeddings_dir, manifest)
+                if rotate:
+                    os.remove(old_log)
+            logging.info(f"Published segment {segment['name']} with {segment['count']} chunks "
+                         f"(generation {manifest['generation']})")
+
+        self.maybe_merge()
+        return len(records)
+
+    def _attach_citations(self, metadatas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Give chunks their citation ids. Caller holds the index lock; the table is saved before the manifest."""
+        table = CitationTable.load(self.embeddings_dir, registry_names())
+        for metadata in metadatas:
+            metadata['citation_id'] = table.add(metadata)
+        table.save(self.embeddings_dir)
+        return metadatas
+
+    def _segment_rows(self, manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [read_segment(self.embeddings_dir, entry['name'], with_embeddings=False)
+                for entry in manifest['segments']]
+
+    def maybe_merge(self) -> List[Dict[str, Any]]:
+        """Run the merges the tiered policy asks for (see select_merge)."""
+        merges = []
+        with index_lock(self.embeddings_dir, PROCESS_LOCK_FILE):
+            while True:
+                manifest = load_manifest(self.embeddings_dir)
+                tombstones = set(manifest['tombstones'])
+                deleted = [sum(chunk_id in tombstones for chunk_id in rows['ids'])
+                           for rows in self._segment_rows(manifest)]
+                run = select_merge([entry['count'] for entry in manifest['segments']], deleted,
+                                   self.merge_factor, self.expunge_ratio)
+                if not run:
+                    return merges
+                merges.append(self._merge([manifest['segments'][i]['name'] for i in run]))
+
+    def compact(self) -> Dict[str, Any]:
+        """Merge every live segment into one, dropping deleted rows."""
+        with index_lock(self.embeddings_dir, PROCESS_LOCK_FILE):
+            names = [entry['name'] for entry in load_manifest(self.embeddings_dir)['segments']]
+            if not names:
+                return {'merged': 0, 'chunks': 0, 'expunged': 0}
+            return self._merge(names)
+
+    def _merge(self, names: List[str]) -> Dict[str, Any]:
+        """Replace a run of adjacent segments by one, without their tombstoned rows. Caller holds the process lock."""
+        tombstones = set(load_manifest(self.embeddings_dir)['tombstones'])
+        ids, documents, metadatas, parts, expunged = [], [], [], [], set()
+        for name in names:
+            segment = read_segment(self.embeddings_dir, name)
+            keep = [chunk_id not in tombstones for chunk_id in segment['ids']]
+            expunged.update(chunk_id for chunk_id, kept in zip(segment['ids'], keep) if not kept)
+            ids.extend(chunk_id for chunk_id, kept in zip(segment['ids'], keep) if kept)
+            documents.extend(text for text, kept in zip(segment['documents'], keep) if kept)
+            metadatas.extend(metadata for metadata, kept in zip(segment['metadatas'], keep) if kept)
+            parts.append(segment['embeddings'][np.array(keep, dtype=bool)])
+
+        with index_lock(self.embeddings_dir):
+            manifest = load_manifest(self.embeddings_dir)
+            position = [entry['name'] for entry in manifest['segments']].index(names[0])
+            merged = []
+            if ids:
+                merged = [write_segment(self.embeddings_dir, new_segment_name(manifest), ids, documents, metadatas,
+                                        np.concatenate(parts))]
+            manifest['segments'][position:position + len(names)] = merged
+            # Deleted rows are physically gone now, so their tombstones can go too
+            manifest['tombstones'] = [chunk_id for chunk_id in manifest['tombstones'] if chunk_id not in expunged]
+            save_manifest(self.embeddings_dir, manifest)
+        for name in names:
+            delete_segment_files(self.embeddings_dir, name)
+        logging.info(f"Merged {len(names)} segments into {merged[0]['name'] if merged else 'nothing'} "
+                     f"({len(ids)} chunks, {len(expunged)} deleted rows expunged)")
+        return {'merged': len(names), 'chunks': len(ids), 'expunged': len(expunged)}
+
+    def _live_rows(self, manifest: Dict[str, Any]):
+        """(chunk id, metadata) of every live row, over the base store and every segment."""
+        with open(os.path.join(self.embeddings_dir, "vector_store.json"), 'r', encoding='utf-8') as f:
+            base = json.load(f)
+        tombstones = set(manifest['tombstones'])
+        for rows in [base] + self._segment_rows(manifest):
+            for chunk_id, metadata in zip(rows['ids'], rows['metadatas']):
+                if chunk_id not in tombstones:
+                    yield chunk_id, metadata
+
+    def delete_sources(self, source_urls: List[str]) -> Dict[str, Any]:
+        """Tombstone every chunk of the given documents; searches stop returning them at once."""
+        with index_lock(self.embeddings_dir, PROCESS_LOCK_FILE):
+            result = self._publish_changes([], {url: None for url in source_urls}, {})
+        self.maybe_merge()
+        return result
+
+    def sync(self, cleaned_dir: str, registry_path: str, store_dir: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Bring the index in line with resource_registry.json and the cleaned
+        documents, touching only what changed: documents whose text hash
+        differs are re-embedded into one new segment (for PDFs with page
+        records, only the pages whose hash differs), documents dropped from
+        the registry are tombstoned. Documents added outside the registry
+        (admin API, add_faq_manual.py) are left alone. With the Phase 1 object
+        store (store_dir), text hashes come from its resource manifests and
+        only changed documents are read.
+        """
+        with open(registry_path, 'r', encoding='utf-8') as f:
+            registry_urls = {resource['url'] for resource in json.load(f)}
+        if store_dir and os.path.isdir(store_dir):
+            store = ObjectStore(store_dir)
+            names = {record['url']: name for name, record in store.manifests().items() if record['url'] in registry_urls}
+            hashes = {url: store.load_manifest(name)['text_hash'] for url, name in names.items()}
+
+            def load(url):
+                document = store.cleaned_document(names[url])
+                document.setdefault('source_file', names[url] + "_cleaned.json")
+                return document
+        else:
+            cleaned = {}
+            for filename in sorted(os.listdir(cleaned_dir)):
+                if filename.endswith('.json'):
+                    for document in load_documents(os.path.join(cleaned_dir, filename)):
+                        if document.get('extracted_text') and document.get('source_url') in registry_urls:
+                            cleaned[document['source_url']] = document
+            hashes = {url: content_hash(document['extracted_text']) for url, document in cleaned.items()}
+            load = cleaned.get
+
+        with index_lock(self.embeddings_dir, PROCESS_LOCK_FILE):
+            manifest = load_manifest(self.embeddings_dir)
+            changed = {url: load(url) for url, digest in hashes.items() if manifest['sources'].get(url) != digest}
+            removed = {url for url in manifest['sources'] if url not in registry_urls}
+            updates, replaced = [], {url: None for url in removed}
+            for url, document in changed.items():
+                old_pages, new_pages = manifest['pages'].get(url), page_hashes(document)
+                if old_pages and new_pages:
+                    pages = {int(number) for number, digest in new_pages.items() if old_pages.get(number) != digest}
+                    replaced[url] = pages | {int(number) for number in old_pages if number not in new_pages}
+                else:
+                    # Indexed as one text before: replace the whole document
+                    pages = replaced[url] = None
+                updates.append((document, pages))
+            result = self._publish_changes(
+                updates, replaced, {url: content_hash(document['extracted_text']) for url, document in changed.items()},
+                {url: page_hashes(document) for url, document in changed.items() if document.get('pages')})
+        result.update({'changed': len(changed), 'removed': len(removed), 'unchanged': len(hashes) - len(changed),
+                       'changed_pages': sum(len(pages) for _, pages in updates if pages is not None)})
+        self.maybe_merge()
+        return result
+
+    def _publish_changes(self, updates: List[Tuple[Dict[str, Any], Optional[set]]],
+                         replaced: Dict[str, Optional[set]], hashes: Dict[str, str],
+                         pages: Optional[Dict[str, Dict[str, str]]] = None) -> Dict[str, Any]:
+        """
+        One manifest update: a segment for `updates` ((document, page numbers to
+        embed or None for all)), tombstones for the old rows in `replaced`
+        (source_url -> page numbers, or None for the whole document).
+        """
+        ids, texts, metadatas = [], [], []
+        for document, only_pages in updates:
+            for chunk, metadata in chunk_document(document, pages=only_pages):
+                ids.append(str(uuid.uuid4()))
+                texts.append(chunk)
+                metadatas.append(metadata)
+        embeddings = np.asarray(self.model.encode(texts, batch_size=self.batch_size), dtype=np.float32) \
+            if texts else None
+
+        with index_lock(self.embeddings_dir):
+            manifest = load_manifest(self.embeddings_dir)
+            deleted = [chunk_id for chunk_id, metadata in self._live_rows(manifest)
+                       if metadata.get('source_url') in replaced
+                       and (replaced[metadata['source_url']] is None
+                            or metadata.get('page') in replaced[metadata['source_url']])]
+            if texts:
+                self._attach_citations(metadatas)
+                manifest['segments'].append(write_segment(self.embeddings_dir, new_segment_name(manifest),
+                                                          ids, texts, metadatas, embeddings))
+            manifest['tombstones'] = manifest['tombstones'] + deleted
+            for url in replaced:
+                manifest['sources'].pop(url, None)
+                manifest['pages'].pop(url, None)
+            manifest['sources'].update(hashes)
+            manifest['pages'].update(pages or {})
+            save_manifest(self.embeddings_dir, manifest)
+        logging.info(f"Published {len(ids)} new chunks and {len(deleted)} tombstones "
+                     f"(generation {manifest['generation']})")
+        return {'chunks': len(ids), 'deleted_chunks': len(deleted)}
+
+    def status(self) -> Dict[str, Any]:
+        manifest = load_manifest(self.embeddings_dir)
+        records, _ = self._read_log(manifest)
+        return {
+            'generation': manifest['generation'],
+            'segments': len(manifest['segments']),
+            'segment_chunks': sum(entry['count'] for entry in manifest['segments']),
+            'deleted_chunks': len(manifest['tombstones']),
+            'pending_chunks': len(records),
+        }
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                # process_pending() also runs the merger
+                self.process_pending()
+            except Exception as e:
+                logging.error(f"Background ingestion failed: {e}")
+
+    def start(self):
+        """Embed queued chunks in a background thread until stop()."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="ingestion", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+
+
+def load_documents(path: str) -> List[Dict[str, Any]]:
+    """Read a cleaned-document JSON file (one document or a list of them)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    documents = data if isinstance(data, list) else [data]
+    for document in documents:
+        document.setdefault('source_file', os.path.basename(path))
+    return documents
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Add documents to the live index without a full rebuild")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    add_parser = subparsers.add_parser("add", help="Queue cleaned-document JSON files and embed them")
+    add_parser.add_argument("files", nargs="+")
+    add_parser.add_argument("--queue-only", action="store_true",
+                            help="Only queue; a running API worker embeds them in the background")
+    subparsers.add_parser("process", help="Embed everything queued")
+    subparsers.add_parser("compact", help="Merge all segments into one, dropping deleted rows")
+    delete_parser = subparsers.add_parser("delete", help="Tombstone every chunk of the given source URLs")
+    delete_parser.add_argument("source_urls", nargs="+")
+    subparsers.add_parser("sync", help="Re-embed changed cleaned documents, tombstone ones dropped from the registry")
+    subparsers.add_parser("status", help="Show segments and queued chunks")
+    subparsers.add_parser("serve", help="Embed queued chunks in the background until interrupted")
+    args = parser.parse_args()
+
+    service = IngestionService(os.path.dirname(os.path.abspath(__file__)))
+    if args.command == "add":
+        for path in args.files:
+            service.submit(load_documents(path))
+        if not args.queue_only:
+            service.process_pending()
+    elif args.command == "process":
+        service.process_pending()
+    elif args.command == "serve":
+        service.start()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            service.stop()
+    elif args.command == "compact":
+        print(json.dumps(service.compact()))
+    elif args.command == "delete":
+        print(json.dumps(service.delete_sources(args.source_urls)))
+    elif args.command == "sync":
+        print(json.dumps(service.sync(os.path.join(PROJECT_ROOT, "phase1_data_collection", "cleaned"),
+                                      os.path.join(PROJECT_ROOT, "phase1_data_collection", "resources",
+                                                   "resource_registry.json"),
+                                      os.path.join(PROJECT_ROOT, "phase1_data_collection", "store"))))
+    print(json.dumps(service.status(), indent=2))
@@ -0,0 +1,240 @@
+import os
+import logging
+import numpy as np
+from typing import Dict, Optional, Type
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Rows decoded per block when scoring, keeps temporary float32 copies small
+SCORE_BLOCK_ROWS = 4096
+
+
+class EmbeddingCodec:
+    """
+    Base class for compressed embedding storage.
+    Codecs are fitted on the float32 matrix at build time, saved next to
+    embeddings.npy and used by the retriever for an approximate first pass.
+    """
+
+    name = "float32"
+
+    def __init__(self):
+        self.codes = None
+        self.dim = 0
+
+    def fit(self, embeddings: np.ndarray) -> "EmbeddingCodec":
+        """Learn any codec parameters and encode the matrix."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        self.dim = embeddings.shape[1]
+        self.codes = self.encode(embeddings)
+        return self
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        return np.asarray(embeddings, dtype=np.float32)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.asarray(codes, dtype=np.float32)
+
+    def score(self, query: np.ndarray) -> np.ndarray:
+        """Approximate dot-product scores of one query against all rows."""
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_BLOCK_ROWS):
+            block = self.decode(self.codes[start:start + SCORE_BLOCK_ROWS])
+            scores[start:start + len(block)] = block @ query
+        return scores
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held in memory by the codes and codec parameters."""
+        return int(self.codes.nbytes) + sum(int(v.nbytes) for v in self._params().values())
+
+    def _params(self) -> Dict[str, np.ndarray]:
+        return {}
+
+    def _load_params(self, params: Dict[str, np.ndarray]):
+        pass
+
+    def save(self, path: str):
+        np.savez(path, codec=np.array(self.name), codes=self.codes, **self._params())
+        logging.info(f"Saved {self.name} embeddings to {path} ({self.nbytes / 1024:.1f} KiB)")
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingCodec":
+        with np.load(path) as data:
+            codec_cls = get_codec_class(str(data['codec']))
+            codec = codec_cls()
+            codec.codes = data['codes']
+            codec._load_params({key: data[key] for key in data.files if key not in ('codec', 'codes')})
+        codec.dim = codec.decode(codec.codes[:1]).shape[1]
+        return codec
+
+
+class Float16Codec(EmbeddingCodec):
+    """Half-precision storage, 2x smaller with negligible score error."""
+
+    name = "float16"
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        return np.asarray(embeddings, dtype=np.float16)
+
+
+class ScalarInt8Codec(EmbeddingCodec):
+    """
+    Per-dimension scalar quantization to int8, 4x smaller.
+    Each dimension is mapped linearly from [min, max] onto [-128, 127].
+    """
+
+    name = "int8"
+
+    def __init__(self):
+        super().__init__()
+        self.offset = None
+        self.scale = None
+
+    def fit(self, embeddings: np.ndarray) -> "ScalarInt8Codec":
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        low = embeddings.min(axis=0)
+        high = embeddings.max(axis=0)
+        self.scale = np.maximum(high - low, 1e-12).astype(np.float32) / 255.0
+        self.offset = low.astype(np.float32)
+        return super().fit(embeddings)
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        levels = np.rint((np.asarray(embeddings, dtype=np.float32) - self.offset) / self.scale)
+        return (np.clip(levels, 0, 255) - 128).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) + 128.0) * self.scale + self.offset
+
+    def score(self, query: np.ndarray) -> np.ndarray:
+        # q.x = q.offset + (q * scale).(code + 128), so rows never need full decoding
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        weighted = query * self.scale
+        bias = float(query @ self.offset) + 128.0 * float(weighted.sum())
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), SCORE_BLOCK_ROWS):
+            block = self.codes[start:start + SCORE_BLOCK_ROWS].astype(np.float32)
+            scores[start:start + len(block)] = block @ weighted + bias
+        return scores
+
+    def _params(self) -> Dict[str, np.ndarray]:
+        return {'offset': self.offset, 'scale': self.scale}
+
+    def _load_params(self, params: Dict[str, np.ndarray]):
+        self.offset = params['offset']
+        self.scale = params['scale']
+
+
+class ProductQuantizer(EmbeddingCodec):
+    """
+    Product quantization: the vector is split into `num_subspaces` slices and
+    each slice is replaced by the id of its nearest k-means centroid (1 byte).
+    Scores are computed with per-query lookup tables (asymmetric distance).
+    """
+
+    name = "pq"
+
+    def __init__(self, num_subspaces: int = 48, num_centroids: int = 256, iterations: int = 20, seed: int = 0):
+        super().__init__()
+        self.num_subspaces = num_subspaces
+        self.num_centroids = num_centroids
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = None  # (num_subspaces, num_centroids, sub_dim)
+
+    def fit(self, embeddings: np.ndarray) -> "ProductQuantizer":
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        n, dim = embeddings.shape
+        if dim % self.num_subspaces != 0:
+            raise ValueError(f"Embedding dim {dim} is not divisible by {self.num_subspaces} subspaces")
+
+        sub_dim = dim // self.num_subspaces
+        num_centroids = min(self.num_centroids, n)
+        rng = np.random.default_rng(self.seed)
+
+        self.centroids = np.zeros((self.num_subspaces, num_centroids, sub_dim), dtype=np.float32)
+        for m in range(self.num_subspaces):
+            sub = embeddings[:, m * sub_dim:(m + 1) * sub_dim]
+            self.centroids[m] = self._kmeans(sub, num_centroids, rng)
+
+        return super().fit(embeddings)
+
+    def _kmeans(self, data: np.ndarray, num_centroids: int, rng: np.random.Generator) -> np.ndarray:
+        """Plain Lloyd iterations, good enough for a few thousand rows."""
+        centroids = data[rng.choice(len(data), num_centroids, replace=False)].copy()
+        for _ in range(self.iterations):
+            assignment = self._nearest(data, centroids)
+            for c in range(num_centroids):
+                members = data[assignment == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+                else:
+                    # Re-seed empty clusters so every code is usable
+                    centroids[c] = data[rng.integers(len(data))]
+        return centroids
+
+    @staticmethod
+    def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+        distances = (
+            (data ** 2).sum(axis=1, keepdims=True)
+            - 2.0 * data @ centroids.T
+            + (centroids ** 2).sum(axis=1)
+        )
+        return distances.argmin(axis=1)
+
+    def encode(self, embeddings: np.ndarray) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        sub_dim = self.centroids.shape[2]
+        codes = np.empty((len(embeddings), self.num_subspaces), dtype=np.uint8)
+        for m in range(self.num_subspaces):
+            sub = embeddings[:, m * sub_dim:(m + 1) * sub_dim]
+            codes[:, m] = self._nearest(sub, self.centroids[m])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.centroids[m][codes[:, m]] for m in range(self.num_subspaces)]
+        return np.concatenate(parts, axis=1)
+
+    def score(self, query: np.ndarray) -> np.ndarray:
+        query = np.asarray(query, dtype=np.float32).reshape(self.num_subspaces, -1)
+        # lookup[m, c] = <query slice m, centroid c of subspace m>
+        lookup = np.einsum('mcd,md->mc', self.centroids, query)
+        return lookup[np.arange(self.num_subspaces), self.codes].sum(axis=1)
+
+    def _params(self) -> Dict[str, np.ndarray]:
+        return {'centroids': self.centroids}
+
+    def _load_params(self, params: Dict[str, np.ndarray]):
+        self.centroids = params['centroids']
+        self.num_subspaces, self.num_centroids = self.centroids.shape[:2]
+
+
+CODECS: Dict[str, Type[EmbeddingCodec]] = {
+    Float16Codec.name: Float16Codec,
+    ScalarInt8Codec.name: ScalarInt8Codec,
+    ProductQuantizer.name: ProductQuantizer,
+}
+
+
+def get_codec_class(name: str) -> Type[EmbeddingCodec]:
+    if name not in CODECS:
+        raise ValueError(f"Unknown compression '{name}'. Choose from: {', '.join(CODECS)}")
+    return CODECS[name]
+
+
+def compressed_embeddings_path(embeddings_dir: str, name: str) -> str:
+    """Location of the compressed matrix for a codec, e.g. embeddings_int8.npz"""
+    return os.path.join(embeddings_dir, f"embeddings_{name}.npz")
+
+
+def build_codec(name: str, embeddings: np.ndarray, **kwargs) -> EmbeddingCodec:
+    return get_codec_class(name)(**kwargs).fit(embeddings)
+
+
+def load_codec(embeddings_dir: str, name: str) -> Optional[EmbeddingCodec]:
+    path = compressed_embeddings_path(embeddings_dir, name)
+    if not os.path.exists(path):
+        return None
+    return EmbeddingCodec.load(path)
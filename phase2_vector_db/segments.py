@@ -0,0 +1,177 @@
+import os
+import json
+import hashlib
+import logging
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-writer deployments only
+    fcntl = None
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Layout inside the embeddings directory, next to the base vector_store.json/embeddings.npy:
+#   segments/manifest.json          which sealed segments are live, tombstoned chunk ids and the
+#                                   content hash of every registry document indexed (the commit point)
+#   segments/seg_000001.{json,npy}  immutable segments: documents/metadatas/ids + embeddings
+#   segments/ingest_000001.jsonl    append-only log of chunks waiting to be embedded
+SEGMENTS_DIR = "segments"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = ".lock"
+# Held by whoever embeds or merges segments, so the manifest lock is never held across model calls
+PROCESS_LOCK_FILE = ".process.lock"
+
+
+def segments_dir(embeddings_dir: str) -> str:
+    return os.path.join(embeddings_dir, SEGMENTS_DIR)
+
+
+def manifest_path(embeddings_dir: str) -> str:
+    return os.path.join(segments_dir(embeddings_dir), MANIFEST_FILE)
+
+
+def ingest_log_path(embeddings_dir: str, manifest: Dict[str, Any]) -> str:
+    # A fully consumed log is rotated by publishing the next number, never truncated in place
+    return os.path.join(segments_dir(embeddings_dir), f"ingest_{manifest['log_number']:06d}.jsonl")
+
+
+def manifest_stamp(embeddings_dir: str) -> Optional[tuple]:
+    """Cheap change detector: every publish replaces the file, so the inode changes too."""
+    try:
+        stat = os.stat(manifest_path(embeddings_dir))
+        return (stat.st_ino, stat.st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def index_lock(embeddings_dir: str, name: str = LOCK_FILE):
+    """Exclusive lock for manifest and log writers (ingestion service, CLI, compaction) across processes."""
+    os.makedirs(segments_dir(embeddings_dir), exist_ok=True)
+    with open(os.path.join(segments_dir(embeddings_dir), name), 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _atomic_write_json(path: str, data: Any):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_manifest(embeddings_dir: str) -> Dict[str, Any]:
+    path = manifest_path(embeddings_dir)
+    if not os.path.exists(path):
+        manifest = {}
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    for key, default in (('generation', 0), ('next_segment', 1), ('segments', []), ('log_number', 1),
+                         ('log_offset', 0), ('tombstones', []), ('sources', {}), ('pages', {})):
+        manifest.setdefault(key, default)
+    return manifest
+
+
+def save_manifest(embeddings_dir: str, manifest: Dict[str, Any]):
+    """Atomically publish a new manifest; readers see either the old or the new one."""
+    manifest['generation'] = manifest.get('generation', 0) + 1
+    os.makedirs(segments_dir(embeddings_dir), exist_ok=True)
+    _atomic_write_json(manifest_path(embeddings_dir), manifest)
+
+
+def new_segment_name(manifest: Dict[str, Any]) -> str:
+    name = f"seg_{manifest['next_segment']:06d}"
+    manifest['next_segment'] += 1
+    return name
+
+
+def write_segment(embeddings_dir: str, name: str, ids: List[str], documents: List[str],
+                  metadatas: List[Dict[str, Any]], embeddings: np.ndarray) -> Dict[str, Any]:
+    """Write an immutable segment. It only becomes visible once a manifest lists it."""
+    directory = segments_dir(embeddings_dir)
+    os.makedirs(directory, exist_ok=True)
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    with open(os.path.join(directory, name + ".npy"), 'wb') as f:
+        np.save(f, embeddings)
+    _atomic_write_json(os.path.join(directory, name + ".json"),
+                       {'ids': ids, 'documents': documents, 'metadatas': metadatas})
+    return {'name': name, 'count': len(ids)}
+
+
+def read_segment(embeddings_dir: str, name: str, with_embeddings: bool = True) -> Dict[str, Any]:
+    directory = segments_dir(embeddings_dir)
+    with open(os.path.join(directory, name + ".json"), 'r', encoding='utf-8') as f:
+        segment = json.load(f)
+    if with_embeddings:
+        segment['embeddings'] = np.load(os.path.join(directory, name + ".npy"))
+    return segment
+
+
+def delete_segment_files(embeddings_dir: str, name: str):
+    # Readers hold segments in memory, so files can go as soon as the manifest drops them;
+    # a reader that read the old manifest just before retries (RetrievalSystem.refresh)
+    for extension in (".json", ".npy"):
+        path = os.path.join(segments_dir(embeddings_dir), name + extension)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def load_segments(embeddings_dir: str) -> Dict[str, Any]:
+    """
+    Rows of every live segment, concatenated in manifest order:
+    {'generation', 'ids', 'documents', 'metadatas', 'embeddings' (n, dim) or None,
+     'tombstones' (deleted chunk ids, base or segment rows)}
+    """
+    manifest = load_manifest(embeddings_dir)
+    result = {'generation': manifest['generation'], 'ids': [], 'documents': [], 'metadatas': [], 'embeddings': None,
+              'tombstones': manifest['tombstones']}
+    parts = []
+    for entry in manifest['segments']:
+        segment = read_segment(embeddings_dir, entry['name'])
+        result['ids'].extend(segment['ids'])
+        result['documents'].extend(segment['documents'])
+        result['metadatas'].extend(segment['metadatas'])
+        parts.append(segment['embeddings'])
+    if parts:
+        result['embeddings'] = np.concatenate(parts).astype(np.float32, copy=False)
+    return result
+
+
+def content_hash(text: str) -> str:
+    """Identity of a cleaned document's text; unchanged hash means nothing to re-embed."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+
+
+def rebase_segments(embeddings_dir: str, sources: Dict[str, str], pages: Optional[Dict[str, Dict[str, str]]] = None):
+    """
+    Record a full Phase 2 rebuild: the new base holds `sources` (source_url ->
+    content hash; `pages`: source_url -> page hashes of PDFs), so segment rows
+    of those documents are superseded. Rows ingested ad hoc stay live;
+    tombstones of the old base no longer apply.
+    """
+    with index_lock(embeddings_dir, PROCESS_LOCK_FILE), index_lock(embeddings_dir):
+        manifest = load_manifest(embeddings_dir)
+        tombstones = set(manifest['tombstones'])
+        segment_ids, superseded = set(), set()
+        for entry in manifest['segments']:
+            rows = read_segment(embeddings_dir, entry['name'], with_embeddings=False)
+            segment_ids.update(rows['ids'])
+            superseded.update(chunk_id for chunk_id, metadata in zip(rows['ids'], rows['metadatas'])
+                              if metadata.get('source_url') in sources)
+        manifest['tombstones'] = sorted((tombstones & segment_ids) | superseded)
+        manifest['sources'] = dict(sources)
+        manifest['pages'] = dict(pages or {})
+        save_manifest(embeddings_dir, manifest)
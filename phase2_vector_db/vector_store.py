@@ -1,19 +1,88 @@
 import os
+import sys
 import json
 import uuid
 import numpy as np
 import logging
 import sqlite3
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from phase2_vector_db.quantization import build_codec, compressed_embeddings_path
+from phase2_vector_db.fact_table import build_fact_table
+from phase2_vector_db.segments import content_hash, rebase_segments
+from phase2_vector_db.citations import CitationTable, registry_names
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def chunk_text(text: str, max_tokens: int = 400, overlap: int = 50) -> List[str]:
+    """
+    Split text into overlapping word windows.
+    """
+    words = text.split()
+    
+    # If text is short, return as one chunk
+    if len(words) <= max_tokens:
+        return [text]
+        
+    chunks = []
+    i = 0
+    step = max_tokens - overlap
+    if step <= 0:
+        step = 1
+        
+    while i < len(words):
+        chunks.append(" ".join(words[i : i + max_tokens]))
+        i += step
+        
+    return chunks
+
+def chunk_metadata(metadata_source: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata stored with every chunk of a cleaned document."""
+    return {
+        "scheme": metadata_source.get('scheme', 'UNKNOWN'),
+        "category": metadata_source.get('category', 'UNKNOWN'),
+        "source_url": metadata_source.get('source_url', ''),
+        "source_type": metadata_source.get('source_type', ''),
+        "source_file": metadata_source.get('source_file', '')
+    }
+
+def chunk_document(document: Dict[str, Any], pages: Optional[set] = None,
+                   max_tokens: int = 400, overlap: int = 50) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    (chunk text, metadata) pairs for a cleaned document. Documents with page
+    records (PDFs) are chunked page by page, so every chunk carries its page
+    number and the page's hash; `pages` limits this to the given page numbers.
+    """
+    if not document.get('pages'):
+        return [(chunk, chunk_metadata(document))
+                for chunk in chunk_text(document.get('extracted_text', ''), max_tokens, overlap)]
+    chunks = []
+    for page in document['pages']:
+        if pages is not None and page['page'] not in pages:
+            continue
+        for chunk in chunk_text(page['text'], max_tokens, overlap):
+            metadata = chunk_metadata(document)
+            metadata.update({'page': page['page'], 'page_hash': page['hash']})
+            chunks.append((chunk, metadata))
+    return chunks
+
+def page_hashes(document: Dict[str, Any]) -> Dict[str, str]:
+    """Page number (as a JSON key) -> hash of the page's cleaned text; {} for documents without pages."""
+    return {str(page['page']): page['hash'] for page in document.get('pages', [])}
+
 class Phase2VectorStore:
-    def __init__(self, cleaned_dir: str, embeddings_dir: str):
+    def __init__(self, cleaned_dir: str, embeddings_dir: str, compression: Optional[str] = None):
         self.cleaned_dir = cleaned_dir
         self.embeddings_dir = embeddings_dir
+        # Optional compressed copy of the embeddings: 'float16', 'int8' or 'pq'
+        self.compression = compression
         os.makedirs(self.embeddings_dir, exist_ok=True)
         
         # Initialize Embedding Model
@@ -24,6 +93,13 @@ class Phase2VectorStore:
         self.metadatas = []
         self.embeddings = []
         self.ids = []
+        # source_url -> content hash of every indexed document, for incremental syncs
+        self.sources = {}
+        # source_url -> page hashes of indexed PDFs, so syncs re-embed changed pages only
+        self.pages = {}
+        # Display name, URL, type, scheme and page of every cited document, by id.
+        # Extends the existing table so ids held by segments and cached answers stay valid.
+        self.citations = CitationTable.load(self.embeddings_dir, registry_names())
 
     def process_all_files(self):
         """Process all JSON files in the cleaned directory."""
@@ -40,7 +116,9 @@ class Phase2VectorStore:
             self.process_file(filepath)
             
         self.save_index()
+        rebase_segments(self.embeddings_dir, self.sources, self.pages)
         self.save_to_sql()
+        self.save_fact_table()
 
     def process_file(self, filepath: str):
         """Read file, chunk text, embed, and store."""
@@ -54,8 +132,17 @@ class Phase2VectorStore:
                 logging.warning(f"No text in {filepath}")
                 return
 
-            chunks = self.create_chunks(text)
-            self.store_chunks(chunks, data)
+            if data.get('pages'):
+                chunks = chunk_document(data)
+                self.store_chunks([chunk for chunk, _ in chunks], data, [metadata for _, metadata in chunks])
+                self.pages[data.get('source_url', '')] = page_hashes(data)
+            else:
+                if data.get('source_url', '').lower().endswith('.pdf'):
+                    logging.warning(f"{filepath} predates page extraction; its chunks and citations have no page. "
+                                    f"Re-run the Phase 1 scrape (phase7_scheduled_refresh/refresh.py --sync-index)")
+                chunks = self.create_chunks(text)
+                self.store_chunks(chunks, data)
+            self.sources[data.get('source_url', '')] = content_hash(text)
             logging.info(f"Processed {len(chunks)} chunks from {filepath}")
             
         except Exception as e:
@@ -65,28 +152,11 @@ class Phase2VectorStore:
         """
         Split text into chunks.
         """
-        words = text.split()
-        
-        # If text is short, return as one chunk
-        if len(words) <= max_tokens:
-            return [text]
-            
-        chunks = []
-        i = 0
-        step = max_tokens - overlap
-        if step <= 0:
-            step = 1
-            
-        while i < len(words):
-            chunk_words = words[i : i + max_tokens]
-            chunk_text = " ".join(chunk_words)
-            chunks.append(chunk_text)
-            i += step
-            
-        return chunks
+        return chunk_text(text, max_tokens=max_tokens, overlap=overlap)
 
-    def store_chunks(self, chunks: List[str], metadata_source: Dict[str, Any]):
-        """Embed and store chunks in memory."""
+    def store_chunks(self, chunks: List[str], metadata_source: Dict[str, Any],
+                     metadatas: Optional[List[Dict[str, Any]]] = None):
+        """Embed and store chunks in memory (metadatas: per-chunk metadata, e.g. with pages)."""
         if not chunks:
             return
 
@@ -94,16 +164,9 @@ class Phase2VectorStore:
         new_ids = [str(uuid.uuid4()) for _ in chunks]
         
         # Prepare Metadata
-        new_metadatas = []
-        for _ in chunks:
-            meta = {
-                "scheme": metadata_source.get('scheme', 'UNKNOWN'),
-                "category": metadata_source.get('category', 'UNKNOWN'),
-                "source_url": metadata_source.get('source_url', ''),
-                "source_type": metadata_source.get('source_type', ''),
-                "source_file": metadata_source.get('source_file', '')
-            }
-            new_metadatas.append(meta)
+        new_metadatas = metadatas or [chunk_metadata(metadata_source) for _ in chunks]
+        for meta in new_metadatas:
+            meta['citation_id'] = self.citations.add(meta)
 
 
 
@@ -133,8 +196,22 @@ class Phase2VectorStore:
             json.dump(data, f, indent=2)
             
         np.save(npy_path, self.embeddings)
+        self.citations.save(self.embeddings_dir)
         logging.info(f"Saved vector store to {self.embeddings_dir}")
 
+        if self.compression:
+            self.save_compressed()
+
+    def save_compressed(self):
+        """Save a compressed copy of the embeddings for the retriever's first pass."""
+        codec = build_codec(self.compression, self.embeddings)
+        codec.save(compressed_embeddings_path(self.embeddings_dir, self.compression))
+
+    def save_fact_table(self):
+        """Extract structured per-scheme facts for the exact-answer fast path."""
+        supplementary_dir = os.path.join(os.path.dirname(self.cleaned_dir), "supplementary_data")
+        build_fact_table(self.cleaned_dir, supplementary_dir, self.embeddings_dir)
+
     def save_to_sql(self):
         """Save embeddings and metadata to a SQLite database."""
         db_path = os.path.join(self.embeddings_dir, "embeddings.db")
@@ -151,9 +228,26 @@ class Phase2VectorStore:
                 category TEXT,
                 source_url TEXT,
                 source_type TEXT,
-                source_file TEXT
+                source_file TEXT,
+                citation_id INTEGER,
+                page INTEGER
             )
         ''')
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS citations (
+                id INTEGER PRIMARY KEY,
+                display_name TEXT,
+                url TEXT,
+                document_type TEXT,
+                scheme TEXT,
+                page INTEGER
+            )
+        ''')
+        cursor.executemany(
+            'INSERT OR REPLACE INTO citations (id, display_name, url, document_type, scheme, page) VALUES (?, ?, ?, ?, ?, ?)',
+            [(i, record['display_name'], record['url'], record['document_type'], record['scheme'], record['page'])
+             for i, record in enumerate(self.citations.records)]
+        )
         
         # Insert data
         for i, doc_id in enumerate(self.ids):
@@ -162,8 +256,8 @@ class Phase2VectorStore:
             
             cursor.execute('''
                 INSERT OR REPLACE INTO embeddings (
-                    id, text_chunk, embedding_blob, scheme, category, source_url, source_type, source_file
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    id, text_chunk, embedding_blob, scheme, category, source_url, source_type, source_file, citation_id, page
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
                 doc_id,
                 self.documents[i],
@@ -172,7 +266,9 @@ class Phase2VectorStore:
                 meta.get('category'),
                 meta.get('source_url'),
                 meta.get('source_type'),
-                meta.get('source_file')
+                meta.get('source_file'),
+                meta.get('citation_id'),
+                meta.get('page')
             ))
             
         conn.commit()
@@ -180,10 +276,17 @@ class Phase2VectorStore:
         logging.info(f"Saved SQL database to {db_path} with {len(self.ids)} records.")
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the Phase 2 vector store")
+    parser.add_argument("--compression", choices=["float16", "int8", "pq"], default=None,
+                        help="Also write a compressed copy of the embeddings")
+    args = parser.parse_args()
+
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     PROJECT_ROOT = os.path.dirname(BASE_DIR)
     CLEANED_DIR = os.path.join(PROJECT_ROOT, "phase1_data_collection", "cleaned")
     EMBEDDINGS_DIR = BASE_DIR
     
-    vector_store = Phase2VectorStore(CLEANED_DIR, EMBEDDINGS_DIR)
+    vector_store = Phase2VectorStore(CLEANED_DIR, EMBEDDINGS_DIR, compression=args.compression)
     vector_store.process_all_files()
@@ -0,0 +1,199 @@
+"""
+Single-process embedding service for multi-worker deployments.
+
+One process loads the SentenceTransformer and serves encode requests over a
+local socket (a Unix socket path, or tcp://host:port where Unix sockets are
+unavailable). Web workers use RemoteEncoder in place of the model, so the
+model weights live in memory once instead of once per worker.
+
+Usage:
+    python phase3_retrieval/embedding_service.py --address /tmp/mf_embeddings.sock
+    MF_EMBEDDING_SERVICE=/tmp/mf_embeddings.sock uvicorn phase5_chat_interface.backend.main:app --workers 4
+"""
+import os
+import sys
+import json
+import socket
+import struct
+import logging
+import argparse
+import threading
+import socketserver
+import numpy as np
+from typing import List, Tuple, Any, Union
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+DEFAULT_ADDRESS = "/tmp/mf_embeddings.sock"
+
+# Frames are a 4-byte big-endian length followed by the payload
+FRAME_HEADER = struct.Struct('!I')
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """'tcp://host:port' -> (AF_INET, (host, port)); anything else is a Unix socket path."""
+    if address.startswith("tcp://"):
+        host, port = address[len("tcp://"):].rsplit(":", 1)
+        return socket.AF_INET, (host, int(port))
+    return socket.AF_UNIX, address
+
+
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    buffer = bytearray()
+    while len(buffer) < size:
+        part = sock.recv(size - len(buffer))
+        if not part:
+            raise ConnectionError("Embedding service connection closed")
+        buffer.extend(part)
+    return bytes(buffer)
+
+
+def recv_frame(sock: socket.socket) -> bytes:
+    (size,) = FRAME_HEADER.unpack(_recv_exact(sock, FRAME_HEADER.size))
+    return _recv_exact(sock, size)
+
+
+class EmbeddingService:
+    """
+    Serves model.encode over a socket. Request: a JSON frame
+    {'texts': [...], 'batch_size': n}. Response: a JSON frame {'shape': [n, dim]}
+    (or {'error': str}) followed by the float32 rows as raw bytes.
+    Encoding is serialized: one model, one batch at a time.
+    """
+
+    def __init__(self, model, address: str = DEFAULT_ADDRESS):
+        self.model = model
+        self.address = address
+        self._lock = threading.Lock()
+        self.server = None
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        with self._lock:
+            return np.asarray(self.model.encode(texts, batch_size=batch_size), dtype=np.float32)
+
+    def _handler(self):
+        service = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                # One connection carries many requests (RemoteEncoder keeps it open)
+                while True:
+                    try:
+                        request = json.loads(recv_frame(self.request))
+                    except (ConnectionError, OSError):
+                        return
+                    try:
+                        embeddings = service.encode(request['texts'], request.get('batch_size', 32))
+                    except Exception as e:
+                        logging.error(f"Encoding failed: {e}")
+                        send_frame(self.request, json.dumps({'error': f"{type(e).__name__}: {e}"}).encode('utf-8'))
+                        continue
+                    send_frame(self.request, json.dumps({'shape': list(embeddings.shape)}).encode('utf-8'))
+                    send_frame(self.request, embeddings.tobytes())
+
+        return Handler
+
+    def start(self):
+        """Bind and serve on a background thread; returns once the socket accepts connections."""
+        family, address = parse_address(self.address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(address):
+                os.unlink(address)  # stale socket from a previous run
+            server_class = socketserver.ThreadingUnixStreamServer
+        else:
+            server_class = socketserver.ThreadingTCPServer
+            server_class.allow_reuse_address = True
+        server_class.daemon_threads = True
+        self.server = server_class(address, self._handler())
+        threading.Thread(target=self.server.serve_forever, daemon=True, name="embedding-service").start()
+        logging.info(f"Embedding service listening on {self.address}")
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            family, address = parse_address(self.address)
+            if family == socket.AF_UNIX and os.path.exists(address):
+                os.unlink(address)
+            self.server = None
+
+
+class RemoteEncoder:
+    """
+    Stand-in for SentenceTransformer in worker processes: encode() has the
+    same call shape and returns numpy arrays (1-D for a single string).
+    Each thread keeps its own connection; a broken one is reopened once.
+    """
+
+    def __init__(self, address: str = DEFAULT_ADDRESS, timeout: float = 30.0):
+        self.address = address
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connect(self) -> socket.socket:
+        family, address = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(address)
+        return sock
+
+    def _request(self, texts: List[str], batch_size: int) -> np.ndarray:
+        sock = getattr(self._local, 'sock', None) or self._connect()
+        self._local.sock = sock
+        send_frame(sock, json.dumps({'texts': texts, 'batch_size': batch_size}).encode('utf-8'))
+        header = json.loads(recv_frame(sock))
+        if 'error' in header:
+            raise RuntimeError(f"Embedding service error: {header['error']}")
+        return np.frombuffer(recv_frame(sock), dtype=np.float32).reshape(header['shape'])
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32, **kwargs) -> np.ndarray:
+        # convert_to_tensor and friends are accepted for compatibility; results are always numpy
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        try:
+            embeddings = self._request(texts, batch_size)
+        except (ConnectionError, OSError):
+            self.close()
+            embeddings = self._request(texts, batch_size)
+        return embeddings[0] if single else embeddings
+
+    def close(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve sentence embeddings to local worker processes")
+    parser.add_argument("--address", default=os.getenv("MF_EMBEDDING_SERVICE", DEFAULT_ADDRESS),
+                        help="Unix socket path or tcp://host:port")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    service = EmbeddingService(SentenceTransformer(args.model), args.address)
+    service.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
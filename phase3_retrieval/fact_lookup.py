@@ -0,0 +1,144 @@
+import os
+import re
+import sys
+import logging
+from typing import List, Dict, Any, Optional
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from phase2_vector_db.fact_table import FactTable, fact_table_path, resolve_schemes
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class FactLookup:
+    """
+    Exact-answer fast path for single-scheme fact questions.
+    Answers from the structured fact table without embedding, search or an LLM
+    call; returns None whenever the question is not a clean table lookup so the
+    caller falls back to RAG.
+    """
+
+    def __init__(self, embeddings_dir: str = None, table: FactTable = None):
+        self.table = table
+        if self.table is None and embeddings_dir:
+            path = fact_table_path(embeddings_dir)
+            if os.path.exists(path):
+                self.table = FactTable.load(path)
+                logging.info(f"Loaded {len(self.table)} facts from {path}")
+            else:
+                logging.warning(f"Fact table not found at {path}. Fact fast path disabled.")
+
+        # Question phrasings per field
+        self.field_patterns = {
+            'expense_ratio': re.compile(r'\b(expense ratio|ter|total expense)\b'),
+            'exit_load': re.compile(r'\bexit load\b'),
+            'min_sip': re.compile(r'\b(min(imum)? sip|sip amount|min(imum)? sip (amount|investment))\b'),
+            'lock_in': re.compile(r'\block[\s-]?in\b'),
+            'benchmark': re.compile(r'\bbenchmark\b'),
+            'riskometer': re.compile(r'\b(riskometer|risk[\s-]?o[\s-]?meter|risk level|risk rating)\b'),
+            'aum': re.compile(r'\b(aum|assets under management|fund size)\b'),
+            'fund_manager': re.compile(r'\b(fund managers?|who manages|managed by)\b'),
+            'inception_date': re.compile(r'\b(inception date|launch date|date of allotment|when was .* launched)\b'),
+        }
+
+        # Questions that need more than a stored value (history, why/how, comparisons)
+        self.fallback_pattern = re.compile(r'\b(why|how is|how are|calculated|history|changed|compare|vs|versus|than)\b')
+
+        self.templates = {
+            'expense_ratio': "The expense ratio of {scheme_name} is {value[regular]} for the Regular Plan "
+                             "and {value[direct]} for the Direct Plan.",
+            'exit_load': "Exit load for {scheme_name}: {value}",
+            'min_sip': "The minimum SIP amount for {scheme_name} is {value}.",
+            'lock_in': "{scheme_name} has no lock-in period.",
+            'benchmark': "The benchmark of {scheme_name} is the {value}.",
+            'riskometer': "The riskometer rating of {scheme_name} is {value[level]} "
+                          "(Level {value[position]}).",
+            'aum': "The AUM of {scheme_name} is {value}.",
+            'fund_manager': "{scheme_name} is managed by {value}.",
+            'inception_date': "The inception date of {scheme_name} is {value}.",
+        }
+
+    def match_fields(self, query: str) -> List[str]:
+        query_lower = query.lower()
+        return [field for field, pattern in self.field_patterns.items() if pattern.search(query_lower)]
+
+    def lookup(self, query: str) -> Optional[Dict[str, Any]]:
+        """
+        Answer a question from the fact table.
+
+        Returns:
+            {
+                'answer': str,
+                'sources': list of source URLs,
+                'citations': list of (source URL, page number or None), one per cited page,
+                'facts': list of fact records used
+            }
+            or None if the question should go through RAG.
+        """
+        if not self.table or not query:
+            return None
+
+        query_lower = query.lower()
+        if self.fallback_pattern.search(query_lower):
+            return None
+
+        schemes = resolve_schemes(query_lower)
+        fields = self.match_fields(query_lower)
+        if len(schemes) != 1 or not fields:
+            return None
+
+        facts = [self.table.get(schemes[0], field) for field in fields]
+        if any(fact is None for fact in facts):
+            # Partial coverage would give a half answer, let RAG handle it
+            return None
+
+        sentences = [self._format(fact) for fact in facts]
+        as_of = sorted({fact['as_of'] for fact in facts if fact.get('as_of')})
+        answer = " ".join(sentences)
+        if as_of:
+            answer += f" Data as of {', '.join(as_of)}."
+        answer += " 📘"
+
+        sources, citations = [], []
+        for fact in facts:
+            if not fact.get('source_url'):
+                continue
+            if fact['source_url'] not in sources:
+                sources.append(fact['source_url'])
+            # Facts read from a PDF table cite the page they are on
+            citation = (fact['source_url'], fact.get('page'))
+            if citation not in citations:
+                citations.append(citation)
+
+        return {'answer': answer, 'sources': sources, 'citations': citations, 'facts': facts}
+
+    def _format(self, fact: Dict[str, Any]) -> str:
+        field = fact['field']
+        if field == 'lock_in' and fact['value'] != 'NA':
+            return f"The lock-in period for {fact['scheme_name']} is {fact['value']}."
+        sentence = self.templates[field].format(scheme_name=fact['scheme_name'], value=fact['value'])
+        # Table values keep their own full stop ("INR 92,641.55 Cr.")
+        return sentence[:-1] if sentence.endswith('..') else sentence
+
+
+if __name__ == "__main__":
+    EMBEDDINGS_DIR = os.path.join(PROJECT_ROOT, "phase2_vector_db")
+    fact_lookup = FactLookup(EMBEDDINGS_DIR)
+
+    test_queries = [
+        "What is the expense ratio of HDFC Midcap Fund?",
+        "Is there any exit load for HDFC Large Cap Fund?",
+        "What is the minimum SIP investment required for HDFC Flexi Cap Fund?",
+        "What is the risk level and benchmark of HDFC Small Cap Fund?",
+        "How can I download my capital gains statement?",
+    ]
+
+    for query in test_queries:
+        result = fact_lookup.lookup(query)
+        print(f"\nQuery: {query}")
+        print(f"Answer: {result['answer'] if result else 'FALLBACK TO RAG'}")
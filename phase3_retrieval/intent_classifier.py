@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+import logging
+import sys
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from utils import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+ADVISORY_EXEMPLARS = [
+    "Should I invest in this fund?",
+    "Which fund should I buy?",
+    "Is this fund good for me?",
+    "Can you recommend a mutual fund?",
+    "Which is the best fund to invest in right now?",
+    "Is it a good time to invest in small cap funds?",
+    "Should I sell my mutual fund units?",
+    "Should I switch to another fund?",
+    "Will this fund give good returns next year?",
+    "Which fund will give the highest returns?",
+    "Is this fund better than that one?",
+    "How should I allocate my money across funds?",
+    "Is this fund suitable for my retirement?",
+    "Is this fund worth investing in?",
+    "Will this fund make me rich?",
+    "Should I stop my SIP?",
+    "Is it safe to put all my savings in this fund?",
+    "Which fund is right for a beginner like me?",
+    "Do you think the market will go up?",
+    "What should I do with my investments?",
+]
+
+FACTUAL_EXEMPLARS = [
+    "What is the expense ratio of the fund?",
+    "What is the exit load?",
+    "What is the minimum SIP amount?",
+    "What is the lock-in period for ELSS funds?",
+    "What is the riskometer rating of the fund?",
+    "What is the benchmark index of the scheme?",
+    "Who is the fund manager?",
+    "What is the investment objective of the scheme?",
+    "What is the AUM of the fund?",
+    "How is NAV calculated?",
+    "How can I download my capital gains statement?",
+    "Can I invest through SIP and lump sum?",
+    "Can I redeem my units online?",
+    "What are the top holdings of the fund?",
+    "What is a flexi cap fund?",
+    "What are the different types of mutual fund schemes?",
+    "What are the risks associated with mutual funds?",
+    "What plans and options does the scheme offer?",
+    "When was the fund launched?",
+    "What is the portfolio turnover ratio?",
+]
+
+
+class EmbeddingIntentClassifier:
+    """
+    Scores a query embedding against advisory and factual exemplar banks.
+    Reuses the embedding computed for retrieval, so classification is one
+    small matrix-vector product. Exemplar embeddings are cached on disk and
+    only re-encoded when the exemplars or the model change.
+    """
+
+    def __init__(self, model, cache_dir: str, method: str = 'centroid', margin: float = 0.05,
+                 model_name: str = 'all-MiniLM-L6-v2',
+                 advisory_exemplars: List[str] = None, factual_exemplars: List[str] = None):
+        if method not in ('centroid', 'nearest'):
+            raise ValueError(f"Unknown method '{method}'. Use 'centroid' or 'nearest'.")
+
+        self.model = model
+        self.method = method
+        self.margin = margin  # advisory score must beat factual score by this much
+        self.model_name = model_name
+        self.advisory_exemplars = advisory_exemplars or ADVISORY_EXEMPLARS
+        self.factual_exemplars = factual_exemplars or FACTUAL_EXEMPLARS
+        self.cache_path = os.path.join(cache_dir, "intent_banks.npz")
+
+        self.advisory_bank, self.factual_bank = self._load_or_build_banks()
+        self.centroids = np.stack([self._normalize(self.advisory_bank.mean(axis=0)),
+                                   self._normalize(self.factual_bank.mean(axis=0))])
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def _fingerprint(self) -> str:
+        payload = json.dumps([self.model_name, self.advisory_exemplars, self.factual_exemplars])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _load_or_build_banks(self):
+        fingerprint = self._fingerprint()
+        if os.path.exists(self.cache_path):
+            with np.load(self.cache_path) as data:
+                if str(data['fingerprint']) == fingerprint:
+                    metrics.record_cache('intent_banks', True)
+                    return data['advisory'], data['factual']
+            logging.info("Intent exemplars changed, rebuilding cached banks")
+        metrics.record_cache('intent_banks', False)
+
+        advisory = self._normalize(np.asarray(self.model.encode(self.advisory_exemplars), dtype=np.float32))
+        factual = self._normalize(np.asarray(self.model.encode(self.factual_exemplars), dtype=np.float32))
+        try:
+            np.savez(self.cache_path, fingerprint=np.array(fingerprint), advisory=advisory, factual=factual)
+            logging.info(f"Saved intent exemplar banks to {self.cache_path}")
+        except OSError as e:
+            # Read-only deployments still work, they just re-encode on start-up
+            logging.warning(f"Could not cache intent banks: {e}")
+        return advisory, factual
+
+    def score(self, query_embedding: np.ndarray) -> Dict[str, float]:
+        """Similarity of the query to the advisory and factual banks."""
+        query = self._normalize(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+        if self.method == 'centroid':
+            advisory, factual = self.centroids @ query
+        else:
+            advisory = (self.advisory_bank @ query).max()
+            factual = (self.factual_bank @ query).max()
+        return {'advisory': float(advisory), 'factual': float(factual)}
+
+    def classify(self, query_embedding: np.ndarray) -> Dict[str, Any]:
+        """
+        Returns the same shape as QueryClassifier.classify:
+        {'type', 'confidence', 'reason', 'rule'}
+        """
+        scores = self.score(query_embedding)
+        delta = scores['advisory'] - scores['factual']
+        is_advisory = delta > self.margin
+        return {
+            'type': 'advisory' if is_advisory else 'factual',
+            'confidence': round(min(0.9, 0.5 + abs(delta)), 2),
+            'reason': f"Embedding {self.method} scores: advisory {scores['advisory']:.2f}, factual {scores['factual']:.2f}",
+            'rule': f"embedding_{self.method}"
+        }
@@ -1,5 +1,5 @@
 import re
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 
 class QueryClassifier:
@@ -7,9 +7,16 @@ class QueryClassifier:
     Classifies user queries as 'advisory' or 'factual'.
     Advisory queries are investment advice/recommendations.
     Factual queries are information requests about fund details.
+    
+    With an optional intent_classifier (see intent_classifier.py) the regexes
+    act as a fast pre-filter: strong advisory patterns and operational queries
+    are decided immediately, everything else is decided from the query
+    embedding that retrieval computes anyway.
     """
     
-    def __init__(self):
+    def __init__(self, intent_classifier=None):
+        self.intent_classifier = intent_classifier
+        
         # Advisory patterns - trigger refusal
         self.advisory_patterns = [
             r'\b(should i|shall i|can i|would you recommend)\b',
@@ -41,56 +48,146 @@ class QueryClassifier:
             'capital gains', 'dividend', 'returns', 'performance'
         ]
         
+        # Advisory matches that over-fire on factual questions ("can i redeem
+        # online?", "portfolio holdings"); with an intent classifier they are only hints
+        self.weak_advisory_matches = {'can i', 'portfolio', 'allocation', 'diversif'}
+        
+        # Operational/factual queries that might match advisory patterns
+        self.operational_keywords = [
+            'download', 'access', 'get', 'find', 'where', 'how to', 'how do i',
+            'how can i', 'steps to', 'guide', 'instructions', 'process'
+        ]
+        
         # Compile regex patterns for efficiency
         self.advisory_regex = [re.compile(pattern, re.IGNORECASE) for pattern in self.advisory_patterns]
+        self._compile()
+    
+    def _compile(self):
+        """
+        Build one regex per rule set so classify() scans the query once per set
+        instead of looping over every pattern and keyword in Python.
+        Queries are lowercased before matching, so no IGNORECASE is needed
+        (it makes the combined patterns several times slower).
+        """
+        # Advisory: a single alternation with one named group per pattern. The
+        # shared leading \b is factored out so mid-word positions are rejected
+        # before any alternative is tried.
+        bounded, unbounded = [], []
+        for i, pattern in enumerate(self.advisory_patterns):
+            if pattern.startswith(r'\b'):
+                bounded.append(f'(?P<advisory_{i}>{pattern[2:]})')
+            else:
+                unbounded.append(f'(?P<advisory_{i}>{pattern})')
+        alternatives = []
+        if bounded:
+            alternatives.append(r'\b(?:' + '|'.join(bounded) + ')')
+        alternatives.extend(unbounded)
+        self.advisory_combined = re.compile('|'.join(alternatives))
+        
+        self.operational_combined = re.compile('|'.join(re.escape(k) for k in self.operational_keywords))
+        
+        # Factual: a zero-width lookahead reports a keyword at every position,
+        # including overlapping ones. Keywords are grouped by first character and
+        # tried longest first; shorter keywords that are prefixes of the captured
+        # one matched at the same position too.
+        keywords = sorted(set(self.factual_keywords), key=len, reverse=True)
+        by_first_char = {}
+        for keyword in keywords:
+            by_first_char.setdefault(keyword[0], []).append(keyword)
+        groups = [
+            re.escape(first) + '(?:' + '|'.join(re.escape(k[1:]) for k in group) + ')'
+            for first, group in by_first_char.items()
+        ]
+        self.factual_combined = re.compile('(?=(' + '|'.join(groups) + '))')
+        self.factual_prefixes = {
+            keyword: [other for other in keywords if other != keyword and keyword.startswith(other)]
+            for keyword in keywords
+        }
     
-    def classify(self, query: str) -> Dict[str, Any]:
+    def _first_advisory_pattern(self, query_lower: str) -> Optional[int]:
+        """
+        Index of the first advisory pattern (in list order) found in the query.
+        The combined regex finds the leftmost match; only patterns listed before
+        it can take priority, and those are checked only when the query already
+        looks advisory.
+        """
+        match = self.advisory_combined.search(query_lower)
+        if not match:
+            return None
+        found = int(match.lastgroup.rsplit('_', 1)[1])
+        for i in range(found):
+            if self.advisory_regex[i].search(query_lower):
+                return i
+        return found
+    
+    def classify(self, query: str, query_embedding=None) -> Dict[str, Any]:
         """
         Classify a query as advisory or factual.
         
         Args:
             query: User's question string
+            query_embedding: Optional embedding of the query. Used by the intent
+                classifier when the regex result is not decisive.
             
         Returns:
             {
                 'type': 'advisory' | 'factual',
                 'confidence': float (0-1),
-                'reason': str (explanation)
+                'reason': str (explanation),
+                'rule': str (rule that decided: 'advisory_<n>', 'operational',
+                         'factual_keywords', 'default' or 'embedding_<method>'),
+                'match': str (advisory results only, the phrase that matched)
             }
         """
+        result = self._classify_rules(query)
+        if query_embedding is not None and self.needs_embedding(result):
+            return self.intent_classifier.classify(query_embedding)
+        return result
+    
+    def needs_embedding(self, result: Dict[str, Any]) -> bool:
+        """
+        True when the regex result should be confirmed by the intent classifier.
+        Strong advisory patterns and operational queries never need the embedding.
+        """
+        if self.intent_classifier is None:
+            return False
+        if result['type'] == 'advisory':
+            return result.get('match') in self.weak_advisory_matches
+        return result['rule'] in ('factual_keywords', 'default')
+    
+    def _classify_rules(self, query: str) -> Dict[str, Any]:
+        """Regex/keyword classification (the fast pre-filter)."""
         query_lower = query.lower().strip()
         
         # Exclude operational/factual queries that might match advisory patterns
-        operational_keywords = [
-            'download', 'access', 'get', 'find', 'where', 'how to', 'how do i',
-            'how can i', 'steps to', 'guide', 'instructions', 'process'
-        ]
-        is_operational = any(keyword in query_lower for keyword in operational_keywords)
+        is_operational = self.operational_combined.search(query_lower) is not None
         
         # Check for advisory patterns
-        advisory_matches = []
-        for pattern in self.advisory_regex:
-            if pattern.search(query_lower):
-                advisory_matches.append(pattern.pattern)
-        
-        if advisory_matches and not is_operational:
-            return {
-                'type': 'advisory',
-                'confidence': 0.9,
-                'reason': f"Detected advisory pattern: {advisory_matches[0]}"
-            }
+        if not is_operational:
+            pattern_index = self._first_advisory_pattern(query_lower)
+            if pattern_index is not None:
+                return {
+                    'type': 'advisory',
+                    'confidence': 0.9,
+                    'reason': f"Detected advisory pattern: {self.advisory_patterns[pattern_index]}",
+                    'rule': f"advisory_{pattern_index}",
+                    'match': self.advisory_regex[pattern_index].search(query_lower).group(0)
+                }
         
         # Check for factual keywords
-        factual_score = 0
-        for keyword in self.factual_keywords:
-            if keyword in query_lower:
-                factual_score += 1
+        matched_keywords = set()
+        for match in self.factual_combined.finditer(query_lower):
+            keyword = match.group(1)
+            matched_keywords.add(keyword)
+            matched_keywords.update(self.factual_prefixes[keyword])
+        factual_score = len(matched_keywords)
         
         if factual_score > 0:
             return {
                 'type': 'factual',
                 'confidence': min(0.9, 0.5 + (factual_score * 0.1)),
-                'reason': f"Contains {factual_score} factual keyword(s)"
+                'reason': f"Contains {factual_score} factual keyword(s)",
+                'rule': 'factual_keywords' if not is_operational else 'operational'
             }
         
         # Default to factual (let RAG handle it)
@@ -98,9 +195,15 @@ class QueryClassifier:
         return {
             'type': 'factual',
             'confidence': 0.5,
-            'reason': "No strong indicators, defaulting to factual"
+            'reason': "No strong indicators, defaulting to factual",
+            'rule': 'default'
         }
     
+    def classify_batch(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """Classify many queries, e.g. when replaying query logs."""
+        classify = self.classify
+        return [classify(query) for query in queries]
+    
     def is_advisory(self, query: str) -> bool:
         """Quick check if query is advisory."""
         return self.classify(query)['type'] == 'advisory'
@@ -138,3 +241,4 @@ if __name__ == "__main__":
         print(f"Type: {result['type'].upper()}")
         print(f"Confidence: {result['confidence']:.2f}")
         print(f"Reason: {result['reason']}")
+        print(f"Rule: {result['rule']}")
@@ -1,29 +1,195 @@
 import os
+import sys
 import json
 import numpy as np
 import logging
-from typing import List, Dict, Any, Tuple
+import threading
+from typing import List, Dict, Any, Tuple, Optional
 from sentence_transformers import SentenceTransformer, util
 
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from phase2_vector_db.quantization import load_codec
+from phase2_vector_db.segments import load_segments, manifest_stamp
+from phase2_vector_db.citations import CitationTable
+from utils import metrics
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Loads of a newly published generation tried before keeping the current view
+RELOAD_ATTEMPTS = 3
+
+def blocked_top_k(query_matrix: np.ndarray, corpus_matrix: np.ndarray, k: int,
+                  mask: Optional[np.ndarray] = None, query_block: int = 256,
+                  corpus_block: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Row-wise top-k of query_matrix @ corpus_matrix.T without materializing
+    the full score matrix: each query block keeps a running top-k that is
+    merged with the top-k of every corpus block. Masked-out rows score -inf.
+    Returns (indices, scores), both (n_queries, k), best first.
+    """
+    n_queries, n_corpus = len(query_matrix), len(corpus_matrix)
+    k = min(k, n_corpus)
+    indices = np.zeros((n_queries, k), dtype=np.int64)
+    scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+    if k == 0:
+        return indices, scores
+
+    for q_start in range(0, n_queries, query_block):
+        block = query_matrix[q_start:q_start + query_block]
+        best_idx = np.zeros((len(block), 0), dtype=np.int64)
+        best_scores = np.zeros((len(block), 0), dtype=np.float32)
+
+        for c_start in range(0, n_corpus, corpus_block):
+            block_scores = block @ corpus_matrix[c_start:c_start + corpus_block].T
+            if mask is not None:
+                block_scores[:, ~mask[c_start:c_start + corpus_block]] = -np.inf
+            candidate_idx = np.concatenate(
+                [best_idx, np.broadcast_to(np.arange(c_start, c_start + block_scores.shape[1]), block_scores.shape)], axis=1)
+            candidate_scores = np.concatenate([best_scores, block_scores], axis=1)
+            keep = np.argpartition(-candidate_scores, k - 1, axis=1)[:, :k]
+            best_idx = np.take_along_axis(candidate_idx, keep, axis=1)
+            best_scores = np.take_along_axis(candidate_scores, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        indices[q_start:q_start + len(block)] = np.take_along_axis(best_idx, order, axis=1)
+        scores[q_start:q_start + len(block)] = np.take_along_axis(best_scores, order, axis=1)
+    return indices, scores
+
+
+class IndexView:
+    """
+    One generation of the searchable index: base rows followed by the rows of
+    every live segment, plus a mask of rows not deleted by a tombstone.
+    A refresh builds a new view and swaps it in whole; each search binds one
+    view, so merges that drop or move segment rows never mix generations.
+
+    The base matrix (memory-mapped when the index is shared between worker
+    processes) and the small matrix of segment rows are kept apart and
+    searched separately, so ingesting never copies the base into private
+    memory. Row indices run over both: base rows first.
+    """
+
+    def __init__(self, ids: List[str], documents: List[str], metadatas: List[Dict[str, Any]], embeddings,
+                 live: Optional[np.ndarray] = None, generation: int = 0,
+                 citations: Optional[CitationTable] = None, segment_embeddings: Optional[np.ndarray] = None):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        # Base rows only; segment rows are in segment_embeddings (None when there are none)
+        self.embeddings = embeddings
+        self.segment_embeddings = segment_embeddings
+        self.n_base = len(embeddings) if embeddings is not None else 0
+        # None when nothing is deleted
+        self.live = live
+        self.generation = generation
+        # Citation id of every row, resolved once per generation
+        self.citations = citations if citations is not None else CitationTable()
+        self.citation_ids = np.fromiter(
+            (metadata['citation_id'] if 'citation_id' in metadata else self.citations.add(metadata)
+             for metadata in metadatas), dtype=np.int64, count=len(metadatas))
+        self._unit = None
+        self._segment_unit = None
+
+    @staticmethod
+    def _unit_rows(rows) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.float32)
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        if np.allclose(norms, 1.0, atol=1e-3):
+            return rows
+        return rows / np.where(norms == 0, 1.0, norms)
+
+    def unit(self) -> np.ndarray:
+        """
+        Row-normalized float32 base matrix, computed once (cosine = dot product).
+        Phase 2 already stores unit rows; those are used as-is (no copy of a mapped index).
+        """
+        if self._unit is None:
+            self._unit = self._unit_rows(self.embeddings)
+        return self._unit
+
+    def segment_unit(self) -> Optional[np.ndarray]:
+        if self._segment_unit is None and self.segment_embeddings is not None:
+            self._segment_unit = self._unit_rows(self.segment_embeddings)
+        return self._segment_unit
+
+    def rows(self, indices: np.ndarray) -> np.ndarray:
+        """float32 rows by view index, from the base or the segment matrix."""
+        in_base = indices < self.n_base
+        if in_base.all():
+            return np.asarray(self.embeddings[indices], dtype=np.float32)
+        rows = np.empty((len(indices), self.segment_embeddings.shape[1]), dtype=np.float32)
+        rows[in_base] = self.embeddings[indices[in_base]]
+        rows[~in_base] = self.segment_embeddings[indices[~in_base] - self.n_base]
+        return rows
+
+    def top_k(self, query_matrix: np.ndarray, k: int, mask: Optional[np.ndarray] = None,
+              query_block: int = 256, corpus_block: int = 65536) -> Tuple[np.ndarray, np.ndarray]:
+        """blocked_top_k over the base and the segment rows, merged; indices are view indices."""
+        base_mask = mask[:self.n_base] if mask is not None else None
+        top, scores = blocked_top_k(query_matrix, self.unit(), k, base_mask,
+                                    query_block=query_block, corpus_block=corpus_block)
+        segment_unit = self.segment_unit()
+        if segment_unit is None:
+            return top, scores
+        segment_mask = mask[self.n_base:] if mask is not None else None
+        segment_top, segment_scores = blocked_top_k(query_matrix, segment_unit, k, segment_mask,
+                                                    query_block=query_block, corpus_block=corpus_block)
+        top = np.concatenate([top, segment_top + self.n_base], axis=1)
+        scores = np.concatenate([scores, segment_scores], axis=1)
+        order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(scores, order, axis=1)
+
+    def mask(self, mask: Optional[np.ndarray]) -> Optional[np.ndarray]:
+        """Combine a filter mask with the live-row mask."""
+        if self.live is None:
+            return mask
+        return self.live if mask is None else mask & self.live
+
+    def result(self, idx: int, score: float) -> Dict[str, Any]:
+        return {
+            'id': self.ids[idx],
+            'text': self.documents[idx],
+            'metadata': self.metadatas[idx],
+            'score': float(score),
+            'citation_id': int(self.citation_ids[idx])
+        }
+
+
 class RetrievalSystem:
-    def __init__(self, embeddings_dir: str):
+    def __init__(self, embeddings_dir: str, compression: Optional[str] = None, rescore_k: int = 50,
+                 encoder=None, mmap_index: bool = False):
         self.embeddings_dir = embeddings_dir
         self.vector_store_path = os.path.join(embeddings_dir, "vector_store.json")
         self.embeddings_path = os.path.join(embeddings_dir, "embeddings.npy")
         
-        self.documents = []
-        self.metadatas = []
-        self.embeddings = None
-        self.ids = []
+        # With compression set, search runs on the compressed codes and only
+        # the top `rescore_k` candidates are rescored against float32 rows.
+        self.compression = compression
+        self.rescore_k = rescore_k
+        self.codec = None
+        
+        # mmap_index maps embeddings.npy read-only instead of copying it, so
+        # every worker process shares the same page-cache pages
+        self.mmap_index = mmap_index
+        
+        # Base rows from vector_store.json/embeddings.npy; ingested segments are appended
+        # after them and picked up by refresh() when the segment manifest changes
+        self._base = None
+        self._view = IndexView([], [], [], None)
+        self._manifest_stamp = None
+        self._reload_lock = threading.Lock()
         
         self._load_artifacts()
         
         # Initialize Embedding Model (same as Phase 2)
         # We use CPU by default for stability, can be configured for cuda if needed
-        self.model = SentenceTransformer('all-MiniLM-L6-v2')
+        # An encoder (e.g. embedding_service.RemoteEncoder) replaces the local model
+        self.model = encoder if encoder is not None else SentenceTransformer('all-MiniLM-L6-v2')
 
     def _load_artifacts(self):
         """Load the persisted vector store and embeddings."""
@@ -34,33 +200,199 @@ class RetrievalSystem:
             
             with open(self.vector_store_path, 'r', encoding='utf-8') as f:
                 data = json.load(f)
-                self.documents = data.get('documents', [])
-                self.metadatas = data.get('metadatas', [])
-                self.ids = data.get('ids', [])
+                documents = data.get('documents', [])
+                metadatas = data.get('metadatas', [])
+                ids = data.get('ids', [])
             
             # Load embeddings
             if not os.path.exists(self.embeddings_path):
                 raise FileNotFoundError(f"Embeddings not found at {self.embeddings_path}")
             
-            self.embeddings = np.load(self.embeddings_path)
+            if self.compression:
+                self.codec = load_codec(self.embeddings_dir, self.compression)
+                if self.codec is None:
+                    raise FileNotFoundError(
+                        f"Compressed embeddings '{self.compression}' not found in {self.embeddings_dir}. "
+                        f"Rebuild Phase 2 with --compression {self.compression}"
+                    )
+                # Full-precision rows are only read for the rescoring shortlist
+                embeddings = np.load(self.embeddings_path, mmap_mode='r')
+            elif self.mmap_index:
+                embeddings = np.load(self.embeddings_path, mmap_mode='r')
+            else:
+                embeddings = np.load(self.embeddings_path)
             
+            self._base = (ids, documents, metadatas, embeddings)
+            self._load_segments()
             logging.info(f"Loaded {len(self.ids)} chunks from {self.embeddings_dir}")
             
         except Exception as e:
             logging.error(f"Error loading artifacts: {e}")
             raise
 
-    def retrieve(self, query: str, k: int = 5, rerank: bool = False) -> List[Dict[str, Any]]:
+    @property
+    def ids(self) -> List[str]:
+        return self._view.ids
+
+    @property
+    def documents(self) -> List[str]:
+        return self._view.documents
+
+    @property
+    def metadatas(self) -> List[Dict[str, Any]]:
+        return self._view.metadatas
+
+    @property
+    def embeddings(self):
+        return self._view.embeddings
+
+    @property
+    def index_generation(self) -> int:
+        return self._view.generation
+
+    @property
+    def citations(self) -> CitationTable:
+        return self._view.citations
+
+    def _load_segments(self):
+        """Build a view of the base rows plus every live segment, minus tombstoned rows."""
+        stamp = manifest_stamp(self.embeddings_dir)
+        segments = load_segments(self.embeddings_dir)
+        ids, documents, metadatas, embeddings = self._base
+        if segments['embeddings'] is not None:
+            ids = ids + segments['ids']
+            documents = documents + segments['documents']
+            metadatas = metadatas + segments['metadatas']
+            # Segment rows stay a separate matrix: the (mapped) base is never copied
+            logging.info(f"Index generation {segments['generation']}: {len(segments['ids'])} segment chunks")
+        live = None
+        if segments['tombstones']:
+            deleted = set(segments['tombstones'])
+            live = np.fromiter((chunk_id not in deleted for chunk_id in ids), dtype=bool, count=len(ids))
+            if live.all():
+                live = None
+
+        # Chunks indexed before citations existed get ids in memory, after the persisted ones
+        view = IndexView(ids, documents, metadatas, embeddings, live, segments['generation'],
+                         CitationTable.load(self.embeddings_dir), segments['embeddings'])
+        if self._view._unit is not None:
+            # keep the normalization off the first query of the new generation
+            view.unit()
+            view.segment_unit()
+        self._view = view
+        self._manifest_stamp = stamp
+
+    def refresh(self) -> bool:
+        """
+        Pick up segments published since the last load; a stat() when nothing
+        changed. Readers take no lock, so a merge in another process can
+        delete a segment between our manifest read and its file: the load is
+        retried against the newer manifest, and the current view is kept if
+        it still fails (the next query tries again).
+        """
+        if manifest_stamp(self.embeddings_dir) == self._manifest_stamp:
+            return False
+        with self._reload_lock:
+            for attempt in range(RELOAD_ATTEMPTS):
+                if manifest_stamp(self.embeddings_dir) == self._manifest_stamp:
+                    return False
+                try:
+                    self._load_segments()
+                    return True
+                except FileNotFoundError as e:
+                    logging.warning(f"Segment removed while loading (attempt {attempt + 1}): {e}")
+        return False
+
+    def encode_query(self, query: str) -> np.ndarray:
+        """Embed a query once so it can be shared by classification and search."""
+        with metrics.span('encode'):
+            return np.asarray(self.model.encode(query), dtype=np.float32)
+
+    def encode_queries(self, queries: List[str], batch_size: int = 64) -> np.ndarray:
+        """Embed many queries in batches; one (n, dim) float32 matrix."""
+        with metrics.span('encode'):
+            return np.asarray(self.model.encode(queries, batch_size=batch_size), dtype=np.float32)
+
+    def retrieve_batch(self, queries: List[str], k: int = 5, filters: Optional[Dict[str, Any]] = None,
+                       query_embeddings: Optional[np.ndarray] = None,
+                       query_block: int = 256, corpus_block: int = 65536) -> List[List[Dict[str, Any]]]:
+        """
+        Top-k chunks for many queries at once. Queries are encoded in one
+        batched call and scored with matrix multiplies over query x corpus
+        blocks, so memory stays bounded at query_block x corpus_block scores.
+
+        filters restricts the corpus by metadata, e.g. {'scheme': 'HDFC Mid Cap Fund'}
+        or {'source_type': ['AMFI', 'SEBI']} (a list means any of).
+        Returns one result list per query, same format as retrieve(); a query
+        gets fewer than k results when the filters leave fewer chunks.
+        """
+        if not queries:
+            return []
+        self.refresh()
+        view = self._view
+        if query_embeddings is None:
+            query_embeddings = self.encode_queries(queries)
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        norms = np.linalg.norm(query_embeddings, axis=1, keepdims=True)
+        query_embeddings = query_embeddings / np.where(norms == 0, 1.0, norms)
+        # Tombstoned rows are masked out in the same pass as the filters
+        mask = view.mask(self.filter_mask(filters, view))
+
+        with metrics.span('search'):
+            if self.codec is not None:
+                return [self._search_compressed(embedding, k, mask, view) for embedding in query_embeddings]
+            top, top_scores = view.top_k(query_embeddings, k, mask,
+                                         query_block=query_block, corpus_block=corpus_block)
+
+        return [
+            [view.result(idx, score) for idx, score in zip(row, row_scores) if np.isfinite(score)]
+            for row, row_scores in zip(top, top_scores)
+        ]
+
+    def filter_mask(self, filters: Optional[Dict[str, Any]],
+                    view: Optional[IndexView] = None) -> Optional[np.ndarray]:
+        """Boolean mask over the corpus for metadata filters (None = no filtering)."""
+        if not filters:
+            return None
+        metadatas = (view or self._view).metadatas
+        mask = np.ones(len(metadatas), dtype=bool)
+        for field, allowed in filters.items():
+            allowed = set(allowed) if isinstance(allowed, (list, tuple, set)) else {allowed}
+            mask &= np.fromiter((metadata.get(field) in allowed for metadata in metadatas),
+                                dtype=bool, count=len(metadatas))
+        return mask
+
+    def _unit_embeddings(self) -> np.ndarray:
+        """Row-normalized base matrix of the current view (segment rows: view.segment_unit())."""
+        return self._view.unit()
+
+    def retrieve(self, query: str, k: int = 5, rerank: bool = False,
+                 query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
         """
         Embed query, calculate similarity, and return top-k chunks.
         Optionally rerank results (placeholder for now).
-        Returns: List of dicts with keys: 'text', 'metadata', 'score', 'id'
+        Pass query_embedding (from encode_query) to skip re-encoding the query.
+        Returns: List of dicts with keys: 'text', 'metadata', 'score', 'id', 'citation_id'
         """
         if not query:
             return []
+        self.refresh()
+
+        if self.codec is not None:
+            return self._retrieve_compressed(query, k, query_embedding)
+
+        view = self._view
+        if self.mmap_index or view.live is not None or view.segment_embeddings is not None:
+            # Numpy search reads the mapped rows in place; semantic_search would copy them into a tensor.
+            # It also applies the tombstone mask and searches segment rows.
+            if query_embedding is None:
+                query_embedding = self.encode_query(query)
+            return self.retrieve_batch([query], k=k, query_embeddings=np.asarray(query_embedding).reshape(1, -1))[0]
 
         # Step 1: Query Embedding
-        query_embedding = self.model.encode(query, convert_to_tensor=True)
+        if query_embedding is None:
+            with metrics.span('encode'):
+                query_embedding = self.model.encode(query, convert_to_tensor=True)
         
         # Step 2: Similarity Search
         # util.cos_sim returns a tensor of shape (1, num_docs)
@@ -68,29 +400,62 @@ class RetrievalSystem:
         # util.cos_sim works with tensors or ndarrays.
         
         # Ensure corpus_embeddings is a tensor or friendly format
-        corpus_embeddings = self.embeddings
+        corpus_embeddings = view.embeddings
         
         # Compute cosine similarities
-        hits = util.semantic_search(query_embedding, corpus_embeddings, top_k=k)
+        with metrics.span('search'):
+            hits = util.semantic_search(query_embedding, corpus_embeddings, top_k=k)
         
         # hits is a list of lists (one list per query). We have 1 query.
         query_hits = hits[0]
         
         results = []
         for hit in query_hits:
-            idx = hit['corpus_id']
-            score = hit['score']
-            
-            result = {
-                'id': self.ids[idx],
-                'text': self.documents[idx],
-                'metadata': self.metadatas[idx],
-                'score': float(score)  # Convert numpy/tensor float to native float
-            }
-            results.append(result)
+            # score converted from numpy/tensor float to native float
+            results.append(view.result(hit['corpus_id'], hit['score']))
             
         return results
 
+    def _retrieve_compressed(self, query: str, k: int,
+                             query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        """
+        Two-stage search: approximate scores from the compressed codes select a
+        shortlist, which is then rescored with exact float32 cosine similarity.
+        """
+        if query_embedding is None:
+            query_embedding = self.encode_query(query)
+        view = self._view
+        with metrics.span('search'):
+            return self._search_compressed(np.asarray(query_embedding, dtype=np.float32), k, view.mask(None), view)
+
+    def _search_compressed(self, query_embedding: np.ndarray, k: int,
+                           mask: Optional[np.ndarray] = None,
+                           view: Optional[IndexView] = None) -> List[Dict[str, Any]]:
+        view = view or self._view
+        query_embedding = query_embedding / (np.linalg.norm(query_embedding) or 1.0)
+
+        approx_scores = self.codec.score(query_embedding)
+        n_base = len(approx_scores)
+        if mask is not None:
+            if not mask.any():
+                return []
+            approx_scores = np.where(mask[:n_base], approx_scores, -np.inf)
+            k = min(k, int(mask.sum()))
+        shortlist_size = min(max(k, self.rescore_k), n_base)
+        shortlist = np.argpartition(-approx_scores, shortlist_size - 1)[:shortlist_size]
+        # The codec covers the base rows only; ingested segment rows are always rescored exactly
+        shortlist = np.concatenate([shortlist, np.arange(n_base, len(view.ids))])
+        if mask is not None:
+            shortlist = shortlist[mask[shortlist]]
+        shortlist.sort()  # sequential reads from the memory-mapped matrix
+
+        rows = view.rows(shortlist)
+        norms = np.linalg.norm(rows, axis=1)
+        exact_scores = rows @ query_embedding / np.where(norms == 0, 1.0, norms)
+
+        order = np.argsort(-exact_scores)[:k]
+        return [view.result(idx, exact_scores[pos]) for pos, idx in zip(order, shortlist[order])]
+
     def build_context(self, retrieved_chunks: List[Dict[str, Any]]) -> str:
         """
         Assemble retrieved chunks into a single context string.
@@ -0,0 +1,166 @@
+import os
+import re
+import sys
+import logging
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from utils import metrics
+from phase4_generation.llm_client import count_tokens
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SENTENCE_SPLIT = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def split_sentences(text: str, max_words: int = 60) -> List[str]:
+    """Split on sentence punctuation and newlines; long runs (tables, menus) are cut into windows."""
+    sentences = []
+    for part in SENTENCE_SPLIT.split(text):
+        words = part.split()
+        for start in range(0, len(words), max_words):
+            sentences.append(" ".join(words[start:start + max_words]))
+    return [sentence for sentence in sentences if sentence]
+
+
+class ContextBuilder:
+    """
+    Token-budgeted context assembly.
+
+    Keeps only the sentences of each retrieved chunk that are most similar to
+    the query, drops chunks that repeat an earlier one (overlapping windows of
+    the same page), skips near-duplicate sentences, and stops at the token
+    budget. Sentence embeddings are cached per chunk id, so after warm-up a
+    request only costs the query embedding retrieval already computed.
+
+    Not used by build_pipeline: pass it to AnswerGenerator(context_builder=...)
+    with a budget that tests/bench_context_compression.py shows keeps fact recall.
+    """
+
+    def __init__(self, model, token_budget: int = 800, max_sentences_per_chunk: int = 4,
+                 redundancy_threshold: float = 0.92, duplicate_sentence_threshold: float = 0.95,
+                 cache_size: int = 4096):
+        self.model = model
+        self.token_budget = token_budget
+        self.max_sentences_per_chunk = max_sentences_per_chunk
+        self.redundancy_threshold = redundancy_threshold
+        self.duplicate_sentence_threshold = duplicate_sentence_threshold
+        self.cache_size = cache_size
+        self._sentence_cache: "OrderedDict[str, Tuple[List[str], np.ndarray]]" = OrderedDict()
+        # Shared by threadpool workers and coalesced requests; encoding happens outside it
+        self._cache_lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.where(norms == 0, 1.0, norms)
+
+    def _chunk_sentences(self, chunks: List[Dict[str, Any]]) -> List[Tuple[List[str], np.ndarray]]:
+        """Sentences and normalized sentence embeddings per chunk, encoding cache misses in one batch."""
+        keys = [chunk.get('id') or chunk.get('text', '') for chunk in chunks]
+        with self._cache_lock:
+            cached = {key: self._sentence_cache[key] for key in keys if key in self._sentence_cache}
+        missing = [i for i, key in enumerate(keys) if key not in cached]
+        metrics.record_cache('sentence_embeddings', not missing)
+
+        if missing:
+            split = {i: split_sentences(chunks[i].get('text', '')) for i in missing}
+            flat = [sentence for i in missing for sentence in split[i]]
+            embeddings = self._normalize(np.asarray(self.model.encode(flat), dtype=np.float32)) if flat else None
+            offset = 0
+            for i in missing:
+                count = len(split[i])
+                rows = embeddings[offset:offset + count] if count else np.zeros((0, 1), dtype=np.float32)
+                cached[keys[i]] = (split[i], rows)
+                offset += count
+
+        with self._cache_lock:
+            for key in keys:
+                # Re-inserted: another request may have evicted it meanwhile
+                self._sentence_cache[key] = cached[key]
+                self._sentence_cache.move_to_end(key)
+            while len(self._sentence_cache) > self.cache_size:
+                self._sentence_cache.popitem(last=False)
+        return [cached[key] for key in keys]
+
+    def build(self, query: str, chunks: List[Dict[str, Any]],
+              query_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """
+        Returns:
+            {
+                'context': str in the same "Source: ...\\nContent: ..." layout as before,
+                'tokens': estimated tokens of the context,
+                'original_tokens': estimated tokens of the uncompressed chunks,
+                'chunks_used': int,
+                'sentences_used': int
+            }
+        """
+        original_tokens = sum(count_tokens(chunk.get('text', '')) for chunk in chunks)
+        if not chunks:
+            return {'context': "", 'tokens': 0, 'original_tokens': 0, 'chunks_used': 0, 'sentences_used': 0}
+
+        if query_embedding is None:
+            query_embedding = self.model.encode(query)
+        query_vector = self._normalize(np.asarray(query_embedding, dtype=np.float32).reshape(-1))
+
+        kept_chunk_vectors = []
+        kept_sentence_vectors = []
+        parts = []
+        used_tokens = 0
+        sentences_used = 0
+
+        for chunk, (sentences, embeddings) in zip(chunks, self._chunk_sentences(chunks)):
+            if not sentences:
+                continue
+
+            # Redundant chunk: overlapping window of something already included
+            chunk_vector = self._normalize(embeddings.mean(axis=0))
+            if any(float(chunk_vector @ kept) > self.redundancy_threshold for kept in kept_chunk_vectors):
+                continue
+
+            scores = embeddings @ query_vector
+            best = np.argsort(-scores)[:self.max_sentences_per_chunk]
+
+            selected = []
+            for idx in best:
+                vector = embeddings[idx]
+                if any(float(vector @ kept) > self.duplicate_sentence_threshold for kept in kept_sentence_vectors):
+                    continue
+                sentence_tokens = count_tokens(sentences[idx])
+                # Always keep the best sentence of the top chunk, even over budget
+                if used_tokens + sentence_tokens > self.token_budget and (parts or selected):
+                    continue
+                selected.append(idx)
+                kept_sentence_vectors.append(vector)
+                used_tokens += sentence_tokens
+
+            if not selected:
+                continue
+            kept_chunk_vectors.append(chunk_vector)
+            sentences_used += len(selected)
+
+            # Original order reads better than score order
+            text = " ".join(sentences[idx] for idx in sorted(selected))
+            source = chunk.get('metadata', {}).get('source_file', 'Unknown Source')
+            parts.append(f"Source: {source}\nContent: {text}")
+
+            if used_tokens >= self.token_budget:
+                break
+
+        context = "\n\n".join(parts)
+        metrics.record_context_tokens(original_tokens, count_tokens(context))
+        return {
+            'context': context,
+            'tokens': count_tokens(context),
+            'original_tokens': original_tokens,
+            'chunks_used': len(parts),
+            'sentences_used': sentences_used,
+        }
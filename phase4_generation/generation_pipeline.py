@@ -1,9 +1,19 @@
 import os
+import sys
 import logging
 from typing import List, Dict, Any
 from groq import Groq
 from dotenv import load_dotenv
 
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from utils import metrics
+from phase4_generation.llm_client import LLMClient, ChatCompletionsClient, count_tokens
+from phase4_generation.resilient_client import ResilientLLMClient, LLMUnavailableError, resilience_settings_from_env
+
 # Load environment variables
 load_dotenv()
 
@@ -11,19 +21,34 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 class AnswerGenerator:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, stream: bool = False, llm_client: LLMClient = None,
+                 context_builder=None):
+        # Streaming lets us measure time-to-first-token
+        self.stream = stream
+        # Optional ContextBuilder: token-budgeted, query-focused context
+        self.context_builder = context_builder
+        # Using Llama 3 for balanced performance and speed
+        self.model = "llama-3.3-70b-versatile"
+        # Smaller model used when the main one is rate limited or failing ('' disables)
+        self.fallback_model = os.getenv("MF_LLM_FALLBACK_MODEL", "llama-3.1-8b-instant")
         self.api_key = api_key or os.getenv("GROQ_API_KEY")
-        if not self.api_key:
-            logging.warning("GROQ_API_KEY not found. Helper will fail if actual generation is attempted.")
-            self.client = None
-        else:
-            try:
-                self.client = Groq(api_key=self.api_key)
-                # Using Llama 3 for balanced performance and speed
-                self.model = "llama-3.3-70b-versatile"
-            except Exception as e:
-                logging.error(f"Failed to initialize Groq client: {e}")
-                self.client = None
+        self.client = None
+        
+        # Any LLMClient can be plugged in (e.g. FakeLLMClient for offline load tests)
+        self.llm = llm_client
+        if self.llm is None:
+            if not self.api_key:
+                logging.warning("GROQ_API_KEY not found. Helper will fail if actual generation is attempted.")
+            else:
+                try:
+                    # Retries are handled by ResilientLLMClient, not the SDK
+                    self.client = Groq(api_key=self.api_key, max_retries=0)
+                    fallback = ChatCompletionsClient(self.client, self.fallback_model) if self.fallback_model else None
+                    self.llm = ResilientLLMClient(ChatCompletionsClient(self.client, self.model), fallback=fallback,
+                                                  **resilience_settings_from_env())
+                except Exception as e:
+                    logging.error(f"Failed to initialize Groq client: {e}")
+                    self.client = None
         
         self.system_prompt = """You are a helpful and friendly Mutual Fund FAQ assistant.
 
@@ -50,18 +75,26 @@ FORBIDDEN ACTIONS:
 If information is missing or irrelevant, strictly state: "I don't know based on the provided sources 🙂"
 """
 
-    def generate_answer(self, query: str, retrieved_chunks: List[Dict[str, Any]]) -> str:
+    def generate_answer(self, query: str, retrieved_chunks: List[Dict[str, Any]], query_embedding=None) -> str:
         """
         Generate an answer using Groq based on the query and retrieved chunks.
+        query_embedding, when given, is reused by the context builder.
         """
-        if not self.client:
+        if not self.llm:
             return "Reference Code: MISSING_API_KEY. Please set GROQ_API_KEY to generate real answers."
 
         if not retrieved_chunks:
             return "I don't know based on the provided sources. Please ask an alternative question to search."
 
         # Step 1: Context Assembly
-        context_str = self._build_context_str(retrieved_chunks)
+        with metrics.span('context_build'):
+            if self.context_builder is not None:
+                context_str = self.context_builder.build(query, retrieved_chunks, query_embedding)['context']
+            else:
+                context_str = self._build_context_str(retrieved_chunks)
+                # Whole chunks: what is retrieved is what is sent
+                context_tokens = count_tokens(context_str)
+                metrics.record_context_tokens(context_tokens, context_tokens)
         
         # Step 2: Prompt Construction
         messages = [
@@ -71,21 +104,19 @@ If information is missing or irrelevant, strictly state: "I don't know based on
         
         # Step 3: LLM Invocation
         try:
-            chat_completion = self.client.chat.completions.create(
-                messages=messages,
-                model=self.model,
-                temperature=0.0, # Deterministic
-                max_tokens=300,
-            )
-            return chat_completion.choices[0].message.content
+            return self.llm.complete(messages, temperature=0.0, max_tokens=300, stream=self.stream)  # Deterministic
             
+        except LLMUnavailableError as e:
+            logging.error(f"Error generating answer: {e}")
+            return "The answer service is busy right now 🙂 Please try again in a moment."
         except Exception as e:
             error_details = f"Error generating answer: {type(e).__name__}: {str(e)}"
             logging.error(error_details)
             # Return detailed error for debugging
             return f"Sorry, I encountered an error while generating the response. Details: {str(e)}"
 
-    def _build_context_str(self, chunks: List[Dict[str, Any]]) -> str:
+    @staticmethod
+    def _build_context_str(chunks: List[Dict[str, Any]]) -> str:
         """Helper to format context with sources."""
         context_parts = []
         for chunk in chunks:
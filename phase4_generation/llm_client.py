@@ -0,0 +1,208 @@
+import os
+import sys
+import time
+import logging
+import threading
+from typing import List, Dict, Any, Optional
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from utils import metrics
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+class LLMClient:
+    """
+    Interface AnswerGenerator talks to. Implementations return the completion
+    text and record llm/llm_ttft timings and token usage in utils.metrics.
+    """
+
+    model = None
+
+    def complete(self, messages: List[Dict[str, str]], temperature: float = 0.0,
+                 max_tokens: int = 300, stream: bool = False, timeout: Optional[float] = None) -> str:
+        raise NotImplementedError
+
+
+class ChatCompletionsClient(LLMClient):
+    """
+    Adapter for OpenAI-style SDK clients (groq.Groq, openai.OpenAI), i.e.
+    anything with client.chat.completions.create(...). Point the SDK at the
+    local fake server (scripts/fake_llm_server.py) with base_url, or for Groq
+    the GROQ_BASE_URL environment variable.
+    """
+
+    def __init__(self, client, model: str):
+        self.client = client
+        self.model = model
+
+    def complete(self, messages: List[Dict[str, str]], temperature: float = 0.0,
+                 max_tokens: int = 300, stream: bool = False, timeout: Optional[float] = None) -> str:
+        start = time.perf_counter()
+        # Per-request timeout is only passed when set, SDK defaults apply otherwise
+        options = {'timeout': timeout} if timeout is not None else {}
+        if stream:
+            answer = self._stream_completion(messages, temperature, max_tokens, start, options)
+        else:
+            chat_completion = self.client.chat.completions.create(
+                messages=messages,
+                model=self.model,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **options
+            )
+            self._record_usage(getattr(chat_completion, 'usage', None))
+            answer = chat_completion.choices[0].message.content
+        metrics.observe_stage('llm', time.perf_counter() - start)
+        return answer
+
+    def _stream_completion(self, messages: List[Dict[str, str]], temperature: float,
+                           max_tokens: int, start: float, options: Dict[str, Any]) -> str:
+        """Stream the completion, recording time-to-first-token and token usage."""
+        stream = self.client.chat.completions.create(
+            messages=messages,
+            model=self.model,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            **options
+        )
+        parts = []
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not parts:
+                    metrics.observe_stage('llm_ttft', time.perf_counter() - start)
+                parts.append(chunk.choices[0].delta.content)
+            # Groq reports usage on the last chunk (x_groq), OpenAI-compatible servers on `usage`
+            x_groq = getattr(chunk, 'x_groq', None)
+            self._record_usage(getattr(x_groq, 'usage', None) or getattr(chunk, 'usage', None))
+        return "".join(parts)
+
+    @staticmethod
+    def _record_usage(usage):
+        prompt_tokens = getattr(usage, 'prompt_tokens', None)
+        completion_tokens = getattr(usage, 'completion_tokens', None)
+        if isinstance(prompt_tokens, int) and isinstance(completion_tokens, int):
+            metrics.record_tokens(prompt_tokens, completion_tokens)
+
+
+class FakeLLMClient(LLMClient):
+    """
+    In-process stand-in with configurable time-to-first-token and token rate.
+    Answers with the first sentence of the context, so the rest of the
+    pipeline behaves as with a real model. No network, no API key.
+    """
+
+    model = "fake-llm"
+
+    def __init__(self, ttft: float = 0.2, tokens_per_second: float = 250.0, answer: str = None):
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.answer = answer
+
+    def complete(self, messages: List[Dict[str, str]], temperature: float = 0.0,
+                 max_tokens: int = 300, stream: bool = False, timeout: Optional[float] = None) -> str:
+        start = time.perf_counter()
+        prompt = " ".join(message['content'] for message in messages)
+        answer = self.answer or fake_answer(prompt)
+        completion_tokens = min(count_tokens(answer), max_tokens)
+
+        duration = self.ttft + (completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0)
+        if timeout is not None and duration > timeout:
+            time.sleep(timeout)
+            raise TimeoutError(f"Fake LLM needs {duration:.2f}s, timeout is {timeout:.2f}s")
+
+        time.sleep(self.ttft)
+        metrics.observe_stage('llm_ttft', time.perf_counter() - start)
+        if self.tokens_per_second:
+            time.sleep(completion_tokens / self.tokens_per_second)
+
+        metrics.record_tokens(count_tokens(prompt), completion_tokens)
+        metrics.observe_stage('llm', time.perf_counter() - start)
+        return answer
+
+
+class RateLimitedLLMClient(LLMClient):
+    """
+    Client-side rate limit shared by all threads: at most `requests_per_minute`
+    calls are started per minute (evenly spaced). Wrap the outermost client
+    so queueing for a slot does not eat into the call deadline. A 429 from
+    the provider (directly or as the cause of a wrapper error) pauses every
+    caller for its Retry-After, or one interval.
+    """
+
+    def __init__(self, client: LLMClient, requests_per_minute: float, clock=time.monotonic, sleep=time.sleep):
+        self.client = client
+        self.model = client.model
+        self.interval = 60.0 / requests_per_minute
+        self.clock = clock
+        self.sleep = sleep
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        with self._lock:
+            now = self.clock()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            self.sleep(slot - now)
+
+    def _pause(self, error: Exception):
+        response = getattr(error, 'response', None)
+        retry_after = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+        try:
+            pause = float(retry_after)
+        except (TypeError, ValueError):
+            pause = self.interval
+        with self._lock:
+            self._next_slot = max(self._next_slot, self.clock() + pause)
+        logging.warning(f"Rate limited by the LLM provider, pausing new calls for {pause:.1f}s")
+
+    def complete(self, messages: List[Dict[str, str]], temperature: float = 0.0,
+                 max_tokens: int = 300, stream: bool = False, timeout: Optional[float] = None) -> str:
+        self._acquire()
+        try:
+            return self.client.complete(messages, temperature=temperature, max_tokens=max_tokens,
+                                        stream=stream, timeout=timeout)
+        except Exception as e:
+            # Also look through wrappers such as LLMUnavailableError
+            for error in (e, e.__cause__):
+                if getattr(error, 'status_code', None) == 429:
+                    self._pause(error)
+                    break
+            raise
+
+
+def count_tokens(text: str) -> int:
+    """Rough token estimate (~0.75 words per token) used by the fakes."""
+    return max(1, int(len(text.split()) / 0.75))
+
+
+def fake_answer(prompt: str) -> str:
+    """First sentence of the first context block, or the standard fallback."""
+    if "Content:" in prompt:
+        content = prompt.split("Content:", 1)[1].strip()
+        sentence = content.split(". ")[0].split("\n")[0].strip()
+        if sentence:
+            return sentence.rstrip('.') + ". 📘"
+    return "I don't know based on the provided sources 🙂"
+
+
+def llm_client_from_env() -> Optional[LLMClient]:
+    """
+    MF_LLM_CLIENT=fake selects FakeLLMClient (MF_FAKE_LLM_TTFT seconds,
+    MF_FAKE_LLM_TOKENS_PER_SECOND). Returns None for the default Groq client.
+    """
+    backend = os.getenv("MF_LLM_CLIENT", "groq")
+    if backend == 'fake':
+        return FakeLLMClient(ttft=float(os.getenv("MF_FAKE_LLM_TTFT", "0.2")),
+                             tokens_per_second=float(os.getenv("MF_FAKE_LLM_TOKENS_PER_SECOND", "250")))
+    if backend != 'groq':
+        raise ValueError(f"Unknown MF_LLM_CLIENT '{backend}'. Use 'groq' or 'fake'.")
+    return None
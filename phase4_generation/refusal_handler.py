@@ -1,6 +1,18 @@
 from typing import Dict, Any
 import random
 
+# Factual questions offered alongside a refusal
+FACTUAL_SUGGESTIONS = [
+    "What is the expense ratio of HDFC Midcap Fund?",
+    "How do I download my capital gains statement?",
+    "What is the lock-in period for ELSS funds?",
+    "What is the minimum SIP amount for HDFC Flexi Cap Fund?",
+    "What is the exit load for HDFC Small Cap Fund?",
+    "What is the riskometer rating of HDFC Large Cap Fund?",
+    "What is the benchmark for HDFC Multi Cap Fund?",
+    "How to download my account statement?",
+]
+
 
 class RefusalHandler:
     """
@@ -88,18 +100,7 @@ class RefusalHandler:
         Returns:
             List of suggested questions
         """
-        suggestion_bank = [
-            "What is the expense ratio of HDFC Midcap Fund?",
-            "How do I download my capital gains statement?",
-            "What is the lock-in period for ELSS funds?",
-            "What is the minimum SIP amount for HDFC Flexi Cap Fund?",
-            "What is the exit load for HDFC Small Cap Fund?",
-            "What is the riskometer rating of HDFC Large Cap Fund?",
-            "What is the benchmark for HDFC Multi Cap Fund?",
-            "How to download my account statement?",
-        ]
-        
-        return random.sample(suggestion_bank, min(count, len(suggestion_bank)))
+        return random.sample(FACTUAL_SUGGESTIONS, min(count, len(FACTUAL_SUGGESTIONS)))
 
 
 # Test cases
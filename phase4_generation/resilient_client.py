@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+import random
+import logging
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import List, Dict, Optional
+
+import numpy as np
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from utils import metrics
+from phase4_generation.llm_client import LLMClient
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+LLM_CALLS = "mf_llm_calls_total"
+LLM_RETRIES = "mf_llm_retries_total"
+LLM_HEDGES = "mf_llm_hedges_total"
+LLM_FALLBACKS = "mf_llm_fallbacks_total"
+LLM_CIRCUIT = "mf_llm_circuit_transitions_total"
+LLM_HEDGE_TOKENS = "mf_llm_hedge_tokens_total"
+
+metrics.REGISTRY.describe(LLM_CALLS, 'counter', "LLM attempts by model and outcome (ok, error, timeout)")
+metrics.REGISTRY.describe(LLM_RETRIES, 'counter', "LLM attempts retried after a retryable failure")
+metrics.REGISTRY.describe(LLM_HEDGES, 'counter', "Hedged LLM requests launched and won")
+metrics.REGISTRY.describe(LLM_FALLBACKS, 'counter', "Requests answered by the fallback model")
+metrics.REGISTRY.describe(LLM_CIRCUIT, 'counter', "Circuit breaker state transitions")
+metrics.REGISTRY.describe(LLM_HEDGE_TOKENS, 'counter',
+                          "Tokens spent on hedged requests that lost (not in mf_llm_tokens_total)")
+
+# Status codes worth retrying: rate limited, or the provider is struggling
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+# Client-side failures that say nothing about the request itself
+RETRYABLE_ERRORS = {'APITimeoutError', 'APIConnectionError', 'TimeoutError', 'ConnectionError'}
+
+
+class LLMUnavailableError(Exception):
+    """Raised when neither the primary nor the fallback model answered in time."""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker. After `failure_threshold` consecutive
+    failures calls are rejected for `reset_timeout` seconds, then a single
+    trial call is let through (half-open) to decide whether to close again.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def _transition(self, state: str):
+        if state != self.state:
+            logging.warning(f"LLM circuit breaker {self.state} -> {state}")
+            self.state = state
+            metrics.REGISTRY.inc(LLM_CIRCUIT, state=state)
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == 'open' and self.clock() - self.opened_at >= self.reset_timeout:
+                self._transition('half_open')
+                return True
+            return self.state == 'closed'
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._transition('closed')
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+                self._transition('open')
+
+
+class ResilientLLMClient(LLMClient):
+    """
+    Wraps a primary LLMClient with:
+    - a per-call deadline covering all attempts,
+    - exponential backoff with jitter on 429/5xx, timeouts and connection errors
+      (Retry-After is honoured when the provider sends it),
+    - optional hedging: a duplicate request once the first has been slower
+      than the observed `hedge_percentile` latency, first answer wins,
+    - a smaller fallback model when the primary is overloaded or the circuit
+      breaker is open.
+    Every outcome is counted in utils.metrics.
+    """
+
+    def __init__(self, primary: LLMClient, fallback: Optional[LLMClient] = None,
+                 deadline: float = 10.0, max_retries: int = 2,
+                 backoff_base: float = 0.25, backoff_max: float = 2.0,
+                 hedge_percentile: Optional[float] = None, hedge_min_samples: int = 20,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = 32, sleep=time.sleep):
+        self.primary = primary
+        self.fallback = fallback
+        self.model = primary.model
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.breaker = breaker or CircuitBreaker()
+        self.sleep = sleep
+        self.latencies = deque(maxlen=500)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+
+    # --- Policy helpers ---
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        if getattr(error, 'status_code', None) in RETRYABLE_STATUS:
+            return True
+        return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+    def backoff_delay(self, attempt: int, error: Exception) -> float:
+        """Full-jitter exponential backoff, or the provider's Retry-After if longer."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+        response = getattr(error, 'response', None)
+        retry_after = getattr(response, 'headers', {}).get('retry-after') if response is not None else None
+        try:
+            delay = max(delay, min(float(retry_after), self.backoff_max))
+        except (TypeError, ValueError):
+            pass
+        return delay
+
+    def hedge_delay(self) -> Optional[float]:
+        if self.hedge_percentile is None or len(self.latencies) < self.hedge_min_samples:
+            return None
+        return float(np.percentile(list(self.latencies), self.hedge_percentile * 100))
+
+    # --- Calls ---
+
+    @staticmethod
+    def _attempt(client: LLMClient, messages, temperature, max_tokens, stream, timeout):
+        # Token usage is held back until it is known whether this request won
+        with metrics.capture_tokens() as usage:
+            answer = client.complete(messages, temperature=temperature, max_tokens=max_tokens, stream=stream,
+                                     timeout=timeout)
+        return answer, usage
+
+    @staticmethod
+    def _count_lost(future):
+        if not future.cancelled() and future.exception() is None:
+            for prompt_tokens, completion_tokens in future.result()[1]:
+                metrics.REGISTRY.inc(LLM_HEDGE_TOKENS, prompt_tokens, type='prompt')
+                metrics.REGISTRY.inc(LLM_HEDGE_TOKENS, completion_tokens, type='completion')
+
+    def _submit(self, client: LLMClient, messages, temperature, max_tokens, stream, timeout):
+        # Run in the caller's context so spans land in the request trace
+        context = contextvars.copy_context()
+        return self.executor.submit(context.run, self._attempt, client, messages, temperature, max_tokens, stream,
+                                    timeout)
+
+    def _call(self, client: LLMClient, messages, temperature, max_tokens, stream, timeout: float,
+              hedge: bool = False) -> str:
+        """One logical attempt, possibly hedged. Raises TimeoutError past `timeout`."""
+        start = time.monotonic()
+        futures = [self._submit(client, messages, temperature, max_tokens, stream, timeout)]
+        hedge_after = self.hedge_delay() if hedge else None
+
+        if hedge_after is not None and hedge_after < timeout:
+            done, _ = wait(futures, timeout=hedge_after)
+            if not done:
+                metrics.REGISTRY.inc(LLM_HEDGES, result='launched')
+                remaining = timeout - (time.monotonic() - start)
+                futures.append(self._submit(client, messages, temperature, max_tokens, stream, remaining))
+
+        error = None
+        pending = set(futures)
+        while pending:
+            remaining = timeout - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if len(futures) > 1 and future is futures[1]:
+                        metrics.REGISTRY.inc(LLM_HEDGES, result='won')
+                    answer, usage = future.result()
+                    # Only the winner's tokens count as the request's usage
+                    for prompt_tokens, completion_tokens in usage:
+                        metrics.record_tokens(prompt_tokens, completion_tokens)
+                    for other in futures:
+                        if other is not future:
+                            other.add_done_callback(self._count_lost)
+                    return answer
+                error = future.exception()
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError(f"LLM call exceeded {timeout:.2f}s")
+
+    def complete(self, messages: List[Dict[str, str]], temperature: float = 0.0,
+                 max_tokens: int = 300, stream: bool = False, timeout: Optional[float] = None) -> str:
+        deadline = time.monotonic() + (timeout if timeout is not None else self.deadline)
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self.breaker.allow():
+                break
+            start = time.monotonic()
+            try:
+                answer = self._call(self.primary, messages, temperature, max_tokens, stream, remaining, hedge=True)
+            except Exception as e:
+                last_error = e
+                if not self.is_retryable(e):
+                    metrics.REGISTRY.inc(LLM_CALLS, model=self.primary.model, outcome='error')
+                    # The provider answered (e.g. a 400), so it is reachable; this also ends a half-open trial
+                    self.breaker.record_success()
+                    raise
+                outcome = 'timeout' if any(cls.__name__ in ('TimeoutError', 'APITimeoutError') for cls in type(e).__mro__) else 'error'
+                metrics.REGISTRY.inc(LLM_CALLS, model=self.primary.model, outcome=outcome)
+                self.breaker.record_failure()
+                logging.warning(f"LLM attempt {attempt + 1} failed: {type(e).__name__}: {e}")
+
+                delay = self.backoff_delay(attempt, e)
+                if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    break
+                metrics.REGISTRY.inc(LLM_RETRIES, model=self.primary.model)
+                self.sleep(delay)
+                continue
+
+            self.latencies.append(time.monotonic() - start)
+            self.breaker.record_success()
+            metrics.REGISTRY.inc(LLM_CALLS, model=self.primary.model, outcome='ok')
+            return answer
+
+        # Primary overloaded, too slow or circuit open: degrade to the smaller model
+        remaining = deadline - time.monotonic()
+        if self.fallback is not None and remaining > 0:
+            metrics.REGISTRY.inc(LLM_FALLBACKS, model=self.fallback.model)
+            try:
+                answer = self._call(self.fallback, messages, temperature, max_tokens, stream, remaining)
+                metrics.REGISTRY.inc(LLM_CALLS, model=self.fallback.model, outcome='ok')
+                return answer
+            except Exception as e:
+                metrics.REGISTRY.inc(LLM_CALLS, model=self.fallback.model, outcome='error')
+                last_error = e
+
+        reason = f"{type(last_error).__name__}: {last_error}" if last_error else f"circuit {self.breaker.state}"
+        raise LLMUnavailableError(f"LLM unavailable ({reason})") from last_error
+
+
+def resilience_settings_from_env() -> Dict[str, object]:
+    """
+    ResilientLLMClient keyword arguments from MF_LLM_DEADLINE (seconds),
+    MF_LLM_MAX_RETRIES and MF_LLM_HEDGE_PERCENTILE (e.g. 0.95, unset = no hedging).
+    """
+    hedge = os.getenv("MF_LLM_HEDGE_PERCENTILE")
+    return {
+        'deadline': float(os.getenv("MF_LLM_DEADLINE", "10")),
+        'max_retries': int(os.getenv("MF_LLM_MAX_RETRIES", "2")),
+        'hedge_percentile': float(hedge) if hedge else None,
+    }
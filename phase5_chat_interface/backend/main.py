@@ -2,17 +2,21 @@ import os
 import sys
 import logging
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from dotenv import load_dotenv
-import random
 
 # Add project root to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from phase3_retrieval.retrieval_pipeline import RetrievalSystem
-from phase4_generation.generation_pipeline import AnswerGenerator
+from utils.chat_pipeline import build_pipeline
+from utils.answer_cache import start_warming
+from utils.suggestions import all_suggested_questions
+from phase2_vector_db.ingestion import IngestionService
+from utils.metrics import REGISTRY
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -37,11 +41,20 @@ if not os.path.exists(EMBEDDINGS_DIR):
     logging.error(f"Embeddings directory not found at {EMBEDDINGS_DIR}")
     raise RuntimeError("Embeddings directory not found. Please run Phase 2 first.")
 
-logging.info("Initializing Retrieval System...")
-retriever = RetrievalSystem(EMBEDDINGS_DIR)
+logging.info("Initializing chat pipeline...")
+pipeline = build_pipeline(EMBEDDINGS_DIR, intent_method=os.getenv("MF_INTENT_CLASSIFIER"))
 
-logging.info("Initializing Generator...")
-generator = AnswerGenerator()
+# Cached answers are dropped when ingestion or a sync republishes the index;
+# recompute them in the background (one worker does it, the others reload the file)
+if pipeline.answer_cache is not None and os.getenv("MF_WARM_ANSWER_CACHE", "1") == "1":
+    pipeline.answer_cache.on_reset = lambda: start_warming(pipeline, all_suggested_questions())
+
+# Documents added through /admin/documents are queued by any worker and become
+# searchable once their segment is published. Only one process should embed them:
+# MF_RUN_INGESTER=1 for a single-worker server, otherwise `ingestion.py serve`
+ingestion = IngestionService(EMBEDDINGS_DIR, model=pipeline.retriever.model)
+if os.getenv("MF_RUN_INGESTER", "0") == "1":
+    ingestion.start()
 
 # Data Models
 class ChatRequest(BaseModel):
@@ -52,15 +65,8 @@ class ChatResponse(BaseModel):
     answer: str
     sources: List[str]
     suggestions: List[str]
-
-# Fallback Suggestions
-FALLBACK_QUESTIONS = [
-    "What is the investment objective of HDFC Large Cap Fund?",
-    "What are the risks associated with mutual funds?",
-    "Who is eligible to invest in HDFC Mutual Fund?",
-    "How is NAV calculated?",
-    "What is a Systematic Investment Plan (SIP)?"
-]
+    # Citation records (display_name, url, document_type, scheme, page) for the sources
+    citations: List[dict] = []
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
@@ -69,51 +75,75 @@ async def chat_endpoint(request: ChatRequest):
         if not query:
             raise HTTPException(status_code=400, detail="Message cannot be empty")
 
-        # Conversational / Acknowledgement Handling
-        conversational_triggers = {"ok", "okay", "thanks", "thank you", "got it", "thx", "cheers", "cool", "👍", "yes"}
-        cleaned_query = "".join(char for char in query.lower() if char.isalnum() or char.isspace()).strip()
-        
-        if cleaned_query in conversational_triggers:
-            return ChatResponse(
-                answer="You’re welcome! 🙂 What else would you like to know about mutual funds?",
-                sources=[],
-                suggestions=[]
-            )
-
-        # Phase 3: Retrieve
-        logging.info(f"Retrieving for: {query}")
-        chunks = retriever.retrieve(query, k=5)
-        
-        # Phase 4: Generate
-        logging.info("Generating answer...")
-        answer = generator.generate_answer(query, chunks)
-        
-        # Extract sources (prioritize URL, then filename)
-        sources = list(set([
-            chunk.get('metadata', {}).get('source_url') or 
-            chunk.get('metadata', {}).get('source_file') or 
-            'Unknown Source'
-            for chunk in chunks
-        ]))
-        
-        # Filter out empty strings if any
-        sources = [s for s in sources if s]
-        
-        # Check for fallback response
-        suggestions = []
-        if "I don't know based on the provided sources" in answer:
-            suggestions = random.sample(FALLBACK_QUESTIONS, 3)
-            
+        # Shared pipeline: conversational replies, advisory refusals, fact
+        # fast path and low-score cut-off all happen before the LLM call
+        # The pipeline blocks (encoding, LLM call), so run it off the event loop;
+        # it coalesces identical in-flight questions itself
+        result = await run_in_threadpool(pipeline.run, query, session_id=request.session_id)
+        logging.info(f"Answered at stage '{result['stage']}' in {result['timings']['total']:.3f}s "
+                     f"(prompt tokens: {result['tokens'].get('prompt', 0)}, coalesced: {result['coalesced']})")
+
         return ChatResponse(
-            answer=answer,
-            sources=sources,
-            suggestions=suggestions
+            answer=result['answer'],
+            sources=result['sources'],
+            suggestions=result['suggestions'],
+            citations=[pipeline.citation(citation_id) for citation_id in result['citations']]
         )
 
     except Exception as e:
         logging.error(f"Error processing chat request: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+class IngestDocument(BaseModel):
+    text: str
+    scheme: str = "General"
+    category: str = "UNKNOWN"
+    source_url: str = ""
+    source_type: str = ""
+    source_file: str = ""
+
+class IngestRequest(BaseModel):
+    documents: List[IngestDocument]
+
+def require_admin(token: Optional[str]):
+    expected = os.getenv("MF_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=403, detail="Admin routes are disabled (set MF_ADMIN_TOKEN)")
+    if token != expected:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+@app.post("/admin/documents", status_code=202)
+async def ingest_documents(request: IngestRequest, x_admin_token: Optional[str] = Header(None)):
+    """Queue documents for embedding; they are searchable within a few seconds, no rebuild needed."""
+    require_admin(x_admin_token)
+    documents = [{'extracted_text': doc.text, 'scheme': doc.scheme, 'category': doc.category,
+                  'source_url': doc.source_url, 'source_type': doc.source_type, 'source_file': doc.source_file}
+                 for doc in request.documents]
+    return await run_in_threadpool(ingestion.submit, documents)
+
+@app.delete("/admin/documents")
+async def delete_documents(source_url: List[str] = Query(...), x_admin_token: Optional[str] = Header(None)):
+    """Tombstone every chunk of the given sources; the merger reclaims the space later."""
+    require_admin(x_admin_token)
+    return await run_in_threadpool(ingestion.delete_sources, source_url)
+
+@app.get("/admin/ingestion")
+async def ingestion_status(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    status = await run_in_threadpool(ingestion.status)
+    status['searchable_chunks'] = len(pipeline.retriever.ids)
+    return status
+
+@app.post("/admin/compact")
+async def compact_segments(x_admin_token: Optional[str] = Header(None)):
+    require_admin(x_admin_token)
+    return await run_in_threadpool(ingestion.compact)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus scrape endpoint: per-stage latency histograms, token and cache counters."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
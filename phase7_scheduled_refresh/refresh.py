@@ -15,6 +15,7 @@ print(f"sys.path: {sys.path}")
 
 try:
     from phase1_data_collection.scraper import Phase1Scraper
+    from phase2_vector_db.fact_table import build_fact_table
 except ImportError as e:
     print(f"CRITICAL ERROR: Failed to import Phase1Scraper: {e}")
     # List files in expected location
@@ -29,10 +30,26 @@ except ImportError as e:
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - Phase7 - %(levelname)s - %(message)s')
 
-def run_refresh():
+def warm_answers(embeddings_dir: str):
+    """Recompute cached answers for the republished index (needs the LLM key; servers also warm on their own)."""
+    if not os.getenv("GROQ_API_KEY"):
+        logging.info("GROQ_API_KEY not set; answer cache will be warmed by the app")
+        return
+    from utils.chat_pipeline import build_pipeline
+    from utils.answer_cache import warm_answer_cache
+    from utils.suggestions import all_suggested_questions
+
+    pipeline = build_pipeline(embeddings_dir, api_key=os.getenv("GROQ_API_KEY"),
+                              intent_method=os.getenv("MF_INTENT_CLASSIFIER"))
+    if pipeline.answer_cache.stale:
+        logging.info(f"Answer cache warm-up: {warm_answer_cache(pipeline, pipeline.answer_cache, all_suggested_questions())}")
+
+def run_refresh(sync_index: bool = False):
     """
     Orchestrates the data refresh.
     Currently triggers Phase 1 scraping and cleaning.
+    With sync_index, changed documents are also re-embedded into the live
+    index (needs sentence-transformers; only changed documents are embedded).
     """
     logging.info("Starting valid scheduled data refresh...")
     
@@ -46,6 +63,8 @@ def run_refresh():
     registry_path = os.path.join(phase1_dir, "resources", "resource_registry.json")
     raw_dir = os.path.join(phase1_dir, "raw")
     cleaned_dir = os.path.join(phase1_dir, "cleaned")
+    # Content-addressed raw text and cleaned documents; replaces raw/ JSON copies
+    store_dir = os.path.join(phase1_dir, "store")
     
     # Validate paths
     if not os.path.exists(registry_path):
@@ -57,12 +76,26 @@ def run_refresh():
     logging.info(f"Target cleaned directory: {cleaned_dir}")
     
     try:
-        scraper = Phase1Scraper(registry_path, raw_dir, cleaned_dir)
+        scraper = Phase1Scraper(registry_path, raw_dir, cleaned_dir, store_dir)
         scraper.scrape_and_clean()
+        # Objects no manifest points to any more (superseded text)
+        scraper.store.gc()
+        
+        # Structured facts only need the cleaned text, so refresh them here too
+        build_fact_table(
+            cleaned_dir,
+            os.path.join(phase1_dir, "supplementary_data"),
+            os.path.join(project_root, "phase2_vector_db")
+        )
+        if sync_index:
+            from phase2_vector_db.ingestion import IngestionService
+            result = IngestionService(os.path.join(project_root, "phase2_vector_db")).sync(cleaned_dir, registry_path, store_dir)
+            logging.info(f"Index sync: {result}")
+            warm_answers(os.path.join(project_root, "phase2_vector_db"))
         logging.info("Data refresh completed successfully.")
     except Exception as e:
         logging.error(f"Data refresh failed: {e}")
         sys.exit(1)
 
 if __name__ == "__main__":
-    run_refresh()
+    run_refresh(sync_index="--sync-index" in sys.argv)
@@ -1,7 +1,10 @@
 import streamlit as st
 import os
+import html
 import sys
 import random
+import uuid
+from markdown_it import MarkdownIt
 
 # Add project root to path for imports
 # This assumes the app is run from the project root or phase_6_streamlit_app folder within the project
@@ -12,11 +15,11 @@ if project_root not in sys.path:
 
 # Import backend modules
 try:
-    from phase3_retrieval.retrieval_pipeline import RetrievalSystem
-    from phase3_retrieval.query_classifier import QueryClassifier
-    from phase4_generation.generation_pipeline import AnswerGenerator
-    from phase4_generation.refusal_handler import RefusalHandler
-    from utils.suggestions import SuggestionsHandler
+    from utils.chat_pipeline import build_pipeline
+    from utils.metrics import REGISTRY
+    from utils.answer_cache import start_warming
+    from utils.suggestions import STARTER_QUESTIONS, all_suggested_questions
+    from phase2_vector_db.citations import display_name
 except ImportError as e:
     st.error(f"Failed to import backend modules: {e}")
     st.stop()
@@ -96,6 +99,39 @@ st.markdown("""
         margin-left: auto;
     }
     
+    /* Pre-rendered history turns */
+    .chat-turn {
+        display: flex;
+        gap: 12px;
+        padding: 8px 0;
+    }
+
+    .chat-avatar {
+        font-size: 20px;
+        line-height: 32px;
+    }
+
+    .chat-content {
+        background-color: #2d2d2d;
+        border-radius: 16px;
+        padding: 14px 18px;
+        color: #e0e0e0;
+        max-width: 85%;
+    }
+
+    .chat-content p:last-child {
+        margin-bottom: 0;
+    }
+
+    .chat-user {
+        flex-direction: row-reverse;
+    }
+
+    .chat-user .chat-content {
+        background: linear-gradient(135deg, #00d4aa 0%, #00a896 100%);
+        color: #000000;
+    }
+    
     /* Chat input */
     .stChatInput {
         background-color: #2d2d2d;
@@ -164,7 +200,7 @@ st.markdown("""
 
 @st.cache_resource(show_spinner=False)
 def load_rag_system():
-    """Initialize Retriever and Generator only once."""
+    """Initialize the shared chat pipeline only once."""
     base_dir = project_root
     embeddings_dir = os.path.join(base_dir, "phase2_vector_db")
     
@@ -173,11 +209,6 @@ def load_rag_system():
         st.stop()
         
     try:
-        retriever = RetrievalSystem(embeddings_dir)
-        classifier = QueryClassifier()
-        refusal_handler = RefusalHandler()
-        suggestions_handler = SuggestionsHandler()
-        
         # API Key Handling: Priority st.secrets > os.getenv
         api_key = None
         if "GROQ_API_KEY" in st.secrets:
@@ -186,7 +217,9 @@ def load_rag_system():
         if not api_key:
              api_key = os.getenv("GROQ_API_KEY")
         
-        if not api_key or api_key == "YOUR_GROQ_API_KEY_HERE":
+        # The offline fake LLM client (MF_LLM_CLIENT=fake) needs no key
+        uses_groq = os.getenv("MF_LLM_CLIENT", "groq") == "groq"
+        if uses_groq and (not api_key or api_key == "YOUR_GROQ_API_KEY_HERE"):
             st.error("❌ **GROQ_API_KEY not configured!**")
             st.info("""
             **For Streamlit Cloud:**
@@ -200,8 +233,17 @@ def load_rag_system():
             """)
             st.stop()
 
-        generator = AnswerGenerator(api_key=api_key)
-        return retriever, classifier, refusal_handler, suggestions_handler, generator
+        # Optional embedding intent classifier: MF_INTENT_CLASSIFIER=centroid|nearest
+        rag_pipeline = build_pipeline(embeddings_dir, api_key=api_key, intent_method=os.getenv("MF_INTENT_CLASSIFIER"))
+
+        # Deploy-time warm-up: precompute answers for every suggested question
+        # in the background when the cache was built for another index, and
+        # again whenever the index is republished while the app runs
+        if os.getenv("MF_WARM_ANSWER_CACHE", "1") == "1":
+            rag_pipeline.answer_cache.on_reset = lambda: start_warming(rag_pipeline, all_suggested_questions())
+            if rag_pipeline.answer_cache.stale:
+                start_warming(rag_pipeline, all_suggested_questions())
+        return rag_pipeline
     except Exception as e:
         st.error(f"❌ Failed to initialize RAG system: {type(e).__name__}")
         st.error(f"Details: {str(e)}")
@@ -210,7 +252,39 @@ def load_rag_system():
             st.code(traceback.format_exc())
         st.stop()
 
-retriever, classifier, refusal_handler, suggestions_handler, generator = load_rag_system()
+pipeline = load_rag_system()
+
+def source_link_html(source, citation):
+    """Source line under an answer, from the answer's citation record when it has one."""
+    # Names and URLs come from scraped pages and the registry: escape them before rendering as HTML
+    if citation and citation['url'].startswith("http"):
+        page = f", p. {citation['page']}" if citation.get('page') else ""
+        return (f'<div class="source-link">📎 Source: <a href="{html.escape(citation["link"], quote=True)}" '
+                f'target="_blank">{html.escape(citation["display_name"] + page, quote=True)}</a></div>')
+    if source and source.startswith("http"):
+        # No citation record (refusal links, fact answers for unindexed URLs): still a link
+        return (f'<div class="source-link">📎 Source: <a href="{html.escape(source, quote=True)}" '
+                f'target="_blank">{html.escape(display_name(source), quote=True)}</a></div>')
+    if source:
+        return f'<div class="source-link">📎 Source: {html.escape(source, quote=True)}</div>'
+    return None
+
+# Answers are markdown; render each turn to HTML once, when it is added
+MARKDOWN = MarkdownIt("commonmark", {"breaks": True, "html": False}).enable("table")
+
+def render_turn(msg):
+    """A chat turn as HTML, styled like st.chat_message."""
+    body = MARKDOWN.render(msg["content"])
+    if msg["role"] == "assistant":
+        body += msg.get("source_html") or ""
+        if msg.get("suggestions"):
+            body += MARKDOWN.render("**Try asking:**\n" + "\n".join(f"- {q}" for q in msg["suggestions"]))
+    avatar = "🧑" if msg["role"] == "user" else "ℹ️"
+    return (f'<div class="chat-turn chat-{msg["role"]}"><div class="chat-avatar">{avatar}</div>'
+            f'<div class="chat-content">{body}</div></div>')
+
+# Only an interaction's fragment reruns; older Streamlit reruns the whole script
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
 
 # Initialize Session State for Chat History
 if "messages" not in st.session_state:
@@ -222,34 +296,13 @@ if "messages" not in st.session_state:
         }
     ]
 
-# Starter questions (fixed set)
-STARTER_QUESTIONS = [
-    "What is the expense ratio of HDFC Midcap Fund?",
-    "Is there any exit load for HDFC Large Cap Fund?",
-    "What is the minimum SIP investment required for HDFC Flexi Cap Fund?",
-    "What is the risk level and benchmark of HDFC Small Cap Fund?",
-    "How can I download my capital gains statement?",
-]
-
-# Alternate questions after refusal (fixed set)
-ALTERNATE_QUESTIONS = [
-    "What is the expense ratio of HDFC Midcap Fund?",
-    "What exit load applies to HDFC Large Cap Fund?",
-    "How can I download my mutual fund statements?",
-]
+# Conversation memory key for follow-up questions ("and its exit load?")
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
 if "show_suggestions" not in st.session_state:
     st.session_state.show_suggestions = True
 
-# Suggested questions - verified to have answers in knowledge base
-SUGGESTED_QUESTIONS = [
-    "What is a Systematic Investment Plan (SIP)?",
-    "What are the risks associated with mutual funds?",
-    "How is NAV calculated?",
-    "What are the different types of mutual funds?",
-    "How can I redeem my mutual fund units?"
-]
-
 # --- UI Layout ---
 
 # Custom Header
@@ -263,140 +316,131 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
-# Display Chat History
-for idx, msg in enumerate(st.session_state.messages):
-    with st.chat_message(msg["role"]):
-        st.markdown(msg["content"])
-        
-        # Display source if available (only for assistant messages)
-        if msg["role"] == "assistant" and "source" in msg and msg["source"]:
-            source = msg["source"]
-            if source.startswith("http"):
-                # Get friendly display name
-                from source_utils import get_source_display_name
-                display_name = get_source_display_name(source)
-                st.markdown(f'<div class="source-link">📎 Source: <a href="{source}" target="_blank">{display_name}</a></div>', unsafe_allow_html=True)
-            else:
-                st.markdown(f'<div class="source-link">📎 Source: {source}</div>', unsafe_allow_html=True)
-
-# Show starter questions after the first message
-if st.session_state.show_suggestions and len(st.session_state.messages) == 1:
-    st.markdown("<div class='suggested-questions'>", unsafe_allow_html=True)
-    st.markdown("**Try asking:**")
-    for idx, question in enumerate(STARTER_QUESTIONS):
-        if st.button(question, key=f"starter_{idx}", use_container_width=True):
-            # Trigger the question
-            st.session_state.show_suggestions = False
-            st.session_state.triggered_question = question
-            st.rerun()
-    st.markdown("</div>", unsafe_allow_html=True)
-
-# Handle triggered question from suggestions
-if "triggered_question" in st.session_state:
-    prompt = st.session_state.triggered_question
-    del st.session_state.triggered_question
-    # Process the triggered question immediately
-else:
+# Chat history is rendered from HTML built once per turn (render_turn), kept
+# as one string in session state: a rerun draws it as a single element
+# instead of re-rendering every message. Turns added since the last full run
+# are drawn by the conversation fragment, which is all an interaction reruns.
+if "history_html" not in st.session_state:
+    st.session_state.history_html = ""
+    st.session_state.rendered_turns = 0
+messages = st.session_state.messages
+for msg in messages[st.session_state.rendered_turns:]:
+    st.session_state.history_html += msg.get("html") or render_turn(msg)
+st.session_state.rendered_turns = len(messages)
+
+st.markdown(st.session_state.history_html, unsafe_allow_html=True)
+st.session_state.full_run_html_len = len(st.session_state.history_html)
+
+
+def add_turn(msg):
+    msg["html"] = render_turn(msg)
+    st.session_state.messages.append(msg)
+    st.session_state.history_html += msg["html"]
+    st.session_state.rendered_turns += 1
+
+
+def show_debug_panel():
+    """Per-stage latency of the last request and process-wide averages (MF_DEBUG_PANEL=1)."""
+    with st.expander("⏱️ Debug: latency", expanded=False):
+        last_result = st.session_state.get("last_result")
+        if last_result:
+            st.markdown(f"**Last request** (answered at `{last_result['stage']}`)")
+            st.table({
+                'stage': list(last_result['timings'].keys()),
+                'ms': [round(seconds * 1000, 1) for seconds in last_result['timings'].values()],
+            })
+            if last_result['tokens']:
+                st.markdown(f"Tokens: {last_result['tokens'].get('prompt', 0)} prompt / "
+                            f"{last_result['tokens'].get('completion', 0)} completion")
+            if 'context_sent' in last_result['tokens']:
+                st.markdown(f"Context: {last_result['tokens']['context_sent']} of "
+                            f"{last_result['tokens']['context_retrieved']} retrieved tokens sent")
+
+        summary = REGISTRY.summary()
+        if summary['stages']:
+            st.markdown("**All requests**")
+            st.table({
+                'stage': list(summary['stages'].keys()),
+                'count': [stats['count'] for stats in summary['stages'].values()],
+                'mean ms': [round(stats['mean'] * 1000, 1) for stats in summary['stages'].values()],
+            })
+        hit_rate = REGISTRY.cache_hit_rate('fact_table')
+        if hit_rate is not None:
+            st.markdown(f"Fact table hit rate: {hit_rate:.0%}")
+
+
+@fragment
+def conversation():
+    # Turns since the last full run, as one element updated in place
+    recent = st.empty()
+    recent.markdown(st.session_state.history_html[st.session_state.full_run_html_len:], unsafe_allow_html=True)
+
     prompt = None
+    # Show starter questions after the first message
+    if st.session_state.show_suggestions and len(st.session_state.messages) == 1:
+        starters = st.empty()
+        with starters.container():
+            st.markdown("<div class='suggested-questions'>", unsafe_allow_html=True)
+            st.markdown("**Try asking:**")
+            for idx, question in enumerate(STARTER_QUESTIONS):
+                if st.button(question, key=f"starter_{idx}", use_container_width=True):
+                    prompt = question
+            st.markdown("</div>", unsafe_allow_html=True)
+        if prompt:
+            # Answered in this run; no rerun needed to hide the buttons
+            st.session_state.show_suggestions = False
+            starters.empty()
 
-# Always show chat input
-user_input = st.chat_input("Ask a question about mutual funds...")
-if user_input:
-    prompt = user_input
+    # Always show chat input
+    user_input = st.chat_input("Ask a question about mutual funds...")
+    if user_input:
+        prompt = user_input
 
-# Handle User Input
-if prompt:
-    # Add user message to history
-    st.session_state.messages.append({"role": "user", "content": prompt})
-    with st.chat_message("user"):
-        st.markdown(prompt)
+    # Handle User Input
+    if prompt:
+        add_turn({"role": "user", "content": prompt})
+        recent.markdown(st.session_state.history_html[st.session_state.full_run_html_len:], unsafe_allow_html=True)
 
-    # Generate Response
-    with st.chat_message("assistant"):
+        # Generate Response
         with st.spinner("Analyzing documents..."):
             try:
-                # 1. Check for conversational triggers
-                conversational_triggers = {"ok", "okay", "thanks", "thank you", "got it", "thx", "cheers", "cool", "👍", "yes", "hi", "hello"}
-                cleaned_query = "".join(char for char in prompt.lower() if char.isalnum() or char.isspace()).strip()
-                
-                response_text = ""
-                first_source = None
-                suggestions = []
-
-                if cleaned_query in conversational_triggers:
-                    response_text = "You’re welcome! 🙂 What else would you like to know about mutual funds?"
-                else:
-                    # 2. Query Classification
-                    classification = classifier.classify(prompt)
-                    
-                    if classification['type'] == 'advisory':
-                        # Advisory question - polite refusal
-                        refusal = refusal_handler.get_refusal(prompt, classification)
-                        response_text = refusal['message']
-                        first_source = refusal['educational_link']
-                        suggestions = refusal['suggestions']
-                    else:
-                        # Factual question - proceed with RAG
-                        # 3. Retrieval
-                        chunks = retriever.retrieve(prompt, k=5)
-                        
-                        # Check if we have good chunks
-                        if not chunks or (chunks and chunks[0].get('score', 0) < 0.5):
-                            # No answer available
-                            response_text = "I don't know based on the provided sources 🙂 Try asking about specific fund details like expense ratio, SIP amount, or lock-in period."
-                            first_source = None  # NO SOURCE
-                            suggestions = suggestions_handler.get_no_answer_suggestions()
-                        else:
-                            # 4. Generation
-                            response_text = generator.generate_answer(prompt, chunks)
-                    
-                    # 5. Source Extraction (only for factual answers with chunks)
-                    if classification.get('type') == 'factual' and chunks and chunks[0].get('score', 0) >= 0.5:
-                        sources = [
-                            chunk.get('metadata', {}).get('source_url') or 
-                            chunk.get('metadata', {}).get('source_file')
-                            for chunk in chunks
-                        ]
-                        sources = [s for s in sources if s]
-                        
-                        if sources:
-                            first_source = sources[0]
-
-                # Display response
-                st.markdown(response_text)
-                
-                # Display source below the message (if available)
-                if first_source:
-                    if first_source.startswith("http"):
-                        from source_utils import get_source_display_name
-                        display_name = get_source_display_name(first_source)
-                        st.markdown(f'<div class="source-link">📎 Source: <a href="{first_source}" target="_blank">{display_name}</a></div>', unsafe_allow_html=True)
-                    else:
-                        st.markdown(f'<div class="source-link">📎 Source: {first_source}</div>', unsafe_allow_html=True)
-                
-                # Display suggestions if "I don't know"
-                if suggestions:
-                    st.markdown("\n\n**Try asking:**\n" + "\n".join([f"- {q}" for q in suggestions]))
-                
-                # Update History with source stored separately
-                st.session_state.messages.append({
-                    "role": "assistant", 
-                    "content": response_text,
-                    "source": first_source
+                # Conversational reply, classification/refusal, fact fast path,
+                # retrieval with score cut-off and generation
+                result = pipeline.run(prompt, session_id=st.session_state.session_id)
+                first_source = result['sources'][0] if result['sources'] else None
+                # Display name comes from the citation record built at index time
+                citation = pipeline.citation(result['citations'][0]) if result['citations'] else None
+                st.session_state.last_result = {
+                    'stage': result['stage'],
+                    'timings': result['timings'],
+                    'tokens': result['tokens'],
+                }
+                add_turn({
+                    "role": "assistant",
+                    "content": result['answer'],
+                    "source_html": source_link_html(first_source, citation),
+                    # Shown with "I don't know" answers
+                    "suggestions": result['suggestions'],
                 })
-                
+
             except Exception as e:
                 import traceback
                 error_details = traceback.format_exc()
                 error_msg = f"❌ Error: {type(e).__name__}: {str(e)}"
-                
+
                 # Log detailed error for debugging
                 st.error(error_msg)
                 with st.expander("🔍 Debug Details (click to expand)"):
                     st.code(error_details)
-                
-                st.session_state.messages.append({
-                    "role": "assistant", 
+
+                add_turn({
+                    "role": "assistant",
                     "content": f"Sorry, I encountered an error. Please check:\n\n1. API key is correctly set in Streamlit Cloud Secrets\n2. All dependencies are installed\n3. Vector database files are present\n\nError: {str(e)}"
                 })
+        recent.markdown(st.session_state.history_html[st.session_state.full_run_html_len:], unsafe_allow_html=True)
+
+    if os.getenv("MF_DEBUG_PANEL"):
+        show_debug_panel()
+
 
+conversation()
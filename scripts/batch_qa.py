@@ -0,0 +1,197 @@
+"""
+Answer a batch of questions from a JSONL file through the chat pipeline.
+
+All questions are embedded in batches and searched with one matrix
+multiply up front; answers are then generated with bounded concurrency and
+a client-side requests-per-minute limit (429s pause every worker). Results
+are appended to the output JSONL as they complete, so an interrupted run
+resumes where it stopped: questions whose latest output record has no
+error are skipped.
+
+Input lines are JSON objects with the question in `question` (or `query`,
+or the field given by --question-field) and an optional `id`/`request_id`.
+
+Usage:
+    python scripts/batch_qa.py questions.jsonl --output answers.jsonl
+    python scripts/batch_qa.py requests.jsonl --question-field title --concurrency 8 --rpm 60
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Set, Tuple
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from phase4_generation.llm_client import RateLimitedLLMClient
+from utils.answer_cache import is_failure
+
+
+def read_questions(path: str, question_field: Optional[str] = None,
+                   id_field: Optional[str] = None) -> List[Tuple[str, str]]:
+    """(id, question) pairs; the id falls back to the line number."""
+    items = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            fields = [question_field] if question_field else ['question', 'query']
+            question = next((record[field] for field in fields if record.get(field)), None)
+            if question is None:
+                raise ValueError(f"{path}:{line_number} has no question field ({', '.join(fields)})")
+            ids = [id_field] if id_field else ['id', 'request_id']
+            item_id = next((str(record[field]) for field in ids if record.get(field) is not None), str(line_number))
+            items.append((item_id, question))
+    return items
+
+
+def load_completed(path: str) -> Set[str]:
+    """Ids whose latest record in an existing output file is a success."""
+    latest: Dict[str, Dict[str, Any]] = {}
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # torn last line of an interrupted run
+            latest[record['id']] = record
+    return {item_id for item_id, record in latest.items() if 'error' not in record}
+
+
+class PrefetchedRetriever:
+    """
+    Retriever stand-in that serves query embeddings and top-k results
+    computed for the whole batch at once, delegating anything else.
+    """
+
+    def __init__(self, retriever):
+        self.retriever = retriever
+        self.model = retriever.model
+        self.embeddings: Dict[str, np.ndarray] = {}
+        self.results: Dict[str, List[Dict[str, Any]]] = {}
+        self.k = 0
+
+    def prefetch(self, queries: List[str], k: int):
+        queries = [query.strip() for query in queries]
+        embeddings = self.retriever.encode_queries(queries)
+        results = self.retriever.retrieve_batch(queries, k=k, query_embeddings=embeddings)
+        self.embeddings = dict(zip(queries, embeddings))
+        self.results = dict(zip(queries, results))
+        self.k = k
+
+    def encode_query(self, query: str) -> np.ndarray:
+        if query in self.embeddings:
+            return self.embeddings[query]
+        return self.retriever.encode_query(query)
+
+    def retrieve(self, query: str, k: int = 5, rerank: bool = False,
+                 query_embedding: Optional[np.ndarray] = None) -> List[Dict[str, Any]]:
+        if query in self.results and k <= self.k:
+            return self.results[query][:k]
+        return self.retriever.retrieve(query, k=k, rerank=rerank, query_embedding=query_embedding)
+
+    def __getattr__(self, name: str):
+        # citations, ids, refresh(), ... come from the wrapped retriever
+        return getattr(self.retriever, name)
+
+
+def answer_record(pipeline, item_id: str, question: str) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        result = pipeline.run(question)
+    except Exception as e:
+        return {'id': item_id, 'question': question, 'error': f"{type(e).__name__}: {e}"}
+    if is_failure(result['answer']):
+        # The generator reports LLM failures as answer text; record them as errors so a resumed run retries
+        return {'id': item_id, 'question': question, 'error': f"LLM failure: {result['answer'].splitlines()[0]}"}
+    return {
+        'id': item_id,
+        'question': question,
+        'answer': result['answer'],
+        'sources': result['sources'],
+        'type': result['type'],
+        'stage': result['stage'],
+        'tokens': result['tokens'],
+        'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+    }
+
+
+def run_batch(pipeline, items: List[Tuple[str, str]], output_path: str,
+              concurrency: int = 4, k: int = 5) -> Dict[str, Any]:
+    """Answer `items` not yet completed in `output_path`, appending one JSON line per answer."""
+    completed = load_completed(output_path)
+    pending = [(item_id, question) for item_id, question in items if item_id not in completed]
+    summary = {'total': len(items), 'skipped': len(items) - len(pending), 'answered': 0, 'failed': 0}
+    if not pending:
+        return summary
+
+    retriever = pipeline.retriever
+    if hasattr(retriever, 'retrieve_batch'):
+        prefetched = PrefetchedRetriever(retriever)
+        prefetched.prefetch([question for _, question in pending], max(k, pipeline.k))
+        pipeline.retriever = prefetched
+
+    # An interrupted run can leave a torn last line; start on a fresh one
+    if os.path.exists(output_path) and os.path.getsize(output_path):
+        with open(output_path, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+        if torn:
+            with open(output_path, 'a', encoding='utf-8') as f:
+                f.write("\n")
+
+    start = time.perf_counter()
+    try:
+        with open(output_path, 'a', encoding='utf-8') as out, \
+                ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-qa") as executor:
+            futures = [executor.submit(answer_record, pipeline, item_id, question) for item_id, question in pending]
+            for future in as_completed(futures):
+                # Only this thread writes; flush so a crash loses at most one line
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                summary['failed' if 'error' in record else 'answered'] += 1
+    finally:
+        pipeline.retriever = retriever
+
+    summary['seconds'] = round(time.perf_counter() - start, 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions")
+    parser.add_argument("input", help="JSONL file with one question per line")
+    parser.add_argument("--output", help="Results JSONL (default: <input>.answers.jsonl); appended to and resumed")
+    parser.add_argument("--question-field", help="Field holding the question (default: question, then query)")
+    parser.add_argument("--id-field", help="Field holding the id (default: id, then request_id, then line number)")
+    parser.add_argument("--concurrency", type=int, default=4, help="LLM calls in flight")
+    parser.add_argument("--rpm", type=float, default=30.0, help="LLM requests per minute (0 = unlimited)")
+    parser.add_argument("--k", type=int, default=5, help="Chunks retrieved per question")
+    parser.add_argument("--embeddings-dir", default=os.path.join(PROJECT_ROOT, "phase2_vector_db"))
+    args = parser.parse_args()
+
+    from utils.chat_pipeline import build_pipeline
+
+    output = args.output or os.path.splitext(args.input)[0] + ".answers.jsonl"
+    pipeline = build_pipeline(args.embeddings_dir, api_key=os.getenv("GROQ_API_KEY"),
+                              intent_method=os.getenv("MF_INTENT_CLASSIFIER"))
+    pipeline.k = args.k
+    if args.rpm > 0 and pipeline.generator.llm is not None:
+        pipeline.generator.llm = RateLimitedLLMClient(pipeline.generator.llm, args.rpm)
+
+    items = read_questions(args.input, args.question_field, args.id_field)
+    summary = run_batch(pipeline, items, output, concurrency=args.concurrency, k=args.k)
+    print(json.dumps(dict(summary, output=output), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Local stand-in for the Groq / OpenAI chat completions API.
+
+Serves POST /openai/v1/chat/completions (Groq SDK path) and
+/v1/chat/completions (OpenAI SDK path) with configurable time-to-first-token,
+token rate and streaming, so the backend and Streamlit app can be load-tested
+without network access or real tokens.
+
+Usage:
+    python scripts/fake_llm_server.py --port 8001 --ttft 0.3 --tokens-per-second 200
+
+    # Point the app at it (the Groq SDK reads GROQ_BASE_URL)
+    GROQ_BASE_URL=http://127.0.0.1:8001 GROQ_API_KEY=fake \\
+        python -m uvicorn phase5_chat_interface.backend.main:app --port 8000
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import argparse
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from phase4_generation.llm_client import count_tokens, fake_answer
+
+# Behaviour, overridable from the command line or environment
+CONFIG = {
+    'ttft': float(os.getenv("FAKE_LLM_TTFT", "0.2")),                     # seconds before the first token
+    'tokens_per_second': float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", "250")),
+    'jitter': float(os.getenv("FAKE_LLM_JITTER", "0.1")),                 # +/- fraction applied to ttft
+    'error_rate': float(os.getenv("FAKE_LLM_ERROR_RATE", "0")),           # share of requests answered with 500
+}
+
+app = FastAPI(title="Fake LLM server")
+
+
+def _usage(prompt_tokens: int, completion_tokens: int) -> dict:
+    return {
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'total_tokens': prompt_tokens + completion_tokens,
+    }
+
+
+def _ttft() -> float:
+    jitter = CONFIG['jitter'] * CONFIG['ttft']
+    return max(0.0, CONFIG['ttft'] + random.uniform(-jitter, jitter))
+
+
+def _split_tokens(text: str):
+    """Word-level pieces standing in for tokens (whitespace kept)."""
+    words = text.split(" ")
+    return [word if i == len(words) - 1 else word + " " for i, word in enumerate(words)]
+
+
+async def _stream(completion_id: str, model: str, answer: str, prompt_tokens: int):
+    created = int(time.time())
+    pieces = _split_tokens(answer)
+    delay = 1.0 / CONFIG['tokens_per_second'] if CONFIG['tokens_per_second'] else 0.0
+
+    await asyncio.sleep(_ttft())
+    for i, piece in enumerate(pieces):
+        chunk = {
+            'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+            'choices': [{'index': 0, 'delta': {'role': 'assistant', 'content': piece} if i == 0 else {'content': piece},
+                         'finish_reason': None}],
+        }
+        yield f"data: {json.dumps(chunk)}\n\n"
+        if i < len(pieces) - 1:
+            await asyncio.sleep(delay)
+
+    usage = _usage(prompt_tokens, count_tokens(answer))
+    final = {
+        'id': completion_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+        'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}],
+        'usage': usage,
+        'x_groq': {'id': completion_id, 'usage': usage},
+    }
+    yield f"data: {json.dumps(final)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/openai/v1/chat/completions")
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    if random.random() < CONFIG['error_rate']:
+        return JSONResponse(status_code=500, content={'error': {'message': "Injected failure", 'type': 'server_error'}})
+
+    messages = body.get('messages', [])
+    model = body.get('model', 'fake-llm')
+    prompt = " ".join(message.get('content', '') for message in messages)
+    answer = fake_answer(prompt)
+    prompt_tokens = count_tokens(prompt)
+    completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+
+    if body.get('stream'):
+        return StreamingResponse(_stream(completion_id, model, answer, prompt_tokens), media_type="text/event-stream")
+
+    completion_tokens = count_tokens(answer)
+    generation_time = completion_tokens / CONFIG['tokens_per_second'] if CONFIG['tokens_per_second'] else 0.0
+    await asyncio.sleep(_ttft() + generation_time)
+    return {
+        'id': completion_id,
+        'object': 'chat.completion',
+        'created': int(time.time()),
+        'model': model,
+        'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': answer}, 'finish_reason': 'stop'}],
+        'usage': _usage(prompt_tokens, completion_tokens),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Groq/OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ttft", type=float, default=CONFIG['ttft'], help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=CONFIG['tokens_per_second'])
+    parser.add_argument("--jitter", type=float, default=CONFIG['jitter'], help="+/- fraction of ttft")
+    parser.add_argument("--error-rate", type=float, default=CONFIG['error_rate'], help="Share of requests failing with 500")
+    args = parser.parse_args()
+
+    CONFIG.update(ttft=args.ttft, tokens_per_second=args.tokens_per_second,
+                  jitter=args.jitter, error_rate=args.error_rate)
+
+    import uvicorn
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
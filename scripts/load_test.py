@@ -0,0 +1,116 @@
+"""
+Open-loop load generator for the FastAPI backend.
+
+Sends /chat requests at a fixed target rate (independent of how fast the
+server answers, so queueing shows up in the latencies) and reports the
+latency distribution, achieved throughput and errors.
+
+Usage:
+    python scripts/load_test.py --url http://127.0.0.1:8000/chat --rps 20 --duration 30
+    python scripts/load_test.py --rps 50 --duration 60 --output load_results.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import numpy as np
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUESTION_SET_PATH = os.path.join(PROJECT_ROOT, "tests", "data", "question_set.json")
+
+
+def load_questions(path: str = QUESTION_SET_PATH) -> List[str]:
+    with open(path, 'r', encoding='utf-8') as f:
+        return [item['question'] for item in json.load(f)['questions']]
+
+
+def summarize(records: List[Dict[str, Any]], elapsed: float, target_rps: float) -> Dict[str, Any]:
+    """Latency percentiles (ms) over successful requests plus throughput and error counts."""
+    ok = [record['latency'] * 1000 for record in records if record['status'] == 200]
+    statuses: Dict[str, int] = {}
+    for record in records:
+        statuses[str(record['status'])] = statuses.get(str(record['status']), 0) + 1
+
+    summary = {
+        'target_rps': target_rps,
+        'sent': len(records),
+        'succeeded': len(ok),
+        'failed': len(records) - len(ok),
+        'achieved_rps': round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        'statuses': statuses,
+    }
+    if ok:
+        latencies = np.array(ok)
+        summary.update({
+            'mean_ms': round(float(latencies.mean()), 1),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 1),
+            'p90_ms': round(float(np.percentile(latencies, 90)), 1),
+            'p95_ms': round(float(np.percentile(latencies, 95)), 1),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 1),
+            'max_ms': round(float(latencies.max()), 1),
+        })
+    return summary
+
+
+def run_load(url: str, questions: List[str], rps: float, duration: float,
+             max_workers: int = 256, timeout: float = 60.0) -> Dict[str, Any]:
+    records = []
+    lock = threading.Lock()
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def send(index: int, question: str):
+        start = time.perf_counter()
+        try:
+            response = session.post(url, json={'message': question, 'session_id': f"load-{index}"}, timeout=timeout)
+            status = response.status_code
+        except requests.RequestException as e:
+            status = type(e).__name__
+        with lock:
+            records.append({'status': status, 'latency': time.perf_counter() - start})
+
+    total = int(rps * duration)
+    interval = 1.0 / rps
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for i in range(total):
+            # Fixed schedule: request i leaves at start + i * interval
+            delay = start + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, i, random.choice(questions))
+    elapsed = time.perf_counter() - start
+    return summarize(records, elapsed, rps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive the /chat endpoint at a target request rate")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/chat")
+    parser.add_argument("--rps", type=float, default=10.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of load")
+    parser.add_argument("--workers", type=int, default=256, help="Maximum requests in flight")
+    parser.add_argument("--questions", default=QUESTION_SET_PATH, help="Question set JSON")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the summary as JSON")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    summary = run_load(args.url, load_questions(args.questions), args.rps, args.duration, args.workers)
+
+    for key, value in summary.items():
+        print(f"{key:<14} {value}")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Precompute answers for every suggested question after an index publish.
+
+Runs each starter button, suggestion-bank and refusal-alternative question
+through the chat pipeline (bypassing the cache) and writes the answers to
+phase2_vector_db/answer_cache.json, stamped with the index fingerprint so a
+later rebuild of the index invalidates them.
+
+Usage:
+    python scripts/warm_answer_cache.py
+    python scripts/warm_answer_cache.py --embeddings-dir phase2_vector_db --force
+"""
+import os
+import sys
+import json
+import argparse
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from utils.chat_pipeline import build_pipeline
+from utils.answer_cache import warm_answer_cache
+from utils.suggestions import all_suggested_questions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for the suggested questions")
+    parser.add_argument("--embeddings-dir", default=os.path.join(PROJECT_ROOT, "phase2_vector_db"))
+    parser.add_argument("--force", action="store_true", help="Recompute even if the cache matches the index")
+    args = parser.parse_args()
+
+    pipeline = build_pipeline(args.embeddings_dir, api_key=os.getenv("GROQ_API_KEY"),
+                              intent_method=os.getenv("MF_INTENT_CLASSIFIER"))
+    cache = pipeline.answer_cache
+    if not cache.stale and not args.force:
+        print(f"Answer cache is current ({len(cache)} answers, index {cache.index_version})")
+        return
+
+    summary = warm_answer_cache(pipeline, cache, all_suggested_questions())
+    print(json.dumps(dict(summary, index_version=cache.index_version), indent=2))
+
+
+if __name__ == "__main__":
+    main()
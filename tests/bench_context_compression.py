@@ -0,0 +1,157 @@
+"""
+Offline answer-evidence benchmark for sentence-level context compression.
+
+For every labelled question with a fact_field, retrieves the top k chunks
+and checks whether the value stored in the fact table (the percentages of an
+expense ratio, the riskometer level, the benchmark name, ...) still appears
+in the context the LLM would see: whole chunks (today's prompt) and
+ContextBuilder output at each token budget. Reports fact recall and context
+tokens per configuration and the smallest budget that keeps recall within
+--max-recall-drop of whole chunks. No LLM call; needs the embedding model.
+
+Usage:
+    python tests/bench_context_compression.py
+    python tests/bench_context_compression.py --budgets 400 800 1200 --k 5
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from phase2_vector_db.fact_table import FactTable, fact_table_path
+from phase4_generation.llm_client import count_tokens
+from phase4_generation.generation_pipeline import AnswerGenerator
+
+QUESTION_SET_PATH = os.path.join(PROJECT_ROOT, "tests", "data", "question_set.json")
+EMBEDDINGS_DIR = os.path.join(PROJECT_ROOT, "phase2_vector_db")
+
+PERCENT = re.compile(r'\d+(?:\.\d+)?%')
+DIGITS = re.compile(r'\d[\d,]*')
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def fact_evidence(fact: Dict[str, Any]) -> List[str]:
+    """Strings a context must contain to answer the fact's question ([] when the fact has no checkable value)."""
+    value = fact['value']
+    if fact['field'] == 'expense_ratio':
+        return [value['regular'], value['direct']]
+    if fact['field'] == 'riskometer':
+        return [value['level']]
+    if not isinstance(value, str) or value == 'NA':
+        return []
+    if fact['field'] == 'exit_load':
+        return sorted(set(PERCENT.findall(value))) or ['nil']
+    if fact['field'] == 'min_sip':
+        return DIGITS.findall(value)[:1]
+    return [value]
+
+
+def contains_evidence(context: str, evidence: List[str]) -> bool:
+    context = _normalize(context)
+    return all(_normalize(item) in context for item in evidence)
+
+
+def load_fact_questions(table: FactTable, path: str = QUESTION_SET_PATH) -> List[Dict[str, Any]]:
+    """Labelled questions whose fact is in the table, with the evidence their context must hold."""
+    with open(path, 'r', encoding='utf-8') as f:
+        questions = json.load(f)['questions']
+    items = []
+    for item in questions:
+        schemes = item.get('relevant', {}).get('schemes', [])
+        if not item.get('fact_field') or len(schemes) != 1:
+            continue
+        fact = table.get(schemes[0], item['fact_field'])
+        evidence = fact_evidence(fact) if fact else []
+        if evidence:
+            items.append({'question': item['question'], 'evidence': evidence})
+    return items
+
+
+def evaluate(questions: List[Dict[str, Any]], retrieve, build_context) -> Dict[str, Any]:
+    """
+    retrieve(query) -> (chunks, query_embedding); build_context(query, chunks,
+    query_embedding) -> context string. Returns fact_recall (share of
+    questions whose context holds all their evidence), mean and p95 context
+    tokens, and the questions that lost their evidence.
+    """
+    found, tokens, misses = [], [], []
+    for item in questions:
+        chunks, query_embedding = retrieve(item['question'])
+        context = build_context(item['question'], chunks, query_embedding)
+        hit = contains_evidence(context, item['evidence'])
+        found.append(hit)
+        tokens.append(count_tokens(context) if context else 0)
+        if not hit:
+            misses.append(item['question'])
+    return {
+        'num_questions': len(questions),
+        'fact_recall': round(float(np.mean(found)), 4) if found else 0.0,
+        'mean_tokens': round(float(np.mean(tokens)), 1) if tokens else 0.0,
+        'p95_tokens': round(float(np.percentile(tokens, 95)), 1) if tokens else 0.0,
+        'misses': misses,
+    }
+
+
+def recommend_budget(results: Dict[str, Dict[str, Any]], max_recall_drop: float) -> Optional[int]:
+    """Smallest budget whose fact recall is within max_recall_drop of whole chunks, or None."""
+    floor = results['full']['fact_recall'] - max_recall_drop
+    budgets = sorted(int(name) for name in results if name != 'full')
+    return next((budget for budget in budgets if results[str(budget)]['fact_recall'] >= floor), None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fact recall and context size with and without compression")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[400, 600, 800, 1200])
+    parser.add_argument("--max-recall-drop", type=float, default=0.0)
+    args = parser.parse_args()
+
+    from phase3_retrieval.retrieval_pipeline import RetrievalSystem
+    from phase4_generation.context_builder import ContextBuilder
+
+    retriever = RetrievalSystem(EMBEDDINGS_DIR)
+    questions = load_fact_questions(FactTable.load(fact_table_path(EMBEDDINGS_DIR)))
+
+    retrieved = {}
+
+    def retrieve(query: str):
+        # Same chunks for every configuration
+        if query not in retrieved:
+            query_embedding = retriever.encode_query(query)
+            retrieved[query] = (retriever.retrieve(query, k=args.k, query_embedding=query_embedding), query_embedding)
+        return retrieved[query]
+
+    results = {'full': evaluate(questions, retrieve,
+                                lambda query, chunks, embedding: AnswerGenerator._build_context_str(chunks))}
+    for budget in args.budgets:
+        builder = ContextBuilder(retriever.model, token_budget=budget)
+        results[str(budget)] = evaluate(questions, retrieve,
+                                        lambda query, chunks, embedding: builder.build(query, chunks, embedding)['context'])
+
+    print(f"{len(questions)} fact questions, top {args.k} chunks")
+    print(f"  {'context':<10} {'fact_recall':>11} {'mean_tokens':>12} {'p95_tokens':>11}")
+    for name, result in results.items():
+        print(f"  {name:<10} {result['fact_recall']:>11} {result['mean_tokens']:>12} {result['p95_tokens']:>11}")
+    for name, result in results.items():
+        if result['misses']:
+            print(f"  misses ({name}): {', '.join(result['misses'])}")
+
+    budget = recommend_budget(results, args.max_recall_drop)
+    if budget is None:
+        print("No budget keeps fact recall; leave compression off.")
+    else:
+        print(f"Smallest budget keeping fact recall: {budget} (AnswerGenerator(context_builder=ContextBuilder(model, "
+              f"token_budget={budget})))")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+HTML extraction benchmark: the original BeautifulSoup/html.parser path
+against the lxml extractor configured for each source in resource_registry.json.
+Reports parse time and extracted text size per saved page; text the new path
+drops is menus, cookie banners and other boilerplate that used to become chunks.
+
+Pages are read from --pages (one .html file per registry resource, named
+after the resource); --fetch downloads the registry's HTML pages there first.
+
+Usage:
+    python tests/bench_html_extraction.py --fetch
+    python tests/bench_html_extraction.py [--pages DIR] [--repeat 20]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+import requests
+
+from phase1_data_collection.html_extract import extract_text, extract_legacy
+
+REGISTRY_PATH = os.path.join(PROJECT_ROOT, "phase1_data_collection", "resources", "resource_registry.json")
+PAGES_DIR = os.path.join(PROJECT_ROOT, "tests", "data", "html_pages")
+
+
+def page_filename(resource_name: str) -> str:
+    return re.sub(r'[^\w\-]+', '_', resource_name).lower() + ".html"
+
+
+def html_resources():
+    with open(REGISTRY_PATH, 'r', encoding='utf-8') as f:
+        return [resource for resource in json.load(f) if not resource['url'].lower().endswith('.pdf')]
+
+
+def fetch_pages(pages_dir: str):
+    os.makedirs(pages_dir, exist_ok=True)
+    for resource in html_resources():
+        response = requests.get(resource['url'], timeout=30)
+        response.raise_for_status()
+        with open(os.path.join(pages_dir, page_filename(resource['resource_name'])), 'w', encoding='utf-8') as f:
+            f.write(response.text)
+        print(f"Saved {resource['resource_name']} ({len(response.text):,} bytes)")
+
+
+def measure(fn, html, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = fn(html)
+        times.append(time.perf_counter() - start)
+    # Size as it reaches chunking: whitespace collapsed like clean_text
+    return statistics.median(times) * 1000, len(re.sub(r'\s+', ' ', text).strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTML extraction parse time and text size")
+    parser.add_argument("--pages", default=PAGES_DIR, help="Directory of saved pages")
+    parser.add_argument("--fetch", action="store_true", help="Download the registry's HTML pages first")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs per page (median is reported)")
+    args = parser.parse_args()
+
+    if args.fetch:
+        fetch_pages(args.pages)
+
+    rows = []
+    for resource in html_resources():
+        path = os.path.join(args.pages, page_filename(resource['resource_name']))
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            html = f.read()
+        legacy_ms, legacy_chars = measure(extract_legacy, html, args.repeat)
+        lxml_ms, lxml_chars = measure(lambda page: extract_text(page, resource), html, args.repeat)
+        rows.append((resource['resource_name'], resource.get('html_extractor', 'readability'),
+                     len(html), legacy_ms, lxml_ms, legacy_chars, lxml_chars))
+    if not rows:
+        print(f"No saved pages in {args.pages}; run with --fetch")
+        return
+
+    print(f"{'page':<45} {'mode':<12} {'KB':>6} {'legacy ms':>10} {'lxml ms':>8} {'legacy chars':>13} {'lxml chars':>11}")
+    for name, mode, size, legacy_ms, lxml_ms, legacy_chars, lxml_chars in rows:
+        print(f"{name[:45]:<45} {mode:<12} {size / 1024:>6.0f} {legacy_ms:>10.2f} {lxml_ms:>8.2f} "
+              f"{legacy_chars:>13,} {lxml_chars:>11,}")
+    legacy_total = sum(row[3] for row in rows)
+    lxml_total = sum(row[4] for row in rows)
+    print(f"Total parse time: {legacy_total:.1f} ms -> {lxml_total:.1f} ms ({legacy_total / lxml_total:.1f}x)")
+    print(f"Total text: {sum(row[5] for row in rows):,} -> {sum(row[6] for row in rows):,} chars")
+
+
+if __name__ == "__main__":
+    main()
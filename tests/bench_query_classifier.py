@@ -0,0 +1,49 @@
+"""
+Throughput benchmark for batch classification of query logs.
+Compares the compiled QueryClassifier with the original per-pattern loop.
+
+Usage: python tests/bench_query_classifier.py [--repeat 200] [--log queries.txt]
+"""
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from phase3_retrieval.query_classifier import QueryClassifier
+from test_query_classifier import load_questions, reference_classify
+
+
+def measure(fn, queries):
+    start = time.perf_counter()
+    fn(queries)
+    elapsed = time.perf_counter() - start
+    return len(queries) / elapsed, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query classifier throughput benchmark")
+    parser.add_argument("--repeat", type=int, default=200, help="Times the question set is replayed")
+    parser.add_argument("--log", help="Query log with one query per line (defaults to the question set)")
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, 'r', encoding='utf-8') as f:
+            base_queries = [line.strip() for line in f if line.strip()]
+    else:
+        base_queries = load_questions()
+    queries = base_queries * args.repeat
+
+    classifier = QueryClassifier()
+    legacy_qps, legacy_s = measure(lambda qs: [reference_classify(classifier, q) for q in qs], queries)
+    compiled_qps, compiled_s = measure(classifier.classify_batch, queries)
+
+    print(f"Queries classified: {len(queries)}")
+    print(f"Per-pattern loop : {legacy_qps:>12,.0f} queries/s ({legacy_s:.3f}s)")
+    print(f"Compiled         : {compiled_qps:>12,.0f} queries/s ({compiled_s:.3f}s)")
+    print(f"Speedup          : {compiled_qps / legacy_qps:>12.1f}x")
+
+
+if __name__ == "__main__":
+    main()
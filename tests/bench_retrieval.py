@@ -0,0 +1,199 @@
+"""
+Offline retrieval benchmark and regression check over the labelled question set.
+
+Replays tests/data/question_set.json against RetrievalSystem (optionally
+through the shared chat pipeline with a stubbed generator) and reports
+recall@k, MRR, latency percentiles, queries/second and peak RSS. Results are
+compared with a JSON baseline; the script exits with status 1 when quality
+drops or latency grows beyond the thresholds.
+
+Usage:
+    python tests/bench_retrieval.py                      # compare with baseline
+    python tests/bench_retrieval.py --update-baseline    # record a new baseline
+    python tests/bench_retrieval.py --compression int8 --pipeline
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import numpy as np
+from typing import List, Dict, Any, Optional
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from phase2_vector_db.fact_table import resolve_schemes
+
+QUESTION_SET_PATH = os.path.join(PROJECT_ROOT, "tests", "data", "question_set.json")
+BASELINE_PATH = os.path.join(PROJECT_ROOT, "tests", "data", "retrieval_baseline.json")
+EMBEDDINGS_DIR = os.path.join(PROJECT_ROOT, "phase2_vector_db")
+
+# Metrics where a larger value is better; everything else is a cost
+QUALITY_METRICS = ['recall_at_k', 'mrr']
+LATENCY_METRICS = ['p50_ms', 'p95_ms', 'p99_ms']
+
+
+class StubGenerator:
+    """Stands in for AnswerGenerator so pipeline overhead is measured without an LLM."""
+
+    def generate_answer(self, query: str, retrieved_chunks: List[Dict[str, Any]], query_embedding=None) -> str:
+        return retrieved_chunks[0]['text'][:200] if retrieved_chunks else ""
+
+
+def load_labelled_questions(path: str = QUESTION_SET_PATH) -> List[Dict[str, Any]]:
+    """Questions with a 'relevant' label (advisory questions have none)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [item for item in json.load(f)['questions'] if item.get('relevant')]
+
+
+def is_relevant(chunk: Dict[str, Any], relevant: Dict[str, List[str]]) -> bool:
+    """
+    A chunk is relevant when its source URL contains one of the expected
+    substrings and it belongs to one of the expected schemes (either list may
+    be empty, meaning 'any').
+    """
+    metadata = chunk.get('metadata', {})
+    source_url = metadata.get('source_url') or metadata.get('source_file') or ''
+    if relevant.get('sources') and not any(s in source_url for s in relevant['sources']):
+        return False
+    if relevant.get('schemes'):
+        # Shared documents (e.g. the expense ratio table) carry no scheme label
+        chunk_schemes = resolve_schemes(metadata.get('scheme', '')) or resolve_schemes(chunk.get('text', '').lower())
+        return bool(set(chunk_schemes) & set(relevant['schemes']))
+    return True
+
+
+def first_relevant_rank(chunks: List[Dict[str, Any]], relevant: Dict[str, List[str]]) -> Optional[int]:
+    for rank, chunk in enumerate(chunks, start=1):
+        if is_relevant(chunk, relevant):
+            return rank
+    return None
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def evaluate(search, questions: List[Dict[str, Any]], k: int = 5, warmup: int = 3) -> Dict[str, Any]:
+    """
+    Run every question through search(query, k) -> chunks.
+
+    Returns recall_at_k (share of questions with a relevant chunk in the
+    top k), mrr, latency percentiles in ms, qps and peak RSS in MB.
+    """
+    for item in questions[:warmup]:
+        search(item['question'], k)
+
+    latencies, reciprocal_ranks, misses = [], [], []
+    start = time.perf_counter()
+    for item in questions:
+        query_start = time.perf_counter()
+        chunks = search(item['question'], k)
+        latencies.append(time.perf_counter() - query_start)
+
+        rank = first_relevant_rank(chunks[:k], item['relevant'])
+        reciprocal_ranks.append(1.0 / rank if rank else 0.0)
+        if rank is None:
+            misses.append(item['question'])
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        'num_questions': len(questions),
+        'k': k,
+        'recall_at_k': round(float(np.mean([rr > 0 for rr in reciprocal_ranks])), 4),
+        'mrr': round(float(np.mean(reciprocal_ranks)), 4),
+        'p50_ms': round(float(np.percentile(latencies_ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(latencies_ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(latencies_ms, 99)), 3),
+        'qps': round(len(questions) / elapsed, 2),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'misses': misses,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], max_quality_drop: float = 0.02,
+            max_latency_increase: float = 0.25) -> List[str]:
+    """
+    Regressions of results against baseline, as readable messages.
+    Quality may drop by at most max_quality_drop (absolute); latency and
+    memory may grow by at most max_latency_increase (relative), qps may
+    shrink by the same fraction.
+    """
+    regressions = []
+    for metric in QUALITY_METRICS:
+        if results[metric] < baseline[metric] - max_quality_drop:
+            regressions.append(f"{metric} dropped from {baseline[metric]} to {results[metric]}")
+    for metric in LATENCY_METRICS + ['peak_rss_mb']:
+        if results[metric] > baseline[metric] * (1 + max_latency_increase):
+            regressions.append(f"{metric} grew from {baseline[metric]} to {results[metric]}")
+    if results['qps'] < baseline['qps'] * (1 - max_latency_increase):
+        regressions.append(f"qps fell from {baseline['qps']} to {results['qps']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval quality/speed benchmark with baseline regression check")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--compression", choices=['float16', 'int8', 'pq'], help="Search compressed embeddings")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Run through the shared chat pipeline with a stub generator")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--name", help="Baseline entry name (defaults to the configuration)")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--max-quality-drop", type=float, default=0.02)
+    parser.add_argument("--max-latency-increase", type=float, default=0.25)
+    args = parser.parse_args()
+
+    from phase3_retrieval.retrieval_pipeline import RetrievalSystem
+
+    retriever = RetrievalSystem(EMBEDDINGS_DIR, compression=args.compression)
+    search = lambda query, k: retriever.retrieve(query, k=k)
+    if args.pipeline:
+        from utils.chat_pipeline import ChatPipeline
+        # Threshold 0 so every question reaches retrieval and generation
+        pipeline = ChatPipeline(retriever, StubGenerator(), k=args.k, score_threshold=0.0)
+        search = lambda query, k: pipeline.run(query)['chunks']
+
+    name = args.name or "-".join(filter(None, ['retrieve', args.compression, 'pipeline' if args.pipeline else None]))
+    results = evaluate(search, load_labelled_questions(), k=args.k)
+
+    print(f"Configuration: {name}")
+    for metric in ['num_questions', 'recall_at_k', 'mrr', 'p50_ms', 'p95_ms', 'p99_ms', 'qps', 'peak_rss_mb']:
+        print(f"  {metric:<14} {results[metric]}")
+    if results['misses']:
+        print(f"  misses ({len(results['misses'])}):")
+        for question in results['misses']:
+            print(f"    - {question}")
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baselines = json.load(f)
+
+    if args.update_baseline:
+        baselines[name] = {key: value for key, value in results.items() if key != 'misses'}
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(baselines, f, indent=2)
+        print(f"Baseline '{name}' saved to {args.baseline}")
+        return
+
+    if name not in baselines:
+        print(f"No baseline '{name}' in {args.baseline}; run with --update-baseline to record one.")
+        return
+
+    regressions = compare(results, baselines[name], args.max_quality_drop, args.max_latency_increase)
+    if regressions:
+        print("REGRESSIONS:")
+        for message in regressions:
+            print(f"  - {message}")
+        sys.exit(1)
+    print("No regressions against baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Throughput benchmark: RetrievalSystem.retrieve in a loop versus retrieve_batch.
+
+With the real index, every question of tests/data/question_set.json is
+answered both ways, end to end (encode + search) and search only (query
+embeddings computed up front). --synthetic replaces the index with a random
+corpus so the search kernels can be compared without the embedding model.
+
+Usage:
+    python tests/bench_retrieve_batch.py
+    python tests/bench_retrieve_batch.py --repeat 5 --output batch_bench.json
+    python tests/bench_retrieve_batch.py --synthetic 100000 --queries 1000
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+from typing import Callable, Dict, Any
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from phase3_retrieval.retrieval_pipeline import blocked_top_k
+
+QUESTION_SET_PATH = os.path.join(PROJECT_ROOT, "tests", "data", "question_set.json")
+EMBEDDINGS_DIR = os.path.join(PROJECT_ROOT, "phase2_vector_db")
+
+
+def throughput(fn: Callable[[], Any], n_queries: int, repeat: int) -> Dict[str, float]:
+    """Best-of-`repeat` wall time of fn() as queries/second."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return {'seconds': round(best, 4), 'qps': round(n_queries / best, 1)}
+
+
+def speedups(results: Dict[str, Dict[str, float]], pairs) -> Dict[str, float]:
+    return {f"{batch}_vs_{loop}": round(results[batch]['qps'] / results[loop]['qps'], 2) for loop, batch in pairs}
+
+
+def bench_index(k: int, repeat: int) -> Dict[str, Any]:
+    from phase3_retrieval.retrieval_pipeline import RetrievalSystem
+
+    with open(QUESTION_SET_PATH, 'r', encoding='utf-8') as f:
+        queries = [item['question'] for item in json.load(f)['questions']]
+    retriever = RetrievalSystem(EMBEDDINGS_DIR)
+    retriever.retrieve_batch(queries[:2], k=k)  # warm-up (model, normalized corpus)
+    embeddings = retriever.encode_queries(queries)
+
+    results = {
+        'loop': throughput(lambda: [retriever.retrieve(q, k=k) for q in queries], len(queries), repeat),
+        'batch': throughput(lambda: retriever.retrieve_batch(queries, k=k), len(queries), repeat),
+        'loop_search_only': throughput(
+            lambda: [retriever.retrieve(q, k=k, query_embedding=e) for q, e in zip(queries, embeddings)],
+            len(queries), repeat),
+        'batch_search_only': throughput(
+            lambda: retriever.retrieve_batch(queries, k=k, query_embeddings=embeddings), len(queries), repeat),
+    }
+    results['speedup'] = speedups(results, [('loop', 'batch'), ('loop_search_only', 'batch_search_only')])
+    return dict(results, queries=len(queries), corpus=len(retriever.ids), k=k)
+
+
+def bench_synthetic(corpus_size: int, n_queries: int, dim: int, k: int, repeat: int) -> Dict[str, Any]:
+    rng = np.random.default_rng(0)
+    corpus = rng.standard_normal((corpus_size, dim)).astype(np.float32)
+    corpus /= np.linalg.norm(corpus, axis=1, keepdims=True)
+    queries = rng.standard_normal((n_queries, dim)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    def loop():
+        for query in queries:
+            scores = corpus @ query
+            top = np.argpartition(-scores, k - 1)[:k]
+            top[np.argsort(-scores[top])]
+
+    results = {
+        'loop': throughput(loop, n_queries, repeat),
+        'batch': throughput(lambda: blocked_top_k(queries, corpus, k), n_queries, repeat),
+        'batch_small_blocks': throughput(lambda: blocked_top_k(queries, corpus, k, query_block=64, corpus_block=16384),
+                                         n_queries, repeat),
+    }
+    results['speedup'] = speedups(results, [('loop', 'batch'), ('loop', 'batch_small_blocks')])
+    return dict(results, queries=n_queries, corpus=corpus_size, dim=dim, k=k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare looped retrieve() with retrieve_batch()")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant (best is reported)")
+    parser.add_argument("--synthetic", type=int, metavar="CORPUS_SIZE",
+                        help="Benchmark the search kernels on a random corpus instead of the index")
+    parser.add_argument("--queries", type=int, default=500, help="Synthetic query count")
+    parser.add_argument("--dim", type=int, default=384, help="Synthetic embedding dimension")
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    if args.synthetic:
+        results = bench_synthetic(args.synthetic, args.queries, args.dim, args.k, args.repeat)
+    else:
+        results = bench_index(args.k, args.repeat)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Rerun cost of the Streamlit app as the conversation grows.
+
+Drives phase_6_streamlit_app/app.py headlessly with streamlit's AppTest and a
+stub pipeline (no index, model or LLM), then reports how long a script rerun
+takes with 0, 10, 50... turns of history. AppTest always reruns the whole
+script, so this measures full reruns; interactions inside the conversation
+fragment skip the header, CSS and history entirely in a real session.
+
+Usage:
+    python tests/bench_streamlit_rerun.py [--turns 10 50 100] [--repeat 5]
+    git show HEAD~1:phase_6_streamlit_app/app.py > phase_6_streamlit_app/app_before.py
+    python tests/bench_streamlit_rerun.py --compare phase_6_streamlit_app/app_before.py
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+from unittest.mock import patch
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from streamlit.testing.v1 import AppTest
+
+import utils.chat_pipeline
+
+APP_PATH = os.path.join(PROJECT_ROOT, "phase_6_streamlit_app", "app.py")
+
+ANSWER = """The **exit load** for HDFC Mid Cap Fund is:
+
+- 1% if redeemed within 1 year from the date of allotment
+- Nil if redeemed after 1 year
+
+| Scheme | Expense ratio |
+|---|---|
+| Direct | 0.74% |
+| Regular | 1.39% |
+
+Last updated from the scheme's KIM."""
+
+
+class StubAnswerCache:
+    stale = False
+
+
+class StubPipeline:
+    """Returns a fixed, realistically sized answer for every question."""
+
+    answer_cache = StubAnswerCache()
+
+    def run(self, question, session_id=None):
+        return {'answer': ANSWER, 'sources': ["https://files.hdfcfund.com/kim.pdf"], 'citations': [0],
+                'stage': 'generate', 'timings': {'retrieve': 0.01, 'generate': 0.2}, 'tokens': {},
+                'suggestions': []}
+
+    def citation(self, citation_id):
+        return {'display_name': "HDFC Mid Cap Fund - KIM", 'url': "https://files.hdfcfund.com/kim.pdf", 'page': None}
+
+
+def timed_run(app, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        app.run(timeout=60)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def measure(app_path, turns, repeat):
+    """Median ms of a plain rerun and of a rerun that adds a turn, at each history length."""
+    results = {}
+    with patch.object(utils.chat_pipeline, 'build_pipeline', return_value=StubPipeline()):
+        app = AppTest.from_file(app_path, default_timeout=60)
+        app.secrets["GROQ_API_KEY"] = "unused"
+        app.run()
+        asked = 0
+        for target in sorted(turns):
+            while asked < target:
+                app.chat_input[0].set_value(f"Question {asked}?").run()
+                asked += 1
+            rerun_ms = timed_run(app, repeat)
+            start = time.perf_counter()
+            app.chat_input[0].set_value(f"Question {asked}?").run()
+            asked += 1
+            results[target] = {'rerun_ms': rerun_ms, 'new_turn_ms': (time.perf_counter() - start) * 1000}
+            if app.exception:
+                raise RuntimeError(app.exception[0].message)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streamlit rerun cost against conversation length")
+    parser.add_argument("--turns", type=int, nargs="+", default=[0, 10, 50, 100])
+    parser.add_argument("--repeat", type=int, default=5, help="Reruns per measurement (median is reported)")
+    parser.add_argument("--compare", help="Another version of app.py to measure alongside")
+    args = parser.parse_args()
+
+    apps = [("current", APP_PATH)] + ([("compare", os.path.abspath(args.compare))] if args.compare else [])
+    measured = {label: measure(path, args.turns, args.repeat) for label, path in apps}
+
+    print(f"{'app':<8} {'turns':>6} {'rerun ms':>10} {'new turn ms':>12}")
+    for label, results in measured.items():
+        for turns, row in results.items():
+            print(f"{label:<8} {turns:>6} {row['rerun_ms']:>10.1f} {row['new_turn_ms']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Memory per worker: local model + in-process index versus shared embedding
+service + memory-mapped index.
+
+Starts N worker processes for each mode, each building the RetrievalSystem
+the way the backend does and answering a few queries, then reads RSS, PSS
+(shared pages split between the processes mapping them) and USS (private
+memory) from /proc/<pid>/smaps_rollup while all workers are alive. In the
+shared mode the embedding service process is included in the total.
+Linux only (needs /proc).
+
+Usage:
+    python tests/bench_worker_memory.py --workers 4
+    python tests/bench_worker_memory.py --workers 8 --mode shared --output memory.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import tempfile
+import argparse
+import subprocess
+import multiprocessing
+from typing import Dict, Any, List
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, PROJECT_ROOT)
+
+from phase3_retrieval.embedding_service import parse_address
+
+EMBEDDINGS_DIR = os.path.join(PROJECT_ROOT, "phase2_vector_db")
+SERVICE_SCRIPT = os.path.join(PROJECT_ROOT, "phase3_retrieval", "embedding_service.py")
+QUERIES = [
+    "What is the expense ratio of HDFC Mid Cap Fund?",
+    "What is the exit load of HDFC Small Cap Fund?",
+    "How do I download my capital gains statement?",
+]
+
+
+def memory_mb(pid: int) -> Dict[str, float]:
+    """RSS, PSS and USS in MB from smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup", 'r') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == 'kB':
+                fields[parts[0].rstrip(':')] = int(parts[1]) / 1024
+    return {
+        'rss_mb': round(fields.get('Rss', 0.0), 1),
+        'pss_mb': round(fields.get('Pss', 0.0), 1),
+        'uss_mb': round(fields.get('Private_Clean', 0.0) + fields.get('Private_Dirty', 0.0), 1),
+    }
+
+
+def worker(service_address, loaded, measured, results):
+    from phase3_retrieval.retrieval_pipeline import RetrievalSystem
+
+    if service_address:
+        from phase3_retrieval.embedding_service import RemoteEncoder
+        retriever = RetrievalSystem(EMBEDDINGS_DIR, encoder=RemoteEncoder(service_address), mmap_index=True)
+    else:
+        retriever = RetrievalSystem(EMBEDDINGS_DIR)
+    for query in QUERIES:
+        retriever.retrieve(query, k=5)
+
+    loaded.wait()   # everyone mapped and warmed: PSS now reflects the sharing
+    results.put(memory_mb(os.getpid()))
+    measured.wait()
+
+
+def start_service(address: str, timeout: float = 300.0) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, SERVICE_SCRIPT, "--address", address])
+    family, target = parse_address(address)
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("Embedding service exited during startup")
+        try:
+            with socket.socket(family, socket.SOCK_STREAM) as sock:
+                sock.connect(target)
+            return process
+        except OSError:
+            time.sleep(0.5)
+    process.kill()
+    raise TimeoutError("Embedding service did not start")
+
+
+def run_mode(mode: str, n_workers: int) -> Dict[str, Any]:
+    ctx = multiprocessing.get_context('spawn')
+    service = None
+    address = None
+    if mode == 'shared':
+        address = os.path.join(tempfile.mkdtemp(), "embeddings.sock")
+        service = start_service(address)
+
+    loaded = ctx.Barrier(n_workers + 1)
+    measured = ctx.Barrier(n_workers + 1)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(address, loaded, measured, results)) for _ in range(n_workers)]
+    try:
+        for process in processes:
+            process.start()
+        loaded.wait()
+        workers: List[Dict[str, float]] = [results.get() for _ in processes]
+        service_memory = memory_mb(service.pid) if service else None
+        measured.wait()
+        for process in processes:
+            process.join()
+    finally:
+        if service:
+            service.terminate()
+            service.wait()
+
+    summary = {
+        'mode': mode,
+        'workers': n_workers,
+        'per_worker': {key: round(sum(w[key] for w in workers) / n_workers, 1) for key in workers[0]},
+        'service': service_memory,
+        'total_pss_mb': round(sum(w['pss_mb'] for w in workers) + (service_memory['pss_mb'] if service_memory else 0), 1),
+    }
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare memory per worker with and without the shared index")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mode", choices=['local', 'shared', 'both'], default='both')
+    parser.add_argument("--output", help="Write results as JSON")
+    args = parser.parse_args()
+
+    modes = ['local', 'shared'] if args.mode == 'both' else [args.mode]
+    results = [run_mode(mode, args.workers) for mode in modes]
+    for result in results:
+        per_worker = result['per_worker']
+        print(f"{result['mode']:>7}: {result['workers']} workers, per worker RSS {per_worker['rss_mb']} MB, "
+              f"PSS {per_worker['pss_mb']} MB, USS {per_worker['uss_mb']} MB; total PSS {result['total_pss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import unittest
+import os
+import sys
+import tempfile
+from unittest.mock import MagicMock
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.chat_pipeline import ChatPipeline
+from utils.answer_cache import AnswerCache, index_fingerprint, is_cacheable, warm_answer_cache
+from utils.suggestions import all_suggested_questions, STARTER_QUESTIONS
+from phase3_retrieval.query_classifier import QueryClassifier
+from phase4_generation.refusal_handler import RefusalHandler, FACTUAL_SUGGESTIONS
+
+
+class TestAnswerCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "answer_cache.json")
+
+        self.retriever = MagicMock()
+        self.retriever.retrieve.return_value = [
+            {'id': "c1", 'text': "Exit load is 1%.", 'metadata': {'source_url': "http://example.com/a"}, 'score': 0.8}
+        ]
+        self.generator = MagicMock()
+        self.generator.generate_answer.return_value = "The exit load is 1%."
+        self.cache = AnswerCache(self.path, "v1")
+        self.pipeline = ChatPipeline(self.retriever, self.generator, classifier=QueryClassifier(),
+                                     refusal_handler=RefusalHandler(), answer_cache=self.cache)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_warm_then_serve_from_cache(self):
+        summary = warm_answer_cache(self.pipeline, self.cache,
+                                    ["What is the exit load?", "Should I buy HDFC Midcap Fund?"])
+        self.assertEqual(summary, {'stored': 1, 'skipped': 1})
+        self.assertEqual(self.generator.generate_answer.call_count, 1)
+
+        result = self.pipeline.run("what is the exit load")
+        self.assertEqual(result['stage'], 'answer_cache')
+        self.assertEqual(result['cached_stage'], 'generate')
+        self.assertEqual(result['answer'], "The exit load is 1%.")
+        self.assertEqual(result['sources'], ["http://example.com/a"])
+        self.assertEqual(self.generator.generate_answer.call_count, 1)
+        self.assertNotIn('classify', result['timings'])
+
+    def test_persisted_per_index_version(self):
+        self.cache.put("Q?", {'answer': "A", 'stage': 'generate', 'chunks': []})
+        self.cache.save()
+        self.assertEqual(AnswerCache(self.path, "v1").get("q")['answer'], "A")
+
+        rebuilt = AnswerCache(self.path, "v2")
+        self.assertTrue(rebuilt.stale)
+        self.assertIsNone(rebuilt.get("q"))
+
+    def test_republished_index_drops_entries(self):
+        store_path = os.path.join(self.tmp.name, "vector_store.json")
+        with open(store_path, 'w') as f:
+            f.write("{}")
+        cache = AnswerCache(self.path, index_fingerprint(self.tmp.name), self.tmp.name)
+        resets = []
+        cache.on_reset = lambda: resets.append(cache.index_version)
+        cache.put("Q?", {'answer': "A", 'stage': 'generate', 'chunks': []})
+        cache.save()
+        self.assertEqual(cache.get("q")['answer'], "A")
+
+        # An ingestion or sync publishes a new index while the process runs
+        with open(store_path, 'w') as f:
+            f.write('{"ids": ["new"]}')
+        self.assertIsNone(cache.get("q"))
+        self.assertTrue(cache.stale)
+        self.assertEqual(resets, [index_fingerprint(self.tmp.name)])
+
+        # Another process warms the cache for the new index; this one reloads it
+        other = AnswerCache(self.path, index_fingerprint(self.tmp.name), self.tmp.name)
+        other.put("Q?", {'answer': "B", 'stage': 'generate', 'chunks': []})
+        other.save()
+        self.assertEqual(cache.get("q")['answer'], "B")
+        self.assertFalse(cache.stale)
+
+    def test_is_cacheable(self):
+        self.assertTrue(is_cacheable({'stage': 'fact_lookup', 'answer': "1.35%"}))
+        self.assertFalse(is_cacheable({'stage': 'retrieve', 'answer': "I don't know"}))
+        self.assertFalse(is_cacheable({'stage': 'generate', 'answer': "The answer service is busy right now"}))
+
+    def test_index_fingerprint_changes_with_artifacts(self):
+        with open(os.path.join(self.tmp.name, "vector_store.json"), 'w') as f:
+            f.write("{}")
+        before = index_fingerprint(self.tmp.name)
+        with open(os.path.join(self.tmp.name, "vector_store.json"), 'w') as f:
+            f.write('{"ids": []}')
+        self.assertNotEqual(before, index_fingerprint(self.tmp.name))
+
+    def test_all_suggested_questions(self):
+        questions = all_suggested_questions()
+        self.assertEqual(len(questions), len(set(questions)))
+        for question in STARTER_QUESTIONS + FACTUAL_SUGGESTIONS + ["What is the tax benefit for ELSS investments?"]:
+            self.assertIn(question, questions)
+
+
+if __name__ == '__main__':
+    unittest.main()
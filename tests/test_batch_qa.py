@@ -0,0 +1,111 @@
+import unittest
+import os
+import sys
+import json
+import tempfile
+from unittest.mock import MagicMock
+
+import numpy as np
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from utils.chat_pipeline import ChatPipeline
+from phase2_vector_db.citations import CitationTable
+from batch_qa import read_questions, load_completed, run_batch
+
+
+def make_retriever():
+    retriever = MagicMock()
+    retriever.encode_queries.side_effect = lambda queries: np.ones((len(queries), 3), dtype=np.float32)
+    retriever.retrieve_batch.side_effect = lambda queries, k, query_embeddings: [
+        [{'id': f"c{i}", 'text': "Text", 'metadata': {'source_url': f"http://example.com/{i}"}, 'score': 0.9}]
+        for i, _ in enumerate(queries)
+    ]
+    return retriever
+
+
+class TestBatchQA(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.tmp.name, "questions.jsonl")
+        self.output = os.path.join(self.tmp.name, "answers.jsonl")
+        with open(self.input, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'request_id': "q1", 'title': "What is the exit load?"}) + "\n")
+            f.write(json.dumps({'request_id': "q2", 'title': "What is NAV?"}) + "\n")
+            f.write(json.dumps({'request_id': "q3", 'title': "What is an SIP?"}) + "\n")
+
+        self.retriever = make_retriever()
+        self.generator = MagicMock()
+        self.generator.generate_answer.return_value = "An answer."
+        self.pipeline = ChatPipeline(self.retriever, self.generator)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_read_questions(self):
+        items = read_questions(self.input, question_field='title')
+        self.assertEqual(items[0], ("q1", "What is the exit load?"))
+        with self.assertRaises(ValueError):
+            read_questions(self.input)
+
+    def test_batch_search_and_output(self):
+        summary = run_batch(self.pipeline, read_questions(self.input, 'title'), self.output, concurrency=2)
+        self.assertEqual(summary['answered'], 3)
+        # One batched search for all questions, no per-question retrieval
+        self.retriever.retrieve_batch.assert_called_once()
+        self.retriever.retrieve.assert_not_called()
+        self.assertIs(self.pipeline.retriever, self.retriever)
+
+        with open(self.output, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual(sorted(record['id'] for record in records), ["q1", "q2", "q3"])
+        self.assertEqual(records[0]['answer'], "An answer.")
+
+    def test_resume_skips_completed_and_retries_failures(self):
+        with open(self.output, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'id': "q1", 'answer': "done"}) + "\n")
+            f.write(json.dumps({'id': "q2", 'error': "RateLimitError"}) + "\n")
+            f.write('{"id": "q3", "ans')  # torn line from an interrupted run
+        self.assertEqual(load_completed(self.output), {"q1"})
+
+        summary = run_batch(self.pipeline, read_questions(self.input, 'title'), self.output)
+        self.assertEqual(summary['skipped'], 1)
+        self.assertEqual(summary['answered'], 2)
+        self.assertEqual(load_completed(self.output), {"q1", "q2", "q3"})
+
+    def test_failures_are_recorded(self):
+        self.generator.generate_answer.side_effect = RuntimeError("boom")
+        summary = run_batch(self.pipeline, read_questions(self.input, 'title'), self.output)
+        self.assertEqual(summary['failed'], 3)
+        self.assertEqual(load_completed(self.output), set())
+
+    def test_error_replies_are_retried(self):
+        # The generator returns these instead of raising
+        self.generator.generate_answer.return_value = "The answer service is busy right now. Please try again."
+        summary = run_batch(self.pipeline, read_questions(self.input, 'title'), self.output)
+        self.assertEqual(summary['failed'], 3)
+        self.assertEqual(load_completed(self.output), set())
+
+        self.generator.generate_answer.return_value = "An answer."
+        summary = run_batch(self.pipeline, read_questions(self.input, 'title'), self.output)
+        self.assertEqual((summary['skipped'], summary['answered']), (0, 3))
+
+    def test_chunks_with_citation_ids(self):
+        # Current stores resolve a citation id per chunk; the pipeline looks it up on the retriever
+        self.retriever.citations = CitationTable()
+        citation_id = self.retriever.citations.add({'source_url': "http://example.com/kim.pdf", 'page': 2})
+        self.retriever.retrieve_batch.side_effect = lambda queries, k, query_embeddings: [
+            [{'id': "c0", 'text': "Text", 'metadata': {}, 'citation_id': citation_id, 'score': 0.9}]
+            for _ in queries
+        ]
+        summary = run_batch(self.pipeline, read_questions(self.input, 'title'), self.output)
+        self.assertEqual((summary['answered'], summary['failed']), (3, 0))
+        with open(self.output, encoding='utf-8') as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual({tuple(record['sources']) for record in records}, {("http://example.com/kim.pdf",)})
+
+
+if __name__ == '__main__':
+    unittest.main()
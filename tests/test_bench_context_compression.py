@@ -0,0 +1,54 @@
+import unittest
+import os
+import sys
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_context_compression import (contains_evidence, evaluate, fact_evidence, load_fact_questions,
+                                       recommend_budget)
+from phase2_vector_db.fact_table import FactTable, make_fact
+from test_context_builder import BagOfWordsModel, CHUNKS
+from phase4_generation.context_builder import ContextBuilder
+
+
+class TestContextCompressionBenchmark(unittest.TestCase):
+    def test_fact_evidence(self):
+        expense = make_fact('hdfc_mid_cap_fund', 'expense_ratio', {'regular': '1.35%', 'direct': '0.73%'}, "u", None)
+        self.assertEqual(fact_evidence(expense), ['1.35%', '0.73%'])
+        exit_load = make_fact('hdfc_mid_cap_fund', 'exit_load', "1.00% if redeemed within 1 year; nil after.", "u", None)
+        self.assertEqual(fact_evidence(exit_load), ['1.00%'])
+        self.assertEqual(fact_evidence(make_fact('hdfc_mid_cap_fund', 'min_sip', "₹100", "u", None)), ['100'])
+        self.assertEqual(fact_evidence(make_fact('hdfc_mid_cap_fund', 'lock_in', "NA", "u", None)), [])
+        self.assertTrue(contains_evidence("Expense ratio:\n1.35%  (Regular), 0.73% (Direct)", ['1.35%', '0.73%']))
+
+    def test_load_fact_questions(self):
+        table = FactTable([make_fact('hdfc_mid_cap_fund', 'expense_ratio', {'regular': '1.35%', 'direct': '0.73%'},
+                                     "u", None)])
+        questions = load_fact_questions(table)
+        self.assertEqual(questions, [{'question': "What is the expense ratio of HDFC Mid Cap Fund?",
+                                      'evidence': ['1.35%', '0.73%']}])
+
+    def test_evaluate_and_recommend(self):
+        questions = [{'question': "What is the exit load if redeemed within one year?", 'evidence': ['1%']},
+                     {'question': "What is the minimum SIP amount?", 'evidence': ['Rs 100']}]
+        model = BagOfWordsModel()
+        retrieve = lambda query: (CHUNKS, model.encode(query))
+        full = evaluate(questions, retrieve, lambda query, chunks, embedding: " ".join(c['text'] for c in chunks))
+        compress = lambda budget: lambda query, chunks, embedding: ContextBuilder(
+            model, token_budget=budget).build(query, chunks, embedding)['context']
+        results = {'full': full, '40': evaluate(questions, retrieve, compress(40)),
+                   '400': evaluate(questions, retrieve, compress(400))}
+        self.assertEqual(full['fact_recall'], 1.0)
+        # A tight budget keeps the exit load sentence but not the second chunk's SIP amount
+        self.assertEqual(results['40']['misses'], ["What is the minimum SIP amount?"])
+        self.assertEqual(results['400']['fact_recall'], 1.0)
+        self.assertLess(results['400']['mean_tokens'], full['mean_tokens'])
+
+        self.assertEqual(recommend_budget(results, 0.0), 400)
+        self.assertEqual(recommend_budget(results, 0.5), 40)
+        self.assertIsNone(recommend_budget({'full': full, '40': results['40']}, 0.0))
+
+if __name__ == '__main__':
+    unittest.main()
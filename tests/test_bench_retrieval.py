@@ -0,0 +1,62 @@
+import unittest
+import os
+import sys
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from bench_retrieval import compare, evaluate, is_relevant, load_labelled_questions
+
+
+def chunk(scheme, url, text="Some text"):
+    return {'text': text, 'metadata': {'scheme': scheme, 'source_url': url}, 'score': 0.7}
+
+
+class TestRetrievalBenchmark(unittest.TestCase):
+    def test_labelled_questions(self):
+        questions = load_labelled_questions()
+        self.assertEqual(len(questions), 78)
+        self.assertTrue(all('relevant' in item for item in questions))
+
+    def test_is_relevant(self):
+        relevant = {'schemes': ['hdfc_mid_cap_fund'], 'sources': ['monthly-portfolio']}
+        self.assertTrue(is_relevant(chunk('Midcap', "https://x/monthly-portfolio.xlsx"), relevant))
+        self.assertFalse(is_relevant(chunk('Small Cap Fund', "https://x/monthly-portfolio.xlsx"), relevant))
+        self.assertFalse(is_relevant(chunk('Midcap', "https://x/fund-page"), relevant))
+        # Shared documents fall back to the chunk text for the scheme
+        self.assertTrue(is_relevant(chunk('Expense Ratios', "https://x/monthly-portfolio.xlsx",
+                                          "HDFC Mid Cap Fund Expense Ratio: 1.35%"), relevant))
+        self.assertTrue(is_relevant(chunk('COMMON', "https://www.amfiindia.com/a"),
+                                    {'schemes': [], 'sources': ['amfiindia.com']}))
+
+    def test_evaluate(self):
+        questions = [
+            {'question': "q1", 'relevant': {'schemes': [], 'sources': ['good']}},
+            {'question': "q2", 'relevant': {'schemes': [], 'sources': ['good']}},
+        ]
+        results_by_query = {
+            "q1": [chunk('COMMON', "http://good/1")],
+            "q2": [chunk('COMMON', "http://bad/1"), chunk('COMMON', "http://good/2")],
+        }
+        results = evaluate(lambda query, k: results_by_query[query], questions, k=5)
+        self.assertEqual(results['recall_at_k'], 1.0)
+        self.assertEqual(results['mrr'], 0.75)
+        self.assertEqual(results['misses'], [])
+        self.assertLessEqual(results['p50_ms'], results['p99_ms'])
+        self.assertGreater(results['qps'], 0)
+        self.assertGreater(results['peak_rss_mb'], 0)
+
+    def test_compare(self):
+        baseline = {'recall_at_k': 0.9, 'mrr': 0.8, 'p50_ms': 10.0, 'p95_ms': 20.0, 'p99_ms': 30.0,
+                    'qps': 100.0, 'peak_rss_mb': 500.0}
+        self.assertEqual(compare(dict(baseline), baseline), [])
+
+        worse = dict(baseline, mrr=0.7, p95_ms=40.0, qps=50.0)
+        regressions = compare(worse, baseline)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(regressions[0].startswith("mrr dropped"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.chat_pipeline import ChatPipeline, CONVERSATIONAL_REPLY, NO_ANSWER_REPLY
+from phase3_retrieval.query_classifier import QueryClassifier
+from phase4_generation.refusal_handler import RefusalHandler
+
+
+def make_chunk(score, url):
+    return {'id': url, 'text': "Some text", 'metadata': {'source_url': url}, 'score': score}
+
+
+class TestChatPipeline(unittest.TestCase):
+    def setUp(self):
+        self.retriever = MagicMock()
+        self.retriever.retrieve.return_value = [
+            make_chunk(0.8, "http://example.com/a"),
+            make_chunk(0.7, "http://example.com/b"),
+            make_chunk(0.6, "http://example.com/a"),
+        ]
+        self.generator = MagicMock()
+        self.generator.generate_answer.return_value = "The exit load is 1%."
+        self.fact_lookup = MagicMock()
+        self.fact_lookup.lookup.return_value = None
+        self.suggestions_handler = MagicMock()
+        self.suggestions_handler.get_no_answer_suggestions.return_value = ["What is NAV?"]
+
+        self.pipeline = ChatPipeline(
+            retriever=self.retriever,
+            generator=self.generator,
+            classifier=QueryClassifier(),
+            fact_lookup=self.fact_lookup,
+            refusal_handler=RefusalHandler(),
+            suggestions_handler=self.suggestions_handler,
+        )
+
+    def test_generate(self):
+        result = self.pipeline.run("What is the exit load of HDFC Small Cap Fund?")
+        self.assertEqual(result['stage'], 'generate')
+        self.assertEqual(result['answer'], "The exit load is 1%.")
+        self.assertEqual(result['sources'], ["http://example.com/a", "http://example.com/b"])
+        self.assertEqual(result['classification']['type'], 'factual')
+        for stage in ['conversational', 'classify', 'fact_lookup', 'retrieve', 'generate', 'total']:
+            self.assertIn(stage, result['timings'])
+
+    def test_conversational_short_circuit(self):
+        result = self.pipeline.run("Thanks!")
+        self.assertEqual(result['stage'], 'conversational')
+        self.assertEqual(result['answer'], CONVERSATIONAL_REPLY)
+        self.assertNotIn('classify', result['timings'])
+        self.retriever.retrieve.assert_not_called()
+
+    def test_advisory_never_reaches_llm(self):
+        result = self.pipeline.run("Should I invest in HDFC Mid Cap Fund?")
+        self.assertEqual(result['stage'], 'classify')
+        self.assertEqual(result['type'], 'advisory')
+        self.assertTrue(result['sources'][0].startswith("https://www.amfiindia.com"))
+        self.retriever.retrieve.assert_not_called()
+        self.generator.generate_answer.assert_not_called()
+
+    def test_fact_lookup_short_circuit(self):
+        self.fact_lookup.lookup.return_value = {'answer': "1.35%", 'sources': ["http://example.com/er"], 'facts': []}
+        result = self.pipeline.run("What is the expense ratio of HDFC Mid Cap Fund?")
+        self.assertEqual(result['stage'], 'fact_lookup')
+        self.assertEqual(result['sources'], ["http://example.com/er"])
+        self.retriever.retrieve.assert_not_called()
+
+    def test_low_score_threshold(self):
+        self.retriever.retrieve.return_value = [make_chunk(0.3, "http://example.com/a")]
+        result = self.pipeline.run("What is the meaning of life?")
+        self.assertEqual(result['stage'], 'retrieve')
+        self.assertEqual(result['answer'], NO_ANSWER_REPLY)
+        self.assertEqual(result['suggestions'], ["What is NAV?"])
+        self.assertEqual(result['sources'], [])
+        self.generator.generate_answer.assert_not_called()
+
+    def test_hooks(self):
+        calls = []
+        self.pipeline.add_hook(lambda stage, seconds, state: calls.append(stage))
+        self.pipeline.run("What is the exit load of HDFC Small Cap Fund?")
+        self.assertEqual(calls, ['conversational', 'rewrite', 'answer_cache', 'classify', 'fact_lookup', 'retrieve', 'generate'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from unittest.mock import MagicMock
+
+import numpy as np
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phase2_vector_db.citations import CitationTable, display_name, attach_citations
+from phase3_retrieval.retrieval_pipeline import RetrievalSystem
+from utils.chat_pipeline import ChatPipeline
+
+KIM_URL = "https://files.hdfcfund.com/s3fs-public/KIM/2025-11/KIM%20-%20HDFC%20Mid%20Cap%20Fund%20dated.pdf"
+AMFI_URL = "https://www.amfiindia.com/investor/knowledge-center-info?zoneName=expenseRatio"
+
+
+class UnitModel:
+    def encode(self, texts, batch_size=32, **kwargs):
+        return np.array([1.0, 0.0], dtype=np.float32) if isinstance(texts, str) \
+            else np.tile([1.0, 0.0], (len(texts), 1)).astype(np.float32)
+
+
+class TestCitationTable(unittest.TestCase):
+    def test_display_names(self):
+        self.assertEqual(display_name(KIM_URL), "HDFC Mid Cap Fund - KIM")
+        self.assertEqual(display_name(""), "Source Document")
+
+    def test_ids_are_deduplicated_and_stable(self):
+        table = CitationTable(names={AMFI_URL: "AMFI - Expense Ratio"})
+        kim = table.add({'source_url': KIM_URL, 'category': 'KIM', 'scheme': 'Midcap'})
+        amfi = table.add({'source_url': AMFI_URL, 'category': 'Educational'})
+        self.assertEqual(table.add({'source_url': KIM_URL}), kim)
+        self.assertEqual(table.add({'source_url': KIM_URL, 'page': 3}), 2)
+        self.assertEqual(table.get(amfi)['display_name'], "AMFI - Expense Ratio")
+        self.assertEqual(table.get(kim)['document_type'], "KIM")
+        self.assertEqual(table.id_for_url(KIM_URL), kim)
+        self.assertEqual(table.id_for_url(KIM_URL, 3), 2)
+        self.assertEqual(table.id_for_url(KIM_URL, 9), kim)
+        # PDF citations open at the cited page
+        self.assertEqual(table.get(2)['link'], KIM_URL + "#page=3")
+        self.assertEqual(table.get(kim)['link'], KIM_URL)
+        self.assertEqual(table.get(amfi)['link'], AMFI_URL)
+
+        tmp = tempfile.mkdtemp()
+        try:
+            table.save(tmp)
+            reloaded = CitationTable.load(tmp)
+            self.assertEqual(reloaded.add({'source_url': AMFI_URL}), amfi)
+            self.assertEqual(reloaded.add({'source_file': "faq.json"}), 3)
+        finally:
+            shutil.rmtree(tmp)
+
+
+class TestCitationsInAnswers(unittest.TestCase):
+    def setUp(self):
+        self.embeddings_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.embeddings_dir, "vector_store.json"), 'w') as f:
+            json.dump({'documents': ["Exit load 1%.", "Expense ratio basics.", "Exit load details."],
+                       'ids': ["a", "b", "c"],
+                       'metadatas': [{'source_url': KIM_URL}, {'source_url': AMFI_URL}, {'source_url': KIM_URL}]}, f)
+        np.save(os.path.join(self.embeddings_dir, "embeddings.npy"),
+                np.array([[1, 0], [0.9, 0.1], [0.8, 0.2]], dtype=np.float32))
+
+    def tearDown(self):
+        shutil.rmtree(self.embeddings_dir)
+
+    def check_answers(self):
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=UnitModel())
+        generator = MagicMock()
+        generator.generate_answer.return_value = "An answer."
+        pipeline = ChatPipeline(retriever, generator)
+
+        result = pipeline.run("What is the exit load?")
+        self.assertEqual(result['sources'], [KIM_URL, AMFI_URL])
+        self.assertEqual(len(result['citations']), 2)
+        self.assertEqual(pipeline.citation(result['citations'][0])['display_name'], "HDFC Mid Cap Fund - KIM")
+        return result
+
+    def test_legacy_index_gets_ids_at_load(self):
+        self.check_answers()
+
+    def test_attached_ids_match(self):
+        self.assertEqual(attach_citations(self.embeddings_dir), 3)
+        with open(os.path.join(self.embeddings_dir, "vector_store.json")) as f:
+            self.assertEqual([m['citation_id'] for m in json.load(f)['metadatas']], [0, 1, 0])
+        self.assertEqual(self.check_answers()['citations'], [0, 1])
+
+    def test_fact_answers_cite_each_page(self):
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=UnitModel())
+        page_3 = retriever.citations.add({'source_url': KIM_URL, 'page': 3})
+        page_5 = retriever.citations.add({'source_url': KIM_URL, 'page': 5})
+        fact_lookup = MagicMock()
+        fact_lookup.lookup.return_value = {'answer': "Facts.", 'sources': [KIM_URL], 'facts': [],
+                                           'citations': [(KIM_URL, 3), (KIM_URL, 5), (KIM_URL, None)]}
+        pipeline = ChatPipeline(retriever, MagicMock(), fact_lookup=fact_lookup)
+
+        result = pipeline.run("What is the AUM and fund manager of HDFC Mid Cap Fund?")
+        self.assertEqual(result['stage'], 'fact_lookup')
+        self.assertEqual(result['citations'], [page_3, page_5, retriever.citations.id_for_url(KIM_URL)])
+
+
+if __name__ == '__main__':
+    unittest.main()
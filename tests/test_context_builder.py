@@ -0,0 +1,101 @@
+import unittest
+import os
+import sys
+import zlib
+import numpy as np
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import metrics
+from phase4_generation.context_builder import ContextBuilder, split_sentences
+from phase4_generation.generation_pipeline import AnswerGenerator
+from phase4_generation.llm_client import FakeLLMClient
+
+
+class BagOfWordsModel:
+    """Deterministic stand-in for SentenceTransformer: hashed bag of words."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        single = isinstance(texts, str)
+        vectors = []
+        for text in [texts] if single else texts:
+            vector = np.zeros(64, dtype=np.float32)
+            for word in text.lower().replace('?', '').replace('.', '').split():
+                vector[zlib.crc32(word.encode()) % 64] += 1
+            vectors.append(vector)
+        return vectors[0] if single else np.array(vectors)
+
+
+FILLER = " ".join(f"Sentence number {i} talks about unrelated scheme documents and disclosures." for i in range(40))
+
+CHUNKS = [
+    {'id': "c1", 'text': f"{FILLER} The exit load is 1% if redeemed within one year. {FILLER}",
+     'metadata': {'source_file': "midcap.json"}},
+    {'id': "c2", 'text': f"{FILLER} The exit load is 1% if redeemed within one year. {FILLER}",
+     'metadata': {'source_file': "midcap_copy.json"}},
+    {'id': "c3", 'text': "The minimum SIP amount is Rs 100.", 'metadata': {'source_file': "sip.json"}},
+]
+
+
+class TestContextBuilder(unittest.TestCase):
+    def setUp(self):
+        self.model = BagOfWordsModel()
+        self.builder = ContextBuilder(self.model, token_budget=120, max_sentences_per_chunk=2)
+
+    def test_split_sentences(self):
+        self.assertEqual(split_sentences("One. Two!\nThree"), ["One.", "Two!", "Three"])
+        self.assertEqual(len(split_sentences(" ".join(["word"] * 130), max_words=60)), 3)
+
+    def test_budget_and_relevance(self):
+        result = self.builder.build("What is the exit load if redeemed within one year?", CHUNKS)
+        self.assertIn("The exit load is 1% if redeemed within one year.", result['context'])
+        self.assertLessEqual(result['tokens'], 120 + 20)  # budget covers sentences, headers are extra
+        self.assertLess(result['tokens'], result['original_tokens'] / 5)
+
+    def test_redundant_chunk_dropped(self):
+        result = self.builder.build("What is the exit load?", CHUNKS)
+        self.assertIn("Source: midcap.json", result['context'])
+        self.assertNotIn("midcap_copy.json", result['context'])
+
+    def test_sentence_embeddings_cached(self):
+        query_embedding = self.model.encode("exit load")
+        self.builder.build("exit load", CHUNKS, query_embedding)
+        calls = self.model.calls
+        self.builder.build("exit load", CHUNKS, query_embedding)
+        self.assertEqual(self.model.calls, calls)
+
+    def test_cache_shared_across_threads(self):
+        from concurrent.futures import ThreadPoolExecutor
+        builder = ContextBuilder(self.model, token_budget=120, cache_size=2)
+        chunks = [{'id': f"c{i}", 'text': f"Fact number {i}. Another sentence."} for i in range(8)]
+        query_embedding = self.model.encode("fact")
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda i: builder.build("fact", chunks[i % 8:i % 8 + 3], query_embedding),
+                                    range(200)))
+        self.assertTrue(all(result['context'] for result in results))
+        self.assertLessEqual(len(builder._sentence_cache), 2)
+
+    def test_reports_tokens(self):
+        generator = AnswerGenerator(llm_client=FakeLLMClient(ttft=0, tokens_per_second=0), context_builder=self.builder)
+        with metrics.trace() as request_trace:
+            generator.generate_answer("What is the minimum SIP amount?", CHUNKS)
+        self.assertLess(request_trace['tokens']['context_sent'], request_trace['tokens']['context_retrieved'])
+
+    def test_whole_chunks_report_tokens(self):
+        generator = AnswerGenerator(llm_client=FakeLLMClient(ttft=0, tokens_per_second=0))
+        with metrics.trace() as request_trace:
+            generator.generate_answer("What is the minimum SIP amount?", CHUNKS)
+        self.assertEqual(request_trace['tokens']['context_sent'], request_trace['tokens']['context_retrieved'])
+        self.assertGreater(request_trace['tokens']['context_sent'], 100)
+
+    def test_empty(self):
+        self.assertEqual(self.builder.build("q", [])['context'], "")
+
+
+if __name__ == '__main__':
+    unittest.main()
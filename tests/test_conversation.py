@@ -0,0 +1,131 @@
+import unittest
+import os
+import sys
+from unittest.mock import MagicMock
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.chat_pipeline import ChatPipeline
+from utils.conversation import (ConversationStore, SQLiteConversationStore, rewrite_follow_up,
+                                key_terms, chunks_cover)
+
+MID_CAP = [{'scheme': 'hdfc_mid_cap_fund'}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRewrite(unittest.TestCase):
+    def test_follow_ups(self):
+        cases = {
+            "and its exit load?": "What is HDFC Mid Cap Fund's exit load?",
+            "what about the benchmark?": "What is the benchmark of HDFC Mid Cap Fund?",
+            "Does it have a lock-in?": "Does HDFC Mid Cap Fund have a lock-in?",
+            "What is the expense ratio?": "What is the expense ratio of HDFC Mid Cap Fund?",
+            "exit load?": "What is exit load of HDFC Mid Cap Fund?",
+            "and the exit load?": "What is the exit load of HDFC Mid Cap Fund?",
+        }
+        for query, expected in cases.items():
+            rewrite = rewrite_follow_up(query, MID_CAP)
+            self.assertEqual(rewrite['query'], expected)
+            self.assertEqual(rewrite['scheme'], 'hdfc_mid_cap_fund')
+            self.assertTrue(rewrite['follow_up'])
+
+    def test_not_follow_ups(self):
+        self.assertFalse(rewrite_follow_up("What is NAV?", MID_CAP)['follow_up'])
+        # Definitions of a field stay generic after a scheme turn
+        for query in ["What is an exit load?", "What is a benchmark?", "What does exit load mean?",
+                      "Define AUM", "What is exit load?", "How is the expense ratio charged?"]:
+            self.assertFalse(rewrite_follow_up(query, MID_CAP)['follow_up'], query)
+        own_scheme = rewrite_follow_up("Exit load of HDFC Small Cap Fund?", MID_CAP)
+        self.assertEqual(own_scheme['scheme'], 'hdfc_small_cap_fund')
+        self.assertFalse(own_scheme['follow_up'])
+        self.assertFalse(rewrite_follow_up("and its exit load?", [])['follow_up'])
+
+    def test_chunks_cover(self):
+        chunks = [{'text': "Exit load: 1% if redeemed within 1 year."}]
+        self.assertTrue(chunks_cover(chunks, key_terms("What is HDFC Mid Cap Fund's exit load?")))
+        self.assertFalse(chunks_cover(chunks, key_terms("What is the benchmark of HDFC Mid Cap Fund?")))
+
+
+class TestConversationStores(unittest.TestCase):
+    def check_store(self, store, clock):
+        for i in range(4):
+            store.add_turn("a", {'query': f"q{i}"})
+        self.assertEqual([turn['query'] for turn in store.history("a")], ["q1", "q2", "q3"])
+
+        store.add_turn("b", {'query': "b0"})
+        store.add_turn("c", {'query': "c0"})
+        # max_sessions=2: the least recently used session is gone
+        self.assertEqual(store.history("a"), [])
+        self.assertEqual(len(store), 2)
+
+        clock.now += 61
+        self.assertEqual(store.history("c"), [])
+
+    def test_memory_store(self):
+        clock = FakeClock()
+        self.check_store(ConversationStore(max_sessions=2, ttl=60, max_turns=3, clock=clock), clock)
+
+    def test_sqlite_store(self):
+        clock = FakeClock()
+        store = SQLiteConversationStore(":memory:", max_sessions=2, ttl=60, max_turns=3, clock=clock)
+        self.check_store(store, clock)
+        store.add_turn("d", {'query': "d0", 'chunks': [{'id': "x", 'text': "t"}]})
+        self.assertEqual(store.history("d")[0]['chunks'][0]['id'], "x")
+
+
+class TestFollowUpPipeline(unittest.TestCase):
+    def setUp(self):
+        self.retriever = MagicMock()
+        self.retriever.retrieve.return_value = [
+            {'id': "c1", 'text': "HDFC Mid Cap Fund. Expense ratio 1.35%. Exit load 1% within 1 year.",
+             'metadata': {'source_url': "http://example.com/midcap"}, 'score': 0.8}
+        ]
+        self.generator = MagicMock()
+        self.generator.generate_answer.return_value = "An answer."
+        self.store = ConversationStore()
+        self.pipeline = ChatPipeline(self.retriever, self.generator, conversations=self.store)
+
+    def test_follow_up_reuses_chunks(self):
+        self.pipeline.run("What is the expense ratio of HDFC Mid Cap Fund?", session_id="s1")
+        result = self.pipeline.run("and its exit load?", session_id="s1")
+
+        self.assertEqual(result['query'], "What is HDFC Mid Cap Fund's exit load?")
+        self.assertEqual(result['scheme'], 'hdfc_mid_cap_fund')
+        self.assertEqual(self.retriever.retrieve.call_count, 1)
+        self.assertEqual(self.generator.generate_answer.call_args[0][0], "What is HDFC Mid Cap Fund's exit load?")
+        self.assertEqual(result['sources'], ["http://example.com/midcap"])
+        self.assertEqual(len(self.store.history("s1")), 2)
+
+    def test_follow_up_retrieves_when_chunks_do_not_cover(self):
+        self.pipeline.run("What is the expense ratio of HDFC Mid Cap Fund?", session_id="s1")
+        self.pipeline.run("what about the benchmark?", session_id="s1")
+        self.assertEqual(self.retriever.retrieve.call_count, 2)
+        self.assertEqual(self.retriever.retrieve.call_args[0][0], "What is the benchmark of HDFC Mid Cap Fund?")
+
+    def test_definition_after_scheme_turn(self):
+        fact_lookup = MagicMock()
+        fact_lookup.lookup.return_value = None
+        self.pipeline.fact_lookup = fact_lookup
+        self.pipeline.run("What is the expense ratio of HDFC Mid Cap Fund?", session_id="s1")
+        result = self.pipeline.run("What is an exit load?", session_id="s1")
+        self.assertEqual(result['query'], "What is an exit load?")
+        self.assertIsNone(result['scheme'])
+        fact_lookup.lookup.assert_called_with("What is an exit load?")
+        self.assertEqual(self.retriever.retrieve.call_args[0][0], "What is an exit load?")
+
+    def test_sessions_are_independent(self):
+        self.pipeline.run("What is the expense ratio of HDFC Mid Cap Fund?", session_id="s1")
+        result = self.pipeline.run("and its exit load?", session_id="s2")
+        self.assertEqual(result['query'], "and its exit load?")
+
+
+if __name__ == '__main__':
+    unittest.main()
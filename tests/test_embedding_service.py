@@ -0,0 +1,89 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+import numpy as np
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phase3_retrieval.embedding_service import EmbeddingService, RemoteEncoder, parse_address
+from phase3_retrieval.retrieval_pipeline import RetrievalSystem
+
+
+class KeywordModel:
+    """Three-dimensional 'embedding' of which keywords a text mentions."""
+
+    keywords = ['funds', 'risks', 'returns']
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts, batch_size=32):
+        self.calls += 1
+        if any(text == "fail" for text in texts):
+            raise ValueError("cannot encode")
+        return np.array([[float(word in text) for word in self.keywords] for text in texts], dtype=np.float32)
+
+
+class TestEmbeddingService(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.address = os.path.join(self.tmp, "embeddings.sock")
+        self.model = KeywordModel()
+        self.service = EmbeddingService(self.model, self.address)
+        self.service.start()
+        self.encoder = RemoteEncoder(self.address, timeout=5)
+
+    def tearDown(self):
+        self.encoder.close()
+        self.service.stop()
+        shutil.rmtree(self.tmp)
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address("tcp://127.0.0.1:9000")[1], ("127.0.0.1", 9000))
+        self.assertEqual(parse_address("/tmp/x.sock")[1], "/tmp/x.sock")
+
+    def test_encode_round_trip(self):
+        batch = self.encoder.encode(["about funds", "risks and returns"])
+        np.testing.assert_array_equal(batch, [[1, 0, 0], [0, 1, 1]])
+        single = self.encoder.encode("returns", convert_to_tensor=True)
+        self.assertEqual(single.shape, (3,))
+        # Both requests went over one connection to the one model
+        self.assertEqual(self.model.calls, 2)
+
+    def test_errors_are_reported(self):
+        with self.assertRaises(RuntimeError):
+            self.encoder.encode(["fail"])
+        # The connection stays usable
+        self.assertEqual(self.encoder.encode(["funds"]).shape, (1, 3))
+
+    def test_reconnects_after_restart(self):
+        self.encoder.encode("funds")
+        self.service.stop()
+        self.service.start()
+        np.testing.assert_array_equal(self.encoder.encode("risks"), [0, 1, 0])
+
+    def test_retrieval_with_remote_encoder_and_mapped_index(self):
+        embeddings_dir = os.path.join(self.tmp, "index")
+        os.makedirs(embeddings_dir)
+        documents = ["Doc about funds.", "Doc about risks.", "Doc about returns."]
+        with open(os.path.join(embeddings_dir, "vector_store.json"), 'w') as f:
+            json.dump({'documents': documents, 'ids': ["id1", "id2", "id3"],
+                       'metadatas': [{}, {}, {}]}, f)
+        np.save(os.path.join(embeddings_dir, "embeddings.npy"), np.eye(3, dtype=np.float32))
+
+        retriever = RetrievalSystem(embeddings_dir, encoder=self.encoder, mmap_index=True)
+        self.assertIsInstance(retriever.embeddings, np.memmap)
+        results = retriever.retrieve("what are the risks", k=2)
+        self.assertEqual(results[0]['id'], "id2")
+        self.assertAlmostEqual(results[0]['score'], 1.0, places=5)
+        # Unit rows are searched in place, not copied
+        self.assertTrue(np.shares_memory(retriever._unit_embeddings(), retriever.embeddings))
+
+
+if __name__ == '__main__':
+    unittest.main()
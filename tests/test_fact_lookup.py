@@ -0,0 +1,164 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phase2_vector_db.fact_table import FactExtractor, FactTable, build_fact_table, fact_table_path, make_fact
+from phase3_retrieval.fact_lookup import FactLookup
+
+
+class TestFactExtractor(unittest.TestCase):
+    def setUp(self):
+        self.cleaned_dir = "mock_cleaned_facts"
+        self.supplementary_dir = "mock_supplementary_facts"
+        self.embeddings_dir = "mock_embeddings_facts"
+        for path in [self.cleaned_dir, self.supplementary_dir, self.embeddings_dir]:
+            os.makedirs(path, exist_ok=True)
+
+        with open(os.path.join(self.supplementary_dir, "riskometer_ratings.json"), 'w') as f:
+            json.dump({
+                "hdfc_mid_cap_fund": {
+                    "scheme_name": "HDFC Mid Cap Fund",
+                    "riskometer": "Very High",
+                    "riskometer_level": "6 out of 6",
+                    "benchmark_riskometer": "Very High",
+                    "last_updated": "December 31, 2025"
+                }
+            }, f)
+
+        with open(os.path.join(self.cleaned_dir, "expense_ratios_cleaned.json"), 'w') as f:
+            json.dump({
+                "scheme": "Expense Ratios",
+                "extracted_text": "HDFC Mutual Fund Expense Ratios (As of Jan 2026):\n\n"
+                                  "2. HDFC Mid Cap Fund Expense Ratio:\n- Regular Plan: 1.35%\n- Direct Plan: 0.73%\n",
+                "source_url": "http://example.com/expense"
+            }, f)
+
+        with open(os.path.join(self.cleaned_dir, "hdfc_midcap_-_fund_page_cleaned.json"), 'w') as f:
+            json.dump({
+                "scheme": "Midcap",
+                "extracted_text": "RiskometerVery HighMin SIP₹ 100Ideal for Lock inA lock-in period is fixed. "
+                                  "ELSS Funds have a 3-year lock-in. NANAV NA AUM (28/02/2026) similar to the market. "
+                                  "NIFTY Midcap 150 Ind...NIFTY Midcap 150 Index (TRI)INVEST NOW "
+                                  "Exit Load● In respect of each purchase of Units, an Exit Load of 1.00% is payable "
+                                  "within 1 year from the date of allotment. ● No Exit Load is payable after 1 year "
+                                  "from the date of allotment. Product Labelling",
+                "source_url": "http://example.com/midcap"
+            }, f)
+
+    def tearDown(self):
+        for path in [self.cleaned_dir, self.supplementary_dir, self.embeddings_dir]:
+            if os.path.exists(path):
+                shutil.rmtree(path)
+
+    def test_extract_all(self):
+        facts = FactExtractor(self.cleaned_dir, self.supplementary_dir).extract_all()
+        table = FactTable(facts)
+
+        self.assertEqual(table.get('hdfc_mid_cap_fund', 'riskometer')['value']['level'], "Very High")
+        self.assertEqual(table.get('hdfc_mid_cap_fund', 'expense_ratio')['value'], {'regular': '1.35%', 'direct': '0.73%'})
+        self.assertEqual(table.get('hdfc_mid_cap_fund', 'expense_ratio')['as_of'], "Jan 2026")
+        self.assertEqual(table.get('hdfc_mid_cap_fund', 'min_sip')['value'], "₹100")
+        self.assertEqual(table.get('hdfc_mid_cap_fund', 'lock_in')['value'], "NA")
+        self.assertEqual(table.get('hdfc_mid_cap_fund', 'benchmark')['value'], "NIFTY Midcap 150 Index (TRI)")
+        self.assertIn("1.00%", table.get('hdfc_mid_cap_fund', 'exit_load')['value'])
+        self.assertEqual(table.get('hdfc_mid_cap_fund', 'exit_load')['source_url'], "http://example.com/midcap")
+
+    def test_extract_tables(self):
+        factsheet = {
+            "scheme": "Midcap",
+            "extracted_text": "Fund Facts",
+            "pages": [{"page": 2, "text": "Fund Facts (as on 31st December, 2025)", "hash": "x"}],
+            "tables": [{"page": 2, "rows": [
+                ["Category of Scheme", "Fund Manager*", "Inception Date"],
+                ["MID CAP FUND", "Chirag Setalvad (since June 25, 2007)", "June 25, 2007"],
+                ["AUM December 2025", "INR 92,641.55 Cr."],
+                ["Expense Ratio", "Regular Plan 1.39% Direct Plan 0.74%"],
+                ["Exit Load", "Nil"]]}],
+            "source_url": "http://example.com/factsheet.pdf"
+        }
+        kim = dict(factsheet, source_url="http://example.com/kim.pdf",
+                   tables=[{"page": 5, "rows": [["AUM", "INR 80,000 Cr."]]}])
+        for filename, data in [("hdfc_midcap_-_factsheet_cleaned.json", factsheet),
+                               ("hdfc_midcap_-_kim_cleaned.json", kim)]:
+            with open(os.path.join(self.cleaned_dir, filename), 'w') as f:
+                json.dump(data, f)
+
+        table = FactTable(FactExtractor(self.cleaned_dir, self.supplementary_dir).extract_all())
+        aum = table.get('hdfc_mid_cap_fund', 'aum')
+        # The monthly factsheet replaces the KIM
+        self.assertEqual((aum['value'], aum['as_of'], aum['page']), ("INR 92,641.55 Cr.", "December 2025", 2))
+        manager = table.get('hdfc_mid_cap_fund', 'fund_manager')
+        self.assertEqual((manager['value'], manager['as_of']), ("Chirag Setalvad (since June 25, 2007)",
+                                                                "31st December, 2025"))
+        self.assertEqual(table.get('hdfc_mid_cap_fund', 'inception_date')['value'], "June 25, 2007")
+        # Curated sources win for the fields they cover; the table rows stay queryable
+        self.assertEqual(table.get('hdfc_mid_cap_fund', 'expense_ratio')['as_of'], "Jan 2026")
+        self.assertEqual([fact['value'] for fact in table.rows('hdfc_mid_cap_fund', 'expense_ratio')],
+                         [{'regular': '1.39%', 'direct': '0.74%'}, {'regular': '1.35%', 'direct': '0.73%'}])
+        self.assertEqual(len(table.rows('hdfc_mid_cap_fund', 'aum')), 2)
+
+    def test_build_and_load(self):
+        build_fact_table(self.cleaned_dir, self.supplementary_dir, self.embeddings_dir)
+        table = FactTable.load(fact_table_path(self.embeddings_dir))
+        self.assertEqual(len(table), 6)
+
+
+class TestFactLookup(unittest.TestCase):
+    def setUp(self):
+        self.lookup = FactLookup(table=FactTable([
+            make_fact('hdfc_mid_cap_fund', 'expense_ratio', {'regular': '1.35%', 'direct': '0.73%'},
+                      "http://example.com/expense", "Jan 2026"),
+            make_fact('hdfc_small_cap_fund', 'riskometer',
+                      {'level': 'Very High', 'position': '6 out of 6', 'benchmark_level': 'Very High'},
+                      "http://example.com/risk", "December 31, 2025"),
+            make_fact('hdfc_small_cap_fund', 'benchmark', "BSE 250 SmallCap Index",
+                      "http://example.com/small", None),
+            make_fact('hdfc_mid_cap_fund', 'aum', "INR 92,641.55 Cr.", "http://example.com/factsheet.pdf",
+                      "December 2025", 2),
+        ]))
+
+    def test_single_fact(self):
+        result = self.lookup.lookup("What is the expense ratio of HDFC Midcap Fund?")
+        self.assertIn("1.35%", result['answer'])
+        self.assertIn("Jan 2026", result['answer'])
+        self.assertEqual(result['sources'], ["http://example.com/expense"])
+
+    def test_multiple_fields(self):
+        result = self.lookup.lookup("What is the risk level and benchmark of HDFC Small Cap Fund?")
+        self.assertIn("Very High", result['answer'])
+        self.assertIn("BSE 250 SmallCap Index", result['answer'])
+        self.assertEqual(len(result['sources']), 2)
+
+    def test_table_fact_cites_page(self):
+        result = self.lookup.lookup("What is the AUM of HDFC Mid Cap Fund?")
+        self.assertEqual(result['answer'], "The AUM of HDFC Mid Cap Fund is INR 92,641.55 Cr. "
+                                           "Data as of December 2025. 📘")
+        self.assertEqual(result['citations'], [("http://example.com/factsheet.pdf", 2)])
+        self.assertIsNone(self.lookup.lookup("What are the returns since inception of HDFC Mid Cap Fund?"))
+
+    def test_facts_cite_their_own_pages(self):
+        self.lookup.table.add(make_fact('hdfc_mid_cap_fund', 'fund_manager', "Chirag Setalvad",
+                                        "http://example.com/factsheet.pdf", "December 2025", 3))
+        result = self.lookup.lookup("What is the AUM and who is the fund manager of HDFC Mid Cap Fund?")
+        self.assertEqual(result['sources'], ["http://example.com/factsheet.pdf"])
+        self.assertEqual(result['citations'], [("http://example.com/factsheet.pdf", 2),
+                                               ("http://example.com/factsheet.pdf", 3)])
+
+    def test_falls_back_to_rag(self):
+        # Missing field, several schemes, no scheme, and an explanatory question
+        self.assertIsNone(self.lookup.lookup("What is the exit load for HDFC Midcap Fund?"))
+        self.assertIsNone(self.lookup.lookup("Expense ratio of mid cap vs small cap?"))
+        self.assertIsNone(self.lookup.lookup("What is an expense ratio?"))
+        self.assertIsNone(self.lookup.lookup("How is the expense ratio of HDFC Midcap Fund calculated?"))
+
+    def test_missing_table(self):
+        self.assertIsNone(FactLookup("does_not_exist").lookup("What is the expense ratio of HDFC Midcap Fund?"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,290 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+import numpy as np
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phase2_vector_db.ingestion import IngestionService, select_merge
+from phase1_data_collection.object_store import ObjectStore
+from phase2_vector_db.segments import load_manifest, ingest_log_path, segments_dir, rebase_segments, content_hash
+from phase2_vector_db.quantization import build_codec, compressed_embeddings_path
+from phase3_retrieval.retrieval_pipeline import RetrievalSystem
+
+
+class KeywordModel:
+    """Four-dimensional 'embedding' of which keywords a text mentions."""
+
+    keywords = ['funds', 'risks', 'returns', 'statement']
+
+    def encode(self, texts, batch_size=32, **kwargs):
+        single = isinstance(texts, str)
+        rows = np.array([[float(word in text) for word in self.keywords]
+                         for text in ([texts] if single else texts)], dtype=np.float32)
+        return rows[0] if single else rows
+
+
+def document(text, source_file="new.json"):
+    return {'extracted_text': text, 'scheme': 'General', 'category': 'Service FAQs',
+            'source_url': "http://example.com/" + source_file, 'source_file': source_file}
+
+
+class TestIngestionService(unittest.TestCase):
+    def setUp(self):
+        self.embeddings_dir = tempfile.mkdtemp()
+        with open(os.path.join(self.embeddings_dir, "vector_store.json"), 'w') as f:
+            json.dump({'documents': ["About funds.", "About risks.", "About returns."],
+                       'ids': ["id1", "id2", "id3"], 'metadatas': [{}, {}, {}]}, f)
+        np.save(os.path.join(self.embeddings_dir, "embeddings.npy"), np.eye(3, 4, dtype=np.float32))
+        self.model = KeywordModel()
+        self.service = IngestionService(self.embeddings_dir, model=self.model, interval=0.05)
+
+    def tearDown(self):
+        self.service.stop()
+        shutil.rmtree(self.embeddings_dir)
+
+    def test_new_documents_become_searchable(self):
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=self.model)
+        self.assertEqual(len(retriever.ids), 3)
+
+        self.service.submit([document("How to get a capital gains statement.")])
+        self.assertEqual(self.service.status()['pending_chunks'], 1)
+        # Queued but not embedded: nothing changes for readers
+        self.assertFalse(retriever.refresh())
+
+        self.assertEqual(self.service.process_pending(), 1)
+        result = retriever.retrieve("statement", k=1)[0]
+        self.assertEqual(result['text'], "How to get a capital gains statement.")
+        self.assertEqual(result['metadata']['source_file'], "new.json")
+        self.assertEqual(len(retriever.ids), 4)
+        self.assertEqual(retriever.index_generation, 1)
+        # Base files are never rewritten
+        self.assertEqual(len(json.load(open(os.path.join(self.embeddings_dir, "vector_store.json")))['ids']), 3)
+
+    def test_refresh_survives_segment_deleted_mid_load(self):
+        from unittest.mock import patch
+        import phase3_retrieval.retrieval_pipeline as retrieval_pipeline
+
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=self.model)
+        self.service.submit([document("How to get a capital gains statement.")])
+        self.service.process_pending()
+        real_load = retrieval_pipeline.load_segments
+        calls = []
+
+        def merged_away_once(embeddings_dir):
+            calls.append(embeddings_dir)
+            if len(calls) == 1:
+                raise FileNotFoundError("seg_000001.npy")
+            return real_load(embeddings_dir)
+
+        with patch.object(retrieval_pipeline, 'load_segments', side_effect=merged_away_once):
+            self.assertTrue(retriever.refresh())
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(retriever.ids), 4)
+
+        # A load that keeps failing leaves the old view in place and is retried by the next query
+        self.service.submit([document("Statement of returns.", "other.json")])
+        self.service.process_pending()
+        with patch.object(retrieval_pipeline, 'load_segments', side_effect=FileNotFoundError("gone")):
+            self.assertFalse(retriever.refresh())
+        self.assertEqual(len(retriever.ids), 4)
+        self.assertTrue(retriever.refresh())
+        self.assertEqual(len(retriever.ids), 5)
+
+    def test_log_rotation_and_partial_lines(self):
+        self.service.submit([document("statement one")])
+        manifest = load_manifest(self.embeddings_dir)
+        with open(ingest_log_path(self.embeddings_dir, manifest), 'a') as f:
+            f.write('{"id": "torn", "te')
+        self.assertEqual(self.service.process_pending(), 1)
+        # The torn tail stays queued in the same log
+        manifest = load_manifest(self.embeddings_dir)
+        self.assertEqual(manifest['log_number'], 1)
+        self.assertGreater(manifest['log_offset'], 0)
+
+        with open(ingest_log_path(self.embeddings_dir, manifest), 'a') as f:
+            f.write('xt": "statement two", "metadata": {}}\n')
+        self.assertEqual(self.service.process_pending(), 1)
+        manifest = load_manifest(self.embeddings_dir)
+        self.assertEqual((manifest['log_number'], manifest['log_offset']), (2, 0))
+        self.assertEqual(self.service.status()['segment_chunks'], 2)
+
+    def test_tiered_merges_keep_rows_in_order(self):
+        self.service.merge_factor = 3
+        for i in range(3):
+            self.service.submit([document(f"statement {i}")])
+            self.service.process_pending()
+        status = self.service.status()
+        self.assertEqual((status['segments'], status['segment_chunks']), (1, 3))
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=self.model)
+        self.assertEqual(retriever.documents[3:], ["statement 0", "statement 1", "statement 2"])
+        # Merged segment files are gone
+        names = sorted(name for name in os.listdir(segments_dir(self.embeddings_dir)) if name.endswith(".npy"))
+        self.assertEqual(names, ["seg_000004.npy"])
+
+    def test_select_merge(self):
+        self.assertEqual(select_merge([1, 1, 1], [0, 0, 0], merge_factor=4), [])
+        self.assertEqual(select_merge([100, 1, 1, 1, 1], [0] * 5, merge_factor=4), [1, 2, 3, 4])
+        # Different tiers are not merged together
+        self.assertEqual(select_merge([100, 1, 100, 1, 1], [0] * 5, merge_factor=4), [])
+        self.assertEqual(select_merge([100, 10], [0, 5], merge_factor=4), [1])
+
+    def test_tombstones_hide_rows_until_merged_away(self):
+        self.service.submit([document("statement old", source_file="a.json"),
+                             document("statement kept", source_file="b.json")])
+        self.service.process_pending()
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=self.model)
+        self.assertEqual(len(retriever.retrieve("statement", k=5)), 5)
+
+        self.service.expunge_ratio = 1.0  # keep the deleted row in place for now
+        result = self.service.delete_sources(["http://example.com/a.json", "http://example.com/x"])
+        self.assertEqual(result['deleted_chunks'], 1)
+        texts = [chunk['text'] for chunk in retriever.retrieve("statement", k=5)]
+        self.assertNotIn("statement old", texts)
+        self.assertIn("statement kept", texts)
+        self.assertEqual(len(retriever.ids), 5)
+        batch = retriever.retrieve_batch(["statement"], k=5, filters={'source_file': "a.json"})
+        self.assertEqual(batch, [[]])
+
+        # Base rows can be deleted too
+        with open(os.path.join(self.embeddings_dir, "vector_store.json")) as f:
+            base = json.load(f)
+        base['metadatas'][0] = {'source_url': "http://example.com/base"}
+        with open(os.path.join(self.embeddings_dir, "vector_store.json"), 'w') as f:
+            json.dump(base, f)
+        self.service.delete_sources(["http://example.com/base"])
+        self.assertNotIn("id1", [chunk['id'] for chunk in retriever.retrieve("funds", k=5)])
+
+        merge = self.service.compact()
+        self.assertEqual((merge['chunks'], merge['expunged']), (1, 1))
+        self.assertEqual(load_manifest(self.embeddings_dir)['tombstones'], ["id1"])
+        self.assertTrue(retriever.refresh())
+        self.assertEqual(retriever.documents[3:], ["statement kept"])
+
+    def test_sync_reembeds_only_changed_documents(self):
+        cleaned_dir = os.path.join(self.embeddings_dir, "cleaned")
+        os.makedirs(cleaned_dir)
+        registry_path = os.path.join(self.embeddings_dir, "registry.json")
+
+        def write_state(texts):
+            for name in os.listdir(cleaned_dir):
+                os.remove(os.path.join(cleaned_dir, name))
+            for name, text in texts.items():
+                with open(os.path.join(cleaned_dir, name + "_cleaned.json"), 'w') as f:
+                    json.dump(document(text, source_file=name), f)
+            with open(registry_path, 'w') as f:
+                json.dump([{'url': "http://example.com/" + name} for name in texts], f)
+
+        write_state({'a': "statement a", 'b': "funds b"})
+        self.assertEqual(self.service.sync(cleaned_dir, registry_path)['changed'], 2)
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=self.model)
+
+        write_state({'a': "statement a v2"})
+        result = self.service.sync(cleaned_dir, registry_path)
+        self.assertEqual((result['changed'], result['removed'], result['chunks'], result['deleted_chunks']),
+                         (1, 1, 1, 2))
+        live = [chunk['text'] for chunk in retriever.retrieve("statement funds", k=10)]
+        self.assertIn("statement a v2", live)
+        self.assertNotIn("statement a", live)
+        self.assertNotIn("funds b", live)
+
+        self.assertEqual(self.service.sync(cleaned_dir, registry_path)['chunks'], 0)
+
+    def test_sync_reads_hashes_from_object_store(self):
+        store_dir = os.path.join(self.embeddings_dir, "store")
+        store = ObjectStore(store_dir)
+        registry_path = os.path.join(self.embeddings_dir, "registry.json")
+        with open(registry_path, 'w') as f:
+            json.dump([{'url': "http://example.com/a", 'resource_name': "A"}], f)
+        store.record("a", {'resource_name': "A"}, document("statement a", source_file="a"), "raw a")
+
+        result = self.service.sync("unused", registry_path, store_dir)
+        self.assertEqual((result['changed'], result['chunks']), (1, 1))
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=self.model)
+        self.assertEqual(retriever.retrieve("statement", k=1)[0]['metadata']['source_file'], "a")
+        # Unchanged manifests: no document is even read
+        store.cleaned_document = None
+        self.assertEqual(self.service.sync("unused", registry_path, store_dir)['unchanged'], 1)
+
+    def test_sync_reembeds_only_changed_pages(self):
+        cleaned_dir = os.path.join(self.embeddings_dir, "cleaned")
+        os.makedirs(cleaned_dir)
+        registry_path = os.path.join(self.embeddings_dir, "registry.json")
+        with open(registry_path, 'w') as f:
+            json.dump([{'url': "http://example.com/sid.pdf"}], f)
+
+        def write_pages(texts):
+            pages = [{'page': number, 'text': text, 'hash': content_hash(text)}
+                     for number, text in enumerate(texts, start=1)]
+            sid = dict(document(" ".join(texts), source_file="sid.pdf"), pages=pages)
+            with open(os.path.join(cleaned_dir, "sid_cleaned.json"), 'w') as f:
+                json.dump(sid, f)
+
+        write_pages(["statement p1", "funds p2", "risks p3"])
+        self.assertEqual(self.service.sync(cleaned_dir, registry_path)['chunks'], 3)
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=self.model)
+        result = next(chunk for chunk in retriever.retrieve("risks", k=10) if chunk['text'] == "risks p3")
+        self.assertEqual(result['metadata']['page'], 3)
+        self.assertEqual(retriever.citations.get(result['citation_id'])['link'], "http://example.com/sid.pdf#page=3")
+
+        write_pages(["statement p1", "funds p2 v2"])
+        result = self.service.sync(cleaned_dir, registry_path)
+        self.assertEqual((result['changed_pages'], result['chunks'], result['deleted_chunks']), (1, 1, 2))
+        live = [chunk['text'] for chunk in retriever.retrieve("statement funds risks", k=10)]
+        self.assertIn("statement p1", live)
+        self.assertIn("funds p2 v2", live)
+        self.assertNotIn("funds p2", live)
+        self.assertNotIn("risks p3", live)
+
+    def test_rebase_after_full_rebuild(self):
+        self.service.submit([document("statement faq", source_file="faq.json"),
+                             document("statement registry", source_file="doc.json")])
+        self.service.process_pending()
+        rebase_segments(self.embeddings_dir, {"http://example.com/doc.json": "hash"})
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=self.model)
+        texts = [chunk['text'] for chunk in retriever.retrieve("statement", k=5)]
+        self.assertIn("statement faq", texts)
+        self.assertNotIn("statement registry", texts)
+        self.assertEqual(load_manifest(self.embeddings_dir)['sources'], {"http://example.com/doc.json": "hash"})
+
+    def test_compressed_search_covers_segment_rows(self):
+        embeddings = np.load(os.path.join(self.embeddings_dir, "embeddings.npy"))
+        build_codec('int8', embeddings).save(compressed_embeddings_path(self.embeddings_dir, 'int8'))
+        self.service.submit([document("statement")])
+        self.service.process_pending()
+
+        retriever = RetrievalSystem(self.embeddings_dir, compression='int8', rescore_k=1, encoder=self.model)
+        self.assertEqual(retriever.retrieve("statement", k=1)[0]['text'], "statement")
+        self.assertEqual(retriever.retrieve_batch(["statement"], k=1)[0][0]['text'], "statement")
+
+    def test_segments_keep_mapped_base(self):
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=self.model, mmap_index=True)
+        self.service.submit([document("statement"), document("risks and statement")])
+        self.service.process_pending()
+
+        results = retriever.retrieve("risks", k=2)
+        self.assertEqual([chunk['text'] for chunk in results], ["About risks.", "risks and statement"])
+        batch = retriever.retrieve_batch(["statement", "funds"], k=1)
+        self.assertEqual([rows[0]['text'] for rows in batch], ["statement", "About funds."])
+        # Segment rows are searched on their own; the base stays mapped, not copied
+        self.assertIsInstance(retriever.embeddings, np.memmap)
+        self.assertTrue(np.shares_memory(retriever._unit_embeddings(), retriever.embeddings))
+
+    def test_background_thread(self):
+        retriever = RetrievalSystem(self.embeddings_dir, encoder=self.model)
+        self.service.start()
+        self.service.submit([document("statement")])
+        for _ in range(100):
+            if self.service.status()['segments']:
+                break
+            self.service._stop.wait(0.05)
+        self.assertEqual(retriever.retrieve("statement", k=1)[0]['text'], "statement")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,122 @@
+import unittest
+import os
+import sys
+import shutil
+import numpy as np
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phase3_retrieval.intent_classifier import EmbeddingIntentClassifier
+from phase3_retrieval.query_classifier import QueryClassifier
+
+ADVISORY = ["Should I invest?", "Which fund is best for me?"]
+FACTUAL = ["What is the exit load?", "What is the expense ratio?"]
+
+
+class FakeModel:
+    """Advisory exemplars point along axis 0, factual ones along axis 1."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def encode(self, texts):
+        self.calls += 1
+        return np.array([[1.0, 0.1, 0.0] if text in ADVISORY else [0.1, 1.0, 0.0] for text in texts])
+
+
+class TestEmbeddingIntentClassifier(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = "mock_intent_cache"
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.model = FakeModel()
+
+    def tearDown(self):
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def make(self, **kwargs):
+        return EmbeddingIntentClassifier(self.model, self.cache_dir, advisory_exemplars=ADVISORY,
+                                         factual_exemplars=FACTUAL, **kwargs)
+
+    def test_classify(self):
+        for method in ['centroid', 'nearest']:
+            classifier = self.make(method=method)
+            advisory = classifier.classify(np.array([0.9, 0.2, 0.1]))
+            factual = classifier.classify(np.array([0.2, 0.9, 0.1]))
+            self.assertEqual(advisory['type'], 'advisory')
+            self.assertEqual(factual['type'], 'factual')
+            self.assertEqual(advisory['rule'], f"embedding_{method}")
+
+    def test_margin_favours_factual(self):
+        # Equidistant queries stay factual and go through RAG
+        classifier = self.make(margin=0.05)
+        self.assertEqual(classifier.classify(np.array([1.0, 1.0, 0.0]))['type'], 'factual')
+
+    def test_banks_cached(self):
+        self.make()
+        self.assertEqual(self.model.calls, 2)
+        self.assertTrue(os.path.exists(os.path.join(self.cache_dir, "intent_banks.npz")))
+
+        # Second instance reads the cache instead of encoding
+        self.make()
+        self.assertEqual(self.model.calls, 2)
+
+        # Changed exemplars invalidate the cache
+        EmbeddingIntentClassifier(self.model, self.cache_dir, advisory_exemplars=ADVISORY[:1],
+                                  factual_exemplars=FACTUAL)
+        self.assertEqual(self.model.calls, 4)
+
+    def test_invalid_method(self):
+        with self.assertRaises(ValueError):
+            self.make(method='knn')
+
+
+class TestHybridQueryClassifier(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = "mock_intent_cache"
+        os.makedirs(self.cache_dir, exist_ok=True)
+        intent_classifier = EmbeddingIntentClassifier(FakeModel(), self.cache_dir,
+                                                      advisory_exemplars=ADVISORY, factual_exemplars=FACTUAL)
+        self.classifier = QueryClassifier(intent_classifier=intent_classifier)
+        self.advisory_embedding = np.array([0.9, 0.2, 0.1])
+
+    def tearDown(self):
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
+
+    def test_strong_rule_skips_embedding(self):
+        result = self.classifier.classify("Should I invest in HDFC Mid Cap Fund?")
+        self.assertFalse(self.classifier.needs_embedding(result))
+        result = self.classifier.classify("Should I invest in HDFC Mid Cap Fund?", self.advisory_embedding)
+        self.assertEqual(result['rule'], 'advisory_0')
+
+    def test_weak_rule_uses_embedding(self):
+        query = "Is this a sensible choice for a beginner?"
+        self.assertEqual(self.classifier.classify(query)['rule'], 'default')
+        self.assertTrue(self.classifier.needs_embedding(self.classifier.classify(query)))
+        result = self.classifier.classify(query, self.advisory_embedding)
+        self.assertEqual(result['type'], 'advisory')
+        self.assertEqual(result['rule'], 'embedding_centroid')
+
+    def test_over_firing_pattern_uses_embedding(self):
+        result = self.classifier.classify("Can I redeem my units online?")
+        self.assertEqual(result['match'], 'can i')
+        self.assertTrue(self.classifier.needs_embedding(result))
+        factual_embedding = np.array([0.2, 0.9, 0.1])
+        self.assertEqual(self.classifier.classify("Can I redeem my units online?", factual_embedding)['type'], 'factual')
+
+    def test_operational_stays_factual(self):
+        result = self.classifier.classify("How can I download my statement?", self.advisory_embedding)
+        self.assertEqual(result['type'], 'factual')
+        self.assertEqual(result['rule'], 'operational')
+
+    def test_without_intent_classifier(self):
+        classifier = QueryClassifier()
+        result = classifier.classify("Is this a sensible choice for a beginner?", self.advisory_embedding)
+        self.assertFalse(classifier.needs_embedding(result))
+        self.assertEqual(result['rule'], 'default')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+import os
+import sys
+import json
+from unittest.mock import MagicMock
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+from fastapi.testclient import TestClient
+
+from utils import metrics
+from phase4_generation.generation_pipeline import AnswerGenerator
+from phase4_generation.llm_client import ChatCompletionsClient, FakeLLMClient, RateLimitedLLMClient, fake_answer
+import fake_llm_server
+from load_test import summarize
+
+CHUNKS = [{'text': "The exit load is 1% within one year. Nothing after that.", 'metadata': {'source_file': "a.json"}}]
+
+
+class TestLLMClients(unittest.TestCase):
+    def test_fake_client_plugs_into_generator(self):
+        generator = AnswerGenerator(api_key=None, llm_client=FakeLLMClient(ttft=0, tokens_per_second=0))
+        self.assertIsNone(generator.client)
+        with metrics.trace() as request_trace:
+            answer = generator.generate_answer("What is the exit load?", CHUNKS)
+        self.assertEqual(answer, "The exit load is 1% within one year. 📘")
+        self.assertIn('llm_ttft', request_trace['timings'])
+        self.assertGreater(request_trace['tokens']['prompt'], 0)
+
+    def test_fake_answer_without_context(self):
+        self.assertIn("I don't know", fake_answer("USER QUESTION: hello"))
+
+    def test_chat_completions_client(self):
+        sdk_client = MagicMock()
+        completion = MagicMock()
+        completion.choices[0].message.content = "Answer"
+        completion.usage = MagicMock(prompt_tokens=10, completion_tokens=2)
+        sdk_client.chat.completions.create.return_value = completion
+
+        client = ChatCompletionsClient(sdk_client, "test-model")
+        with metrics.trace() as request_trace:
+            self.assertEqual(client.complete([{'role': 'user', 'content': "Q"}], max_tokens=50), "Answer")
+        self.assertEqual(sdk_client.chat.completions.create.call_args[1]['model'], "test-model")
+        self.assertEqual(request_trace['tokens'], {'prompt': 10, 'completion': 2})
+
+
+class RateLimitError(Exception):
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("rate limited")
+        self.response = MagicMock(headers={'retry-after': str(retry_after)})
+
+
+class TestRateLimitedClient(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.sleeps = []
+        self.inner = MagicMock(model="m")
+        self.inner.complete.return_value = "ok"
+
+    def clock(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def test_spaces_calls(self):
+        client = RateLimitedLLMClient(self.inner, requests_per_minute=60, clock=self.clock, sleep=self.sleep)
+        for _ in range(3):
+            self.assertEqual(client.complete([]), "ok")
+        self.assertEqual(self.sleeps, [1.0, 1.0])
+
+    def test_429_pauses_callers(self):
+        client = RateLimitedLLMClient(self.inner, requests_per_minute=600, clock=self.clock, sleep=self.sleep)
+        self.inner.complete.side_effect = RateLimitError(retry_after=5)
+        with self.assertRaises(RateLimitError):
+            client.complete([])
+        self.inner.complete.side_effect = None
+        client.complete([])
+        self.assertEqual(self.sleeps, [5.0])
+
+
+class TestFakeLLMServer(unittest.TestCase):
+    def setUp(self):
+        fake_llm_server.CONFIG.update(ttft=0.0, tokens_per_second=0, jitter=0.0, error_rate=0.0)
+        self.client = TestClient(fake_llm_server.app)
+        self.body = {
+            'model': "llama-3.3-70b-versatile",
+            'messages': [{'role': 'user', 'content': "CONTEXT:\nSource: a\nContent: NAV is the unit price. More.\n\nUSER QUESTION: q"}],
+        }
+
+    def test_completion(self):
+        response = self.client.post("/openai/v1/chat/completions", json=self.body)
+        data = response.json()
+        self.assertEqual(data['choices'][0]['message']['content'], "NAV is the unit price. 📘")
+        self.assertGreater(data['usage']['prompt_tokens'], 0)
+
+    def test_streaming(self):
+        response = self.client.post("/v1/chat/completions", json=dict(self.body, stream=True))
+        events = [line[len("data: "):] for line in response.text.splitlines() if line.startswith("data: ")]
+        self.assertEqual(events[-1], "[DONE]")
+        chunks = [json.loads(event) for event in events[:-1]]
+        text = "".join(chunk['choices'][0]['delta'].get('content', '') for chunk in chunks)
+        self.assertEqual(text, "NAV is the unit price. 📘")
+        self.assertIn('usage', chunks[-1]['x_groq'])
+
+    def test_injected_errors(self):
+        fake_llm_server.CONFIG['error_rate'] = 1.0
+        self.assertEqual(self.client.post("/v1/chat/completions", json=self.body).status_code, 500)
+
+
+class TestLoadSummary(unittest.TestCase):
+    def test_summarize(self):
+        records = [{'status': 200, 'latency': 0.1 * i} for i in range(1, 11)] + [{'status': 500, 'latency': 0.01}]
+        summary = summarize(records, elapsed=2.0, target_rps=5)
+        self.assertEqual(summary['succeeded'], 10)
+        self.assertEqual(summary['failed'], 1)
+        self.assertEqual(summary['achieved_rps'], 5.0)
+        self.assertEqual(summary['statuses'], {'200': 10, '500': 1})
+        self.assertEqual(summary['max_ms'], 1000.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+import os
+import sys
+from unittest.mock import patch, MagicMock
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import metrics
+from utils.metrics import MetricsRegistry
+from phase4_generation.generation_pipeline import AnswerGenerator
+
+
+def stream_chunk(content=None, usage=None):
+    chunk = MagicMock()
+    chunk.choices = [MagicMock()]
+    chunk.choices[0].delta.content = content
+    chunk.x_groq = MagicMock(usage=usage) if usage else None
+    chunk.usage = None
+    return chunk
+
+
+class TestMetricsRegistry(unittest.TestCase):
+    def test_render_prometheus_format(self):
+        registry = MetricsRegistry()
+        registry.describe('latency_seconds', 'histogram', "Latency")
+        registry.observe('latency_seconds', 0.003, stage='search')
+        registry.observe('latency_seconds', 0.2, stage='search')
+        registry.inc('cache_total', cache='facts', result='hit')
+
+        text = registry.render()
+        self.assertIn("# TYPE latency_seconds histogram", text)
+        self.assertIn('latency_seconds_bucket{stage="search",le="0.005"} 1', text)
+        self.assertIn('latency_seconds_bucket{stage="search",le="0.25"} 2', text)
+        self.assertIn('latency_seconds_bucket{stage="search",le="+Inf"} 2', text)
+        self.assertIn('latency_seconds_count{stage="search"} 2', text)
+        self.assertIn('cache_total{cache="facts",result="hit"} 1', text)
+
+    def test_cache_hit_rate(self):
+        registry = MetricsRegistry()
+        self.assertIsNone(registry.cache_hit_rate('facts'))
+        registry.inc(metrics.CACHE_REQUESTS, cache='facts', result='hit')
+        registry.inc(metrics.CACHE_REQUESTS, cache='facts', result='miss')
+        self.assertEqual(registry.cache_hit_rate('facts'), 0.5)
+
+    def test_trace_collects_spans(self):
+        with metrics.trace() as request_trace:
+            with metrics.span('encode'):
+                pass
+            with metrics.span('encode'):
+                pass
+            metrics.record_tokens(100, 20)
+        self.assertIn('encode', request_trace['timings'])
+        self.assertEqual(request_trace['tokens'], {'prompt': 100, 'completion': 20})
+
+        # Spans outside a trace still reach the registry
+        with metrics.span('search'):
+            pass
+        self.assertIn('search', metrics.REGISTRY.summary()['stages'])
+
+
+class TestGeneratorInstrumentation(unittest.TestCase):
+    @patch('phase4_generation.generation_pipeline.Groq')
+    def test_streaming_records_ttft_and_tokens(self, mock_groq_class):
+        mock_client = mock_groq_class.return_value
+        mock_client.chat.completions.create.return_value = iter([
+            stream_chunk("The exit "),
+            stream_chunk("load is 1%."),
+            stream_chunk(None, usage=MagicMock(prompt_tokens=250, completion_tokens=8)),
+        ])
+
+        generator = AnswerGenerator(api_key="test_key", stream=True)
+        with metrics.trace() as request_trace:
+            answer = generator.generate_answer("Query", [{'text': "Context", 'metadata': {}}])
+
+        self.assertEqual(answer, "The exit load is 1%.")
+        self.assertTrue(mock_client.chat.completions.create.call_args[1]['stream'])
+        for stage in ['context_build', 'llm_ttft', 'llm']:
+            self.assertIn(stage, request_trace['timings'])
+        self.assertEqual(request_trace['tokens'], {'prompt': 250, 'completion': 8,
+                                                   'context_retrieved': 6, 'context_sent': 6})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,41 @@ import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from phase1_data_collection.scraper import Phase1Scraper
+from phase1_data_collection import html_extract
+from phase1_data_collection.html_extract import extract_text
+from phase1_data_collection.object_store import ObjectStore
+from phase1_data_collection.cleaning import CleaningPipeline, clean_documents, rules_version
+from phase1_data_collection.pdf_tables import extract_tables_from_pdf, layout_rows
+
+ARTICLE = (" The expense ratio is the annual fee charged by a mutual fund, expressed as a percentage of"
+           " average daily net assets, covering management, administration and distribution costs.") * 2
+PAGE = f"""<html><body>
+<div class="top-menu"><a href="/">Home</a><a href="/funds">Funds</a></div>
+<div id="cookie-consent">We use cookies. Accept all?</div>
+<div class="row"><div class="main-content"><h1>Expense Ratio</h1><p>{ARTICLE}</p></div>
+<div class="related"><a href="/a">Related article</a></div></div>
+<footer>Copyright</footer></body></html>"""
+
+def make_pdf(pages):
+    """A minimal PDF with text at given positions: pages of [(x, y, text)]."""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for lines in pages:
+        stream = "".join(f"BT /F1 10 Tf {x} {y} Td ({text}) Tj ET\n" for x, y, text in lines)
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}endstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {len(objects)} 0 R "
+                       f"/Resources << /Font << /F1 3 0 R >> >> >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+    pdf, offsets = "%PDF-1.4\n", []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj\n{obj}\nendobj\n"
+    xref = len(pdf)
+    pdf += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    pdf += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    pdf += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return pdf.encode('latin-1')
 
 class TestPhase1Scraper(unittest.TestCase):
     def setUp(self):
@@ -101,5 +136,198 @@ class TestPhase1Scraper(unittest.TestCase):
         
         self.assertIn("PDF Page Text", text)
 
+    @patch('phase1_data_collection.scraper.Phase1Scraper.save_json')
+    @patch('phase1_data_collection.scraper.Phase1Scraper.extract_pages_from_pdf')
+    def test_process_pdf_keeps_pages(self, mock_extract, mock_save):
+        mock_extract.return_value = ["Page  one\n text", "", "Page three"]
+        scraper = Phase1Scraper(self.registry_path, self.raw_dir, self.cleaned_dir)
+        scraper.process_resource(self.registry_data[0])
+
+        cleaned = mock_save.call_args_list[1][0][0]
+        self.assertEqual(cleaned["extracted_text"], "Page one text Page three")
+        # Blank pages are dropped but the numbering still counts them
+        self.assertEqual([page["page"] for page in cleaned["pages"]], [1, 3])
+        self.assertEqual(cleaned["pages"][0]["hash"], scraper.clean_pages(["Page one text"], "")[0]["hash"])
+        self.assertEqual(len(mock_save.call_args_list[0][0][0]["pages"]), 3)
+
+class TestPdfTables(unittest.TestCase):
+    def test_rows_from_layout_text(self):
+        pdf = make_pdf([[(50, 700, "Fund Facts"), (50, 680, "Exit Load"), (200, 680, "1% if redeemed within 1 year"),
+                         (200, 668, "Nil after 1 year"), (50, 650, "AUM (as on 31st December, 2025)"),
+                         (300, 650, "INR 92,641.55 Cr.")],
+                        [(50, 700, "No tables on this page")]])
+        tables = extract_tables_from_pdf(pdf)
+        self.assertEqual(tables, [{"page": 1, "rows": [
+            ["Exit Load", "1% if redeemed within 1 year Nil after 1 year"],
+            ["AUM (as on 31st December, 2025)", "INR 92,641.55 Cr."]]}])
+        self.assertEqual(extract_tables_from_pdf(b"not a pdf"), [])
+
+    @patch('phase1_data_collection.scraper.Phase1Scraper.save_json')
+    @patch('phase1_data_collection.scraper.Phase1Scraper.download')
+    def test_scraper_keeps_table_rows(self, mock_download, mock_save):
+        mock_download.return_value = make_pdf([[(50, 700, "Exit Load"), (200, 700, "Nil")]])
+        with open("mock_registry.json", 'w') as f:
+            json.dump([], f)
+        try:
+            scraper = Phase1Scraper("mock_registry.json", "mock_raw", "mock_cleaned")
+            resource = {"resource_name": "Test KIM", "source": "HDFC MF", "document_type": "KIM",
+                        "url": "http://example.com/kim.pdf", "extract_tables": True}
+            scraper.process_resource(resource)
+        finally:
+            os.remove("mock_registry.json")
+            for path in ["mock_raw", "mock_cleaned"]:
+                if os.path.exists(path):
+                    os.rmdir(path)
+        # One download for both the text and the table rows
+        self.assertEqual(mock_download.call_count, 1)
+        cleaned = mock_save.call_args_list[1][0][0]
+        self.assertEqual(cleaned["extracted_text"], "Exit Load Nil")
+        self.assertEqual(cleaned["tables"], [{"page": 1, "rows": [["Exit Load", "Nil"]]}])
+
+    def test_header_rows_and_unaligned_lines(self):
+        text = ("Inception Date     Benchmark\n"
+                "June 25, 2007      Nifty Midcap 150\n"
+                "                   Index (TRI)\n"
+                "   Footnote text after the table")
+        self.assertEqual(layout_rows(text), [["Inception Date", "Benchmark"],
+                                             ["June 25, 2007", "Nifty Midcap 150 Index (TRI)"]])
+
+class TestObjectStore(unittest.TestCase):
+    def setUp(self):
+        import tempfile
+        self.root = tempfile.mkdtemp()
+        self.store = ObjectStore(self.root)
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.root)
+
+    def test_objects_are_content_addressed(self):
+        digest = self.store.put_text("some text")
+        path = self.store._existing_path(digest)
+        mtime = os.path.getmtime(path)
+        self.assertEqual(self.store.put_text("some text"), digest)
+        self.assertEqual(os.path.getmtime(path), mtime)
+        self.assertEqual(self.store.get_text(digest), "some text")
+        self.assertEqual(self.store.put_json({"b": 1, "a": 2}), self.store.put_json({"a": 2, "b": 1}))
+
+    @patch('phase1_data_collection.scraper.Phase1Scraper.save_json')
+    @patch('phase1_data_collection.scraper.Phase1Scraper.extract_text_from_html')
+    @patch('phase1_data_collection.scraper.Phase1Scraper.download')
+    def test_scraper_skips_unchanged_downloads(self, mock_download, mock_extract, mock_save):
+        import tempfile
+        cleaned_dir = tempfile.mkdtemp(dir=self.root)
+        with open("mock_registry.json", 'w') as f:
+            json.dump([], f)
+        try:
+            scraper = Phase1Scraper("mock_registry.json", os.path.join(self.root, "raw"), cleaned_dir, self.root)
+        finally:
+            os.remove("mock_registry.json")
+        mock_save.side_effect = lambda data, path: open(path, 'w').close()
+        resource = {"resource_name": "Test HTML", "source": "Test Source", "document_type": "Educational",
+                    "url": "http://example.com/test.html"}
+        mock_download.return_value = b"<html>v1</html>"
+        mock_extract.return_value = "Extracted  Text"
+
+        scraper.process_resource(resource)
+        # Raw data goes to the store only
+        self.assertEqual([call[0][1] for call in mock_save.call_args_list],
+                         [os.path.join(cleaned_dir, "test_html_cleaned.json")])
+        manifest = self.store.load_manifest("test_html")
+        self.assertEqual(self.store.get_text(manifest['raw_text']), "Extracted  Text")
+        self.assertEqual(self.store.cleaned_document("test_html")["extracted_text"], "Extracted Text")
+        self.assertFalse(self.store.has(manifest['raw']))
+
+        scraper.process_resource(resource)
+        self.assertEqual(mock_extract.call_count, 1)
+        # New bytes, same text: nothing downstream is rewritten
+        mock_download.return_value = b"<html>v2</html>"
+        scraper.process_resource(resource)
+        self.assertEqual((mock_extract.call_count, mock_save.call_count), (2, 1))
+        self.assertEqual(self.store.gc(), 0)
+        # Same bytes, new cleaning rules: the document is cleaned again
+        self.assertEqual(self.store.load_manifest("test_html")['cleaning'], rules_version())
+        scraper.process_resource(resource)
+        self.assertEqual(mock_extract.call_count, 2)
+        with patch('phase1_data_collection.scraper.rules_version', return_value="other rules"):
+            scraper.process_resource(resource)
+        self.assertEqual(mock_extract.call_count, 3)
+
+@unittest.skipIf(html_extract.lxml is None, "lxml is not installed")
+class TestHtmlExtraction(unittest.TestCase):
+    def test_readability_keeps_main_content_only(self):
+        text = extract_text(PAGE, {"html_extractor": "readability"})
+        self.assertTrue(text.startswith("Expense Ratio\nThe expense ratio"))
+        for boilerplate in ["Home", "cookies", "Related article", "Copyright"]:
+            self.assertNotIn(boilerplate, text)
+
+    def test_page_and_legacy_modes(self):
+        page = extract_text(PAGE, {"html_extractor": "page"})
+        self.assertIn("Related article", page)
+        self.assertNotIn("cookies", page)
+        self.assertIn("cookies", extract_text(PAGE, {"html_extractor": "legacy"}))
+        # Short pages fall back to the whole body
+        self.assertEqual(extract_text("<html><body><p>Hello World</p></body></html>"), "Hello World")
+
+    def test_content_inside_boilerplate_like_classes(self):
+        page = (f"<html><body><div class='app-wrapper has-sidebar'><div class='fund-header'>HDFC Mid Cap Fund</div>"
+                f"<div id='shareholding'><p>{ARTICLE}</p></div><div class='main-menu'>Home</div></div></body></html>")
+        text = extract_text(page, {"html_extractor": "page"})
+        self.assertTrue(text.startswith("HDFC Mid Cap Fund\nThe expense ratio"))
+        self.assertNotIn("Home", text)
+        # A wrapper that looks like boilerplate but holds the page is kept
+        wrapped = f"<html><body><div class='page-header'><p>{ARTICLE}</p></div></body></html>"
+        self.assertIn("expense ratio", extract_text(wrapped, {"html_extractor": "page"}))
+        # Rules that remove the content itself fall back to the legacy extractor
+        self.assertIn("expense ratio", extract_text(PAGE, {"html_extractor": "page", "drop_xpath": ["//body/div"]}))
+
+    def test_registry_xpaths(self):
+        config = {"content_xpath": "//div[@class='related']", "drop_xpath": ["//a[@href='/a']"]}
+        self.assertEqual(extract_text(PAGE, config), "")
+        self.assertEqual(extract_text(PAGE, {"content_xpath": "//h1"}), "Expense Ratio")
+        with self.assertRaises(ValueError):
+            extract_text(PAGE, {"html_extractor": "unknown"})
+
+class TestCleaningPipeline(unittest.TestCase):
+    def test_hyphenation_unicode_and_disclaimers(self):
+        text = ("An open-\nended equity sch\u00ad\neme \ufb01ts most.\uf06c Mutual Fund investments are subject "
+                "to market risks, read all scheme related documents carefully.")
+        self.assertEqual(CleaningPipeline.for_source("AMFI").run([text])[0], ["An open-ended equity scheme fits most."])
+
+    def test_running_headers_and_tables_per_source(self):
+        body = ["Investment objective", "Exit load", "Fund manager", "Benchmark"]
+        pages = [f"HDFC Mid Cap Fund - KIM\n{text}\nRefer disclaimer on page 12\n{n}"
+                 for n, text in enumerate(body, start=1)]
+        pages[1] += "\nPlan     Expense ratio\nDirect   0.74%"
+        cleaned, report = CleaningPipeline.for_source("HDFC MF").run(pages)
+        self.assertEqual(cleaned[0], "Investment objective")
+        self.assertEqual(cleaned[1], "Exit load Plan | Expense ratio Direct | 0.74%")
+        self.assertGreater(report['stages']['strip_headers_footers']['chars_removed'], 0)
+        self.assertEqual(report['chars_in'] - report['chars_out'],
+                         sum(stage['chars_removed'] for stage in report['stages'].values()))
+        # Other sources do not strip headers or split table cells
+        self.assertTrue(CleaningPipeline.for_source("AMFI").run(pages)[0][0].startswith("HDFC Mid Cap Fund - KIM"))
+        with self.assertRaises(ValueError):
+            CleaningPipeline(["unknown_stage"])
+
+    def test_disclaimer_across_page_break_keeps_pages(self):
+        pages = ["Intro. Mutual Fund investments are subject to", "market risks, read all scheme related documents "
+                 "carefully. Refer disclaimer on\n", "page 3 Body"]
+        cleaned, _ = CleaningPipeline.for_source("HDFC MF").run(pages)
+        self.assertEqual(len(cleaned), 3)
+        self.assertEqual(cleaned[2], "page 3 Body")
+
+        def merge_pages(text, pipeline):
+            return text.replace("\f", " ")
+        with patch.dict('phase1_data_collection.cleaning.STAGES', {'collapse_whitespace': merge_pages}):
+            with self.assertRaises(RuntimeError):
+                CleaningPipeline(["collapse_whitespace"]).run(["a", "b"])
+
+    def test_clean_documents_keeps_order(self):
+        documents = [("AMFI", ["  a  b "]), ("HDFC MF", ["c\n", "", " d"])]
+        cleaned, report = clean_documents(documents, workers=1)
+        self.assertEqual(cleaned, [["a b"], ["c", "", "d"]])
+        self.assertEqual(report['documents'], 2)
+
 if __name__ == '__main__':
     unittest.main()
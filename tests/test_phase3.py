@@ -9,7 +9,8 @@ import shutil
 # Ensure parent directory is in path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from phase3_retrieval.retrieval_pipeline import RetrievalSystem
+from phase3_retrieval.retrieval_pipeline import RetrievalSystem, blocked_top_k
+from phase2_vector_db.quantization import build_codec, compressed_embeddings_path
 
 class TestRetrievalSystem(unittest.TestCase):
     def setUp(self):
@@ -68,6 +69,69 @@ class TestRetrievalSystem(unittest.TestCase):
         self.assertEqual(results[0]['score'], 0.95)
         self.assertEqual(results[1]['id'], "id1") # corpus_id 0
 
+    @patch('phase3_retrieval.retrieval_pipeline.SentenceTransformer')
+    def test_retrieve_compressed(self, mock_model_cls):
+        codec = build_codec('int8', self.embeddings)
+        codec.save(compressed_embeddings_path(self.embeddings_dir, 'int8'))
+        mock_model_cls.return_value.encode.return_value = np.array([0.7, 0.8, 0.9], dtype=np.float32)
+        
+        retriever = RetrievalSystem(self.embeddings_dir, compression='int8', rescore_k=2)
+        results = retriever.retrieve("query", k=2)
+        
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0]['id'], "id3")
+        # Scores come from exact float32 rescoring, not the int8 codes
+        expected = float(self.embeddings[2] @ np.array([0.7, 0.8, 0.9]) /
+                         (np.linalg.norm(self.embeddings[2]) * np.linalg.norm([0.7, 0.8, 0.9])))
+        self.assertAlmostEqual(results[0]['score'], expected, places=5)
+
+    @patch('phase3_retrieval.retrieval_pipeline.SentenceTransformer')
+    def test_retrieve_batch(self, mock_model_cls):
+        mock_model_cls.return_value.encode.return_value = np.array([
+            [0.1, 0.2, 0.3],
+            [0.7, 0.8, 0.9],
+        ], dtype=np.float32)
+        
+        retriever = RetrievalSystem(self.embeddings_dir)
+        results = retriever.retrieve_batch(["q1", "q2"], k=2)
+        
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0][0]['id'], "id1")
+        self.assertEqual(results[1][0]['id'], "id3")
+        self.assertGreaterEqual(results[1][0]['score'], results[1][1]['score'])
+        self.assertAlmostEqual(results[0][0]['score'], 1.0, places=5)
+
+    @patch('phase3_retrieval.retrieval_pipeline.SentenceTransformer')
+    def test_retrieve_batch_filters(self, mock_model_cls):
+        mock_model_cls.return_value.encode.return_value = np.array([[0.7, 0.8, 0.9]], dtype=np.float32)
+        
+        retriever = RetrievalSystem(self.embeddings_dir)
+        results = retriever.retrieve_batch(["q"], k=3, filters={'source': ["file1", "file2"]})
+        self.assertEqual([r['id'] for r in results[0]], ["id2", "id1"])
+        
+        codec = build_codec('int8', self.embeddings)
+        codec.save(compressed_embeddings_path(self.embeddings_dir, 'int8'))
+        compressed = RetrievalSystem(self.embeddings_dir, compression='int8', rescore_k=3)
+        results = compressed.retrieve_batch(["q"], k=3, filters={'source': "file1"})
+        self.assertEqual([r['id'] for r in results[0]], ["id1"])
+
+    def test_blocked_top_k_matches_full_sort(self):
+        rng = np.random.default_rng(0)
+        queries = rng.standard_normal((7, 4)).astype(np.float32)
+        corpus = rng.standard_normal((50, 4)).astype(np.float32)
+        mask = rng.random(50) > 0.3
+        
+        indices, scores = blocked_top_k(queries, corpus, 5, mask, query_block=3, corpus_block=8)
+        full = np.where(mask, queries @ corpus.T, -np.inf)
+        expected = np.argsort(-full, axis=1)[:, :5]
+        np.testing.assert_array_equal(indices, expected)
+        np.testing.assert_allclose(scores, np.take_along_axis(full, expected, axis=1), rtol=1e-5)
+
+    @patch('phase3_retrieval.retrieval_pipeline.SentenceTransformer')
+    def test_missing_compressed_embeddings(self, mock_model_cls):
+        with self.assertRaises(FileNotFoundError):
+            RetrievalSystem(self.embeddings_dir, compression='pq')
+
     @patch('phase3_retrieval.retrieval_pipeline.SentenceTransformer')
     def test_build_context(self, mock_model_cls):
         # We can test this without mocking if we pass manual dicts
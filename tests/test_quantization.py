@@ -0,0 +1,78 @@
+import unittest
+import os
+import sys
+import shutil
+import numpy as np
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phase2_vector_db.quantization import (
+    Float16Codec, ScalarInt8Codec, ProductQuantizer,
+    build_codec, compressed_embeddings_path, load_codec
+)
+from phase2_vector_db.compression_report import build_report
+
+
+def random_unit_vectors(n, dim, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class TestEmbeddingCodecs(unittest.TestCase):
+    def setUp(self):
+        self.embeddings = random_unit_vectors(300, 32)
+        self.query = random_unit_vectors(1, 32, seed=1)[0]
+        self.exact = self.embeddings @ self.query
+        self.embeddings_dir = "mock_embeddings_quant"
+        os.makedirs(self.embeddings_dir, exist_ok=True)
+
+    def tearDown(self):
+        if os.path.exists(self.embeddings_dir):
+            shutil.rmtree(self.embeddings_dir)
+
+    def test_float16_scores(self):
+        codec = Float16Codec().fit(self.embeddings)
+        self.assertEqual(codec.codes.dtype, np.float16)
+        np.testing.assert_allclose(codec.score(self.query), self.exact, atol=1e-2)
+
+    def test_int8_scores(self):
+        codec = ScalarInt8Codec().fit(self.embeddings)
+        self.assertEqual(codec.codes.dtype, np.int8)
+        np.testing.assert_allclose(codec.score(self.query), self.exact, atol=5e-2)
+        # Fast path must agree with decode-then-multiply
+        np.testing.assert_allclose(codec.score(self.query), codec.decode(codec.codes) @ self.query, atol=1e-4)
+
+    def test_pq_scores(self):
+        codec = ProductQuantizer(num_subspaces=8, num_centroids=16, iterations=5).fit(self.embeddings)
+        self.assertEqual(codec.codes.shape, (300, 8))
+        np.testing.assert_allclose(codec.score(self.query), codec.decode(codec.codes) @ self.query, atol=1e-4)
+
+    def test_pq_rejects_bad_subspaces(self):
+        with self.assertRaises(ValueError):
+            ProductQuantizer(num_subspaces=7).fit(self.embeddings)
+
+    def test_save_and_load(self):
+        for name in ['float16', 'int8']:
+            codec = build_codec(name, self.embeddings)
+            codec.save(compressed_embeddings_path(self.embeddings_dir, name))
+            loaded = load_codec(self.embeddings_dir, name)
+            self.assertEqual(type(loaded), type(codec))
+            np.testing.assert_allclose(loaded.score(self.query), codec.score(self.query))
+
+        self.assertIsNone(load_codec(self.embeddings_dir, 'pq'))
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            build_codec('int4', self.embeddings)
+
+    def test_report(self):
+        report = build_report(self.embeddings, self.embeddings[:20], k=5, rescore_k=30, codecs=['float16', 'int8'])
+        self.assertEqual(report['codecs']['float32']['recall_rescored'], 1.0)
+        self.assertGreaterEqual(report['codecs']['int8']['recall_rescored'], 0.9)
+        self.assertAlmostEqual(report['codecs']['float16']['compression_ratio'], 2.0, places=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
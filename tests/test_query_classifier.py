@@ -0,0 +1,108 @@
+import unittest
+import os
+import re
+import sys
+import json
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phase3_retrieval.query_classifier import QueryClassifier
+
+QUESTION_SET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "question_set.json")
+
+
+def load_questions():
+    with open(QUESTION_SET_PATH, 'r', encoding='utf-8') as f:
+        return [item['question'] for item in json.load(f)['questions']]
+
+
+def reference_classify(classifier, query):
+    """The original per-pattern loop, kept as the oracle for the compiled classifier."""
+    query_lower = query.lower().strip()
+
+    operational_keywords = [
+        'download', 'access', 'get', 'find', 'where', 'how to', 'how do i',
+        'how can i', 'steps to', 'guide', 'instructions', 'process'
+    ]
+    is_operational = any(keyword in query_lower for keyword in operational_keywords)
+
+    advisory_matches = []
+    for pattern in [re.compile(p, re.IGNORECASE) for p in classifier.advisory_patterns]:
+        if pattern.search(query_lower):
+            advisory_matches.append(pattern.pattern)
+
+    if advisory_matches and not is_operational:
+        return {
+            'type': 'advisory',
+            'confidence': 0.9,
+            'reason': f"Detected advisory pattern: {advisory_matches[0]}"
+        }
+
+    factual_score = 0
+    for keyword in classifier.factual_keywords:
+        if keyword in query_lower:
+            factual_score += 1
+
+    if factual_score > 0:
+        return {
+            'type': 'factual',
+            'confidence': min(0.9, 0.5 + (factual_score * 0.1)),
+            'reason': f"Contains {factual_score} factual keyword(s)"
+        }
+
+    return {
+        'type': 'factual',
+        'confidence': 0.5,
+        'reason': "No strong indicators, defaulting to factual"
+    }
+
+
+class TestCompiledQueryClassifier(unittest.TestCase):
+    def setUp(self):
+        self.classifier = QueryClassifier()
+
+    def assertEquivalent(self, query):
+        expected = reference_classify(self.classifier, query)
+        actual = self.classifier.classify(query)
+        self.assertEqual({k: actual[k] for k in expected}, expected, msg=query)
+
+    def test_equivalent_on_question_set(self):
+        questions = load_questions()
+        self.assertEqual(len(questions), 120)
+        for query in questions:
+            self.assertEquivalent(query)
+
+    def test_equivalent_on_edge_cases(self):
+        edge_cases = [
+            "", "   ", "NAV", "navigate the portfolio holdings page",
+            "lock-in and lock in", "what is what is", "RETURNS PERFORMANCE DIVIDEND",
+            "is it good for me", "beat the benchmark",
+            "compare fund where can i", "should i buy and sell this fund",
+        ]
+        for query in edge_cases:
+            self.assertEquivalent(query)
+
+    def test_rule_reports_first_pattern_in_list_order(self):
+        # 'portfolio' (pattern 5) appears before 'should i' (pattern 0) in the text
+        result = self.classifier.classify("My portfolio: should i rebalance?")
+        self.assertEqual(result['rule'], 'advisory_0')
+
+        self.assertEqual(self.classifier.classify("What is NAV?")['rule'], 'factual_keywords')
+        self.assertEqual(self.classifier.classify("hello")['rule'], 'default')
+
+    def test_overlapping_keywords_counted(self):
+        # Custom keyword list where one keyword is a prefix of another
+        classifier = QueryClassifier()
+        classifier.factual_keywords = ['exit', 'exit load', 'load']
+        classifier._compile()
+        result = classifier.classify("exit load")
+        self.assertEqual(result['reason'], "Contains 3 factual keyword(s)")
+
+    def test_classify_batch(self):
+        queries = load_questions()[:10]
+        self.assertEqual(self.classifier.classify_batch(queries), [self.classifier.classify(q) for q in queries])
+
+
+if __name__ == '__main__':
+    unittest.main()
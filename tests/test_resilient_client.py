@@ -0,0 +1,144 @@
+import unittest
+import os
+import sys
+import time
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import metrics
+from phase4_generation.llm_client import LLMClient, FakeLLMClient
+from phase4_generation.resilient_client import (
+    CircuitBreaker, LLMUnavailableError, ResilientLLMClient, LLM_FALLBACKS, LLM_HEDGES, LLM_HEDGE_TOKENS
+)
+
+MESSAGES = [{'role': 'user', 'content': "Question"}]
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+class ScriptedClient(LLMClient):
+    """Plays back a script of exceptions / (delay, answer) pairs, one per call."""
+
+    def __init__(self, script, model="primary"):
+        self.script = list(script)
+        self.model = model
+        self.calls = 0
+
+    def complete(self, messages, temperature=0.0, max_tokens=300, stream=False, timeout=None):
+        step = self.script[min(self.calls, len(self.script) - 1)]
+        self.calls += 1
+        if isinstance(step, Exception):
+            raise step
+        delay, answer = step
+        time.sleep(delay)
+        metrics.record_tokens(10, len(answer))
+        return answer
+
+
+class TestResilientLLMClient(unittest.TestCase):
+    def make(self, primary, **kwargs):
+        kwargs.setdefault('sleep', lambda seconds: None)
+        return ResilientLLMClient(primary, **kwargs)
+
+    def test_retries_rate_limit(self):
+        primary = ScriptedClient([StatusError(429), StatusError(503), (0, "ok")])
+        self.assertEqual(self.make(primary).complete(MESSAGES), "ok")
+        self.assertEqual(primary.calls, 3)
+
+    def test_non_retryable_raises(self):
+        primary = ScriptedClient([StatusError(400), (0, "ok")])
+        with self.assertRaises(StatusError):
+            self.make(primary).complete(MESSAGES)
+        self.assertEqual(primary.calls, 1)
+
+    def test_fallback_after_retries(self):
+        primary = ScriptedClient([StatusError(429)])
+        fallback = ScriptedClient([(0, "small model answer")], model="fallback")
+        before = metrics.REGISTRY.counter_value(LLM_FALLBACKS, model="fallback")
+        answer = self.make(primary, fallback=fallback, max_retries=1).complete(MESSAGES)
+        self.assertEqual(answer, "small model answer")
+        self.assertEqual(primary.calls, 2)
+        self.assertEqual(metrics.REGISTRY.counter_value(LLM_FALLBACKS, model="fallback"), before + 1)
+
+    def test_deadline(self):
+        client = self.make(FakeLLMClient(ttft=1.0, tokens_per_second=0), deadline=0.2, max_retries=0)
+        start = time.monotonic()
+        with self.assertRaises(LLMUnavailableError):
+            client.complete(MESSAGES)
+        self.assertLess(time.monotonic() - start, 0.6)
+
+    def test_hedging_wins_over_slow_request(self):
+        # Warm-up calls are fast, then the first attempt stalls and the hedge answers
+        primary = ScriptedClient([(0, "fast")] * 5 + [(1.0, "slow"), (0, "hedged")])
+        client = self.make(primary, hedge_percentile=0.95, hedge_min_samples=5, deadline=3.0)
+        for _ in range(5):
+            client.complete(MESSAGES)
+        before = metrics.REGISTRY.counter_value(LLM_HEDGES, result='won')
+        lost_before = metrics.REGISTRY.counter_value(LLM_HEDGE_TOKENS, type='completion')
+        start = time.monotonic()
+        with metrics.trace() as request_trace:
+            self.assertEqual(client.complete(MESSAGES), "hedged")
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual(metrics.REGISTRY.counter_value(LLM_HEDGES, result='won'), before + 1)
+        # Usage is the winner's only; the slow request's tokens are counted apart once it finishes
+        self.assertEqual(request_trace['tokens'], {'prompt': 10, 'completion': len("hedged")})
+        for _ in range(40):
+            if metrics.REGISTRY.counter_value(LLM_HEDGE_TOKENS, type='completion') > lost_before:
+                break
+            time.sleep(0.05)
+        self.assertEqual(metrics.REGISTRY.counter_value(LLM_HEDGE_TOKENS, type='completion'),
+                         lost_before + len("slow"))
+        self.assertEqual(request_trace['tokens']['completion'], len("hedged"))
+
+    def test_open_circuit_goes_straight_to_fallback(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        primary = ScriptedClient([StatusError(500)])
+        fallback = ScriptedClient([(0, "fallback")], model="fallback")
+        client = self.make(primary, fallback=fallback, breaker=breaker, max_retries=1)
+        client.complete(MESSAGES)
+        self.assertEqual(breaker.state, 'open')
+
+        calls = primary.calls
+        self.assertEqual(client.complete(MESSAGES), "fallback")
+        self.assertEqual(primary.calls, calls)
+
+    def test_half_open_trial_with_non_retryable_error(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        primary = ScriptedClient([StatusError(500), StatusError(400), (0, "ok")])
+        fallback = ScriptedClient([(0, "fallback")], model="fallback")
+        client = self.make(primary, fallback=fallback, breaker=breaker, max_retries=0)
+        self.assertEqual(client.complete(MESSAGES), "fallback")
+        self.assertEqual(breaker.state, 'open')
+
+        now[0] = 11.0
+        with self.assertRaises(StatusError):
+            client.complete(MESSAGES)
+        # The provider answered the trial, so the primary is used again
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(client.complete(MESSAGES), "ok")
+        self.assertEqual(primary.calls, 3)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_half_open_trial(self):
+        now = [0.0]
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+
+        now[0] = 11.0
+        self.assertTrue(breaker.allow())   # single trial call
+        self.assertFalse(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertTrue(breaker.allow())
+
+
+if __name__ == '__main__':
+    unittest.main()
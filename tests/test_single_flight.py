@@ -0,0 +1,110 @@
+import unittest
+import os
+import sys
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+# Ensure parent directory is in path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import metrics
+from utils.single_flight import AsyncSingleFlight, SingleFlight, normalize_query, COALESCED_REQUESTS
+from utils.chat_pipeline import ChatPipeline
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_normalize_query(self):
+        self.assertEqual(normalize_query("  What is   NAV? "), normalize_query("what is nav"))
+
+    def test_concurrent_calls_share_result(self):
+        flight = SingleFlight('test')
+        calls = []
+        release = threading.Event()
+
+        def compute():
+            calls.append(1)
+            release.wait(2)
+            return "answer"
+
+        with ThreadPoolExecutor(max_workers=5) as pool:
+            futures = [pool.submit(flight.do, "key", compute) for _ in range(5)]
+            time.sleep(0.1)
+            release.set()
+            results = [future.result() for future in futures]
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result for result, _ in results], ["answer"] * 5)
+        self.assertEqual(sum(shared for _, shared in results), 4)
+        self.assertEqual(flight.in_flight(), 0)
+
+    def test_error_shared_and_not_cached(self):
+        flight = SingleFlight('test')
+        with self.assertRaises(ValueError):
+            flight.do("key", lambda: (_ for _ in ()).throw(ValueError("boom")))
+        self.assertEqual(flight.do("key", lambda: "ok"), ("ok", False))
+
+    def test_async_single_flight(self):
+        flight = AsyncSingleFlight('test-async')
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        async def main():
+            return await asyncio.gather(*[flight.do("key", compute) for _ in range(4)])
+
+        before = metrics.REGISTRY.counter_value(COALESCED_REQUESTS, layer='test-async')
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([shared for _, shared in results], [False, True, True, True])
+        self.assertEqual(metrics.REGISTRY.counter_value(COALESCED_REQUESTS, layer='test-async'), before + 3)
+
+    def test_cancelled_first_caller_does_not_fail_others(self):
+        flight = AsyncSingleFlight('test-async-cancel')
+
+        async def compute():
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        async def main():
+            first = asyncio.ensure_future(flight.do("key", compute))
+            await asyncio.sleep(0)
+            others = [asyncio.ensure_future(flight.do("key", compute)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            first.cancel()  # the first client disconnects
+            results = await asyncio.gather(*others)
+            with self.assertRaises(asyncio.CancelledError):
+                await first
+            return results
+
+        self.assertEqual(asyncio.run(main()), [("answer", True), ("answer", True)])
+
+
+class TestPipelineCoalescing(unittest.TestCase):
+    def test_identical_questions_run_once(self):
+        retriever = MagicMock()
+        retriever.retrieve.return_value = [{'text': "t", 'metadata': {'source_url': "http://a"}, 'score': 0.9}]
+        generator = MagicMock()
+
+        def slow_answer(query, chunks, query_embedding=None):
+            time.sleep(0.2)
+            return "answer"
+        generator.generate_answer.side_effect = slow_answer
+
+        pipeline = ChatPipeline(retriever, generator)
+        questions = ["What is NAV?", "what is nav", "  What is NAV  "]
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            results = list(pool.map(pipeline.run, questions))
+
+        self.assertEqual(generator.generate_answer.call_count, 1)
+        self.assertEqual([result['answer'] for result in results], ["answer"] * 3)
+        self.assertEqual(sum(result['coalesced'] for result in results), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process warm-up lock
+    fcntl = None
+
+from utils import metrics
+from utils.single_flight import normalize_query
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Artifacts an answer depends on; any change invalidates the cache
+INDEX_ARTIFACTS = ("vector_store.json", "embeddings.npy", "fact_table.json", "citations.json",
+                   "segments/manifest.json")
+
+# Response fields worth keeping; chunks are reduced to ids and scores
+CACHED_FIELDS = ('answer', 'sources', 'suggestions', 'type', 'stage', 'citations')
+
+
+def index_fingerprint(embeddings_dir: str) -> str:
+    """Content hash of the published index artifacts."""
+    digest = hashlib.sha256()
+    for name in INDEX_ARTIFACTS:
+        path = os.path.join(embeddings_dir, name)
+        if not os.path.exists(path):
+            continue
+        digest.update(name.encode('utf-8'))
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def index_stamp(embeddings_dir: str) -> tuple:
+    """Cheap change detector for the index artifacts: stat() only, publishes replace the files."""
+    stamp = []
+    for name in INDEX_ARTIFACTS:
+        try:
+            stat = os.stat(os.path.join(embeddings_dir, name))
+        except FileNotFoundError:
+            continue
+        stamp.append((name, stat.st_ino, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamp)
+
+
+def _file_stamp(path: str) -> Optional[tuple]:
+    try:
+        stat = os.stat(path)
+        return (stat.st_ino, stat.st_mtime_ns)
+    except FileNotFoundError:
+        return None
+
+
+class AnswerCache:
+    """
+    Precomputed answers keyed by normalized question, persisted as JSON next
+    to the index. Entries are only valid for the index they were computed
+    against: a cache file written for another fingerprint loads empty.
+
+    With embeddings_dir, every lookup also checks (with a few stat() calls)
+    that the index has not been republished since, e.g. by ingestion or a
+    sync in another process; if it has, the entries are dropped and
+    on_reset (if set) is called so the cache can be warmed again.
+    """
+
+    def __init__(self, path: str, index_version: str, embeddings_dir: Optional[str] = None):
+        self.path = path
+        self.index_version = index_version
+        self.embeddings_dir = embeddings_dir
+        self.on_reset: Optional[Callable[[], None]] = None
+        self._lock = threading.Lock()
+        self._warming = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.stale = False
+        self._index_stamp = index_stamp(embeddings_dir) if embeddings_dir else None
+        self._load()
+
+    def _check_index(self):
+        if self.embeddings_dir is None:
+            return
+        stamp = index_stamp(self.embeddings_dir)
+        if stamp == self._index_stamp:
+            if self.stale and _file_stamp(self.path) != self._loaded_stamp:
+                # Warmed by another process for the current index
+                with self._lock:
+                    self._load()
+            return
+        with self._lock:
+            if stamp == self._index_stamp:
+                return
+            self._index_stamp = stamp
+            version = index_fingerprint(self.embeddings_dir)
+            if version == self.index_version:
+                return
+            logging.info(f"Index republished ({self.index_version} -> {version}); dropping cached answers")
+            self.index_version = version
+            self.entries = {}
+            self.stale = False
+            self._load()
+            reset = self.stale
+        if reset and self.on_reset is not None:
+            self.on_reset()
+
+    def _load(self):
+        self._loaded_stamp = _file_stamp(self.path)
+        if not os.path.exists(self.path):
+            self.stale = True
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable answer cache {self.path}: {e}")
+            self.stale = True
+            return
+        if data.get('index_version') != self.index_version:
+            logging.info("Answer cache was built for another index version, ignoring it")
+            self.stale = True
+            return
+        self.stale = False
+        self.entries = data.get('entries', {})
+        logging.info(f"Loaded {len(self.entries)} precomputed answers")
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        self._check_index()
+        with self._lock:
+            entry = self.entries.get(normalize_query(query))
+        metrics.record_cache('answer_cache', entry is not None)
+        return dict(entry) if entry is not None else None
+
+    def put(self, query: str, response: Dict[str, Any]):
+        entry = {field: response.get(field) for field in CACHED_FIELDS}
+        entry['chunks'] = [{'id': chunk.get('id'), 'score': chunk.get('score')} for chunk in response.get('chunks', [])]
+        self._check_index()
+        with self._lock:
+            self.entries[normalize_query(query)] = entry
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def save(self):
+        """Atomic write so a reader never sees a half-written file."""
+        with self._lock:
+            data = {'index_version': self.index_version, 'entries': dict(self.entries)}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+        self._loaded_stamp = _file_stamp(self.path)
+        self.stale = False
+
+
+# Replies the generator returns instead of raising when the LLM call fails
+FAILURE_PREFIXES = ("Sorry, I encountered an error", "The answer service is busy", "Reference Code:")
+
+
+def is_failure(answer: str) -> bool:
+    """True for the generator's error replies (exhausted retries, errors, missing API key)."""
+    return answer.startswith(FAILURE_PREFIXES)
+
+
+def is_cacheable(response: Dict[str, Any]) -> bool:
+    """Only real answers are kept; errors, refusals and no-answer replies are recomputed."""
+    if response.get('stage') not in ('fact_lookup', 'generate'):
+        return False
+    answer = response.get('answer', "")
+    return bool(answer) and not is_failure(answer) and "I don't know based on the provided sources" not in answer
+
+
+def warm_answer_cache(pipeline, cache: AnswerCache, questions: List[str]) -> Dict[str, int]:
+    """
+    Run every question through the pipeline (bypassing the cache) and store
+    the answers. Meant to run once per index publish / deploy.
+    """
+    stored = skipped = 0
+    for question in dict.fromkeys(questions):
+        try:
+            response = pipeline.run(question, use_cache=False)
+        except Exception as e:
+            logging.warning(f"Warm-up failed for '{question}': {e}")
+            skipped += 1
+            continue
+        if is_cacheable(response):
+            cache.put(question, response)
+            stored += 1
+        else:
+            skipped += 1
+    cache.save()
+    logging.info(f"Answer cache warmed: {stored} stored, {skipped} skipped")
+    return {'stored': stored, 'skipped': skipped}
+
+
+def start_warming(pipeline, questions: List[str]) -> bool:
+    """
+    Warm the pipeline's answer cache in a background thread. One warm-up per
+    cache at a time, and one per cache file across processes (API workers):
+    the others pick up the saved file on their next lookup.
+    """
+    cache = pipeline.answer_cache
+    if not cache._warming.acquire(blocking=False):
+        return False
+
+    def run():
+        try:
+            with open(cache.path + ".lock", 'a') as lock_file:
+                if fcntl is not None:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        logging.info("Answer cache is being warmed by another process")
+                        return
+                warm_answer_cache(pipeline, cache, questions)
+        except Exception as e:
+            logging.warning(f"Answer cache warm-up failed: {e}")
+        finally:
+            cache._warming.release()
+
+    threading.Thread(target=run, daemon=True, name="answer-cache-warm").start()
+    return True
@@ -0,0 +1,345 @@
+import os
+import sys
+import time
+import logging
+from typing import List, Dict, Any, Callable, Optional, Tuple
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from utils import metrics
+from utils.single_flight import SingleFlight, normalize_query
+from utils.conversation import rewrite_follow_up, key_terms, chunks_cover
+from phase2_vector_db.citations import CitationTable
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+CONVERSATIONAL_TRIGGERS = {"ok", "okay", "thanks", "thank you", "got it", "thx", "cheers", "cool", "👍", "yes", "hi", "hello"}
+CONVERSATIONAL_REPLY = "You’re welcome! 🙂 What else would you like to know about mutual funds?"
+ANSWER_CACHE_FILE = "answer_cache.json"
+NO_ANSWER_REPLY = ("I don't know based on the provided sources 🙂 Try asking about specific fund details "
+                   "like expense ratio, SIP amount, or lock-in period.")
+
+
+class ChatPipeline:
+    """
+    One request pipeline shared by the FastAPI backend, the Streamlit app and
+    the CLI. Stages run in order and any stage can short-circuit by setting
+    the response, so every front end gets the same cheap early exits:
+
+        conversational -> rewrite -> answer_cache -> classify -> fact_lookup -> retrieve -> generate
+
+    Each stage is timed and recorded in utils.metrics; hooks registered with
+    add_hook receive (stage_name, seconds, state) after every stage that ran.
+    Concurrent identical questions (after normalization) share one run, and
+    questions precomputed into the answer cache are served without any work.
+    With a conversation store, follow-ups ("and its exit load?") are rewritten
+    against the session's earlier turns before anything else looks at them.
+    """
+
+    def __init__(self, retriever, generator, classifier=None, fact_lookup=None,
+                 refusal_handler=None, suggestions_handler=None,
+                 k: int = 5, score_threshold: float = 0.5, coalesce: bool = True, answer_cache=None,
+                 conversations=None):
+        self.retriever = retriever
+        self.generator = generator
+        self.classifier = classifier
+        self.fact_lookup = fact_lookup
+        self.refusal_handler = refusal_handler
+        self.suggestions_handler = suggestions_handler
+        self.answer_cache = answer_cache
+        self.conversations = conversations
+        self.k = k
+        self.score_threshold = score_threshold
+        self.hooks: List[Callable[[str, float, Dict[str, Any]], None]] = []
+        self.single_flight = SingleFlight('pipeline') if coalesce else None
+
+        self.stages = [
+            ('conversational', self._conversational),
+            ('rewrite', self._rewrite),
+            ('answer_cache', self._answer_cache),
+            ('classify', self._classify),
+            ('fact_lookup', self._fact_lookup),
+            ('retrieve', self._retrieve),
+            ('generate', self._generate),
+        ]
+
+    def add_hook(self, hook: Callable[[str, float, Dict[str, Any]], None]):
+        """Register a callback run after each stage with its duration in seconds."""
+        self.hooks.append(hook)
+
+    def run(self, query: str, use_cache: bool = True, session_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Answer a query. use_cache=False skips the answer cache (used to warm it).
+        With a session_id (and a conversation store) the turn is remembered and
+        follow-ups are resolved against the session's history.
+
+        Returns:
+            {
+                'answer': str,
+                'sources': list of source URLs/files (best first),
+                'citations': citation ids of those sources (see citation()),
+                'suggestions': list of follow-up questions,
+                'type': 'conversational' | 'advisory' | 'factual',
+                'stage': name of the stage that produced the answer,
+                'query': the question actually answered (rewritten for follow-ups),
+                'scheme': scheme key the question is about, or None,
+                'classification': classifier result or None,
+                'chunks': retrieved chunks (empty when retrieval was skipped),
+                'timings': {stage_name: seconds, ..., 'total': seconds}, including
+                           the encode/search/context_build/llm_ttft/llm spans,
+                'tokens': {'prompt': n, 'completion': n} when the LLM was called,
+                'coalesced': True when the answer came from an identical in-flight request,
+                'cached_stage': stage that originally produced a cached answer (answer_cache only)
+            }
+        """
+        history = []
+        if session_id and self.conversations is not None:
+            history = self.conversations.history(session_id)
+
+        if self.single_flight is None:
+            result, shared = self._run(query, use_cache, history), False
+        else:
+            key = normalize_query(query) if use_cache else "nocache:" + normalize_query(query)
+            if history:
+                # A follow-up means something different in every session
+                key = f"{session_id}:{key}"
+            result, shared = self.single_flight.do(key, lambda: self._run(query, use_cache, history))
+
+        self.remember(session_id, query, result)
+        return dict(result, coalesced=shared)
+
+    def remember(self, session_id: Optional[str], query: str, result: Dict[str, Any]):
+        """Record a turn in the session's history (callers that share another's result use this too)."""
+        if not session_id or self.conversations is None:
+            return
+        self.conversations.add_turn(session_id, {
+            'query': query,
+            'rewritten': result['query'],
+            'scheme': result['scheme'],
+            'answer': result['answer'],
+            'chunks': result['chunks'],
+        })
+
+    def _run(self, query: str, use_cache: bool = True, history: List[Dict[str, Any]] = None) -> Dict[str, Any]:
+        state = {
+            'query': query.strip(),
+            'history': history or [],
+            'scheme': None,
+            'reused_chunks': False,
+            'use_cache': use_cache,
+            'query_embedding': None,
+            'classification': None,
+            'chunks': [],
+            'response': None,
+        }
+
+        with metrics.trace() as request_trace:
+            start = time.perf_counter()
+            for name, stage in self.stages:
+                stage_start = time.perf_counter()
+                stage(state)
+                elapsed = time.perf_counter() - stage_start
+                metrics.observe_stage(name, elapsed)
+                for hook in self.hooks:
+                    hook(name, elapsed, state)
+                if state['response'] is not None:
+                    state['response']['stage'] = name
+                    break
+            metrics.observe_stage('total', time.perf_counter() - start)
+
+        response = state['response']
+        metrics.record_request(response['stage'])
+        response['query'] = state['query']
+        response['scheme'] = state['scheme']
+        response['classification'] = state['classification']
+        response['chunks'] = state['chunks']
+        response['timings'] = request_trace['timings']
+        response['tokens'] = request_trace['tokens']
+        return response
+
+    @staticmethod
+    def _respond(answer: str, response_type: str, sources: List[str] = None,
+                 suggestions: List[str] = None, citations: List[int] = None) -> Dict[str, Any]:
+        return {
+            'answer': answer,
+            'sources': sources or [],
+            'suggestions': suggestions or [],
+            'type': response_type,
+            'citations': citations or [],
+        }
+
+    def citation(self, citation_id: int) -> Dict[str, Any]:
+        """Citation record ({'display_name', 'url', 'document_type', 'scheme', 'page', 'link'}) for an answer's id."""
+        return self.retriever.citations.get(citation_id)
+
+    def _cite_chunks(self, chunks: List[Dict[str, Any]]):
+        """Sources and citation ids of chunks, in retrieval order, without duplicates."""
+        sources, citations = [], []
+        for chunk in chunks:
+            citation_id = chunk.get('citation_id')
+            if citation_id is not None:
+                if citation_id not in citations:
+                    citations.append(citation_id)
+                    # Pages of one document share its URL
+                    url = self.retriever.citations.get(citation_id)['url']
+                    if url not in sources:
+                        sources.append(url)
+                continue
+            # Chunks from a retriever without citations: prioritize URL, then filename
+            metadata = chunk.get('metadata', {})
+            source = metadata.get('source_url') or metadata.get('source_file')
+            if source and source not in sources:
+                sources.append(source)
+        return sources, citations
+
+    def _cite_urls(self, sources: List[Tuple[str, Optional[int]]]) -> List[int]:
+        """Citation ids of (URL, page or None) pairs; pages without a citation of their own cite the document."""
+        citations = getattr(self.retriever, 'citations', None)
+        if not isinstance(citations, CitationTable):
+            return []
+        ids = []
+        for url, page in sources:
+            citation_id = citations.id_for_url(url, page)
+            if citation_id is not None and citation_id not in ids:
+                ids.append(citation_id)
+        return ids
+
+    def _no_answer_suggestions(self) -> List[str]:
+        if self.suggestions_handler is None:
+            return []
+        return self.suggestions_handler.get_no_answer_suggestions()
+
+    # --- Stages ---
+
+    def _conversational(self, state: Dict[str, Any]):
+        cleaned_query = "".join(char for char in state['query'].lower() if char.isalnum() or char.isspace()).strip()
+        if not state['query'] or cleaned_query in CONVERSATIONAL_TRIGGERS:
+            state['response'] = self._respond(CONVERSATIONAL_REPLY, 'conversational')
+
+    def _rewrite(self, state: Dict[str, Any]):
+        if self.conversations is None:
+            return
+        rewrite = rewrite_follow_up(state['query'], state['history'])
+        state['query'] = rewrite['query']
+        state['scheme'] = rewrite['scheme']
+        if not rewrite['follow_up']:
+            return
+
+        # Same scheme as the last turn: its chunks may already hold the answer
+        previous = state['history'][-1]
+        if previous.get('scheme') == rewrite['scheme'] and previous.get('chunks'):
+            reuse = chunks_cover(previous['chunks'], key_terms(rewrite['query']))
+            metrics.record_cache('conversation_chunks', reuse)
+            if reuse:
+                state['chunks'] = previous['chunks']
+                state['reused_chunks'] = True
+
+    def _answer_cache(self, state: Dict[str, Any]):
+        if self.answer_cache is None or not state['use_cache']:
+            return
+        cached = self.answer_cache.get(state['query'])
+        if cached:
+            # Precomputed at deploy time - no classification, retrieval or LLM call
+            response = self._respond(cached['answer'], cached['type'], cached['sources'], cached['suggestions'],
+                                     cached.get('citations'))
+            response['cached_stage'] = cached.get('stage')
+            state['response'] = response
+
+    def _classify(self, state: Dict[str, Any]):
+        if self.classifier is None:
+            return
+        query = state['query']
+        classification = self.classifier.classify(query)
+        if self.classifier.needs_embedding(classification):
+            # Regex result not decisive - embed once, reuse for retrieval
+            state['query_embedding'] = self.retriever.encode_query(query)
+            classification = self.classifier.classify(query, state['query_embedding'])
+        state['classification'] = classification
+
+        if classification['type'] == 'advisory' and self.refusal_handler is not None:
+            refusal = self.refusal_handler.get_refusal(query, classification)
+            state['response'] = self._respond(refusal['message'], 'advisory',
+                                              [refusal['educational_link']], refusal['suggestions'])
+
+    def _fact_lookup(self, state: Dict[str, Any]):
+        if self.fact_lookup is None:
+            return
+        fact_answer = self.fact_lookup.lookup(state['query'])
+        metrics.record_cache('fact_table', fact_answer is not None)
+        if fact_answer:
+            # Answered from the fact table - no retrieval or LLM call
+            state['response'] = self._respond(fact_answer['answer'], 'factual', fact_answer['sources'],
+                                              citations=self._cite_urls(fact_answer.get('citations', [])))
+
+    def _retrieve(self, state: Dict[str, Any]):
+        if state['reused_chunks']:
+            return
+        chunks = self.retriever.retrieve(state['query'], k=self.k, query_embedding=state['query_embedding'])
+        state['chunks'] = chunks
+        if not chunks or chunks[0].get('score', 0) < self.score_threshold:
+            state['response'] = self._respond(NO_ANSWER_REPLY, 'factual', suggestions=self._no_answer_suggestions())
+
+    def _generate(self, state: Dict[str, Any]):
+        answer = self.generator.generate_answer(state['query'], state['chunks'],
+                                                query_embedding=state['query_embedding'])
+
+        # Citation ids were resolved at index time; no per-request string work
+        sources, citations = self._cite_chunks(state['chunks'])
+
+        suggestions = []
+        if "I don't know based on the provided sources" in answer:
+            suggestions = self._no_answer_suggestions()
+        state['response'] = self._respond(answer, 'factual', sources, suggestions, citations)
+
+
+def build_pipeline(embeddings_dir: str, api_key: str = None, intent_method: str = None,
+                   answer_cache: bool = True) -> ChatPipeline:
+    """
+    Build the standard pipeline from the Phase 2 artifacts.
+    answer_cache loads precomputed answers from answer_cache.json (see warm_answer_cache).
+    intent_method ('centroid' or 'nearest') enables the embedding intent classifier.
+    MF_LLM_CLIENT=fake swaps Groq for the offline FakeLLMClient.
+    MF_EMBEDDING_SERVICE (socket path or tcp://host:port) encodes through the
+    shared embedding service and maps the index read-only; MF_MMAP_INDEX=1
+    maps the index without the service.
+    MF_CONVERSATION_DB keeps conversation history in SQLite instead of memory.
+    """
+    from phase3_retrieval.retrieval_pipeline import RetrievalSystem
+    from phase3_retrieval.query_classifier import QueryClassifier
+    from phase3_retrieval.fact_lookup import FactLookup
+    from phase3_retrieval.intent_classifier import EmbeddingIntentClassifier
+    from phase4_generation.generation_pipeline import AnswerGenerator
+    from phase4_generation.llm_client import llm_client_from_env
+    from phase4_generation.refusal_handler import RefusalHandler
+    from utils.suggestions import SuggestionsHandler
+    from utils.answer_cache import AnswerCache, index_fingerprint
+    from utils.conversation import conversation_store_from_env
+
+    encoder = None
+    service_address = os.getenv("MF_EMBEDDING_SERVICE")
+    if service_address:
+        from phase3_retrieval.embedding_service import RemoteEncoder
+        encoder = RemoteEncoder(service_address)
+    mmap_index = bool(service_address) or os.getenv("MF_MMAP_INDEX") == "1"
+
+    retriever = RetrievalSystem(embeddings_dir, encoder=encoder, mmap_index=mmap_index)
+    intent_classifier = None
+    if intent_method:
+        intent_classifier = EmbeddingIntentClassifier(retriever.model, embeddings_dir, method=intent_method)
+
+    return ChatPipeline(
+        retriever=retriever,
+        generator=AnswerGenerator(api_key=api_key, stream=True, llm_client=llm_client_from_env()),
+        classifier=QueryClassifier(intent_classifier=intent_classifier),
+        fact_lookup=FactLookup(embeddings_dir),
+        refusal_handler=RefusalHandler(),
+        suggestions_handler=SuggestionsHandler(),
+        # Checked against the published index on every lookup (ingestion, sync)
+        answer_cache=AnswerCache(os.path.join(embeddings_dir, ANSWER_CACHE_FILE),
+                                 index_fingerprint(embeddings_dir), embeddings_dir) if answer_cache else None,
+        conversations=conversation_store_from_env(),
+    )
@@ -0,0 +1,191 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+# Add project root to path so the module also runs as a script
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from phase2_vector_db.fact_table import SCHEMES, resolve_schemes
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+# Openers that mark a question as continuing the previous one
+FOLLOW_UP_OPENERS = re.compile(r"^(and|also|what about|how about|and what about|and how about)\b[\s,]*", re.IGNORECASE)
+# References to "the fund we were talking about"
+POSSESSIVE_REFERENCE = re.compile(r"\b(its|it's)\b", re.IGNORECASE)
+SUBJECT_REFERENCE = re.compile(r"\b(this|that|the same|the) (fund|scheme)\b|\bit\b", re.IGNORECASE)
+# A bare scheme-level field ("exit load?", "what is the benchmark?") is a follow-up too; definitions
+# ("what is an exit load?", "what does exit load mean?", "define AUM") are not
+FIELD_QUESTION = re.compile(r"^(?:(?:what|who|which)(?:'s| is| are| was) the |the )?"
+                            r"(?:expense ratio|exit load|sip|lock[\s-]?in|benchmark|riskometer|risk level|aum|"
+                            r"fund manager)\s*\??$", re.IGNORECASE)
+QUESTION_START = re.compile(r"^(what|which|who|when|where|why|how|is|are|does|do|did|can|should|will|has|have)\b",
+                            re.IGNORECASE)
+STOP_WORDS = {'what', 'which', 'about', 'does', 'have', 'there', 'this', 'that', 'fund', 'scheme', 'the', 'also', 'and'}
+
+
+def single_scheme(text: str) -> Optional[str]:
+    schemes = resolve_schemes(text)
+    return schemes[0] if len(schemes) == 1 else None
+
+
+def rewrite_follow_up(query: str, history: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Resolve a follow-up against the conversation so far.
+
+    "and its exit load?" after a question about HDFC Mid Cap Fund becomes
+    "What is HDFC Mid Cap Fund's exit load?". Pure regex work, no model call.
+
+    Returns:
+        {'query': str (rewritten or unchanged), 'scheme': scheme key or None,
+         'follow_up': bool}
+    """
+    scheme = single_scheme(query)
+    if scheme or resolve_schemes(query):
+        return {'query': query, 'scheme': scheme, 'follow_up': False}
+
+    previous = next((turn['scheme'] for turn in reversed(history) if turn.get('scheme')), None)
+    if previous is None:
+        return {'query': query, 'scheme': None, 'follow_up': False}
+
+    text = query.strip()
+    opener = FOLLOW_UP_OPENERS.match(text)
+    has_reference = POSSESSIVE_REFERENCE.search(text) or SUBJECT_REFERENCE.search(text)
+    bare_field = FIELD_QUESTION.match(text)
+    if not (opener or has_reference or bare_field):
+        return {'query': query, 'scheme': None, 'follow_up': False}
+
+    name = SCHEMES[previous]['name']
+    text = FOLLOW_UP_OPENERS.sub("", text).rstrip(" ?")
+    if POSSESSIVE_REFERENCE.search(text):
+        text = POSSESSIVE_REFERENCE.sub(f"{name}'s", text, count=1)
+    elif SUBJECT_REFERENCE.search(text):
+        text = SUBJECT_REFERENCE.sub(name, text, count=1)
+    else:
+        text = f"{text} of {name}"
+    if not QUESTION_START.match(text):
+        text = f"What is {text[0].lower() + text[1:]}" if not text.startswith(name) else f"What is {text}"
+    return {'query': text + "?", 'scheme': previous, 'follow_up': True}
+
+
+def key_terms(query: str) -> List[str]:
+    """Content words of a question (scheme names excluded)."""
+    text = query.lower()
+    for scheme in SCHEMES.values():
+        text = text.replace(scheme['name'].lower(), " ")
+    return [word for word in re.findall(r"[a-z0-9%-]+", text) if len(word) > 2 and word not in STOP_WORDS]
+
+
+def chunks_cover(chunks: List[Dict[str, Any]], terms: List[str]) -> bool:
+    """True when one chunk mentions every term, i.e. the old context can answer the new question."""
+    return bool(terms) and any(all(term in chunk.get('text', '').lower() for term in terms) for chunk in chunks)
+
+
+class ConversationStore:
+    """
+    Bounded in-memory conversation history: at most `max_sessions` sessions
+    (least recently used evicted first), `max_turns` turns each, and sessions
+    idle for longer than `ttl` seconds are dropped.
+    """
+
+    def __init__(self, max_sessions: int = 1000, ttl: float = 1800.0, max_turns: int = 6, clock=time.time):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.max_turns = max_turns
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def history(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return []
+            if self.clock() - session['updated'] > self.ttl:
+                del self._sessions[session_id]
+                return []
+            self._sessions.move_to_end(session_id)
+            return list(session['turns'])
+
+    def add_turn(self, session_id: str, turn: Dict[str, Any]):
+        with self._lock:
+            session = self._sessions.pop(session_id, None) or {'turns': []}
+            session['turns'] = (session['turns'] + [turn])[-self.max_turns:]
+            session['updated'] = self.clock()
+            self._sessions[session_id] = session
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    Same bounds as ConversationStore, persisted in SQLite so history survives
+    restarts and is shared by every worker process on the host.
+    """
+
+    def __init__(self, path: str, max_sessions: int = 1000, ttl: float = 1800.0, max_turns: int = 6,
+                 clock=time.time):
+        super().__init__(max_sessions=max_sessions, ttl=ttl, max_turns=max_turns, clock=clock)
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, created REAL NOT NULL, turn TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, id)")
+
+    def history(self, session_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT created, turn FROM turns WHERE session_id = ? ORDER BY id", (session_id,)
+            ).fetchall()
+        if not rows or self.clock() - rows[-1][0] > self.ttl:
+            return []
+        return [json.loads(turn) for _, turn in rows]
+
+    def add_turn(self, session_id: str, turn: Dict[str, Any]):
+        now = self.clock()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute("INSERT INTO turns (session_id, created, turn) VALUES (?, ?, ?)",
+                               (session_id, now, json.dumps(turn, ensure_ascii=False)))
+            # Keep the newest max_turns of this session
+            self._conn.execute(
+                "DELETE FROM turns WHERE session_id = ? AND id NOT IN "
+                "(SELECT id FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_turns))
+            # Expire idle sessions, then evict the least recently used beyond max_sessions
+            self._conn.execute(
+                "DELETE FROM turns WHERE session_id IN "
+                "(SELECT session_id FROM turns GROUP BY session_id HAVING MAX(created) < ?)", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM turns WHERE session_id IN (SELECT session_id FROM turns GROUP BY session_id "
+                "ORDER BY MAX(id) DESC LIMIT -1 OFFSET ?)", (self.max_sessions,))
+            self._conn.execute("COMMIT")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(DISTINCT session_id) FROM turns").fetchone()[0]
+
+
+def conversation_store_from_env() -> ConversationStore:
+    """MF_CONVERSATION_DB (SQLite path) persists history; MF_CONVERSATION_TTL sets idle expiry in seconds."""
+    ttl = float(os.getenv("MF_CONVERSATION_TTL", "1800"))
+    path = os.getenv("MF_CONVERSATION_DB")
+    if path:
+        return SQLiteConversationStore(path, ttl=ttl)
+    return ConversationStore(ttl=ttl)
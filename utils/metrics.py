@@ -0,0 +1,214 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Tuple
+
+# Latency buckets in seconds, from in-memory lookups up to slow LLM calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+STAGE_SECONDS = "mf_stage_duration_seconds"
+LLM_TOKENS = "mf_llm_tokens_total"
+CACHE_REQUESTS = "mf_cache_requests_total"
+REQUESTS = "mf_requests_total"
+CONTEXT_TOKENS = "mf_context_tokens_total"
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Minimal thread-safe metrics registry (counters and histograms with labels)
+    rendered in the Prometheus text exposition format.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self._counters: Dict[str, Dict[Tuple, float]] = {}
+
+    def describe(self, name: str, metric_type: str, help_text: str):
+        self._help[name] = (metric_type, help_text)
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram()
+            series[key].observe(value)
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Compact view for debug panels:
+        {'stages': {stage: {'count', 'mean'}}, 'counters': {name: {labels: value}}}
+        """
+        with self._lock:
+            stages = {}
+            for key, histogram in self._histograms.get(STAGE_SECONDS, {}).items():
+                stage = dict(key).get('stage', '')
+                stages[stage] = {'count': histogram.count, 'mean': histogram.sum / histogram.count}
+            counters = {
+                name: {",".join(f"{k}={v}" for k, v in key): value for key, value in series.items()}
+                for name, series in self._counters.items()
+            }
+        return {'stages': stages, 'counters': counters}
+
+    def cache_hit_rate(self, cache: str) -> Optional[float]:
+        hits = self.counter_value(CACHE_REQUESTS, cache=cache, result='hit')
+        misses = self.counter_value(CACHE_REQUESTS, cache=cache, result='miss')
+        total = hits + misses
+        return hits / total if total else None
+
+    def render(self) -> str:
+        """Prometheus text format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name in sorted(self._counters):
+                self._render_header(lines, name, 'counter')
+                for key, value in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_format_labels(key)} {value:g}")
+
+            for name in sorted(self._histograms):
+                self._render_header(lines, name, 'histogram')
+                for key, histogram in sorted(self._histograms[name].items()):
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        lines.append(f"{name}_bucket{_format_labels(key, (('le', f'{bound:g}'),))} {count}")
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def _render_header(self, lines: List[str], name: str, default_type: str):
+        metric_type, help_text = self._help.get(name, (default_type, ""))
+        if help_text:
+            lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.describe(STAGE_SECONDS, 'histogram', "Time spent per request stage (classify, encode, search, context_build, llm_ttft, llm, total)")
+REGISTRY.describe(LLM_TOKENS, 'counter', "Tokens reported by the LLM API")
+REGISTRY.describe(CACHE_REQUESTS, 'counter', "Cache lookups by cache and result (hit/miss)")
+REGISTRY.describe(CONTEXT_TOKENS, 'counter', "Estimated context tokens before (retrieved) and after (sent) context compression")
+REGISTRY.describe(REQUESTS, 'counter', "Answered requests by the pipeline stage that produced the answer")
+
+# Per-request trace so callers can see the spans of the request they ran
+_current_trace: contextvars.ContextVar = contextvars.ContextVar('mf_trace', default=None)
+# Token counts held back by capture_tokens()
+_token_capture: contextvars.ContextVar = contextvars.ContextVar('mf_token_capture', default=None)
+
+
+@contextmanager
+def trace():
+    """
+    Collect the spans and token counts of one request:
+    {'timings': {stage: seconds}, 'tokens': {'prompt': n, 'completion': n}}
+    """
+    request_trace = {'timings': {}, 'tokens': {}}
+    token = _current_trace.set(request_trace)
+    try:
+        yield request_trace
+    finally:
+        _current_trace.reset(token)
+
+
+def observe_stage(stage: str, seconds: float):
+    REGISTRY.observe(STAGE_SECONDS, seconds, stage=stage)
+    request_trace = _current_trace.get()
+    if request_trace is not None:
+        timings = request_trace['timings']
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block and record it as a stage."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def capture_tokens():
+    """
+    Hold back the token counts recorded in the block as [(prompt, completion)]
+    instead of counting them; the caller decides whether to record_tokens()
+    them (e.g. only for the hedged request that won).
+    """
+    captured: List[Tuple[int, int]] = []
+    token = _token_capture.set(captured)
+    try:
+        yield captured
+    finally:
+        _token_capture.reset(token)
+
+
+def record_tokens(prompt_tokens: int, completion_tokens: int):
+    captured = _token_capture.get()
+    if captured is not None:
+        captured.append((prompt_tokens, completion_tokens))
+        return
+    REGISTRY.inc(LLM_TOKENS, prompt_tokens, type='prompt')
+    REGISTRY.inc(LLM_TOKENS, completion_tokens, type='completion')
+    request_trace = _current_trace.get()
+    if request_trace is not None:
+        tokens = request_trace['tokens']
+        tokens['prompt'] = tokens.get('prompt', 0) + prompt_tokens
+        tokens['completion'] = tokens.get('completion', 0) + completion_tokens
+
+
+def record_context_tokens(retrieved_tokens: int, sent_tokens: int):
+    REGISTRY.inc(CONTEXT_TOKENS, retrieved_tokens, type='retrieved')
+    REGISTRY.inc(CONTEXT_TOKENS, sent_tokens, type='sent')
+    request_trace = _current_trace.get()
+    if request_trace is not None:
+        request_trace['tokens']['context_retrieved'] = retrieved_tokens
+        request_trace['tokens']['context_sent'] = sent_tokens
+
+
+def record_cache(cache: str, hit: bool):
+    REGISTRY.inc(CACHE_REQUESTS, cache=cache, result='hit' if hit else 'miss')
+
+
+def record_request(stage: str):
+    REGISTRY.inc(REQUESTS, stage=stage)
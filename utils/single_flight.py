@@ -0,0 +1,93 @@
+import asyncio
+import threading
+from typing import Any, Callable, Dict, Tuple, Awaitable
+
+from utils import metrics
+
+COALESCED_REQUESTS = "mf_coalesced_requests_total"
+metrics.REGISTRY.describe(COALESCED_REQUESTS, 'counter', "Requests answered by joining an identical in-flight request")
+
+
+def normalize_query(query: str) -> str:
+    """Key for 'the same question': case, whitespace and trailing punctuation are ignored."""
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Thread-based single-flight: concurrent callers with the same key wait for
+    the first caller's computation and share its result (or exception).
+    Nothing is cached once the call finishes.
+    """
+
+    def __init__(self, name: str = 'pipeline'):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """Returns (result, shared); shared is True for callers that joined another's call."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            metrics.REGISTRY.inc(COALESCED_REQUESTS, layer=self.name)
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """
+    asyncio flavour of SingleFlight for async request handlers. The shared
+    call runs as its own task, so cancelling any caller (the first one
+    included, e.g. a client that disconnected) leaves the others waiting on it.
+    """
+
+    def __init__(self, name: str = 'backend'):
+        self.name = name
+        self._calls: Dict[str, asyncio.Task] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        task = self._calls.get(key)
+        shared = task is not None
+        if shared:
+            metrics.REGISTRY.inc(COALESCED_REQUESTS, layer=self.name)
+        else:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda finished: self._finished(key, finished))
+        # shield: a cancelled caller stops waiting without cancelling the shared call
+        return await asyncio.shield(task), shared
+
+    def _finished(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            # Mark retrieved so an exception every caller abandoned is not logged
+            task.exception()
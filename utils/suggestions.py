@@ -1,6 +1,40 @@
 import random
 from typing import List
 
+# Streamlit starter buttons (fixed set)
+STARTER_QUESTIONS = [
+    "What is the expense ratio of HDFC Midcap Fund?",
+    "Is there any exit load for HDFC Large Cap Fund?",
+    "What is the minimum SIP investment required for HDFC Flexi Cap Fund?",
+    "What is the risk level and benchmark of HDFC Small Cap Fund?",
+    "How can I download my capital gains statement?",
+]
+
+# Alternate questions after refusal (fixed set)
+ALTERNATE_QUESTIONS = [
+    "What is the expense ratio of HDFC Midcap Fund?",
+    "What exit load applies to HDFC Large Cap Fund?",
+    "How can I download my mutual fund statements?",
+]
+
+# Suggested questions - verified to have answers in knowledge base
+SUGGESTED_QUESTIONS = [
+    "What is a Systematic Investment Plan (SIP)?",
+    "What are the risks associated with mutual funds?",
+    "How is NAV calculated?",
+    "What are the different types of mutual funds?",
+    "How can I redeem my mutual fund units?"
+]
+
+
+def all_suggested_questions() -> List[str]:
+    """Every question the UI can offer as a click: starter buttons, suggestion banks and refusal alternatives."""
+    from phase4_generation.refusal_handler import FACTUAL_SUGGESTIONS
+
+    questions = STARTER_QUESTIONS + ALTERNATE_QUESTIONS + SUGGESTED_QUESTIONS
+    questions += SuggestionsHandler().all_questions() + FACTUAL_SUGGESTIONS
+    return list(dict.fromkeys(questions))
+
 
 class SuggestionsHandler:
     """
@@ -64,6 +98,15 @@ class SuggestionsHandler:
         # Return random sample
         return random.sample(suggestions, min(count, len(suggestions)))
     
+    def all_questions(self) -> List[str]:
+        """Every question in the bank, including the fund-specific ones, without duplicates."""
+        questions = []
+        for context, bank in self.suggestion_bank.items():
+            groups = bank.values() if isinstance(bank, dict) else [bank]
+            for group in groups:
+                questions.extend(group)
+        return list(dict.fromkeys(questions))
+
     def get_no_answer_suggestions(self, count: int = 2) -> List[str]:
         """Get suggestions for when no answer is available."""
         return self.get_suggestions('no_answer', count)